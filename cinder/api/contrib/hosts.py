@@ -152,27 +152,21 @@ class HostController(wsgi.Controller):
         host_ref = objects.Service.get_by_host_and_topic(
             context, host, constants.VOLUME_TOPIC)
 
-        # Getting total available/used resource
-        # TODO(jdg): Add summary info for Snapshots
-        volume_refs = db.volume_get_all_by_host(context, host_ref.host)
-        (count, sum) = db.volume_data_get_for_host(context,
-                                                   host_ref.host)
-
+        # Getting the used resources of each project on the host, with one
+        # grouped query per resource type
+        volume_data = db.volume_data_get_by_project_for_host(context,
+                                                             host_ref.host)
+        snapshot_data = db.snapshot_data_get_by_project_for_host(
+            context, host_ref.host)
+
+        count_total = 0
+        sum_total = 0
         snap_count_total = 0
         snap_sum_total = 0
-        resources = [{'resource': {'host': host, 'project': '(total)',
-                                   'volume_count': str(count),
-                                   'total_volume_gb': str(sum),
-                                   'snapshot_count': str(snap_count_total),
-                                   'total_snapshot_gb': str(snap_sum_total)}}]
-
-        project_ids = [v['project_id'] for v in volume_refs]
-        project_ids = list(set(project_ids))
-        for project_id in project_ids:
-            (count, sum) = db.volume_data_get_for_project(context, project_id)
-            (snap_count, snap_sum) = (
-                objects.Snapshot.snapshot_data_get_for_project(context,
-                                                               project_id))
+        resources = []
+        for project_id in sorted(volume_data):
+            (count, sum) = volume_data[project_id]
+            (snap_count, snap_sum) = snapshot_data.get(project_id, (0, 0))
             resources.append(
                 {'resource':
                     {'host': host,
@@ -181,10 +175,17 @@ class HostController(wsgi.Controller):
                      'total_volume_gb': str(sum),
                      'snapshot_count': str(snap_count),
                      'total_snapshot_gb': str(snap_sum)}})
-            snap_count_total += int(snap_count)
-            snap_sum_total += int(snap_sum)
-        resources[0]['resource']['snapshot_count'] = str(snap_count_total)
-        resources[0]['resource']['total_snapshot_gb'] = str(snap_sum_total)
+            count_total += count
+            sum_total += sum
+            snap_count_total += snap_count
+            snap_sum_total += snap_sum
+
+        resources.insert(0, {'resource': {
+            'host': host, 'project': '(total)',
+            'volume_count': str(count_total),
+            'total_volume_gb': str(sum_total),
+            'snapshot_count': str(snap_count_total),
+            'total_snapshot_gb': str(snap_sum_total)}})
         return {"host": resources}
 
 
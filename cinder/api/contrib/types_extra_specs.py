@@ -65,6 +65,7 @@ class VolumeTypeExtraSpecsController(wsgi.Controller):
         db.volume_type_extra_specs_update_or_create(context,
                                                     type_id,
                                                     specs)
+        volume_types.invalidate_cache()
         notifier_info = dict(type_id=type_id, specs=specs)
         notifier = rpc.get_notifier('volumeTypeExtraSpecs')
         notifier.info(context, 'volume_type_extra_specs.create',
@@ -90,6 +91,7 @@ class VolumeTypeExtraSpecsController(wsgi.Controller):
         db.volume_type_extra_specs_update_or_create(context,
                                                     type_id,
                                                     body)
+        volume_types.invalidate_cache()
         notifier_info = dict(type_id=type_id, id=id)
         notifier = rpc.get_notifier('volumeTypeExtraSpecs')
         notifier.info(context,
@@ -117,6 +119,7 @@ class VolumeTypeExtraSpecsController(wsgi.Controller):
 
         # Not found exception will be handled at the wsgi level
         db.volume_type_extra_specs_delete(context, type_id, id)
+        volume_types.invalidate_cache()
 
         notifier_info = dict(type_id=type_id, id=id)
         notifier = rpc.get_notifier('volumeTypeExtraSpecs')
@@ -113,10 +113,14 @@ class VolumeController(wsgi.Controller):
                                           sort_dirs=sort_dirs,
                                           filters=filters,
                                           viewable_admin_meta=True,
-                                          offset=offset)
+                                          offset=offset,
+                                          detail=is_detail)
 
-        for volume in volumes:
-            utils.add_visible_admin_metadata(volume)
+        # The summary view only shows the id and the name of the volumes,
+        # which are listed without their metadata.
+        if is_detail:
+            for volume in volumes:
+                utils.add_visible_admin_metadata(volume)
 
         req.cache_db_volumes(volumes.objects)
 
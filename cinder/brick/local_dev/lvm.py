@@ -20,6 +20,7 @@ LVM class for performing LVM operations.
 import math
 import os
 import re
+import time
 
 from os_brick import executor
 from oslo_concurrency import processutils as putils
@@ -28,7 +29,7 @@ from oslo_utils import excutils
 from six import moves
 
 from cinder import exception
-from cinder.i18n import _LE, _LI
+from cinder.i18n import _LE, _LI, _LW
 from cinder import utils
 
 
@@ -38,10 +39,12 @@ LOG = logging.getLogger(__name__)
 class LVM(executor.Executor):
     """LVM object to enable various LVM related operations."""
     LVM_CMD_PREFIX = ['env', 'LC_ALL=C']
+    # Fields of the LVs kept in the cache, in the order of the lvs output
+    LV_CACHE_FIELDS = ('vg', 'name', 'size', 'attr', 'origin', 'data_percent')
 
     def __init__(self, vg_name, root_helper, create_vg=False,
                  physical_volumes=None, lvm_type='default',
-                 executor=putils.execute, lvm_conf=None):
+                 executor=putils.execute, lvm_conf=None, cache_ttl=0):
 
         """Initialize the LVM object.
 
@@ -55,6 +58,8 @@ class LVM(executor.Executor):
         :param physical_volumes: List of PVs to build VG on
         :param lvm_type: VG and Volume type (default, or thin)
         :param executor: Execute method to use, None uses common/processutils
+        :param cache_ttl: Number of seconds the LV and VG information is
+                          cached for, 0 disables the cache
 
         """
         super(LVM, self).__init__(execute=executor, root_helper=root_helper)
@@ -71,6 +76,17 @@ class LVM(executor.Executor):
         self._supports_lvchange_ignoreskipactivation = None
         self.vg_provisioned_capacity = 0.0
 
+        # The LVs of the VG by name and the VG info, loaded by one lvs and
+        # one vgs command and updated by the changes made through this
+        # object, so that reads do not run LVM commands.
+        self._cache_ttl = cache_ttl
+        self._lv_cache = None
+        self._vg_cache = None
+        self._cache_loaded_at = 0
+        # Bumped on every change, so that a scan started before a change
+        # is not stored over its write-through update.
+        self._cache_epoch = 0
+
         # Ensure LVM_SYSTEM_DIR has been added to LVM.LVM_CMD_PREFIX
         # before the first LVM command is executed, and use the directory
         # where the specified lvm_conf file is located as the value.
@@ -163,11 +179,8 @@ class LVM(executor.Executor):
             if out is not None:
                 out = out.strip()
                 data = out.split(':')
-                pool_size = float(data[0])
-                data_percent = float(data[1])
-                consumed_space = pool_size / 100 * data_percent
-                free_space = pool_size - consumed_space
-                free_space = round(free_space, 2)
+                free_space = self._calculate_thin_pool_free_space(data[0],
+                                                                  data[1])
         except putils.ProcessExecutionError as err:
             LOG.exception(_LE('Error querying thin pool about data_percent'))
             LOG.error(_LE('Cmd     :%s'), err.cmd)
@@ -176,6 +189,50 @@ class LVM(executor.Executor):
 
         return free_space
 
+    def get_snapshot_allocated_size(self, name):
+        """Returns the allocated size of the COW store of a snapshot.
+
+        dm-snapshot allocates the chunks of its exception store one after
+        the other, so everything the snapshot ever stored is within this
+        size from the start of its -cow device.
+
+        :param name: the snapshot LV to gather info for
+        :returns: Allocated size in MiB (float), or None if it is unknown
+
+        """
+        cmd = LVM.LVM_CMD_PREFIX + ['lvs', '--noheadings', '--unit=m',
+                                    '-o', 'size,data_percent', '--separator',
+                                    ':', '--nosuffix',
+                                    '%s/%s' % (self.vg_name, name)]
+        try:
+            (out, _err) = self._execute(*cmd,
+                                        root_helper=self._root_helper,
+                                        run_as_root=True)
+            size, data_percent = out.strip().split(':')
+            size = float(size)
+            # NOTE: data_percent is rounded to two decimals, round it up
+            # so that the last chunks allocated are always included.
+            data_percent = min(float(data_percent) + 0.01, 100.0)
+        except putils.ProcessExecutionError as err:
+            LOG.exception(_LE('Error querying snapshot about data_percent'))
+            LOG.error(_LE('Cmd     :%s'), err.cmd)
+            LOG.error(_LE('StdOut  :%s'), err.stdout)
+            LOG.error(_LE('StdErr  :%s'), err.stderr)
+            return None
+        except (AttributeError, ValueError):
+            # An invalidated snapshot has no data_percent
+            LOG.warning(_LW('Unable to get the allocated size of snapshot '
+                            '%s.'), name)
+            return None
+
+        return size / 100 * data_percent
+
+    @staticmethod
+    def _calculate_thin_pool_free_space(pool_size, data_percent):
+        pool_size = float(pool_size)
+        consumed_space = pool_size / 100 * float(data_percent)
+        return round(pool_size - consumed_space, 2)
+
     @staticmethod
     def get_lvm_version(root_helper):
         """Static method to get LVM version from system.
@@ -287,15 +344,134 @@ class LVM(executor.Executor):
 
         return lv_list
 
+    def _get_lvs(self, *lv_names):
+        """Get the cached fields of the LVs of the VG, or of some of them.
+
+        :param lv_names: optional, gathers info for only the specified LVs
+        :returns: Dictionary of LV info dictionaries, by LV name
+
+        """
+        cmd = LVM.LVM_CMD_PREFIX + ['lvs', '--noheadings', '--unit=g',
+                                    '-o', 'vg_name,name,size,attr,origin,'
+                                    'data_percent', '--separator', ':',
+                                    '--nosuffix']
+        if lv_names:
+            cmd.extend('%s/%s' % (self.vg_name, name) for name in lv_names)
+        else:
+            cmd.append(self.vg_name)
+
+        (out, _err) = self._execute(*cmd,
+                                    root_helper=self._root_helper,
+                                    run_as_root=True)
+        lvs = {}
+        for line in (out or '').splitlines():
+            fields = line.strip().split(':')
+            if len(fields) != len(self.LV_CACHE_FIELDS):
+                continue
+            lv = dict(zip(self.LV_CACHE_FIELDS, fields))
+            lv['origin'] = lv['origin'] or None
+            lvs[lv['name']] = lv
+        return lvs
+
+    def _get_cache(self):
+        """Get the cached LVs and VG info, reloading them when expired.
+
+        :returns: Tuple of the LV info dictionaries by LV name and of the
+                  VG info list
+
+        """
+        now = time.time()
+        if (self._lv_cache is not None and
+                now - self._cache_loaded_at < self._cache_ttl):
+            return self._lv_cache, self._vg_cache
+
+        epoch = self._cache_epoch
+        lvs = self._get_lvs()
+        vg_list = self.get_all_volume_groups(self._root_helper, self.vg_name)
+        if epoch == self._cache_epoch:
+            self._lv_cache = lvs
+            self._vg_cache = vg_list
+            self._cache_loaded_at = now
+        return lvs, vg_list
+
+    def _get_cached_lv(self, name):
+        """Get the cached info of an LV.
+
+        LVs missing from the cache are looked up, in case they were created
+        outside of this object since the cache was loaded.
+
+        :returns: LV info dictionary, None if the LV does not exist
+
+        """
+        lvs, _vg_list = self._get_cache()
+        if name in lvs:
+            return lvs[name]
+
+        epoch = self._cache_epoch
+        try:
+            lv = self._get_lvs(name).get(name)
+        except putils.ProcessExecutionError as err:
+            if "not found" in err.stderr or "Failed to find" in err.stderr:
+                return None
+            raise
+        if lv is not None and epoch == self._cache_epoch:
+            lvs[name] = lv
+        return lv
+
+    @staticmethod
+    def _lv_info(lv):
+        return {'vg': lv['vg'], 'name': lv['name'], 'size': lv['size']}
+
+    def _update_cache(self, changed=(), removed=()):
+        """Write-through update of the cache after LVs were changed.
+
+        :param changed: names of the LVs created or modified
+        :param removed: names of the LVs deleted
+
+        """
+        self._cache_epoch += 1
+        if self._lv_cache is None:
+            return
+
+        for name in removed:
+            self._lv_cache.pop(name, None)
+        names = set(changed)
+        if self.vg_thin_pool is not None:
+            # Changes in a thin pool update its data usage
+            names.add(self.vg_thin_pool)
+        try:
+            if names:
+                self._lv_cache.update(self._get_lvs(*sorted(names)))
+            self._vg_cache = self.get_all_volume_groups(self._root_helper,
+                                                        self.vg_name)
+        except putils.ProcessExecutionError:
+            LOG.warning(_LW('Unable to update the cached information of '
+                            'Volume Group %s, it will be reloaded.'),
+                        self.vg_name)
+            self.invalidate_cache()
+
+    def invalidate_cache(self):
+        """Drop the cached LV and VG info, the next read reloads them."""
+        self._cache_epoch += 1
+        self._lv_cache = None
+        self._vg_cache = None
+
     def get_volumes(self, lv_name=None):
         """Get all LV's associated with this instantiation (VG).
 
         :returns: List of Dictionaries with LV info
 
         """
-        return self.get_lv_info(self._root_helper,
-                                self.vg_name,
-                                lv_name)
+        if not self._cache_ttl:
+            return self.get_lv_info(self._root_helper,
+                                    self.vg_name,
+                                    lv_name)
+
+        if lv_name is not None:
+            lv = self._get_cached_lv(lv_name)
+            return [self._lv_info(lv)] if lv else []
+        lvs, _vg_list = self._get_cache()
+        return [self._lv_info(lvs[name]) for name in sorted(lvs)]
 
     def get_volume(self, name):
         """Get reference object of volume specified by name.
@@ -383,7 +559,11 @@ class LVM(executor.Executor):
         :returns: Dictionaries of VG info
 
         """
-        vg_list = self.get_all_volume_groups(self._root_helper, self.vg_name)
+        if self._cache_ttl:
+            lvs, vg_list = self._get_cache()
+        else:
+            vg_list = self.get_all_volume_groups(self._root_helper,
+                                                 self.vg_name)
 
         if len(vg_list) != 1:
             LOG.error(_LE('Unable to find VG: %s'), self.vg_name)
@@ -418,8 +598,11 @@ class LVM(executor.Executor):
             # We need info on both the thin pool and the volumes,
             # therefore we should provide only self.vg_name, but not
             # self.vg_thin_pool here.
-            for lv in self.get_lv_info(self._root_helper,
-                                       self.vg_name):
+            if self._cache_ttl:
+                lv_list = [self._lv_info(lv) for lv in lvs.values()]
+            else:
+                lv_list = self.get_lv_info(self._root_helper, self.vg_name)
+            for lv in lv_list:
                 lvsize = lv['size']
                 # get_lv_info runs "lvs" command with "--nosuffix".
                 # This removes "g" from "1.00g" and only outputs "1.00".
@@ -430,8 +613,12 @@ class LVM(executor.Executor):
                     lvsize = lvsize[:-1]
                 if lv['name'] == self.vg_thin_pool:
                     self.vg_thin_pool_size = lvsize
-                    tpfs = self._get_thin_pool_free_space(self.vg_name,
-                                                          self.vg_thin_pool)
+                    if self._cache_ttl:
+                        tpfs = self._calculate_thin_pool_free_space(
+                            lvsize, lvs[lv['name']]['data_percent'])
+                    else:
+                        tpfs = self._get_thin_pool_free_space(
+                            self.vg_name, self.vg_thin_pool)
                     self.vg_thin_pool_free_space = tpfs
                 else:
                     total_vols_size = total_vols_size + float(lvsize)
@@ -498,6 +685,7 @@ class LVM(executor.Executor):
                       run_as_root=True)
 
         self.vg_thin_pool = name
+        self._update_cache(changed=[name])
         return size_str
 
     def create_volume(self, name, size_str, lv_type='default', mirror_count=0):
@@ -538,6 +726,7 @@ class LVM(executor.Executor):
             LOG.error(_LE('StdOut  :%s'), err.stdout)
             LOG.error(_LE('StdErr  :%s'), err.stderr)
             raise
+        self._update_cache(changed=[name])
 
     @utils.retry(putils.ProcessExecutionError)
     def create_lv_snapshot(self, name, source_lv_name, lv_type='default'):
@@ -569,6 +758,8 @@ class LVM(executor.Executor):
             LOG.error(_LE('StdOut  :%s'), err.stdout)
             LOG.error(_LE('StdErr  :%s'), err.stderr)
             raise
+        # The source LV is now the origin of a snapshot
+        self._update_cache(changed=[name, source_lv_name])
 
     def _mangle_lv_name(self, name):
         # Linux LVM reserves name that starts with snapshot, so that
@@ -674,6 +865,10 @@ class LVM(executor.Executor):
                           root_helper=self._root_helper, run_as_root=True,
                           check_exit_code=False)
 
+        origin = None
+        if self._cache_ttl and self._lv_cache and name in self._lv_cache:
+            origin = self._lv_cache[name]['origin']
+
         # LV removal seems to be a race with other writers or udev in
         # some cases (see LP #1270192), so we enable retry deactivation
         LVM_CONFIG = 'activation { retry_deactivation = 1} '
@@ -707,6 +902,9 @@ class LVM(executor.Executor):
                 root_helper=self._root_helper, run_as_root=True)
             LOG.debug('Successfully deleted volume: %s after '
                       'udev settle.', name)
+        # The origin of a deleted snapshot may have no snapshot left
+        self._update_cache(changed=[origin] if origin else [],
+                           removed=[name])
 
     def revert(self, snapshot_name):
         """Revert an LV from snapshot.
@@ -717,8 +915,17 @@ class LVM(executor.Executor):
         self._execute('lvconvert', '--merge',
                       snapshot_name, root_helper=self._root_helper,
                       run_as_root=True)
+        # The merge completes in the background, reload everything
+        self.invalidate_cache()
+
+    def _get_cached_lv_attr(self, name):
+        lv = self._get_cached_lv(name)
+        return lv['attr'] if lv else ''
 
     def lv_has_snapshot(self, name):
+        if self._cache_ttl:
+            return self._get_cached_lv_attr(name)[:1] in ('o', 'O')
+
         cmd = LVM.LVM_CMD_PREFIX + ['lvdisplay', '--noheading', '-C', '-o',
                                     'Attr', '%s/%s' % (self.vg_name, name)]
         out, _err = self._execute(*cmd,
@@ -732,6 +939,9 @@ class LVM(executor.Executor):
 
     def lv_is_snapshot(self, name):
         """Return True if LV is a snapshot, False otherwise."""
+        if self._cache_ttl:
+            return self._get_cached_lv_attr(name)[:1] == 's'
+
         cmd = LVM.LVM_CMD_PREFIX + ['lvdisplay', '--noheading', '-C', '-o',
                                     'Attr', '%s/%s' % (self.vg_name, name)]
         out, _err = self._execute(*cmd,
@@ -744,7 +954,10 @@ class LVM(executor.Executor):
         return False
 
     def lv_is_open(self, name):
-        """Return True if LV is currently open, False otherwise."""
+        """Return True if LV is currently open, False otherwise.
+
+        This is used as a safety check, so the cache is never used.
+        """
         cmd = LVM.LVM_CMD_PREFIX + ['lvdisplay', '--noheading', '-C', '-o',
                                     'Attr', '%s/%s' % (self.vg_name, name)]
         out, _err = self._execute(*cmd,
@@ -758,6 +971,10 @@ class LVM(executor.Executor):
 
     def lv_get_origin(self, name):
         """Return the origin of an LV that is a snapshot, None otherwise."""
+        if self._cache_ttl:
+            lv = self._get_cached_lv(name)
+            return lv['origin'] if lv else None
+
         cmd = LVM.LVM_CMD_PREFIX + ['lvdisplay', '--noheading', '-C', '-o',
                                     'Origin', '%s/%s' % (self.vg_name, name)]
         out, _err = self._execute(*cmd,
@@ -787,6 +1004,7 @@ class LVM(executor.Executor):
             LOG.error(_LE('StdOut  :%s'), err.stdout)
             LOG.error(_LE('StdErr  :%s'), err.stderr)
             raise
+        self._update_cache(changed=[lv_name])
 
     def vg_mirror_free_space(self, mirror_count):
         free_capacity = 0.0
@@ -825,3 +1043,4 @@ class LVM(executor.Executor):
             LOG.error(_LE('StdOut  :%s'), err.stdout)
             LOG.error(_LE('StdErr  :%s'), err.stderr)
             raise
+        self._update_cache(changed=[new_name], removed=[lv_name])
@@ -80,6 +80,7 @@ from cinder.db.sqlalchemy import api as db_api
 from cinder import exception
 from cinder.i18n import _
 from cinder import objects
+from cinder import quota_utils
 from cinder import rpc
 from cinder import utils
 from cinder import version
@@ -225,7 +226,11 @@ class DbCommands(object):
 
     @args('age_in_days', type=int,
           help='Purge deleted rows older than age in days')
-    def purge(self, age_in_days):
+    @args('--batch-size', type=int, default=1000,
+          help='Number of rows deleted in each transaction')
+    @args('--sleep', type=float, default=0,
+          help='Seconds to sleep between batches')
+    def purge(self, age_in_days, batch_size=1000, sleep=0):
         """Purge deleted rows older than a given age from cinder tables."""
         age_in_days = int(age_in_days)
         if age_in_days <= 0:
@@ -234,16 +239,35 @@ class DbCommands(object):
         if age_in_days >= (int(time.time()) / 86400):
             print(_("Maximum age is count of days since epoch."))
             sys.exit(1)
+        if batch_size <= 0:
+            print(_("Must supply a positive, non-zero value for batch "
+                    "size"))
+            sys.exit(1)
         ctxt = context.get_admin_context()
 
         try:
-            db.purge_deleted_rows(ctxt, age_in_days)
+            rows = db.purge_deleted_rows(ctxt, age_in_days,
+                                         batch_size=batch_size,
+                                         sleep_interval=sleep)
+            print(_("Purged %d rows.") % rows)
         except db_exc.DBReferenceError:
             print(_("Purge command failed, check cinder-manage "
                     "logs for more details."))
             sys.exit(1)
 
 
+class QuotaCommands(object):
+    """Class for managing quotas."""
+
+    def flush_project_cache(self):
+        """Flush the Keystone projects cached for nested quotas."""
+        ctxt = context.get_admin_context()
+        quota_utils.flush_cache(ctxt)
+        print(_("Services will drop their cached project hierarchies "
+                "within %d seconds.") %
+              CONF.project_hierarchy_cache_check_interval)
+
+
 class VersionCommands(object):
     """Class for exposing the codebase version."""
 
@@ -604,6 +628,7 @@ CATEGORIES = {
     'db': DbCommands,
     'host': HostCommands,
     'logs': GetLogCommands,
+    'quota': QuotaCommands,
     'service': ServiceCommands,
     'shell': ShellCommands,
     'version': VersionCommands,
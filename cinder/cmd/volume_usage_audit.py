@@ -34,6 +34,13 @@
     - `year` - previous year. If run on Jan 1, it generates usages for
       Jan 1 through Dec 31 of the previous year.
 
+    Volumes, snapshots and backups are loaded from the database in pages of
+    `batch_size` resources and their notifications are sent by at most
+    `notification_workers` green threads, so the memory used by the audit
+    does not grow with the number of resources.  `project_id_start` and
+    `project_id_end` restrict the audit to a range of project ids, so that
+    several workers can each audit a share of the projects.
+
 """
 
 from __future__ import print_function
@@ -41,9 +48,12 @@ from __future__ import print_function
 import datetime
 import sys
 
+import eventlet
 from oslo_config import cfg
 from oslo_log import log as logging
 
+eventlet.monkey_patch()
+
 from cinder import i18n
 i18n.enable_lazy()
 from cinder import context
@@ -70,19 +80,35 @@ script_opts = [
                 default=False,
                 help="Send the volume and snapshot create and delete "
                      "notifications generated in the specified period."),
+    cfg.IntOpt('batch_size',
+               default=1000,
+               min=1,
+               help="Number of volumes, snapshots or backups loaded from "
+                    "the database at a time."),
+    cfg.IntOpt('notification_workers',
+               default=10,
+               min=1,
+               help="Maximum number of usage notifications sent "
+                    "concurrently."),
+    cfg.StrOpt('project_id_start',
+               help="If this option is specified then only the projects "
+                    "whose id is greater than or equal to it are audited. "
+                    "Used with project_id_end to split the audit between "
+                    "several workers."),
+    cfg.StrOpt('project_id_end',
+               help="If this option is specified then only the projects "
+                    "whose id is lower than it are audited. Used with "
+                    "project_id_start to split the audit between several "
+                    "workers."),
 ]
 CONF.register_cli_opts(script_opts)
 
 
-def main():
-    objects.register_all()
-    admin_context = context.get_admin_context()
-    CONF(sys.argv[1:], project='cinder',
-         version=version.version_string())
-    logging.setup(CONF, "cinder")
-    LOG = logging.getLogger("cinder")
-    rpc.init(CONF)
-    begin, end = utils.last_completed_audit_period()
+def _get_audit_period(LOG, begin, end):
+    """Return the audit period, overridden by --start_time and --end_time.
+
+    Exits if the period ends before it starts.
+    """
     if CONF.start_time:
         begin = datetime.datetime.strptime(CONF.start_time,
                                            "%Y-%m-%d %H:%M:%S")
@@ -95,6 +121,136 @@ def main():
                                         'end': end}
         LOG.error(msg)
         sys.exit(-1)
+    return begin, end
+
+
+def _get_all_active_by_window(get_page, begin, end, project_id_range):
+    """Iterate over the resources active in a window, one page at a time.
+
+    get_page is called with a marker and a limit and returns the resources
+    ordered by id, the id of the last resource of a page being the marker
+    of the next one.
+    """
+    marker = None
+    while True:
+        page = get_page(begin, end, marker=marker, limit=CONF.batch_size,
+                        project_id_range=project_id_range)
+        for resource_ref in page:
+            yield resource_ref
+        if len(page) < CONF.batch_size:
+            return
+        marker = page[-1].id
+
+
+def _notify_actions(LOG, notify, admin_context, resource_ref, resource_type,
+                    begin, end):
+    """Send the create and delete notifications generated in the period."""
+    for action, action_at in (('create', resource_ref.created_at),
+                              ('delete', resource_ref.deleted_at)):
+        if not (action_at and action_at > begin and action_at < end):
+            continue
+        try:
+            local_extra_info = {
+                'audit_period_beginning': str(action_at),
+                'audit_period_ending': str(action_at),
+            }
+            LOG.debug("Send %(action)s notification for "
+                      "<%(type)s_id: %(id)s> "
+                      "<project_id %(project_id)s> <%(extra_info)s>",
+                      {'action': action,
+                       'type': resource_type,
+                       'id': resource_ref.id,
+                       'project_id': resource_ref.project_id,
+                       'extra_info': local_extra_info})
+            notify(admin_context, resource_ref, action + '.start',
+                   extra_usage_info=local_extra_info)
+            notify(admin_context, resource_ref, action + '.end',
+                   extra_usage_info=local_extra_info)
+        except Exception as exc_msg:
+            LOG.exception(_LE("%(action)s %(type)s notification failed: "
+                              "%(exc_msg)s"),
+                          {'action': action.capitalize(),
+                           'type': resource_type,
+                           'exc_msg': exc_msg},
+                          resource=resource_ref)
+
+
+def _vol_notify_usage(LOG, volume_ref, extra_info, admin_context, begin,
+                      end):
+    """volume_ref notify usage"""
+    try:
+        LOG.debug("Send exists notification for <volume_id: "
+                  "%(volume_id)s> <project_id %(project_id)s> "
+                  "<%(extra_info)s>",
+                  {'volume_id': volume_ref.id,
+                   'project_id': volume_ref.project_id,
+                   'extra_info': extra_info})
+        cinder.volume.utils.notify_about_volume_usage(
+            admin_context,
+            volume_ref,
+            'exists', extra_usage_info=extra_info)
+    except Exception as exc_msg:
+        LOG.exception(_LE("Exists volume notification failed: %s"),
+                      exc_msg, resource=volume_ref)
+
+    if CONF.send_actions:
+        _notify_actions(LOG, cinder.volume.utils.notify_about_volume_usage,
+                        admin_context, volume_ref, 'volume', begin, end)
+
+
+def _snap_notify_usage(LOG, snapshot_ref, extra_info, admin_context, begin,
+                       end):
+    """snapshot_ref notify usage"""
+    try:
+        LOG.debug("Send notification for <snapshot_id: %(snapshot_id)s> "
+                  "<project_id %(project_id)s> <%(extra_info)s>",
+                  {'snapshot_id': snapshot_ref.id,
+                   'project_id': snapshot_ref.project_id,
+                   'extra_info': extra_info})
+        cinder.volume.utils.notify_about_snapshot_usage(admin_context,
+                                                        snapshot_ref,
+                                                        'exists',
+                                                        extra_info)
+    except Exception as exc_msg:
+        LOG.exception(_LE("Exists snapshot notification failed: %s"),
+                      exc_msg, resource=snapshot_ref)
+
+    if CONF.send_actions:
+        _notify_actions(LOG, cinder.volume.utils.notify_about_snapshot_usage,
+                        admin_context, snapshot_ref, 'snapshot', begin, end)
+
+
+def _backup_notify_usage(LOG, backup_ref, extra_info, admin_context, begin,
+                         end):
+    """backup_ref notify usage"""
+    try:
+        LOG.debug("Send notification for <backup_id: %(backup_id)s> "
+                  "<project_id %(project_id)s> <%(extra_info)s>",
+                  {'backup_id': backup_ref.id,
+                   'project_id': backup_ref.project_id,
+                   'extra_info': extra_info})
+        cinder.volume.utils.notify_about_backup_usage(
+            admin_context, backup_ref, 'exists', extra_info)
+    except Exception as exc_msg:
+        LOG.exception(_LE("Exists backup notification failed: %s"),
+                      exc_msg, resource=backup_ref)
+
+    if CONF.send_actions:
+        _notify_actions(LOG, cinder.volume.utils.notify_about_backup_usage,
+                        admin_context, backup_ref, 'backup', begin, end)
+
+
+def main():
+    objects.register_all()
+    admin_context = context.get_admin_context()
+    CONF(sys.argv[1:], project='cinder',
+         version=version.version_string())
+    logging.setup(CONF, "cinder")
+    LOG = logging.getLogger("cinder")
+    rpc.init(CONF)
+    begin, end = utils.last_completed_audit_period()
+    begin, end = _get_audit_period(LOG, begin, end)
+
     LOG.debug("Starting volume usage audit")
     msg = _("Creating usages for %(begin_period)s until %(end_period)s")
     LOG.debug(msg, {"begin_period": str(begin), "end_period": str(end)})
@@ -103,147 +259,40 @@ def main():
         'audit_period_beginning': str(begin),
         'audit_period_ending': str(end),
     }
+    project_id_range = None
+    if CONF.project_id_start or CONF.project_id_end:
+        project_id_range = (CONF.project_id_start, CONF.project_id_end)
+        LOG.debug("Auditing the projects from %(start)s to %(end)s",
+                  {'start': CONF.project_id_start or '',
+                   'end': CONF.project_id_end or ''})
 
-    volumes = db.volume_get_active_by_window(admin_context,
-                                             begin,
-                                             end)
-    LOG.debug("Found %d volumes", len(volumes))
-    for volume_ref in volumes:
-        try:
-            LOG.debug("Send exists notification for <volume_id: "
-                      "%(volume_id)s> <project_id %(project_id)s> "
-                      "<%(extra_info)s>",
-                      {'volume_id': volume_ref.id,
-                       'project_id': volume_ref.project_id,
-                       'extra_info': extra_info})
-            cinder.volume.utils.notify_about_volume_usage(
-                admin_context,
-                volume_ref,
-                'exists', extra_usage_info=extra_info)
-        except Exception as exc_msg:
-            LOG.exception(_LE("Exists volume notification failed: %s"),
-                          exc_msg, resource=volume_ref)
-
-        if (CONF.send_actions and
-                volume_ref.created_at > begin and
-                volume_ref.created_at < end):
-            try:
-                local_extra_info = {
-                    'audit_period_beginning': str(volume_ref.created_at),
-                    'audit_period_ending': str(volume_ref.created_at),
-                }
-                LOG.debug("Send create notification for "
-                          "<volume_id: %(volume_id)s> "
-                          "<project_id %(project_id)s> <%(extra_info)s>",
-                          {'volume_id': volume_ref.id,
-                           'project_id': volume_ref.project_id,
-                           'extra_info': local_extra_info})
-                cinder.volume.utils.notify_about_volume_usage(
-                    admin_context,
-                    volume_ref,
-                    'create.start', extra_usage_info=local_extra_info)
-                cinder.volume.utils.notify_about_volume_usage(
-                    admin_context,
-                    volume_ref,
-                    'create.end', extra_usage_info=local_extra_info)
-            except Exception as exc_msg:
-                LOG.exception(_LE("Create volume notification failed: %s"),
-                              exc_msg, resource=volume_ref)
-
-        if (CONF.send_actions and volume_ref.deleted_at and
-                volume_ref.deleted_at > begin and
-                volume_ref.deleted_at < end):
-            try:
-                local_extra_info = {
-                    'audit_period_beginning': str(volume_ref.deleted_at),
-                    'audit_period_ending': str(volume_ref.deleted_at),
-                }
-                LOG.debug("Send delete notification for "
-                          "<volume_id: %(volume_id)s> "
-                          "<project_id %(project_id)s> <%(extra_info)s>",
-                          {'volume_id': volume_ref.id,
-                           'project_id': volume_ref.project_id,
-                           'extra_info': local_extra_info})
-                cinder.volume.utils.notify_about_volume_usage(
-                    admin_context,
-                    volume_ref,
-                    'delete.start', extra_usage_info=local_extra_info)
-                cinder.volume.utils.notify_about_volume_usage(
-                    admin_context,
-                    volume_ref,
-                    'delete.end', extra_usage_info=local_extra_info)
-            except Exception as exc_msg:
-                LOG.exception(_LE("Delete volume notification failed: %s"),
-                              exc_msg, resource=volume_ref)
-
-    snapshots = objects.SnapshotList.get_active_by_window(admin_context,
-                                                          begin, end)
-    LOG.debug("Found %d snapshots", len(snapshots))
-    for snapshot_ref in snapshots:
-        try:
-            LOG.debug("Send notification for <snapshot_id: %(snapshot_id)s> "
-                      "<project_id %(project_id)s> <%(extra_info)s>",
-                      {'snapshot_id': snapshot_ref.id,
-                       'project_id': snapshot_ref.project_id,
-                       'extra_info': extra_info})
-            cinder.volume.utils.notify_about_snapshot_usage(admin_context,
-                                                            snapshot_ref,
-                                                            'exists',
-                                                            extra_info)
-        except Exception as exc_msg:
-            LOG.exception(_LE("Exists snapshot notification failed: %s"),
-                          exc_msg, resource=snapshot_ref)
-
-        if (CONF.send_actions and
-                snapshot_ref.created_at > begin and
-                snapshot_ref.created_at < end):
-            try:
-                local_extra_info = {
-                    'audit_period_beginning': str(snapshot_ref.created_at),
-                    'audit_period_ending': str(snapshot_ref.created_at),
-                }
-                LOG.debug("Send create notification for "
-                          "<snapshot_id: %(snapshot_id)s> "
-                          "<project_id %(project_id)s> <%(extra_info)s>",
-                          {'snapshot_id': snapshot_ref.id,
-                           'project_id': snapshot_ref.project_id,
-                           'extra_info': local_extra_info})
-                cinder.volume.utils.notify_about_snapshot_usage(
-                    admin_context,
-                    snapshot_ref,
-                    'create.start', extra_usage_info=local_extra_info)
-                cinder.volume.utils.notify_about_snapshot_usage(
-                    admin_context,
-                    snapshot_ref,
-                    'create.end', extra_usage_info=local_extra_info)
-            except Exception as exc_msg:
-                LOG.exception(_LE("Create snapshot notification failed: %s"),
-                              exc_msg, resource=snapshot_ref)
-
-        if (CONF.send_actions and snapshot_ref.deleted_at and
-                snapshot_ref.deleted_at > begin and
-                snapshot_ref.deleted_at < end):
-            try:
-                local_extra_info = {
-                    'audit_period_beginning': str(snapshot_ref.deleted_at),
-                    'audit_period_ending': str(snapshot_ref.deleted_at),
-                }
-                LOG.debug("Send delete notification for "
-                          "<snapshot_id: %(snapshot_id)s> "
-                          "<project_id %(project_id)s> <%(extra_info)s>",
-                          {'snapshot_id': snapshot_ref.id,
-                           'project_id': snapshot_ref.project_id,
-                           'extra_info': local_extra_info})
-                cinder.volume.utils.notify_about_snapshot_usage(
-                    admin_context,
-                    snapshot_ref,
-                    'delete.start', extra_usage_info=local_extra_info)
-                cinder.volume.utils.notify_about_snapshot_usage(
-                    admin_context,
-                    snapshot_ref,
-                    'delete.end', extra_usage_info=local_extra_info)
-            except Exception as exc_msg:
-                LOG.exception(_LE("Delete snapshot notification failed: %s"),
-                              exc_msg, resource=snapshot_ref)
+    # spawn_n blocks once all the workers are busy, which bounds both the
+    # number of notifications in flight and the resources held in memory
+    pool = eventlet.GreenPool(CONF.notification_workers)
+
+    def get_volumes(*args, **kwargs):
+        return db.volume_get_active_by_window(admin_context, *args, **kwargs)
+
+    def get_snapshots(*args, **kwargs):
+        return objects.SnapshotList.get_active_by_window(admin_context,
+                                                         *args, **kwargs)
+
+    def get_backups(*args, **kwargs):
+        return objects.BackupList.get_all_active_by_window(admin_context,
+                                                           *args, **kwargs)
+
+    for resource_type, get_page, notify_usage in (
+            ('volumes', get_volumes, _vol_notify_usage),
+            ('snapshots', get_snapshots, _snap_notify_usage),
+            ('backups', get_backups, _backup_notify_usage)):
+        count = 0
+        for resource_ref in _get_all_active_by_window(get_page, begin, end,
+                                                      project_id_range):
+            pool.spawn_n(notify_usage, LOG, resource_ref, extra_info,
+                         admin_context, begin, end)
+            count += 1
+        pool.waitall()
+        LOG.debug("Found %(count)d %(type)s",
+                  {'count': count, 'type': resource_type})
 
     LOG.debug("Volume usage audit completed")
@@ -114,6 +114,13 @@ global_opts = [
     cfg.StrOpt('scheduler_manager',
                default='cinder.scheduler.manager.SchedulerManager',
                help='Full class name for the Manager for scheduler'),
+    cfg.IntOpt('capabilities_delta_reports',
+               default=4,
+               min=0,
+               help='Number of capability reports sent to the schedulers '
+                    'between two full reports. These reports only carry '
+                    'the capabilities that changed since the previous '
+                    'report. 0 always sends full reports.'),
     cfg.StrOpt('host',
                default=socket.gethostname(),
                help='Name of this node.  This can be an opaque identifier. '
@@ -144,6 +151,14 @@ global_opts = [
                default='/etc/cinder/rootwrap.conf',
                help='Path to the rootwrap configuration file to use for '
                     'running commands as root'),
+    cfg.BoolOpt('use_rootwrap_daemon',
+                default=False,
+                help='Run the commands that need root privileges through a '
+                     'long-lived rootwrap daemon, started with "sudo '
+                     'cinder-rootwrap-daemon <rootwrap_config>" on first '
+                     'use, instead of starting cinder-rootwrap for every '
+                     'command. The daemon applies the same filters as '
+                     'cinder-rootwrap.'),
     cfg.BoolOpt('monkey_patch',
                 default=False,
                 help='Enable monkey patching'),
@@ -231,6 +231,11 @@ def volume_data_get_for_host(context, host, count_only=False):
                                          count_only)
 
 
+def volume_data_get_by_project_for_host(context, host):
+    """Get {project_id: (volume_count, gigabytes)} for a host."""
+    return IMPL.volume_data_get_by_project_for_host(context, host)
+
+
 def volume_data_get_for_project(context, project_id):
     """Get (volume_count, gigabytes) for project."""
     return IMPL.volume_data_get_for_project(context, project_id)
@@ -252,11 +257,11 @@ def volume_get(context, volume_id):
 
 
 def volume_get_all(context, marker, limit, sort_keys=None, sort_dirs=None,
-                   filters=None, offset=None):
+                   filters=None, offset=None, detail=True):
     """Get all volumes."""
     return IMPL.volume_get_all(context, marker, limit, sort_keys=sort_keys,
                                sort_dirs=sort_dirs, filters=filters,
-                               offset=offset)
+                               offset=offset, detail=detail)
 
 
 def volume_get_all_by_host(context, host, filters=None):
@@ -277,13 +282,13 @@ def volume_get_all_by_generic_group(context, group_id, filters=None):
 
 def volume_get_all_by_project(context, project_id, marker, limit,
                               sort_keys=None, sort_dirs=None, filters=None,
-                              offset=None):
+                              offset=None, detail=True):
     """Get all volumes belonging to a project."""
     return IMPL.volume_get_all_by_project(context, project_id, marker, limit,
                                           sort_keys=sort_keys,
                                           sort_dirs=sort_dirs,
                                           filters=filters,
-                                          offset=offset)
+                                          offset=offset, detail=detail)
 
 
 def get_volume_summary_all(context):
@@ -443,6 +448,14 @@ def snapshot_update(context, snapshot_id, values):
     return IMPL.snapshot_update(context, snapshot_id, values)
 
 
+def snapshots_update(context, values_list):
+    """Set the given properties on a list of snapshots and update them.
+
+    Raises NotFound if a snapshot does not exist.
+    """
+    return IMPL.snapshots_update(context, values_list)
+
+
 def snapshot_data_get_for_project(context, project_id, volume_type_id=None):
     """Get count and gigabytes used for snapshots for specified project."""
     return IMPL.snapshot_data_get_for_project(context,
@@ -450,12 +463,22 @@ def snapshot_data_get_for_project(context, project_id, volume_type_id=None):
                                               volume_type_id)
 
 
-def snapshot_get_active_by_window(context, begin, end=None, project_id=None):
+def snapshot_data_get_by_project_for_host(context, host):
+    """Get {project_id: (snapshot_count, gigabytes)} for a host."""
+    return IMPL.snapshot_data_get_by_project_for_host(context, host)
+
+
+def snapshot_get_active_by_window(context, begin, end=None, project_id=None,
+                                  marker=None, limit=None,
+                                  project_id_range=None):
     """Get all the snapshots inside the window.
 
-    Specifying a project_id will filter for a certain project.
+    Specifying a project_id will filter for a certain project, and a
+    project_id_range tuple (start, end) for the projects in [start, end).
+    With a marker or a limit, snapshots are returned by id after the marker.
     """
-    return IMPL.snapshot_get_active_by_window(context, begin, end, project_id)
+    return IMPL.snapshot_get_active_by_window(context, begin, end, project_id,
+                                              marker, limit, project_id_range)
 
 
 ####################
@@ -564,6 +587,11 @@ def volume_type_get_all(context, inactive=False, filters=None, marker=None,
                                     list_result=list_result)
 
 
+def volume_type_get_generation(context):
+    """Get a value that changes when volume types or their specs change."""
+    return IMPL.volume_type_get_generation(context)
+
+
 def volume_type_get(context, id, inactive=False, expected_fields=None):
     """Get volume type by id.
 
@@ -620,12 +648,17 @@ def volume_type_destroy(context, id):
     return IMPL.volume_type_destroy(context, id)
 
 
-def volume_get_active_by_window(context, begin, end=None, project_id=None):
+def volume_get_active_by_window(context, begin, end=None, project_id=None,
+                                marker=None, limit=None,
+                                project_id_range=None):
     """Get all the volumes inside the window.
 
-    Specifying a project_id will filter for a certain project.
+    Specifying a project_id will filter for a certain project, and a
+    project_id_range tuple (start, end) for the projects in [start, end).
+    With a marker or a limit, volumes are returned by id after the marker.
     """
-    return IMPL.volume_get_active_by_window(context, begin, end, project_id)
+    return IMPL.volume_get_active_by_window(context, begin, end, project_id,
+                                            marker, limit, project_id_range)
 
 
 def volume_type_access_get_all(context, type_id):
@@ -1102,9 +1135,9 @@ def quota_destroy_by_project(context, project_id):
     return IMPL.quota_destroy_by_project(context, project_id)
 
 
-def reservation_expire(context):
+def reservation_expire(context, batch_size=1000):
     """Roll back any expired reservations."""
-    return IMPL.reservation_expire(context)
+    return IMPL.reservation_expire(context, batch_size=batch_size)
 
 
 def quota_usage_update_resource(context, old_res, new_res):
@@ -1155,6 +1188,20 @@ def backup_get_all_by_volume(context, volume_id, filters=None):
                                          filters=filters)
 
 
+def backup_get_all_active_by_window(context, begin, end=None, project_id=None,
+                                    marker=None, limit=None,
+                                    project_id_range=None):
+    """Get all the backups inside the window.
+
+    Specifying a project_id will filter for a certain project, and a
+    project_id_range tuple (start, end) for the projects in [start, end).
+    With a marker or a limit, backups are returned by id after the marker.
+    """
+    return IMPL.backup_get_all_active_by_window(context, begin, end,
+                                                project_id, marker, limit,
+                                                project_id_range)
+
+
 def backup_update(context, backup_id, values):
     """Set the given properties on a backup and update it.
 
@@ -1476,13 +1523,19 @@ def group_snapshot_creating_from_src():
 ###################
 
 
-def purge_deleted_rows(context, age_in_days):
+def purge_deleted_rows(context, age_in_days, batch_size=1000,
+                       sleep_interval=0):
     """Purge deleted rows older than given age from cinder tables
 
+    Rows are deleted batch_size at a time, sleeping sleep_interval seconds
+    between batches.
+
     Raises InvalidParameterValue if age_in_days is incorrect.
     :returns: number of deleted rows
     """
-    return IMPL.purge_deleted_rows(context, age_in_days=age_in_days)
+    return IMPL.purge_deleted_rows(context, age_in_days=age_in_days,
+                                   batch_size=batch_size,
+                                   sleep_interval=sleep_interval)
 
 
 def get_booleans_for_table(table_name):
@@ -1577,6 +1630,19 @@ def message_destroy(context, message_id):
 ###################
 
 
+def cache_generation_get(context, name):
+    """Return the generation of a cache, 0 if it was never flushed."""
+    return IMPL.cache_generation_get(context, name)
+
+
+def cache_generation_bump(context, name):
+    """Flush a cache in every process by incrementing its generation."""
+    return IMPL.cache_generation_bump(context, name)
+
+
+###################
+
+
 def worker_create(context, **values):
     """Create a worker entry from optional arguments."""
     return IMPL.worker_create(context, **values)
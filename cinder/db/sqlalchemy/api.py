@@ -42,7 +42,8 @@ import six
 import sqlalchemy
 from sqlalchemy import MetaData
 from sqlalchemy import or_, and_, case
-from sqlalchemy.orm import joinedload, joinedload_all, undefer_group
+from sqlalchemy.orm import joinedload, joinedload_all, subqueryload
+from sqlalchemy.orm import undefer_group
 from sqlalchemy.orm import RelationshipProperty
 from sqlalchemy.schema import Table
 from sqlalchemy import sql
@@ -110,6 +111,8 @@ def dispose_engine():
     get_engine().dispose()
 
 _DEFAULT_QUOTA_NAME = 'default'
+# Name of the generation of the volume types in the cache_generations table
+VOLUME_TYPES_CACHE = 'volume_types'
 
 
 def get_backend():
@@ -257,6 +260,21 @@ def handle_db_data_error(f):
     return wrapper
 
 
+def _bump_cache_generation(name):
+    """Decorator to bump a cache generation after a DB API call changed it.
+
+    The first argument to the wrapped function must be the context.
+    """
+    def decorator(f):
+        @functools.wraps(f)
+        def wrapper(context, *args, **kwargs):
+            result = f(context, *args, **kwargs)
+            cache_generation_bump(context.elevated(), name)
+            return result
+        return wrapper
+    return decorator
+
+
 def model_query(context, *args, **kwargs):
     """Query helper that accounts for context's `read_deleted` field.
 
@@ -1048,7 +1066,6 @@ def _get_quota_usages(context, session, project_id):
                        session=session).\
         filter_by(project_id=project_id).\
         order_by(models.QuotaUsage.id.asc()).\
-        with_lockmode('update').\
         all()
     return {row.resource: row for row in rows}
 
@@ -1064,6 +1081,26 @@ def _get_quota_usages_by_resource(context, session, resource):
     return rows
 
 
+def _get_reservation_usages(context, session, reservations):
+    """Lock the quota usages of the given reservations, by id."""
+    rows = model_query(context, models.Reservation.usage_id,
+                       read_deleted="no", session=session).\
+        filter(models.Reservation.uuid.in_(reservations)).\
+        filter(models.Reservation.usage_id.isnot(None)).\
+        distinct().\
+        all()
+    usage_ids = [row.usage_id for row in rows]
+    if not usage_ids:
+        return {}
+    rows = model_query(context, models.QuotaUsage,
+                       read_deleted="no", session=session).\
+        filter(models.QuotaUsage.id.in_(usage_ids)).\
+        order_by(models.QuotaUsage.id.asc()).\
+        with_lockmode('update').\
+        all()
+    return {row.id: row for row in rows}
+
+
 @require_context
 @_retry_on_deadlock
 def quota_usage_update_resource(context, old_res, new_res):
@@ -1075,166 +1112,241 @@ def quota_usage_update_resource(context, old_res, new_res):
             usage.until_refresh = 1
 
 
+def _refresh_quota_usages(context, session, project_id, resources, deltas,
+                          until_refresh, max_age):
+    """Create the missing usages of deltas and resync the stale ones.
+
+    No row is locked: the sync routines count the volumes, snapshots and
+    backups of the project, which is too slow to do while holding the locks
+    of the usages.  Like before, the refresh is a best-effort mechanism.
+
+    :returns: the usages of the project, by resource
+    """
+    elevated = context.elevated()
+    usages = _get_quota_usages(context, session, project_id)
+
+    work = set(deltas.keys())
+    while work:
+        resource = work.pop()
+
+        # Do we need to refresh the usage?
+        refresh = False
+        if resource not in usages:
+            usages[resource] = _quota_usage_create(elevated,
+                                                   project_id,
+                                                   resource,
+                                                   0, 0,
+                                                   until_refresh or None,
+                                                   session=session)
+            refresh = True
+        elif usages[resource].in_use < 0:
+            # Negative in_use count indicates a desync, so try to
+            # heal from that...
+            refresh = True
+        elif usages[resource].until_refresh is not None:
+            if usages[resource].until_refresh <= 1:
+                refresh = True
+            else:
+                # Decrement in SQL, other reservations may be doing the same
+                usages[resource].until_refresh = (
+                    models.QuotaUsage.until_refresh - 1)
+        elif max_age and usages[resource].updated_at is not None and (
+            (usages[resource].updated_at -
+                timeutils.utcnow()).seconds >= max_age):
+            refresh = True
+
+        # OK, refresh the usage
+        if refresh:
+            # Grab the sync routine
+            sync = QUOTA_SYNC_FUNCTIONS[resources[resource].sync]
+            volume_type_id = getattr(resources[resource],
+                                     'volume_type_id', None)
+            volume_type_name = getattr(resources[resource],
+                                       'volume_type_name', None)
+            updates = sync(elevated, project_id,
+                           volume_type_id=volume_type_id,
+                           volume_type_name=volume_type_name,
+                           session=session)
+            for res, in_use in updates.items():
+                # Make sure we have a destination for the usage!
+                if res not in usages:
+                    usages[res] = _quota_usage_create(
+                        elevated,
+                        project_id,
+                        res,
+                        0, 0,
+                        until_refresh or None,
+                        session=session
+                    )
+
+                # Update the usage
+                usages[res].in_use = in_use
+                usages[res].until_refresh = until_refresh or None
+
+                # Because more than one resource may be refreshed
+                # by the call to the sync routine, and we don't
+                # want to double-sync, we make sure all refreshed
+                # resources are dropped from the work set.
+                work.discard(res)
+
+                # NOTE(Vek): We make the assumption that the sync
+                #            routine actually refreshes the
+                #            resources that it is the sync routine
+                #            for.  We don't check, because this is
+                #            a best-effort mechanism.
+    return usages
+
+
+def _quota_usage_reserve(context, session, usage_id, delta, limit,
+                         allocated):
+    """Add delta to the reserved usage unless it goes over the limit.
+
+    The check and the update are a single conditional UPDATE, so the row
+    is only locked for the duration of the statement.
+
+    :returns: False if the usage would go over the limit
+    """
+    query = model_query(context, models.QuotaUsage, read_deleted="no",
+                        session=session).\
+        filter_by(id=usage_id)
+    if limit >= 0:
+        query = query.filter(models.QuotaUsage.in_use +
+                             models.QuotaUsage.reserved +
+                             delta + allocated <= limit)
+    return bool(query.update(
+        {'reserved': models.QuotaUsage.reserved + delta},
+        synchronize_session=False))
+
+
+def _quota_allocated_reserve(context, session, quota_id, delta, limit,
+                             usage_total):
+    """Add delta to the allocated quota unless it goes over the limit.
+
+    :returns: False if the quota would go over the limit
+    """
+    query = model_query(context, models.Quota, read_deleted="no",
+                        session=session).\
+        filter_by(id=quota_id)
+    if limit >= 0 and delta >= 0:
+        query = query.filter(models.Quota.allocated +
+                             delta + usage_total <= limit)
+    return bool(query.update(
+        {'allocated': models.Quota.allocated + delta},
+        synchronize_session=False))
+
+
 @require_context
 @_retry_on_deadlock
 def quota_reserve(context, resources, quotas, deltas, expire,
                   until_refresh, max_age, project_id=None,
                   is_allocated_reserve=False):
+    """Reserve the deltas of a project, or raise OverQuota.
+
+    The usages are first created and refreshed in their own transaction,
+    without any lock.  The reservation itself then only touches the rows
+    being changed: each positive delta is added to the reserved usage, or
+    to the allocated quota, with a conditional UPDATE that fails when the
+    limit would be exceeded.  Reservations in one project therefore only
+    wait on each other while they update the same usage row, instead of
+    while all the usages of the project are locked and refreshed.
+    """
     elevated = context.elevated()
+    if project_id is None:
+        project_id = context.project_id
+
+    # Make sure the quotas allocated to child projects have a row to update
+    quota_ids = {}
+    if is_allocated_reserve:
+        for resource in deltas:
+            try:
+                quota = _quota_get(context, project_id, resource)
+            except exception.ProjectQuotaNotFound:
+                # If we were using the default quota, create DB entry
+                quota = quota_create(context, project_id, resource,
+                                     quotas[resource], 0)
+            quota_ids[resource] = quota.id
+
     session = get_session()
     with session.begin():
-        if project_id is None:
-            project_id = context.project_id
-
-        # Get the current usages
-        usages = _get_quota_usages(context, session, project_id)
-        allocated = quota_allocated_get_all_by_project(context, project_id)
-        allocated.pop('project_id')
-
-        # Handle usage refresh
-        work = set(deltas.keys())
-        while work:
-            resource = work.pop()
-
-            # Do we need to refresh the usage?
-            refresh = False
-            if resource not in usages:
-                usages[resource] = _quota_usage_create(elevated,
-                                                       project_id,
-                                                       resource,
-                                                       0, 0,
-                                                       until_refresh or None,
-                                                       session=session)
-                refresh = True
-            elif usages[resource].in_use < 0:
-                # Negative in_use count indicates a desync, so try to
-                # heal from that...
-                refresh = True
-            elif usages[resource].until_refresh is not None:
-                usages[resource].until_refresh -= 1
-                if usages[resource].until_refresh <= 0:
-                    refresh = True
-            elif max_age and usages[resource].updated_at is not None and (
-                (usages[resource].updated_at -
-                    timeutils.utcnow()).seconds >= max_age):
-                refresh = True
+        usages = _refresh_quota_usages(context, session, project_id,
+                                       resources, deltas, until_refresh,
+                                       max_age)
+    allocated = quota_allocated_get_all_by_project(context, project_id)
+    allocated.pop('project_id')
+
+    # Check for deltas that would go negative
+    if is_allocated_reserve:
+        unders = [r for r, delta in deltas.items()
+                  if delta < 0 and delta + allocated.get(r, 0) < 0]
+    else:
+        unders = [r for r, delta in deltas.items()
+                  if delta < 0 and delta + usages[r].in_use < 0]
+    if unders:
+        LOG.warning(_LW("Change will make usage less than 0 for the following "
+                        "resources: %s"), unders)
 
-            # OK, refresh the usage
-            if refresh:
-                # Grab the sync routine
-                sync = QUOTA_SYNC_FUNCTIONS[resources[resource].sync]
-                volume_type_id = getattr(resources[resource],
-                                         'volume_type_id', None)
-                volume_type_name = getattr(resources[resource],
-                                           'volume_type_name', None)
-                updates = sync(elevated, project_id,
-                               volume_type_id=volume_type_id,
-                               volume_type_name=volume_type_name,
-                               session=session)
-                for res, in_use in updates.items():
-                    # Make sure we have a destination for the usage!
-                    if res not in usages:
-                        usages[res] = _quota_usage_create(
-                            elevated,
-                            project_id,
-                            res,
-                            0, 0,
-                            until_refresh or None,
-                            session=session
-                        )
-
-                    # Update the usage
-                    usages[res].in_use = in_use
-                    usages[res].until_refresh = until_refresh or None
-
-                    # Because more than one resource may be refreshed
-                    # by the call to the sync routine, and we don't
-                    # want to double-sync, we make sure all refreshed
-                    # resources are dropped from the work set.
-                    work.discard(res)
-
-                    # NOTE(Vek): We make the assumption that the sync
-                    #            routine actually refreshes the
-                    #            resources that it is the sync routine
-                    #            for.  We don't check, because this is
-                    #            a best-effort mechanism.
-
-        # Check for deltas that would go negative
-        if is_allocated_reserve:
-            unders = [r for r, delta in deltas.items()
-                      if delta < 0 and delta + allocated.get(r, 0) < 0]
-        else:
-            unders = [r for r, delta in deltas.items()
-                      if delta < 0 and delta + usages[r].in_use < 0]
+    # TODO(mc_nair): Should ignore/zero alloc if using non-nested driver
 
-        # TODO(mc_nair): Should ignore/zero alloc if using non-nested driver
+    # Update the rows in id order, so that concurrent reservations of
+    # several resources don't deadlock.
+    if is_allocated_reserve:
+        order = sorted(deltas, key=quota_ids.get)
+    else:
+        order = sorted(deltas, key=lambda r: usages[r].id)
 
+    with session.begin():
         # Now, let's check the quotas
         # NOTE(Vek): We're only concerned about positive increments.
         #            If a project has gone over quota, we want them to
         #            be able to reduce their usage without any
         #            problems.
-        overs = [r for r, delta in deltas.items()
-                 if quotas[r] >= 0 and delta >= 0 and
-                 quotas[r] < delta + usages[r].total + allocated.get(r, 0)]
-
-        # NOTE(Vek): The quota check needs to be in the transaction,
-        #            but the transaction doesn't fail just because
-        #            we're over quota, so the OverQuota raise is
-        #            outside the transaction.  If we did the raise
-        #            here, our usage updates would be discarded, but
-        #            they're not invalidated by being over-quota.
+        #
+        #            Here, though, we're also worried about the following
+        #            scenario:
+        #
+        #            1) User initiates resize down.
+        #            2) User allocates a new instance.
+        #            3) Resize down fails or is reverted.
+        #            4) User is now over quota.
+        #
+        #            To prevent this, we only update the reserved value if
+        #            the delta is positive.
+        overs = []
+        for resource in order:
+            delta = deltas[resource]
+            if is_allocated_reserve:
+                # Since there's no reserved/total for allocated, update
+                # allocated immediately and subtract on rollback if needed
+                reserved = _quota_allocated_reserve(
+                    context, session, quota_ids[resource], delta,
+                    quotas[resource], usages[resource].total)
+            elif delta >= 0:
+                reserved = _quota_usage_reserve(
+                    context, session, usages[resource].id, delta,
+                    quotas[resource], allocated.get(resource, 0))
+            else:
+                reserved = True
+            if not reserved:
+                overs.append(resource)
+
+        # NOTE(Vek): The usage refresh is already committed, so raising
+        #            here only rolls back the reservation.
+        if overs:
+            usages = {k: dict(in_use=v.in_use, reserved=v.reserved,
+                              allocated=allocated.get(k, 0))
+                      for k, v in usages.items()}
+            raise exception.OverQuota(overs=sorted(overs), quotas=quotas,
+                                      usages=usages)
 
         # Create the reservations
-        if not overs:
-            reservations = []
-            for resource, delta in deltas.items():
-                usage = usages[resource]
-                allocated_id = None
-                if is_allocated_reserve:
-                    try:
-                        quota = _quota_get(context, project_id, resource,
-                                           session=session)
-                    except exception.ProjectQuotaNotFound:
-                        # If we were using the default quota, create DB entry
-                        quota = quota_create(context, project_id, resource,
-                                             quotas[resource], 0)
-                    # Since there's no reserved/total for allocated, update
-                    # allocated immediately and subtract on rollback if needed
-                    quota_allocated_update(context, project_id, resource,
-                                           quota.allocated + delta)
-                    allocated_id = quota.id
-                    usage = None
-                reservation = _reservation_create(
-                    elevated, str(uuid.uuid4()), usage, project_id, resource,
-                    delta, expire, session=session, allocated_id=allocated_id)
-
-                reservations.append(reservation.uuid)
-
-                # Also update the reserved quantity
-                # NOTE(Vek): Again, we are only concerned here about
-                #            positive increments.  Here, though, we're
-                #            worried about the following scenario:
-                #
-                #            1) User initiates resize down.
-                #            2) User allocates a new instance.
-                #            3) Resize down fails or is reverted.
-                #            4) User is now over quota.
-                #
-                #            To prevent this, we only update the
-                #            reserved value if the delta is positive.
-                if delta > 0 and not is_allocated_reserve:
-                    usages[resource].reserved += delta
-
-    if unders:
-        LOG.warning(_LW("Change will make usage less than 0 for the following "
-                        "resources: %s"), unders)
-    if overs:
-        usages = {k: dict(in_use=v.in_use, reserved=v.reserved,
-                          allocated=allocated.get(k, 0))
-                  for k, v in usages.items()}
-        raise exception.OverQuota(overs=sorted(overs), quotas=quotas,
-                                  usages=usages)
+        reservations = []
+        for resource, delta in deltas.items():
+            usage = None if is_allocated_reserve else usages[resource]
+            reservation = _reservation_create(
+                elevated, str(uuid.uuid4()), usage, project_id, resource,
+                delta, expire, session=session,
+                allocated_id=quota_ids.get(resource))
+            reservations.append(reservation.uuid)
 
     return reservations
 
@@ -1251,17 +1363,12 @@ def _quota_reservations(session, context, reservations):
         all()
 
 
-def _dict_with_usage_id(usages):
-    return {row.id: row for row in usages.values()}
-
-
 @require_context
 @_retry_on_deadlock
 def reservation_commit(context, reservations, project_id=None):
     session = get_session()
     with session.begin():
-        usages = _get_quota_usages(context, session, project_id)
-        usages = _dict_with_usage_id(usages)
+        usages = _get_reservation_usages(context, session, reservations)
 
         for reservation in _quota_reservations(session, context, reservations):
             # Allocated reservations will have already been bumped
@@ -1279,8 +1386,7 @@ def reservation_commit(context, reservations, project_id=None):
 def reservation_rollback(context, reservations, project_id=None):
     session = get_session()
     with session.begin():
-        usages = _get_quota_usages(context, session, project_id)
-        usages = _dict_with_usage_id(usages)
+        usages = _get_reservation_usages(context, session, reservations)
         for reservation in _quota_reservations(session, context, reservations):
             if reservation.allocated_id:
                 reservation.quota.allocated -= reservation.delta
@@ -1342,28 +1448,101 @@ def quota_destroy_all_by_project(context, project_id, only_quotas=False):
             reservation_ref.delete(session=session)
 
 
+def _reservations_delta_by(context, session, ids, column, *criterion):
+    """Sum the positive deltas of the given reservations per column value."""
+    rows = model_query(context, column, func.sum(models.Reservation.delta),
+                       session=session, read_deleted="no").\
+        filter(models.Reservation.id.in_(ids)).\
+        filter(models.Reservation.delta >= 0).\
+        filter(column.isnot(None), *criterion).\
+        group_by(column).\
+        all()
+    return {row[0]: int(row[1]) for row in rows}
+
+
+def _expire_reservations(context, session, ids):
+    """Roll back the given reservations with set-based updates."""
+    allocated = _reservations_delta_by(context, session, ids,
+                                       models.Reservation.allocated_id)
+    # Allocated reservations are counted in the quota, not in the usage
+    reserved = _reservations_delta_by(
+        context, session, ids, models.Reservation.usage_id,
+        models.Reservation.allocated_id.is_(None))
+
+    if allocated:
+        model_query(context, models.Quota, session=session,
+                    read_deleted="no").\
+            filter(models.Quota.id.in_(allocated.keys())).\
+            update({'allocated': models.Quota.allocated -
+                    case(allocated, value=models.Quota.id)},
+                   synchronize_session=False)
+    if reserved:
+        model_query(context, models.QuotaUsage, session=session,
+                    read_deleted="no").\
+            filter(models.QuotaUsage.id.in_(reserved.keys())).\
+            update({'reserved': models.QuotaUsage.reserved -
+                    case(reserved, value=models.QuotaUsage.id)},
+                   synchronize_session=False)
+
+    model_query(context, models.Reservation, session=session,
+                read_deleted="no").\
+        filter(models.Reservation.id.in_(ids)).\
+        update({'deleted': True,
+                'deleted_at': timeutils.utcnow(),
+                'updated_at': literal_column('updated_at')},
+               synchronize_session=False)
+
+
 @require_admin_context
 @_retry_on_deadlock
-def reservation_expire(context):
-    session = get_session()
-    with session.begin():
-        current_time = timeutils.utcnow()
-        results = model_query(context, models.Reservation, session=session,
-                              read_deleted="no").\
-            filter(models.Reservation.expire < current_time).\
-            all()
+def reservation_expire(context, batch_size=1000):
+    """Roll back the reservations that have expired.
 
-        if results:
-            for reservation in results:
-                if reservation.delta >= 0:
-                    if reservation.allocated_id:
-                        reservation.quota.allocated -= reservation.delta
-                        reservation.quota.save(session=session)
-                    else:
-                        reservation.usage.reserved -= reservation.delta
-                        reservation.usage.save(session=session)
+    Expired reservations are handled in batches of batch_size, each in its
+    own transaction.  The deltas of a batch are summed per quota usage and
+    per allocated quota in SQL and applied with one UPDATE per table, and
+    the batch is deleted with a single UPDATE.  The quota usages of a batch
+    are locked before its reservations, like in the rest of the quota code.
 
-                reservation.delete(session=session)
+    :returns: number of expired reservations
+    """
+    current_time = timeutils.utcnow()
+    total = 0
+    while True:
+        session = get_session()
+        with session.begin():
+            rows = model_query(context, models.Reservation.id,
+                               models.Reservation.usage_id,
+                               session=session, read_deleted="no").\
+                filter(models.Reservation.expire < current_time).\
+                order_by(models.Reservation.id).\
+                limit(batch_size).\
+                all()
+            usage_ids = set(row.usage_id for row in rows if row.usage_id)
+            if usage_ids:
+                model_query(context, models.QuotaUsage.id, session=session,
+                            read_deleted="no").\
+                    filter(models.QuotaUsage.id.in_(usage_ids)).\
+                    order_by(models.QuotaUsage.id.asc()).\
+                    with_lockmode('update').\
+                    all()
+            # Reservations committed or rolled back in the meantime are gone
+            ids = []
+            if rows:
+                ids = [row[0] for row in
+                       model_query(context, models.Reservation.id,
+                                   session=session, read_deleted="no").
+                       filter(models.Reservation.id.in_(
+                           [row.id for row in rows])).
+                       with_lockmode('update')]
+            if ids:
+                _expire_reservations(context, session, ids)
+        total += len(ids)
+        if len(rows) < batch_size:
+            break
+    if total:
+        LOG.info(_LI("Expired %d reservations."), total)
+    return total
 
 
 ###################
@@ -1474,6 +1653,22 @@ def volume_data_get_for_host(context, host, count_only=False):
         return (result[0] or 0, result[1] or 0)
 
 
+@require_admin_context
+def volume_data_get_by_project_for_host(context, host):
+    host_attr = models.Volume.host
+    conditions = [host_attr == host, host_attr.op('LIKE')(host + '#%')]
+    rows = model_query(context,
+                       models.Volume.project_id,
+                       func.count(models.Volume.id),
+                       func.sum(models.Volume.size),
+                       read_deleted="no").\
+        filter(or_(*conditions)).\
+        group_by(models.Volume.project_id).\
+        all()
+    # NOTE(vish): convert None to 0
+    return {row[0]: (row[1] or 0, int(row[2] or 0)) for row in rows}
+
+
 @require_admin_context
 def _volume_data_get_for_project(context, project_id, volume_type_id=None,
                                  session=None):
@@ -1684,6 +1879,24 @@ def _volume_get_query(context, session=None, project_only=False,
             options(joinedload('group'))
 
 
+def _volume_list_query(context, session=None):
+    """Get the query to list volumes with their related models.
+
+    Unlike _volume_get_query, collections are loaded with one extra query
+    each instead of being joined, since joining several collections returns
+    a row for every combination of metadata and attachments of each volume.
+    """
+    query = model_query(context, models.Volume, session=session).\
+        options(subqueryload('volume_metadata')).\
+        options(subqueryload('volume_attachment')).\
+        options(joinedload('volume_type')).\
+        options(joinedload('consistencygroup')).\
+        options(joinedload('group'))
+    if is_admin_context(context):
+        query = query.options(subqueryload('volume_admin_metadata'))
+    return query
+
+
 @require_context
 def _volume_get(context, volume_id, session=None, joined_load=True):
     result = _volume_get_query(context, session=session, project_only=True,
@@ -1755,7 +1968,7 @@ def volume_get(context, volume_id):
 
 @require_admin_context
 def volume_get_all(context, marker, limit, sort_keys=None, sort_dirs=None,
-                   filters=None, offset=None):
+                   filters=None, offset=None, detail=True):
     """Retrieves all volumes.
 
     If no sort parameters are specified then the returned volumes are sorted
@@ -1774,13 +1987,17 @@ def volume_get_all(context, marker, limit, sort_keys=None, sort_dirs=None,
                     or sets cause an 'IN' operation, while exact matching
                     is used for other values, see _process_volume_filters
                     function for more information
+    :param offset: number of items to skip
+    :param detail: load the related models of the volumes, otherwise only
+                   the volume columns are loaded
     :returns: list of matching volumes
     """
     session = get_session()
     with session.begin():
         # Generate the query
         query = _generate_paginate_query(context, session, marker, limit,
-                                         sort_keys, sort_dirs, filters, offset)
+                                         sort_keys, sort_dirs, filters, offset,
+                                         detail=detail)
         # No volumes would match, return empty list
         if query is None:
             return []
@@ -1884,7 +2101,7 @@ def volume_get_all_by_generic_group(context, group_id, filters=None):
 @require_context
 def volume_get_all_by_project(context, project_id, marker, limit,
                               sort_keys=None, sort_dirs=None, filters=None,
-                              offset=None):
+                              offset=None, detail=True):
     """Retrieves all volumes in a project.
 
     If no sort parameters are specified then the returned volumes are sorted
@@ -1904,6 +2121,9 @@ def volume_get_all_by_project(context, project_id, marker, limit,
                     or sets cause an 'IN' operation, while exact matching
                     is used for other values, see _process_volume_filters
                     function for more information
+    :param offset: number of items to skip
+    :param detail: load the related models of the volumes, otherwise only
+                   the volume columns are loaded
     :returns: list of matching volumes
     """
     session = get_session()
@@ -1914,7 +2134,8 @@ def volume_get_all_by_project(context, project_id, marker, limit,
         filters['project_id'] = project_id
         # Generate the query
         query = _generate_paginate_query(context, session, marker, limit,
-                                         sort_keys, sort_dirs, filters, offset)
+                                         sort_keys, sort_dirs, filters, offset,
+                                         detail=detail)
         # No volumes would match, return empty list
         if query is None:
             return []
@@ -1923,7 +2144,7 @@ def volume_get_all_by_project(context, project_id, marker, limit,
 
 def _generate_paginate_query(context, session, marker, limit, sort_keys,
                              sort_dirs, filters, offset=None,
-                             paginate_type=models.Volume):
+                             paginate_type=models.Volume, detail=True):
     """Generate the query to include the filters and the paginate options.
 
     Returns a query with sorting / pagination criteria added or None
@@ -1944,6 +2165,8 @@ def _generate_paginate_query(context, session, marker, limit, sort_keys,
                     function for more information
     :param offset: number of items to skip
     :param paginate_type: type of pagination to generate
+    :param detail: load the related models, otherwise only the columns of
+                   paginate_type are loaded
     :returns: updated query or None
     """
     get_query, process_filters, get = PAGINATION_HELPERS[paginate_type]
@@ -1951,7 +2174,10 @@ def _generate_paginate_query(context, session, marker, limit, sort_keys,
     sort_keys, sort_dirs = process_sort_params(sort_keys,
                                                sort_dirs,
                                                default_dir='desc')
-    query = get_query(context, session=session)
+    if detail:
+        query = get_query(context, session=session)
+    else:
+        query = model_query(context, paginate_type, session=session)
 
     if filters:
         query = process_filters(query, filters)
@@ -2779,20 +3005,36 @@ def snapshot_data_get_for_project(context, project_id, volume_type_id=None):
     return _snapshot_data_get_for_project(context, project_id, volume_type_id)
 
 
+@require_admin_context
+def snapshot_data_get_by_project_for_host(context, host):
+    # Snapshots live on the host of their volume
+    host_attr = models.Volume.host
+    conditions = [host_attr == host, host_attr.op('LIKE')(host + '#%')]
+    rows = model_query(context,
+                       models.Snapshot.project_id,
+                       func.count(models.Snapshot.id),
+                       func.sum(models.Snapshot.volume_size),
+                       read_deleted="no").\
+        join(models.Volume, models.Snapshot.volume_id == models.Volume.id).\
+        filter(or_(*conditions)).\
+        group_by(models.Snapshot.project_id).\
+        all()
+    # NOTE(vish): convert None to 0
+    return {row[0]: (row[1] or 0, int(row[2] or 0)) for row in rows}
+
+
 @require_context
-def snapshot_get_active_by_window(context, begin, end=None, project_id=None):
+def snapshot_get_active_by_window(context, begin, end=None, project_id=None,
+                                  marker=None, limit=None,
+                                  project_id_range=None):
     """Return snapshots that were active during window."""
 
     query = model_query(context, models.Snapshot, read_deleted="yes")
-    query = query.filter(or_(models.Snapshot.deleted_at == None,  # noqa
-                             models.Snapshot.deleted_at > begin))
     query = query.options(joinedload(models.Snapshot.volume))
     query = query.options(joinedload('snapshot_metadata'))
-    if end:
-        query = query.filter(models.Snapshot.created_at < end)
-    if project_id:
-        query = query.filter_by(project_id=project_id)
-
+    query = _active_by_window_filter(query, models.Snapshot, begin, end,
+                                     project_id, marker, limit,
+                                     project_id_range)
     return query.all()
 
 
@@ -2805,6 +3047,22 @@ def snapshot_update(context, snapshot_id, values):
         snapshot_ref.update(values)
         return snapshot_ref
 
+
+@handle_db_data_error
+@require_context
+def snapshots_update(context, values_list):
+    session = get_session()
+    with session.begin():
+        snapshot_refs = []
+        for values in values_list:
+            snapshot_id = values.pop('id')
+            snapshot_ref = _snapshot_get(context, snapshot_id,
+                                         session=session)
+            snapshot_ref.update(values)
+            snapshot_refs.append(snapshot_ref)
+
+        return snapshot_refs
+
 ####################
 
 
@@ -2900,6 +3158,7 @@ def snapshot_metadata_update(context, snapshot_id, metadata, delete):
 
 @handle_db_data_error
 @require_admin_context
+@_bump_cache_generation(VOLUME_TYPES_CACHE)
 def volume_type_create(context, values, projects=None):
     """Create a new volume type.
 
@@ -3100,6 +3359,7 @@ def _process_group_types_filters(query, filters):
 
 @handle_db_data_error
 @require_admin_context
+@_bump_cache_generation(VOLUME_TYPES_CACHE)
 def volume_type_update(context, volume_type_id, values):
     session = get_session()
     with session.begin():
@@ -3290,6 +3550,16 @@ def group_type_get_all(context, inactive=False, filters=None, marker=None,
         return result
 
 
+@require_context
+def volume_type_get_generation(context):
+    """Return a value that changes when volume types are changed.
+
+    It is bumped by every change of the volume types, of their extra specs,
+    QoS specs and project accesses.
+    """
+    return cache_generation_get(context, VOLUME_TYPES_CACHE)
+
+
 def _volume_type_get_id_from_volume_type_query(context, id, session=None):
     return model_query(
         context, models.VolumeTypes.id, read_deleted="no",
@@ -3522,6 +3792,7 @@ def volume_type_qos_associations_get(context, qos_specs_id, inactive=False):
 
 
 @require_admin_context
+@_bump_cache_generation(VOLUME_TYPES_CACHE)
 def volume_type_qos_associate(context, type_id, qos_specs_id):
     session = get_session()
     with session.begin():
@@ -3534,6 +3805,7 @@ def volume_type_qos_associate(context, type_id, qos_specs_id):
 
 
 @require_admin_context
+@_bump_cache_generation(VOLUME_TYPES_CACHE)
 def volume_type_qos_disassociate(context, qos_specs_id, type_id):
     """Disassociate volume type from qos specs."""
     session = get_session()
@@ -3548,6 +3820,7 @@ def volume_type_qos_disassociate(context, qos_specs_id, type_id):
 
 
 @require_admin_context
+@_bump_cache_generation(VOLUME_TYPES_CACHE)
 def volume_type_qos_disassociate_all(context, qos_specs_id):
     """Disassociate all volume types associated with specified qos specs."""
     session = get_session()
@@ -3600,6 +3873,7 @@ def volume_type_qos_specs_get(context, type_id):
 
 
 @require_admin_context
+@_bump_cache_generation(VOLUME_TYPES_CACHE)
 @_retry_on_deadlock
 def volume_type_destroy(context, id):
     utcnow = timeutils.utcnow()
@@ -3660,20 +3934,49 @@ def group_type_destroy(context, id):
                     'updated_at': literal_column('updated_at')})
 
 
+def _active_by_window_filter(query, model, begin, end=None, project_id=None,
+                             marker=None, limit=None, project_id_range=None):
+    """Filter a query on the resources that were active during a window.
+
+    When a marker or a limit is given the results are ordered by id and start
+    after the resource whose id is the marker, so that callers can page
+    through them with the id of the last resource of the previous page.
+
+    project_id_range is a (start, end) tuple restricting the results to the
+    project ids greater than or equal to start and lower than end, either
+    bound may be None.
+    """
+    query = query.filter(or_(model.deleted_at == None,  # noqa
+                             model.deleted_at > begin))
+    if end:
+        query = query.filter(model.created_at < end)
+    if project_id:
+        query = query.filter(model.project_id == project_id)
+    if project_id_range:
+        range_start, range_end = project_id_range
+        if range_start:
+            query = query.filter(model.project_id >= range_start)
+        if range_end:
+            query = query.filter(model.project_id < range_end)
+    if marker or limit:
+        query = query.order_by(model.id)
+    if marker:
+        query = query.filter(model.id > marker)
+    if limit:
+        query = query.limit(limit)
+    return query
+
+
 @require_context
 def volume_get_active_by_window(context,
                                 begin,
                                 end=None,
-                                project_id=None):
+                                project_id=None,
+                                marker=None,
+                                limit=None,
+                                project_id_range=None):
     """Return volumes that were active during window."""
     query = model_query(context, models.Volume, read_deleted="yes")
-    query = query.filter(or_(models.Volume.deleted_at == None,  # noqa
-                             models.Volume.deleted_at > begin))
-    if end:
-        query = query.filter(models.Volume.created_at < end)
-    if project_id:
-        query = query.filter_by(project_id=project_id)
-
     query = (query.options(joinedload('volume_metadata')).
              options(joinedload('volume_type')).
              options(joinedload('volume_attachment')).
@@ -3683,6 +3986,9 @@ def volume_get_active_by_window(context,
     if is_admin_context(context):
         query = query.options(joinedload('volume_admin_metadata'))
 
+    query = _active_by_window_filter(query, models.Volume, begin, end,
+                                     project_id, marker, limit,
+                                     project_id_range)
     return query.all()
 
 
@@ -3742,6 +4048,7 @@ def _group_volume_type_mapping_get_all_by_group_volume_type(context, group_id,
 
 
 @require_admin_context
+@_bump_cache_generation(VOLUME_TYPES_CACHE)
 def volume_type_access_add(context, type_id, project_id):
     """Add given tenant to the volume type access list."""
     volume_type_id = _volume_type_get_id_from_volume_type(context, type_id)
@@ -3780,6 +4087,7 @@ def group_type_access_add(context, type_id, project_id):
 
 
 @require_admin_context
+@_bump_cache_generation(VOLUME_TYPES_CACHE)
 def volume_type_access_remove(context, type_id, project_id):
     """Remove given tenant from the volume type access list."""
     volume_type_id = _volume_type_get_id_from_volume_type(context, type_id)
@@ -3829,6 +4137,7 @@ def volume_type_extra_specs_get(context, volume_type_id):
 
 
 @require_context
+@_bump_cache_generation(VOLUME_TYPES_CACHE)
 def volume_type_extra_specs_delete(context, volume_type_id, key):
     session = get_session()
     with session.begin():
@@ -3859,6 +4168,7 @@ def _volume_type_extra_specs_get_item(context, volume_type_id, key,
 
 @handle_db_data_error
 @require_context
+@_bump_cache_generation(VOLUME_TYPES_CACHE)
 def volume_type_extra_specs_update_or_create(context, volume_type_id,
                                              specs):
     session = get_session()
@@ -3953,6 +4263,7 @@ def group_type_specs_update_or_create(context, group_type_id,
 
 
 @require_admin_context
+@_bump_cache_generation(VOLUME_TYPES_CACHE)
 def qos_specs_create(context, values):
     """Create a new QoS specs.
 
@@ -4197,6 +4508,7 @@ def qos_specs_disassociate_all(context, qos_specs_id):
 
 
 @require_admin_context
+@_bump_cache_generation(VOLUME_TYPES_CACHE)
 def qos_specs_item_delete(context, qos_specs_id, key):
     session = get_session()
     with session.begin():
@@ -4209,6 +4521,7 @@ def qos_specs_item_delete(context, qos_specs_id, key):
 
 
 @require_admin_context
+@_bump_cache_generation(VOLUME_TYPES_CACHE)
 def qos_specs_delete(context, qos_specs_id):
     session = get_session()
     with session.begin():
@@ -4243,6 +4556,7 @@ def _qos_specs_get_item(context, qos_specs_id, key, session=None):
 
 @handle_db_data_error
 @require_admin_context
+@_bump_cache_generation(VOLUME_TYPES_CACHE)
 def qos_specs_update(context, qos_specs_id, updates):
     """Make updates to an existing qos specs.
 
@@ -4662,6 +4976,18 @@ def backup_get_all_by_host(context, host):
     return model_query(context, models.Backup).filter_by(host=host).all()
 
 
+@require_context
+def backup_get_all_active_by_window(context, begin, end=None, project_id=None,
+                                    marker=None, limit=None,
+                                    project_id_range=None):
+    """Return backups that were active during window."""
+    query = model_query(context, models.Backup, read_deleted="yes")
+    query = _active_by_window_filter(query, models.Backup, begin, end,
+                                     project_id, marker, limit,
+                                     project_id_range)
+    return query.all()
+
+
 @require_context
 def backup_get_all_by_project(context, project_id, filters=None, marker=None,
                               limit=None, offset=None, sort_keys=None,
@@ -5743,15 +6069,68 @@ def group_snapshot_creating_from_src():
 ###############################
 
 
+def _purge_table(session, table, deleted_age, batch_size, sleep_interval,
+                 condition=None):
+    """Delete deleted rows older than deleted_age in batches of ids.
+
+    Every batch is deleted in its own transaction and the batches walk the
+    table in id order, so locks are only held on one batch at a time and an
+    interrupted purge can simply be run again.
+    """
+    if 'id' in table.c:
+        id_col = table.c.id
+    else:
+        id_col = list(table.primary_key.columns)[0]
+    conditions = [table.c.deleted_at < deleted_age]
+    if condition is not None:
+        conditions.append(condition)
+
+    total = 0
+    last_id = None
+    while True:
+        query = sql.select([id_col]).where(and_(*conditions))
+        if last_id is not None:
+            query = query.where(id_col > last_id)
+        query = query.order_by(id_col).limit(batch_size)
+        with session.begin():
+            ids = [row[0] for row in session.execute(query)]
+            if not ids:
+                break
+            result = session.execute(table.delete().where(
+                and_(id_col.in_(ids), *conditions)))
+        total += result.rowcount
+        last_id = ids[-1]
+        LOG.info(_LI("Purged %(total)d rows from table=%(table)s, last "
+                     "id %(last_id)s"),
+                 {'total': total, 'table': table.name, 'last_id': last_id})
+        if len(ids) < batch_size:
+            break
+        if sleep_interval:
+            time.sleep(sleep_interval)
+    return total
+
+
 @require_admin_context
-def purge_deleted_rows(context, age_in_days):
-    """Purge deleted rows older than age from cinder tables."""
+def purge_deleted_rows(context, age_in_days, batch_size=1000,
+                       sleep_interval=0):
+    """Purge deleted rows older than age from cinder tables.
+
+    Rows are deleted in batches of batch_size, sleeping sleep_interval
+    seconds between batches.  Child tables are purged before the tables
+    they reference.
+
+    :returns: number of deleted rows
+    """
     try:
         age_in_days = int(age_in_days)
     except ValueError:
         msg = _('Invalid value for age, %(age)s') % {'age': age_in_days}
         LOG.exception(msg)
         raise exception.InvalidParameterValue(msg)
+    if batch_size <= 0:
+        msg = _('Invalid value for batch size, %(size)s') % {
+            'size': batch_size}
+        raise exception.InvalidParameterValue(msg)
 
     engine = get_engine()
     session = get_session()
@@ -5764,41 +6143,45 @@ def purge_deleted_rows(context, age_in_days):
                 and hasattr(model_class, "deleted"):
             tables.append(model_class.__tablename__)
 
-    # Reorder the list so the volumes and volume_types tables are last
-    # to avoid FK constraints
+    # Reorder the list so the child tables are first and the volumes and
+    # volume_types tables are last to avoid FK constraints
+    for table in ("volume_attachment", "volume_admin_metadata",
+                  "volume_metadata", "snapshot_metadata",
+                  "volume_glance_metadata"):
+        tables.remove(table)
+        tables.insert(0, table)
     for table in ("volume_types", "quality_of_service_specs",
                   "snapshots", "volumes", "clusters"):
         tables.remove(table)
         tables.append(table)
 
+    deleted_age = timeutils.utcnow() - dt.timedelta(days=age_in_days)
+    total = 0
     for table in tables:
         t = Table(table, metadata, autoload=True)
         LOG.info(_LI('Purging deleted rows older than age=%(age)d days '
                      'from table=%(table)s'), {'age': age_in_days,
                                                'table': table})
-        deleted_age = timeutils.utcnow() - dt.timedelta(days=age_in_days)
+        rows_purged = 0
         try:
-            with session.begin():
-                # Delete child records first from quality_of_service_specs
-                # table to avoid FK constraints
-                if table == "quality_of_service_specs":
-                    session.query(models.QualityOfServiceSpecs).filter(
-                        and_(models.QualityOfServiceSpecs.specs_id.isnot(
-                            None), models.QualityOfServiceSpecs.deleted == 1,
-                            models.QualityOfServiceSpecs.deleted_at <
-                            deleted_age)).delete()
-                result = session.execute(
-                    t.delete()
-                    .where(t.c.deleted_at < deleted_age))
+            # Delete child records first from quality_of_service_specs
+            # table to avoid FK constraints
+            if table == "quality_of_service_specs":
+                rows_purged += _purge_table(
+                    session, t, deleted_age, batch_size, sleep_interval,
+                    condition=t.c.specs_id.isnot(None))
+            rows_purged += _purge_table(session, t, deleted_age,
+                                        batch_size, sleep_interval)
         except db_exc.DBReferenceError as ex:
             LOG.error(_LE('DBError detected when purging from '
                           '%(tablename)s: %(error)s.'),
                       {'tablename': table, 'error': six.text_type(ex)})
             raise
 
-        rows_purged = result.rowcount
+        total += rows_purged
         LOG.info(_LI("Deleted %(row)d rows from table=%(table)s"),
                  {'row': rows_purged, 'table': table})
+    return total
 
 
 ###############################
@@ -5923,6 +6306,38 @@ def message_destroy(context, message):
 ###############################
 
 
+@require_context
+def cache_generation_get(context, name):
+    generation = model_query(context, models.CacheGeneration.generation,
+                             read_deleted="no").\
+        filter_by(name=name).\
+        scalar()
+    return generation or 0
+
+
+@require_admin_context
+@_retry_on_deadlock
+def cache_generation_bump(context, name):
+    session = get_session()
+    try:
+        with session.begin():
+            updated = model_query(context, models.CacheGeneration,
+                                  session=session, read_deleted="no").\
+                filter_by(name=name).\
+                update({'generation': models.CacheGeneration.generation + 1},
+                       synchronize_session=False)
+            if not updated:
+                generation = models.CacheGeneration(name=name, generation=1)
+                generation.save(session)
+    except db_exc.DBDuplicateEntry:
+        # Created by a concurrent flush, increment it instead
+        return cache_generation_bump(context, name)
+    return cache_generation_get(context, name)
+
+
+###############################
+
+
 @require_context
 def driver_initiator_data_insert_by_key(context, initiator, namespace,
                                         key, value):
@@ -5954,7 +6369,7 @@ def driver_initiator_data_get(context, initiator, namespace):
 
 
 PAGINATION_HELPERS = {
-    models.Volume: (_volume_get_query, _process_volume_filters, _volume_get),
+    models.Volume: (_volume_list_query, _process_volume_filters, _volume_get),
     models.Snapshot: (_snaps_get_query, _process_snaps_filters, _snapshot_get),
     models.Backup: (_backups_get_query, _process_backups_filters, _backup_get),
     models.QualityOfServiceSpecs: (_qos_specs_get_query,
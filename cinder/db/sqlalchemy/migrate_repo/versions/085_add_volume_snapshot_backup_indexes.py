@@ -0,0 +1,60 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from sqlalchemy import Index, MetaData, Table
+
+
+# (table, index name, columns)
+INDEXES = (
+    # volume_get_all_by_host, volume_data_get_for_host
+    ('volumes', 'volumes_deleted_host_idx', ('deleted', 'host')),
+    # Quota usage of a project, per volume type
+    ('volumes', 'volumes_deleted_project_id_volume_type_id_idx',
+     ('deleted', 'project_id', 'volume_type_id')),
+    # Paginated listings of a project and of all projects
+    ('volumes', 'volumes_deleted_project_id_created_at_idx',
+     ('deleted', 'project_id', 'created_at')),
+    ('volumes', 'volumes_deleted_created_at_idx', ('deleted', 'created_at')),
+    ('volumes', 'volumes_deleted_status_idx', ('deleted', 'status')),
+
+    ('snapshots', 'snapshots_volume_id_deleted_idx', ('volume_id', 'deleted')),
+    ('snapshots', 'snapshots_deleted_project_id_volume_type_id_idx',
+     ('deleted', 'project_id', 'volume_type_id')),
+    ('snapshots', 'snapshots_deleted_project_id_created_at_idx',
+     ('deleted', 'project_id', 'created_at')),
+
+    ('backups', 'backups_deleted_host_idx', ('deleted', 'host')),
+    ('backups', 'backups_volume_id_deleted_idx', ('volume_id', 'deleted')),
+    ('backups', 'backups_deleted_project_id_created_at_idx',
+     ('deleted', 'project_id', 'created_at')),
+
+    ('volume_attachment', 'volume_attachment_volume_id_deleted_idx',
+     ('volume_id', 'deleted')),
+    ('volume_attachment', 'volume_attachment_instance_uuid_deleted_idx',
+     ('instance_uuid', 'deleted')),
+)
+
+
+def upgrade(migrate_engine):
+    meta = MetaData()
+    meta.bind = migrate_engine
+
+    for table_name, index_name, columns in INDEXES:
+        table = Table(table_name, meta, autoload=True)
+        if index_name in [idx.name for idx in table.indexes]:
+            continue
+        # Host lookups match 'host' and 'host#pool' with a LIKE prefix,
+        # which PostgreSQL only serves from an index using pattern ops.
+        postgresql_ops = {'host': 'varchar_pattern_ops'}
+        index = Index(index_name, *[table.c[c] for c in columns],
+                      postgresql_ops=postgresql_ops)
+        index.create(migrate_engine)
@@ -25,7 +25,7 @@ from oslo_db.sqlalchemy import models
 from oslo_utils import timeutils
 from sqlalchemy import and_, func, select
 from sqlalchemy import bindparam
-from sqlalchemy import Column, Integer, String, Text, schema
+from sqlalchemy import Column, Index, Integer, String, Text, schema
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy import ForeignKey, DateTime, Boolean, UniqueConstraint
 from sqlalchemy.orm import backref, column_property, relationship, validates
@@ -234,6 +234,17 @@ class GroupSnapshot(BASE, CinderBase):
 class Volume(BASE, CinderBase):
     """Represents a block storage device that can be attached to a vm."""
     __tablename__ = 'volumes'
+    __table_args__ = (
+        Index('volumes_deleted_host_idx', 'deleted', 'host',
+              postgresql_ops={'host': 'varchar_pattern_ops'}),
+        Index('volumes_deleted_project_id_volume_type_id_idx',
+              'deleted', 'project_id', 'volume_type_id'),
+        Index('volumes_deleted_project_id_created_at_idx',
+              'deleted', 'project_id', 'created_at'),
+        Index('volumes_deleted_created_at_idx', 'deleted', 'created_at'),
+        Index('volumes_deleted_status_idx', 'deleted', 'status'),
+        {'mysql_engine': 'InnoDB'}
+    )
     id = Column(String(36), primary_key=True)
     _name_id = Column(String(36))  # Don't access/modify this directly!
 
@@ -335,6 +346,13 @@ class VolumeAdminMetadata(BASE, CinderBase):
 class VolumeAttachment(BASE, CinderBase):
     """Represents a volume attachment for a vm."""
     __tablename__ = 'volume_attachment'
+    __table_args__ = (
+        Index('volume_attachment_volume_id_deleted_idx',
+              'volume_id', 'deleted'),
+        Index('volume_attachment_instance_uuid_deleted_idx',
+              'instance_uuid', 'deleted'),
+        {'mysql_engine': 'InnoDB'}
+    )
     id = Column(String(36), primary_key=True)
 
     volume_id = Column(String(36), ForeignKey('volumes.id'), nullable=False)
@@ -648,6 +666,14 @@ class Reservation(BASE, CinderBase):
 class Snapshot(BASE, CinderBase):
     """Represents a snapshot of volume."""
     __tablename__ = 'snapshots'
+    __table_args__ = (
+        Index('snapshots_volume_id_deleted_idx', 'volume_id', 'deleted'),
+        Index('snapshots_deleted_project_id_volume_type_id_idx',
+              'deleted', 'project_id', 'volume_type_id'),
+        Index('snapshots_deleted_project_id_created_at_idx',
+              'deleted', 'project_id', 'created_at'),
+        {'mysql_engine': 'InnoDB'}
+    )
     id = Column(String(36), primary_key=True)
 
     @property
@@ -714,6 +740,14 @@ class SnapshotMetadata(BASE, CinderBase):
 class Backup(BASE, CinderBase):
     """Represents a backup of a volume to Swift."""
     __tablename__ = 'backups'
+    __table_args__ = (
+        Index('backups_deleted_host_idx', 'deleted', 'host',
+              postgresql_ops={'host': 'varchar_pattern_ops'}),
+        Index('backups_volume_id_deleted_idx', 'volume_id', 'deleted'),
+        Index('backups_deleted_project_id_created_at_idx',
+              'deleted', 'project_id', 'created_at'),
+        {'mysql_engine': 'InnoDB'}
+    )
     id = Column(String(36), primary_key=True)
 
     @property
@@ -819,6 +853,17 @@ class Message(BASE, CinderBase):
     expires_at = Column(DateTime, nullable=True)
 
 
+class CacheGeneration(BASE, CinderBase):
+    """Represents the generation of a cache kept by every process.
+
+    Processes drop their copy of the cache when its generation changes,
+    which lets cinder-manage flush the caches of all the services.
+    """
+    __tablename__ = 'cache_generations'
+    name = Column(String(255), primary_key=True, nullable=False)
+    generation = Column(Integer, nullable=False, default=0)
+
+
 class ImageVolumeCacheEntry(BASE, models.ModelBase):
     """Represents an image volume cache entry"""
     __tablename__ = 'image_volume_cache_entries'
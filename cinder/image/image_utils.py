@@ -24,10 +24,12 @@ we should look at maybe pushing this up to Oslo
 """
 
 
+import collections
 import contextlib
 import math
 import os
 import re
+import stat
 import tempfile
 
 from oslo_concurrency import processutils
@@ -41,6 +43,7 @@ from oslo_utils import units
 from cinder import exception
 from cinder.i18n import _, _LI, _LW
 from cinder import utils
+from cinder.volume import copy_scheduler
 from cinder.volume import throttling
 from cinder.volume import utils as volume_utils
 
@@ -66,23 +69,81 @@ def validate_disk_format(disk_format):
     return disk_format in VALID_DISK_FORMATS
 
 
+# Number of 'qemu-img info' results kept by qemu_img_info().
+QEMU_IMG_INFO_CACHE_SIZE = 128
+
+_QEMU_IMG_VERSION_UNKNOWN = object()
+_qemu_img_version = _QEMU_IMG_VERSION_UNKNOWN
+_qemu_img_info_cache = collections.OrderedDict()
+
+
+def reset_qemu_img_cache():
+    """Forget the detected qemu-img version and cached image info."""
+    global _qemu_img_version
+    _qemu_img_version = _QEMU_IMG_VERSION_UNKNOWN
+    _qemu_img_info_cache.clear()
+
+
+def _qemu_img_info_cache_key(path):
+    # Only regular files are cached, the content of a block device can
+    # change without its mtime or size changing.
+    try:
+        st = os.stat(path)
+    except (OSError, TypeError):
+        return None
+    if not stat.S_ISREG(st.st_mode):
+        return None
+    return (path, st.st_ino, st.st_mtime, st.st_size)
+
+
 def qemu_img_info(path, run_as_root=True):
-    """Return an object containing the parsed output from qemu-img info."""
+    """Return an object containing the parsed output from qemu-img info.
+
+    Results for regular files are cached by path, inode, mtime and size,
+    so inspecting the same unchanged image again does not run qemu-img.
+    """
+    key = _qemu_img_info_cache_key(path)
+    if key is not None and key in _qemu_img_info_cache:
+        return _qemu_img_info_cache[key]
+
     cmd = ('env', 'LC_ALL=C', 'qemu-img', 'info', path)
     if os.name == 'nt':
         cmd = cmd[2:]
     out, _err = utils.execute(*cmd, run_as_root=run_as_root)
-    return imageutils.QemuImgInfo(out)
+    info = imageutils.QemuImgInfo(out)
+
+    if key is not None:
+        _qemu_img_info_cache[key] = info
+        while len(_qemu_img_info_cache) > QEMU_IMG_INFO_CACHE_SIZE:
+            _qemu_img_info_cache.popitem(last=False)
+    return info
 
 
 def get_qemu_img_version():
-    info = utils.execute('qemu-img', '--help', check_exit_code=False)[0]
+    """Return the qemu-img version, or None if it is not installed.
+
+    qemu-img is only probed the first time this is called in a process.
+    """
+    global _qemu_img_version
+    if _qemu_img_version is not _QEMU_IMG_VERSION_UNKNOWN:
+        return _qemu_img_version
+
+    try:
+        info = utils.execute('qemu-img', '--help', check_exit_code=False)[0]
+    except (OSError, processutils.ProcessExecutionError):
+        info = ''
     pattern = r"qemu-img version ([0-9\.]*)"
     version = re.match(pattern, info)
     if not version:
         LOG.warning(_LW("qemu-img is not installed."))
-        return None
-    return _get_version_from_string(version.groups()[0])
+        _qemu_img_version = None
+    else:
+        _qemu_img_version = _get_version_from_string(version.groups()[0])
+    return _qemu_img_version
+
+
+def qemu_img_available():
+    return get_qemu_img_version() is not None
 
 
 def _get_version_from_string(version_string):
@@ -106,8 +167,13 @@ def check_qemu_img_version(minimum_version):
         raise exception.VolumeBackendAPIException(data=_msg)
 
 
-def _convert_image(prefix, source, dest, out_format, run_as_root=True):
-    """Convert image to other format."""
+def _convert_image(prefix, source, dest, out_format, run_as_root=True,
+                   src_size=None):
+    """Convert image to other format.
+
+    src_size is the virtual size of the source in bytes, when the caller
+    already knows it; it is only used to report the conversion rate.
+    """
 
     cmd = prefix + ('qemu-img', 'convert',
                     '-O', out_format, source, dest)
@@ -137,15 +203,18 @@ def _convert_image(prefix, source, dest, out_format, run_as_root=True):
     # some incredible event this is 0 (cirros image?) don't barf
     if duration < 1:
         duration = 1
-    try:
-        image_size = qemu_img_info(source, run_as_root=True).virtual_size
-    except ValueError as e:
-        msg = _LI("The image was successfully converted, but image size "
-                  "is unavailable. src %(src)s, dest %(dest)s. %(error)s")
-        LOG.info(msg, {"src": source,
-                       "dest": dest,
-                       "error": e})
-        return
+    image_size = src_size
+    if image_size is None:
+        try:
+            image_size = qemu_img_info(source, run_as_root=True).virtual_size
+        except ValueError as e:
+            msg = _LI("The image was successfully converted, but image size "
+                      "is unavailable. src %(src)s, dest %(dest)s. "
+                      "%(error)s")
+            LOG.info(msg, {"src": source,
+                           "dest": dest,
+                           "error": e})
+            return
 
     fsz_mb = image_size / units.Mi
     mbps = (fsz_mb / duration)
@@ -160,13 +229,17 @@ def _convert_image(prefix, source, dest, out_format, run_as_root=True):
     LOG.info(msg, {"sz": fsz_mb, "mbps": mbps})
 
 
-def convert_image(source, dest, out_format, run_as_root=True, throttle=None):
+def convert_image(source, dest, out_format, run_as_root=True, throttle=None,
+                  priority=copy_scheduler.PRIORITY_HIGH, src_size=None):
     if not throttle:
         throttle = throttling.Throttle.get_default()
-    with throttle.subcommand(source, dest) as throttle_cmd:
-        _convert_image(tuple(throttle_cmd['prefix']),
-                       source, dest,
-                       out_format, run_as_root=run_as_root)
+    scheduler = copy_scheduler.CopyScheduler.get_default()
+    with scheduler.slot(priority, name=dest):
+        with throttle.subcommand(source, dest) as throttle_cmd:
+            _convert_image(tuple(throttle_cmd['prefix']),
+                           source, dest,
+                           out_format, run_as_root=run_as_root,
+                           src_size=src_size)
 
 
 def resize_image(source, size, run_as_root=False):
@@ -266,10 +339,7 @@ def fetch_to_volume_format(context, image_service,
         # throw an exception if not.  Otherwise we stop before needing
         # qemu-img.  Systems with qemu-img will always progress through the
         # whole function.
-        try:
-            # Use the empty tmp file to make sure qemu_img_info works.
-            qemu_img_info(tmp, run_as_root=run_as_root)
-        except processutils.ProcessExecutionError:
+        if not qemu_img_available():
             qemu_img = False
             if image_meta:
                 if image_meta['disk_format'] != 'raw':
@@ -341,7 +411,7 @@ def fetch_to_volume_format(context, image_service,
         # malicious.
         LOG.debug("%s was %s, converting to %s ", image_id, fmt, volume_format)
         convert_image(tmp, dest, volume_format,
-                      run_as_root=run_as_root)
+                      run_as_root=run_as_root, src_size=data.virtual_size)
 
         data = qemu_img_info(dest, run_as_root=run_as_root)
 
@@ -401,7 +471,7 @@ def upload_volume(context, image_service, image_meta, volume_path,
             out_format = 'vpc'
 
         convert_image(volume_path, tmp, out_format,
-                      run_as_root=run_as_root)
+                      run_as_root=run_as_root, src_size=data.virtual_size)
 
         data = qemu_img_info(tmp, run_as_root=run_as_root)
         if data.file_format != out_format:
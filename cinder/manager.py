@@ -52,14 +52,18 @@ This module provides Manager, a base class for managers.
 """
 
 
+import copy
+
 from oslo_config import cfg
 from oslo_log import log as logging
 import oslo_messaging as messaging
 from oslo_service import periodic_task
+from oslo_utils import uuidutils
 
 from cinder.db import base
 from cinder.i18n import _LI
 from cinder import rpc
+from cinder.scheduler import capabilities as sched_capabilities
 from cinder.scheduler import rpcapi as scheduler_rpcapi
 
 from eventlet import greenpool
@@ -151,6 +155,13 @@ class SchedulerDependentManager(Manager):
         self.service_name = service_name
         self.scheduler_rpcapi = scheduler_rpcapi.SchedulerAPI()
         self._tp = greenpool.GreenPool()
+        # Capabilities reported last, with their version, to send the next
+        # ones as a delta.
+        self._reported_capabilities = None
+        self._reported_version = None
+        self._capabilities_id = uuidutils.generate_uuid()
+        self._capabilities_seq = 0
+        self._delta_reports = 0
         super(SchedulerDependentManager, self).__init__(host, db_driver,
                                                         cluster=cluster)
 
@@ -158,16 +169,56 @@ class SchedulerDependentManager(Manager):
         """Remember these capabilities to send on next periodic update."""
         self.last_capabilities = capabilities
 
+    def _reset_reported_capabilities(self):
+        """Send the next capabilities in full."""
+        self._reported_capabilities = None
+
     @periodic_task.periodic_task
     def _publish_service_capabilities(self, context):
-        """Pass data back to the scheduler at a periodic interval."""
-        if self.last_capabilities:
+        """Pass data back to the scheduler at a periodic interval.
+
+        Once a full report was sent, capabilities_delta_reports reports only
+        carry what changed since the previous one.
+        """
+        if not self.last_capabilities:
+            return
+
+        if not self.scheduler_rpcapi.can_send_capabilities_delta():
             LOG.debug('Notifying Schedulers of capabilities ...')
             self.scheduler_rpcapi.update_service_capabilities(
                 context,
                 self.service_name,
                 self.host,
                 self.last_capabilities)
+            return
+
+        delta = None
+        if (self._reported_capabilities is not None and
+                self._delta_reports < CONF.capabilities_delta_reports):
+            delta = sched_capabilities.get_delta(self._reported_capabilities,
+                                                 self.last_capabilities)
+
+        self._capabilities_seq += 1
+        version = '%s:%d' % (self._capabilities_id, self._capabilities_seq)
+        if delta is None:
+            LOG.debug('Notifying Schedulers of capabilities version '
+                      '%s ...', version)
+            self.scheduler_rpcapi.update_service_capabilities(
+                context, self.service_name, self.host,
+                self.last_capabilities, capabilities_version=version)
+            self._delta_reports = 0
+        else:
+            LOG.debug('Notifying Schedulers of capabilities version '
+                      '%(version)s as a delta from %(base)s ...',
+                      {'version': version, 'base': self._reported_version})
+            self.scheduler_rpcapi.update_service_capabilities(
+                context, self.service_name, self.host, delta,
+                capabilities_version=version,
+                base_version=self._reported_version)
+            self._delta_reports += 1
+        # The driver may update the capabilities in place
+        self._reported_capabilities = copy.deepcopy(self.last_capabilities)
+        self._reported_version = version
 
     def _add_to_threadpool(self, func, *args, **kwargs):
         self._tp.spawn_n(func, *args, **kwargs)
@@ -191,6 +191,15 @@ class BackupList(base.ObjectListBase, base.CinderObject):
         return base.obj_make_list(context, cls(context), objects.Backup,
                                   backups)
 
+    @classmethod
+    def get_all_active_by_window(cls, context, begin, end, marker=None,
+                                 limit=None, project_id_range=None):
+        backups = db.backup_get_all_active_by_window(
+            context, begin, end, marker=marker, limit=limit,
+            project_id_range=project_id_range)
+        return base.obj_make_list(context, cls(context), objects.Backup,
+                                  backups)
+
 
 @base.CinderObjectRegistry.register
 class BackupImport(Backup):
@@ -524,11 +524,12 @@ class VolumeList(base.ObjectListBase, base.CinderObject):
 
     @classmethod
     def get_all(cls, context, marker, limit, sort_keys=None, sort_dirs=None,
-                filters=None, offset=None):
+                filters=None, offset=None, detail=True):
         volumes = db.volume_get_all(context, marker, limit,
                                     sort_keys=sort_keys, sort_dirs=sort_dirs,
-                                    filters=filters, offset=offset)
-        expected_attrs = cls._get_expected_attrs(context)
+                                    filters=filters, offset=offset,
+                                    detail=detail)
+        expected_attrs = cls._get_expected_attrs(context) if detail else []
         return base.obj_make_list(context, cls(context), objects.Volume,
                                   volumes, expected_attrs=expected_attrs)
 
@@ -559,12 +560,13 @@ class VolumeList(base.ObjectListBase, base.CinderObject):
     @classmethod
     def get_all_by_project(cls, context, project_id, marker, limit,
                            sort_keys=None, sort_dirs=None, filters=None,
-                           offset=None):
+                           offset=None, detail=True):
         volumes = db.volume_get_all_by_project(context, project_id, marker,
                                                limit, sort_keys=sort_keys,
                                                sort_dirs=sort_dirs,
-                                               filters=filters, offset=offset)
-        expected_attrs = cls._get_expected_attrs(context)
+                                               filters=filters, offset=offset,
+                                               detail=detail)
+        expected_attrs = cls._get_expected_attrs(context) if detail else []
         return base.obj_make_list(context, cls(context), objects.Volume,
                                   volumes, expected_attrs=expected_attrs)
 
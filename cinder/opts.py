@@ -44,6 +44,7 @@ from cinder.image import image_utils as cinder_image_imageutils
 from cinder.keymgr import conf_key_mgr as cinder_keymgr_confkeymgr
 from cinder.message import api as cinder_message_api
 from cinder import quota as cinder_quota
+from cinder import quota_utils as cinder_quotautils
 from cinder.scheduler import driver as cinder_scheduler_driver
 from cinder.scheduler import host_manager as cinder_scheduler_hostmanager
 from cinder.scheduler import manager as cinder_scheduler_manager
@@ -177,6 +178,7 @@ from cinder.volume.drivers.zfssa import zfssanfs as \
     cinder_volume_drivers_zfssa_zfssanfs
 from cinder.volume.drivers.zte import zte_ks as cinder_volume_drivers_zte_zteks
 from cinder.volume import manager as cinder_volume_manager
+from cinder.volume import volume_types as cinder_volume_volumetypes
 from cinder.wsgi import eventlet_server as cinder_wsgi_eventletserver
 from cinder.zonemanager.drivers.brocade import brcd_fabric_opts as \
     cinder_zonemanager_drivers_brocade_brcdfabricopts
@@ -317,6 +319,7 @@ def list_opts():
                 storwize_svc_opts,
                 cinder_volume_drivers_hitachi_hbsdfc.volume_opts,
                 cinder_quota.quota_opts,
+                cinder_quotautils.project_hierarchy_cache_opts,
                 cinder_volume_drivers_huawei_huaweidriver.huawei_opts,
                 cinder_volume_drivers_synology_synologycommon.cinder_opts,
                 cinder_volume_drivers_dell_dellstoragecentercommon.
@@ -343,6 +346,7 @@ def list_opts():
                 cinder_volume_drivers_hpe_hpexpopts.HORCM_VOLUME_OPTS,
                 cinder_volume_drivers_hitachi_hbsdiscsi.volume_opts,
                 cinder_volume_manager.volume_manager_opts,
+                cinder_volume_volumetypes.volume_types_cache_opts,
                 cinder_volume_drivers_ibm_flashsystemiscsi.
                 flashsystem_iscsi_opts,
                 cinder_volume_drivers_tegile.tegile_opts,
@@ -18,6 +18,7 @@
 
 from collections import deque
 import datetime
+import time
 
 from oslo_config import cfg
 from oslo_log import log as logging
@@ -77,7 +78,14 @@ quota_opts = [
                      'with default quota.'),
     cfg.IntOpt('per_volume_size_limit',
                default=-1,
-               help='Max size allowed per volume, in gigabytes'), ]
+               help='Max size allowed per volume, in gigabytes'),
+    cfg.IntOpt('quota_resources_check_interval',
+               default=10,
+               help='Number of seconds between checks for volume type '
+                    'changes made by other processes, when using the cached '
+                    'volume type quota resources.  Changes made by this '
+                    'process are seen immediately.  0 checks on every '
+                    'access.'), ]
 
 CONF = cfg.CONF
 CONF.register_opts(quota_opts)
@@ -1123,12 +1131,62 @@ class QuotaEngine(object):
 
 
 class VolumeTypeQuotaEngine(QuotaEngine):
-    """Represent the set of all quotas."""
+    """Represent the set of all quotas.
+
+    The resources are built once and shared by all the engines of the
+    process.  They are rebuilt when the generation is bumped by a volume
+    type change in this process, or when the volume types generation in
+    the database changes, which is checked at most every
+    quota_resources_check_interval seconds.
+    """
+
+    _generation = 0
+    # (generation, database generation, checked at, resources)
+    _cache = None
+
+    @classmethod
+    def invalidate_resources(cls):
+        """Rebuild the resources on next access."""
+        cls._generation += 1
+
+    @classmethod
+    def reset_cache(cls):
+        cls._cache = None
 
     @property
     def resources(self):
         """Fetches all possible quota resources."""
+        return self._get_resources()
+
+    def _get_resources(self, force_check=False):
+        cls = VolumeTypeQuotaEngine
+        generation = cls._generation
+        cache = cls._cache
+        now = time.time()
+        if (cache is not None and cache[0] == generation and
+                not force_check and
+                now - cache[2] < CONF.quota_resources_check_interval):
+            return cache[3]
+
+        db_generation = db.volume_type_get_generation(
+            context.get_admin_context())
+        if cache is not None and cache[:2] == (generation, db_generation):
+            resources = cache[3]
+        else:
+            resources = self._load_resources()
+        cls._cache = (generation, db_generation, now, resources)
+        return resources
+
+    def _refresh_resources(self):
+        """Rebuild the resources if volume types changed in the database.
 
+        :returns: True if the resources were rebuilt
+        """
+        cache = VolumeTypeQuotaEngine._cache
+        old_resources = cache[3] if cache is not None else None
+        return self._get_resources(force_check=True) is not old_resources
+
+    def _load_resources(self):
         result = {}
         # Global quotas.
         argses = [('volumes', '_sync_volumes', 'quota_volumes'),
@@ -1157,6 +1215,28 @@ class VolumeTypeQuotaEngine(QuotaEngine):
     def register_resources(self, resources):
         raise NotImplementedError(_("Cannot register resources"))
 
+    def limit_check(self, context, project_id=None, **values):
+        # The resources of a volume type created by another process may not
+        # be cached yet.
+        try:
+            return super(VolumeTypeQuotaEngine, self).limit_check(
+                context, project_id=project_id, **values)
+        except exception.QuotaResourceUnknown:
+            if not self._refresh_resources():
+                raise
+        return super(VolumeTypeQuotaEngine, self).limit_check(
+            context, project_id=project_id, **values)
+
+    def reserve(self, context, expire=None, project_id=None, **deltas):
+        try:
+            return super(VolumeTypeQuotaEngine, self).reserve(
+                context, expire=expire, project_id=project_id, **deltas)
+        except exception.QuotaResourceUnknown:
+            if not self._refresh_resources():
+                raise
+        return super(VolumeTypeQuotaEngine, self).reserve(
+            context, expire=expire, project_id=project_id, **deltas)
+
     def update_quota_resource(self, context, old_type_name, new_type_name):
         """Update resource in quota.
 
@@ -1180,6 +1260,7 @@ class VolumeTypeQuotaEngine(QuotaEngine):
             db.quota_update_resource(context,
                                      old_res,
                                      new_res)
+        self.invalidate_resources()
 
 
 class CGQuotaEngine(QuotaEngine):
@@ -14,22 +14,46 @@
 #    under the License.
 from oslo_config import cfg
 from oslo_log import log as logging
+import requests
 
 from keystoneclient.auth.identity.generic import token
 from keystoneclient import client
 from keystoneclient import exceptions
 from keystoneclient import session
 
+from cinder import context
 from cinder import db
 from cinder import exception
 from cinder.i18n import _, _LW
+from cinder import utils
+
+project_hierarchy_cache_opts = [
+    cfg.IntOpt('project_hierarchy_cache_ttl',
+               default=300,
+               help='Number of seconds the parents and subtree of projects '
+                    'fetched from Keystone for nested quotas are cached by '
+                    'each process.  0 disables the cache.'),
+    cfg.IntOpt('project_hierarchy_cache_size',
+               default=1000,
+               help='Maximum number of project hierarchies cached by each '
+                    'process, the least recently used ones are dropped '
+                    'first.'),
+    cfg.IntOpt('project_hierarchy_cache_check_interval',
+               default=10,
+               help='Number of seconds between checks for flushes of the '
+                    'project hierarchy cache requested with cinder-manage.'),
+]
 
 CONF = cfg.CONF
+CONF.register_opts(project_hierarchy_cache_opts)
 CONF.import_opt('auth_uri', 'keystonemiddleware.auth_token.__init__',
                 'keystone_authtoken')
 
 LOG = logging.getLogger(__name__)
 
+# Name of the project hierarchy cache generation in the database
+PROJECT_HIERARCHY_CACHE = 'project_hierarchy'
+
 
 class GenericProjectInfo(object):
     """Abstraction layer for Keystone V2 and V3 project objects"""
@@ -46,6 +70,43 @@ class GenericProjectInfo(object):
         self.is_admin_project = is_admin_project
 
 
+def _get_cache_generation():
+    return db.cache_generation_get(context.get_admin_context(),
+                                   PROJECT_HIERARCHY_CACHE)
+
+
+def _create_cache():
+    """Create the cache of the project hierarchies from Keystone.
+
+    It is flushed in every process by 'cinder-manage quota
+    flush_project_cache', which bumps its generation in the database.
+    """
+    return utils.GenerationCache(
+        'Project hierarchy cache', _get_cache_generation,
+        ttl=lambda: CONF.project_hierarchy_cache_ttl,
+        check_interval=lambda: CONF.project_hierarchy_cache_check_interval,
+        size=lambda: CONF.project_hierarchy_cache_size)
+
+
+CACHE = _create_cache()
+
+
+def flush_cache(context):
+    """Flush the project hierarchy cache of every process."""
+    CACHE.invalidate()
+    return db.cache_generation_bump(context, PROJECT_HIERARCHY_CACHE)
+
+
+def reset_cache():
+    global CACHE
+    CACHE = _create_cache()
+
+
+def get_cache_stats():
+    """Return the hit and miss counters of the project hierarchy cache."""
+    return CACHE.get_stats()
+
+
 def get_volume_type_reservation(ctxt, volume, type_id,
                                 reserve_vol_type_only=False):
     from cinder import quota
@@ -98,7 +159,25 @@ def get_project_hierarchy(context, project_id, subtree_as_ids=False,
     hierarchy, if any, in order to do nested quota operations properly.
     If the domain is being used as the top most parent, it is filtered out from
     the parent tree and parent_id.
+    The hierarchies are cached, see _create_cache.  Keystone only returns
+    the parents and subtree the token of the caller can see, so the entries
+    are cached per user and roles of the caller.
     """
+    key = (context.user_id, context.project_id, tuple(sorted(context.roles)),
+           project_id, subtree_as_ids, parents_as_ids)
+    generic_project = CACHE.get(
+        key,
+        lambda: _get_project_hierarchy(context, project_id,
+                                       subtree_as_ids=subtree_as_ids,
+                                       parents_as_ids=parents_as_ids))
+    if generic_project.keystone_api_version == 'v3':
+        generic_project.is_admin_project = is_admin_project
+
+    return generic_project
+
+
+def _get_project_hierarchy(context, project_id, subtree_as_ids=False,
+                           parents_as_ids=False):
     keystone = _keystone_client(context)
     generic_project = GenericProjectInfo(project_id, keystone.version)
     if keystone.version == 'v3':
@@ -118,8 +197,6 @@ def get_project_hierarchy(context, project_id, subtree_as_ids=False,
             generic_project.parents = _filter_domain_id_from_parents(
                 project.domain_id, project.parents)
 
-        generic_project.is_admin_project = is_admin_project
-
     return generic_project
 
 
@@ -214,6 +291,21 @@ def validate_setup_for_nested_quota_use(ctxt, resources,
         raise exception.CinderException(message=msg)
 
 
+_HTTP_SESSION = None
+
+
+def _get_http_session():
+    """Return the HTTP session shared by the keystone clients.
+
+    Its connection pool keeps the connections to Keystone open, so that
+    nested quota operations don't pay a TCP and TLS handshake each time.
+    """
+    global _HTTP_SESSION
+    if _HTTP_SESSION is None:
+        _HTTP_SESSION = requests.Session()
+    return _HTTP_SESSION
+
+
 def _keystone_client(context, version=(3, 0)):
     """Creates and returns an instance of a generic keystone client.
 
@@ -226,6 +318,7 @@ def _keystone_client(context, version=(3, 0)):
         token=context.auth_token,
         project_id=context.project_id)
     client_session = session.Session(auth=auth_plugin,
+                                     session=_get_http_session(),
                                      verify=False if
                                      CONF.keystone_authtoken.insecure else
                                      (CONF.keystone_authtoken.cafile or True))
@@ -0,0 +1,107 @@
+# Copyright (c) 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Delta encoding of the capabilities reported to the schedulers.
+
+A delta only carries what changed since the previous report of a backend::
+
+    {'changed': {<capability>: <value>, ...},
+     'removed': [<capability>, ...],
+     'pools': [{'pool_name': <pool>,
+                'changed': {<capability>: <value>, ...},
+                'removed': [<capability>, ...]}, ...],
+     'removed_pools': [<pool>, ...]}
+
+'pools' and 'removed_pools' are only present when the capabilities have a
+list of pools.
+"""
+
+
+def _diff(old, new, ignore=()):
+    changed = {key: value for key, value in new.items()
+               if key not in ignore and (key not in old or
+                                         old[key] != value)}
+    removed = [key for key in old if key not in ignore and key not in new]
+    return changed, removed
+
+
+def _apply(old, changed, removed):
+    new = dict(old)
+    for key in removed:
+        new.pop(key, None)
+    new.update(changed)
+    return new
+
+
+def _get_pools(capabilities):
+    pools = capabilities.get('pools')
+    if isinstance(pools, list) and all(
+            isinstance(pool, dict) and 'pool_name' in pool for pool in pools):
+        return pools
+    return None
+
+
+def get_delta(old, new):
+    """Returns the delta from the old capabilities to the new ones.
+
+    :returns: the delta, or None if the new capabilities can not be sent
+              as a delta and must be reported in full
+    """
+    old_pools = _get_pools(old)
+    new_pools = _get_pools(new)
+    if ('pools' in old or 'pools' in new) and (old_pools is None or
+                                               new_pools is None):
+        return None
+
+    changed, removed = _diff(old, new, ignore=('pools',))
+    delta = {'changed': changed, 'removed': removed}
+    if new_pools is not None:
+        old_pools = {pool['pool_name']: pool for pool in old_pools}
+        delta['pools'] = []
+        for pool in new_pools:
+            pool_changed, pool_removed = _diff(
+                old_pools.pop(pool['pool_name'], {}), pool)
+            if pool_changed or pool_removed:
+                delta['pools'].append({'pool_name': pool['pool_name'],
+                                       'changed': pool_changed,
+                                       'removed': pool_removed})
+        delta['removed_pools'] = list(old_pools)
+    return delta
+
+
+def apply_delta(capabilities, delta):
+    """Returns the capabilities updated with a delta from get_delta.
+
+    The capabilities are not modified, the pools that did not change are
+    shared with the capabilities returned.
+    """
+    new = _apply(capabilities, delta['changed'], delta['removed'])
+    if 'pools' in delta:
+        removed_pools = set(delta['removed_pools'])
+        updates = {update['pool_name']: update for update in delta['pools']}
+        pools = []
+        for pool in capabilities.get('pools') or []:
+            if pool['pool_name'] in removed_pools:
+                continue
+            update = updates.pop(pool['pool_name'], None)
+            if update:
+                pool = _apply(pool, update['changed'], update['removed'])
+            pools.append(pool)
+        # New pools
+        pools.extend(_apply({}, update['changed'], update['removed'])
+                     for update in delta['pools']
+                     if update['pool_name'] in updates)
+        new['pools'] = pools
+    return new
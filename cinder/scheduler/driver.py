@@ -97,11 +97,14 @@ class Scheduler(object):
 
         return self.host_manager.has_all_capabilities()
 
-    def update_service_capabilities(self, service_name, host, capabilities):
+    def update_service_capabilities(self, service_name, host, capabilities,
+                                    capabilities_version=None,
+                                    base_version=None):
         """Process a capability update from a service node."""
-        self.host_manager.update_service_capabilities(service_name,
-                                                      host,
-                                                      capabilities)
+        self.host_manager.update_service_capabilities(
+            service_name, host, capabilities,
+            capabilities_version=capabilities_version,
+            base_version=base_version)
 
     def host_passes_filters(self, context, host, request_spec,
                             filter_properties):
@@ -30,6 +30,7 @@ from cinder import exception
 from cinder import objects
 from cinder import utils
 from cinder.i18n import _LI, _LW
+from cinder.scheduler import capabilities as sched_capabilities
 from cinder.scheduler import filters
 from cinder.volume import utils as vol_utils
 
@@ -358,6 +359,7 @@ class HostManager(object):
         self.weight_classes = self.weight_handler.get_all_classes()
 
         self._no_capabilities_hosts = set()  # Hosts having no capabilities
+        self._capabilities_versions = {}  # Version of the host capabilities
         self._update_host_state_map(cinder_context.get_admin_context())
 
     def _choose_host_filters(self, filter_cls_names):
@@ -431,18 +433,38 @@ class HostManager(object):
                                                        hosts,
                                                        weight_properties)
 
-    def update_service_capabilities(self, service_name, host, capabilities):
-        """Update the per-service capabilities based on this notification."""
+    def update_service_capabilities(self, service_name, host, capabilities,
+                                    capabilities_version=None,
+                                    base_version=None):
+        """Update the per-service capabilities based on this notification.
+
+        The capabilities are a delta from the capabilities of version
+        base_version if it is given. The delta is ignored if these are not
+        the capabilities known for the host, they are then updated by the
+        next full report.
+        """
         if service_name != 'volume':
             LOG.debug('Ignoring %(service_name)s service update '
                       'from %(host)s',
                       {'service_name': service_name, 'host': host})
             return
 
-        # Copy the capabilities, so we don't modify the original dict
-        capab_copy = dict(capabilities)
+        if base_version is not None:
+            if self._capabilities_versions.get(host) != base_version:
+                LOG.debug('Ignoring %(service_name)s service update '
+                          'from %(host)s based on unknown version '
+                          '%(version)s',
+                          {'service_name': service_name, 'host': host,
+                           'version': base_version})
+                return
+            capab_copy = sched_capabilities.apply_delta(
+                self.service_states[host], capabilities)
+        else:
+            # Copy the capabilities, so we don't modify the original dict
+            capab_copy = dict(capabilities)
         capab_copy["timestamp"] = timeutils.utcnow()  # Reported time
         self.service_states[host] = capab_copy
+        self._capabilities_versions[host] = capabilities_version
 
         LOG.debug("Received %(service_name)s service update from "
                   "%(host)s: %(cap)s",
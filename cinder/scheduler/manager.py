@@ -82,13 +82,16 @@ class SchedulerManager(manager.Manager):
         self.driver.reset()
 
     def update_service_capabilities(self, context, service_name=None,
-                                    host=None, capabilities=None, **kwargs):
+                                    host=None, capabilities=None,
+                                    capabilities_version=None,
+                                    base_version=None, **kwargs):
         """Process a capability update from a service node."""
         if capabilities is None:
             capabilities = {}
-        self.driver.update_service_capabilities(service_name,
-                                                host,
-                                                capabilities)
+        self.driver.update_service_capabilities(
+            service_name, host, capabilities,
+            capabilities_version=capabilities_version,
+            base_version=base_version)
 
     def _wait_for_scheduler(self):
         # NOTE(dulek): We're waiting for scheduler to announce that it's ready
@@ -361,7 +364,7 @@ class SchedulerManager(manager.Manager):
 # TODO(dulek): This goes away immediately in Ocata and is just present in
 # Newton so that we can receive v2.x and v3.0 messages.
 class _SchedulerV3Proxy(object):
-    target = messaging.Target(version='3.0')
+    target = messaging.Target(version='3.1')
 
     def __init__(self, manager):
         self.manager = manager
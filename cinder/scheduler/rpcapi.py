@@ -58,9 +58,11 @@ class SchedulerAPI(rpc.RPCAPI):
         set to 2.3.
 
         3.0 - Remove 2.x compatibility
+        3.1 - Adds capabilities_version and base_version to
+              update_service_capabilities() to send capability deltas
     """
 
-    RPC_API_VERSION = '3.0'
+    RPC_API_VERSION = '3.1'
     TOPIC = constants.SCHEDULER_TOPIC
     BINARY = 'cinder-scheduler'
 
@@ -185,11 +187,20 @@ class SchedulerAPI(rpc.RPCAPI):
         return cctxt.call(ctxt, 'get_pools',
                           filters=filters)
 
+    def can_send_capabilities_delta(self):
+        return self.client.can_send_version('3.1')
+
     def update_service_capabilities(self, ctxt,
                                     service_name, host,
-                                    capabilities):
-        version = self._compat_ver('3.0', '2.0')
+                                    capabilities, capabilities_version=None,
+                                    base_version=None):
+        msg_args = {'service_name': service_name, 'host': host,
+                    'capabilities': capabilities}
+        if capabilities_version is None:
+            version = self._compat_ver('3.0', '2.0')
+        else:
+            version = '3.1'
+            msg_args['capabilities_version'] = capabilities_version
+            msg_args['base_version'] = base_version
         cctxt = self.client.prepare(fanout=True, version=version)
-        cctxt.cast(ctxt, 'update_service_capabilities',
-                   service_name=service_name, host=host,
-                   capabilities=capabilities)
+        cctxt.cast(ctxt, 'update_service_capabilities', **msg_args)
@@ -44,12 +44,16 @@ from cinder import coordination
 from cinder.db import migration
 from cinder.db.sqlalchemy import api as sqla_api
 from cinder import i18n
+from cinder.image import image_utils
 from cinder.objects import base as objects_base
+from cinder import quota
+from cinder import quota_utils
 from cinder import rpc
 from cinder import service
 from cinder.tests import fixtures as cinder_fixtures
 from cinder.tests.unit import conf_fixture
 from cinder.tests.unit import fake_notifier
+from cinder.volume import volume_types
 
 
 CONF = cfg.CONF
@@ -217,6 +221,17 @@ class TestCase(testtools.TestCase):
         # clear out the cache.
         sqla_api._GET_METHODS = {}
 
+        # NOTE: image_utils probes qemu-img once per process and caches
+        # 'qemu-img info' results, so clear them out for each test.
+        image_utils.reset_qemu_img_cache()
+
+        # NOTE: the volume type quota resources, the volume types cache and
+        # the project hierarchy cache are shared by the process and would
+        # otherwise carry volume types and projects from one test to the next.
+        quota.VolumeTypeQuotaEngine.reset_cache()
+        volume_types.reset_cache()
+        quota_utils.reset_cache()
+
         self.override_config('backend_url', 'file://' + lock_path,
                              group='coordination')
         coordination.COORDINATOR.start()
@@ -16,10 +16,18 @@
 # NOTE(mriedem): This is needed for importing from fixtures.
 from __future__ import absolute_import
 
+import collections
+import datetime
 import logging as std_logging
 import os
+import time
 
 import fixtures
+from oslo_utils import timeutils
+from six.moves import range
+
+from cinder.db.sqlalchemy import api as db_api
+from cinder.db.sqlalchemy import models
 
 _TRUE_VALUES = ('True', 'true', '1', 'yes')
 
@@ -99,3 +107,122 @@ class StandardLogging(fixtures.Fixture):
             # Don't log every single DB migration step
             std_logging.getLogger(
                 'migrate.versioning.api').setLevel(std_logging.WARNING)
+
+
+class DatabaseBenchmark(fixtures.Fixture):
+    """Seed the database with volumes, snapshots and backups for benchmarks.
+
+    Every volume gets a snapshot and a backup, and the given number of
+    metadata items along with a 'readonly' admin metadata item when
+    metadata is set.  Rows are spread over the given number of projects and
+    backend pools, and one in four is deleted.
+    time_queries() runs a set of queries and keeps the best of several runs,
+    so that the same queries can be timed with and without indexes.
+    """
+
+    TABLES = (models.Volume, models.Snapshot, models.Backup,
+              models.VolumeAttachment)
+
+    def __init__(self, rows, projects=1000, hosts=20, metadata=0,
+                 batch_size=10000):
+        self.rows = rows
+        self.metadata = metadata
+        self.projects = projects
+        self.hosts = hosts
+        self.batch_size = batch_size
+        self.timings = collections.OrderedDict()
+
+    def setUp(self):
+        super(DatabaseBenchmark, self).setUp()
+        self.engine = db_api.get_engine()
+        self._seed()
+
+    @staticmethod
+    def host(n):
+        return 'host%d@backend' % n
+
+    @staticmethod
+    def project_id(n):
+        return 'project-%d' % n
+
+    def _seed(self):
+        now = timeutils.utcnow()
+        conn = self.engine.connect()
+        for start in range(0, self.rows, self.batch_size):
+            volumes, snapshots, backups = [], [], []
+            metadata, admin_metadata = [], []
+            for i in range(start, min(start + self.batch_size, self.rows)):
+                common = {
+                    'created_at': now - datetime.timedelta(seconds=i),
+                    'deleted': i % 4 == 0,
+                    'project_id': self.project_id(i % self.projects),
+                    'user_id': 'user',
+                    'status': 'deleted' if i % 4 == 0 else 'available',
+                }
+                volume_id = '00000000-0000-0000-0000-%012d' % i
+                volumes.append(dict(
+                    common, id=volume_id, size=1,
+                    host=self.host(i % self.hosts) + '#pool',
+                    volume_type_id='type-%d' % (i % 3)))
+                snapshots.append(dict(
+                    common, id='00000000-0000-0000-0001-%012d' % i,
+                    volume_id=volume_id, volume_size=1,
+                    volume_type_id='type-%d' % (i % 3)))
+                backups.append(dict(
+                    common, id='00000000-0000-0000-0002-%012d' % i,
+                    volume_id=volume_id, size=1,
+                    host=self.host(i % self.hosts)))
+                for j in range(self.metadata):
+                    metadata.append(dict(
+                        created_at=now, deleted=False, volume_id=volume_id,
+                        key='key%d' % j, value='value%d' % j))
+                if self.metadata:
+                    admin_metadata.append(dict(
+                        created_at=now, deleted=False, volume_id=volume_id,
+                        key='readonly', value='False'))
+            conn.execute(models.Volume.__table__.insert(), volumes)
+            conn.execute(models.Snapshot.__table__.insert(), snapshots)
+            conn.execute(models.Backup.__table__.insert(), backups)
+            if metadata:
+                conn.execute(models.VolumeMetadata.__table__.insert(),
+                             metadata)
+                conn.execute(models.VolumeAdminMetadata.__table__.insert(),
+                             admin_metadata)
+        conn.close()
+
+    def drop_indexes(self):
+        for model in self.TABLES:
+            for index in model.__table__.indexes:
+                index.drop(self.engine)
+
+    def create_indexes(self):
+        for model in self.TABLES:
+            for index in model.__table__.indexes:
+                index.create(self.engine)
+
+    def time_queries(self, label, queries, repeat=3):
+        """Time each (name, callable) query and return their results."""
+        results = {}
+        for name, query in queries:
+            best = None
+            for _i in range(repeat):
+                start = time.time()
+                results[name] = query()
+                elapsed = time.time() - start
+                best = elapsed if best is None else min(best, elapsed)
+            self.timings.setdefault(name, collections.OrderedDict())
+            self.timings[name][label] = best
+        return results
+
+    def report(self):
+        labels = []
+        for timings in self.timings.values():
+            labels.extend(label for label in timings if label not in labels)
+        lines = ['%-40s' % ('%d rows' % self.rows) +
+                 ''.join('%12s' % label for label in labels)]
+        for name, timings in self.timings.items():
+            lines.append('%-40s' % name +
+                         ''.join('%11.4fs' % timings[label]
+                                 if label in timings else '%12s' % '-'
+                                 for label in labels))
+        return '\n'.join(lines)
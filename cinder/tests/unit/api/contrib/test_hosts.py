@@ -16,6 +16,7 @@
 import datetime
 
 from iso8601 import iso8601
+import mock
 from oslo_utils import timeutils
 import webob.exc
 
@@ -149,6 +150,35 @@ class HostTestCase(test.TestCase):
                           self.req, dest)
         self.req.environ['cinder.context'].is_admin = True
 
+    @mock.patch('cinder.db.snapshot_data_get_by_project_for_host',
+                return_value={'p1': (1, 10)})
+    @mock.patch('cinder.db.volume_data_get_by_project_for_host',
+                return_value={'p2': (1, 5), 'p1': (2, 20)})
+    @mock.patch('cinder.objects.Service.get_by_host_and_topic')
+    def test_show(self, mock_get_service, mock_volume_data,
+                  mock_snapshot_data):
+        mock_get_service.return_value.host = 'test.host.1'
+
+        result = self.controller.show(self.req, 'test.host.1')
+
+        mock_volume_data.assert_called_once_with(mock.ANY, 'test.host.1')
+        mock_snapshot_data.assert_called_once_with(mock.ANY, 'test.host.1')
+        self.assertEqual(
+            {'host': [
+                {'resource': {'host': 'test.host.1', 'project': '(total)',
+                              'volume_count': '3', 'total_volume_gb': '25',
+                              'snapshot_count': '1',
+                              'total_snapshot_gb': '10'}},
+                {'resource': {'host': 'test.host.1', 'project': 'p1',
+                              'volume_count': '2', 'total_volume_gb': '20',
+                              'snapshot_count': '1',
+                              'total_snapshot_gb': '10'}},
+                {'resource': {'host': 'test.host.1', 'project': 'p2',
+                              'volume_count': '1', 'total_volume_gb': '5',
+                              'snapshot_count': '0',
+                              'total_snapshot_gb': '0'}}]},
+            result)
+
     def test_show_host_not_exist(self):
         """A host given as an argument does not exists."""
         self.req.environ['cinder.context'].is_admin = True
@@ -144,7 +144,7 @@ def stub_volume_api_get_all_by_project(self, context, marker, limit,
 
 def stub_volume_get_all(context, search_opts=None, marker=None, limit=None,
                         sort_keys=None, sort_dirs=None, filters=None,
-                        viewable_admin_meta=False, offset=None):
+                        viewable_admin_meta=False, offset=None, detail=True):
     return [stub_volume(fake.VOLUME_ID, project_id=fake.PROJECT_ID),
             stub_volume(fake.VOLUME2_ID, project_id=fake.PROJECT2_ID),
             stub_volume(fake.VOLUME3_ID, project_id=fake.PROJECT3_ID)]
@@ -153,7 +153,8 @@ def stub_volume_get_all(context, search_opts=None, marker=None, limit=None,
 def stub_volume_get_all_by_project(self, context, marker, limit,
                                    sort_keys=None, sort_dirs=None,
                                    filters=None,
-                                   viewable_admin_meta=False, offset=None):
+                                   viewable_admin_meta=False, offset=None,
+                                   detail=True):
     return [stub_volume_get(self, context, fake.VOLUME_ID,
                             viewable_admin_meta=True)]
 
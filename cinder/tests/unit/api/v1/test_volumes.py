@@ -665,7 +665,7 @@ class VolumeApiTest(test.TestCase):
                                                limit, sort_keys=None,
                                                sort_dirs=None, filters=None,
                                                viewable_admin_meta=False,
-                                               offset=None):
+                                               offset=None, detail=True):
                 return [
                     stubs.stub_volume(fake.VOLUME_ID, display_name='vol1'),
                     stubs.stub_volume(fake.VOLUME2_ID, display_name='vol2'),
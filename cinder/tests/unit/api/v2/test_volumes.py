@@ -923,7 +923,7 @@ class VolumeApiTest(test.TestCase):
                                            sort_keys=None, sort_dirs=None,
                                            filters=None,
                                            viewable_admin_meta=False,
-                                           offset=0):
+                                           offset=0, detail=True):
             return [
                 stubs.stub_volume(fake.VOLUME_ID, display_name='vol1'),
                 stubs.stub_volume(fake.VOLUME2_ID, display_name='vol2'),
@@ -1028,7 +1028,7 @@ class VolumeApiTest(test.TestCase):
                                            sort_keys=None, sort_dirs=None,
                                            filters=None,
                                            viewable_admin_meta=False,
-                                           offset=0):
+                                           offset=0, detail=True):
             return [
                 stubs.stub_volume(fake.VOLUME_ID, display_name='vol1'),
                 stubs.stub_volume(fake.VOLUME2_ID, display_name='vol2'),
@@ -1211,7 +1211,7 @@ class VolumeApiTest(test.TestCase):
                                            sort_keys=None, sort_dirs=None,
                                            filters=None,
                                            viewable_admin_meta=False,
-                                           offset=0):
+                                           offset=0, detail=True):
             self.assertTrue(filters['no_migration_targets'])
             self.assertNotIn('all_tenants', filters)
             return [stubs.stub_volume(fake.VOLUME_ID, display_name='vol1')]
@@ -1219,7 +1219,8 @@ class VolumeApiTest(test.TestCase):
         def stub_volume_get_all(context, marker, limit,
                                 sort_keys=None, sort_dirs=None,
                                 filters=None,
-                                viewable_admin_meta=False, offset=0):
+                                viewable_admin_meta=False, offset=0,
+                                detail=True):
             return []
         self.stubs.Set(db, 'volume_get_all_by_project',
                        stub_volume_get_all_by_project)
@@ -1505,7 +1506,7 @@ class VolumeApiTest(test.TestCase):
             context, None, CONF.osapi_max_limit,
             sort_keys=['created_at'], sort_dirs=['desc'],
             filters={'display_name': display_name},
-            viewable_admin_meta=True, offset=0)
+            viewable_admin_meta=True, offset=0, detail=True)
 
     @mock.patch('cinder.volume.api.API.get_all')
     def test_get_volumes_filter_with_string(self, get_all):
@@ -1534,6 +1535,22 @@ class VolumeApiTest(test.TestCase):
         # double quote
         self._test_get_volumes_by_name(get_all, '\'Volume-573108026"')
 
+    @mock.patch('cinder.utils.add_visible_admin_metadata')
+    @mock.patch('cinder.volume.api.API.get_all')
+    def test_get_volumes_summary(self, get_all, add_meta):
+        req = mock.MagicMock()
+        context = mock.Mock()
+        req.environ = {'cinder.context': context}
+        req.params = {}
+        get_all.return_value.__iter__.return_value = [mock.sentinel.volume]
+        self.controller._view_builder.summary_list = mock.Mock()
+        self.controller._get_volumes(req, False)
+        get_all.assert_called_once_with(
+            context, None, CONF.osapi_max_limit,
+            sort_keys=['created_at'], sort_dirs=['desc'], filters={},
+            viewable_admin_meta=True, offset=0, detail=False)
+        self.assertFalse(add_meta.called)
+
     @mock.patch('cinder.volume.api.API.get_all')
     def test_get_volumes_filter_with_true(self, get_all):
         req = mock.MagicMock()
@@ -1546,7 +1563,7 @@ class VolumeApiTest(test.TestCase):
             context, None, CONF.osapi_max_limit,
             sort_keys=['created_at'], sort_dirs=['desc'],
             filters={'display_name': 'Volume-573108026', 'bootable': True},
-            viewable_admin_meta=True, offset=0)
+            viewable_admin_meta=True, offset=0, detail=True)
 
     @mock.patch('cinder.volume.api.API.get_all')
     def test_get_volumes_filter_with_false(self, get_all):
@@ -1560,7 +1577,7 @@ class VolumeApiTest(test.TestCase):
             context, None, CONF.osapi_max_limit,
             sort_keys=['created_at'], sort_dirs=['desc'],
             filters={'display_name': 'Volume-573108026', 'bootable': False},
-            viewable_admin_meta=True, offset=0)
+            viewable_admin_meta=True, offset=0, detail=True)
 
     @mock.patch('cinder.volume.api.API.get_all')
     def test_get_volumes_filter_with_list(self, get_all):
@@ -1576,7 +1593,7 @@ class VolumeApiTest(test.TestCase):
             sort_keys=['created_at'], sort_dirs=['desc'],
             filters={'id': [fake.VOLUME_ID, fake.VOLUME2_ID, fake.VOLUME3_ID]},
             viewable_admin_meta=True,
-            offset=0)
+            offset=0, detail=True)
 
     @mock.patch('cinder.volume.api.API.get_all')
     def test_get_volumes_filter_with_expression(self, get_all):
@@ -1589,7 +1606,8 @@ class VolumeApiTest(test.TestCase):
         get_all.assert_called_once_with(
             context, None, CONF.osapi_max_limit,
             sort_keys=['created_at'], sort_dirs=['desc'],
-            filters={'display_name': 'd-'}, viewable_admin_meta=True, offset=0)
+            filters={'display_name': 'd-'}, viewable_admin_meta=True, offset=0,
+            detail=True)
 
     @mock.patch('cinder.volume.api.API.get_all')
     def test_get_volumes_filter_with_status(self, get_all):
@@ -1604,7 +1622,7 @@ class VolumeApiTest(test.TestCase):
             ctxt, None, CONF.osapi_max_limit,
             sort_keys=['created_at'], sort_dirs=['desc'],
             filters={'status': 'available'}, viewable_admin_meta=True,
-            offset=0)
+            offset=0, detail=True)
 
     @mock.patch('cinder.volume.api.API.get_all')
     def test_get_volumes_filter_with_metadata(self, get_all):
@@ -1619,7 +1637,7 @@ class VolumeApiTest(test.TestCase):
             ctxt, None, CONF.osapi_max_limit,
             sort_keys=['created_at'], sort_dirs=['desc'],
             filters={'metadata': {'fake_key': 'fake_value'}},
-            viewable_admin_meta=True, offset=0)
+            viewable_admin_meta=True, offset=0, detail=True)
 
     @mock.patch('cinder.volume.api.API.get_all')
     def test_get_volumes_filter_with_availability_zone(self, get_all):
@@ -1634,7 +1652,7 @@ class VolumeApiTest(test.TestCase):
             ctxt, None, CONF.osapi_max_limit,
             sort_keys=['created_at'], sort_dirs=['desc'],
             filters={'availability_zone': 'nova'}, viewable_admin_meta=True,
-            offset=0)
+            offset=0, detail=True)
 
     @mock.patch('cinder.volume.api.API.get_all')
     def test_get_volumes_filter_with_bootable(self, get_all):
@@ -1649,7 +1667,7 @@ class VolumeApiTest(test.TestCase):
             ctxt, None, CONF.osapi_max_limit,
             sort_keys=['created_at'], sort_dirs=['desc'],
             filters={'bootable': True}, viewable_admin_meta=True,
-            offset=0)
+            offset=0, detail=True)
 
     @mock.patch('cinder.volume.api.API.get_all')
     def test_get_volumes_filter_with_invalid_filter(self, get_all):
@@ -1665,7 +1683,7 @@ class VolumeApiTest(test.TestCase):
             ctxt, None, CONF.osapi_max_limit,
             sort_keys=['created_at'], sort_dirs=['desc'],
             filters={'availability_zone': 'nova'}, viewable_admin_meta=True,
-            offset=0)
+            offset=0, detail=True)
 
     @mock.patch('cinder.volume.api.API.get_all')
     def test_get_volumes_sort_by_name(self, get_all):
@@ -1681,7 +1699,7 @@ class VolumeApiTest(test.TestCase):
         get_all.assert_called_once_with(
             ctxt, None, CONF.osapi_max_limit,
             sort_dirs=['desc'], viewable_admin_meta=True,
-            sort_keys=['display_name'], filters={}, offset=0)
+            sort_keys=['display_name'], filters={}, offset=0, detail=True)
 
     def test_get_volume_filter_options_using_config(self):
         filter_list = ['name', 'status', 'metadata', 'bootable',
@@ -23,7 +23,7 @@ class FakeBrickLVM(object):
         return False
 
     def get_volumes(self):
-        return ['fake-volume']
+        return [{'vg': self.vg_name, 'name': 'fake-volume', 'size': '1.00'}]
 
     def get_volume(self, name):
         return ['name']
@@ -52,6 +52,9 @@ class FakeBrickLVM(object):
     def lv_has_snapshot(self, name):
         return False
 
+    def get_snapshot_allocated_size(self, name):
+        return None
+
     def activate_lv(self, lv, is_snapshot=False, permanent=False):
         pass
 
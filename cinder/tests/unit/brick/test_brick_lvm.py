@@ -138,6 +138,12 @@ class BrickLvmTestCase(test.TestCase):
                 data = "  9.5:20\n"
             else:
                 data = "  9:12\n"
+        elif 'env, LC_ALL=C, lvs, --noheadings, --unit=m' \
+             ', -o, size,data_percent, --separator, :' in cmd_string:
+            if 'fake-invalid-snapshot' in cmd_string:
+                data = "  10240.00:\n"
+            else:
+                data = "  10240.00:2.00\n"
         elif 'lvcreate, -T, -L, ' in cmd_string:
             pass
         elif 'lvcreate, -T, -V, ' in cmd_string:
@@ -309,6 +315,16 @@ class BrickLvmTestCase(test.TestCase):
                          self.vg._get_thin_pool_free_space("fake-vg",
                                                            "fake-vg-pool"))
 
+    def test_get_snapshot_allocated_size(self):
+        # data_percent is rounded up by 0.01% to cover the last chunks
+        self.assertAlmostEqual(
+            10240 * 0.0201,
+            self.vg.get_snapshot_allocated_size('fake-snapshot'))
+
+    def test_get_snapshot_allocated_size_invalid_snapshot(self):
+        self.assertIsNone(
+            self.vg.get_snapshot_allocated_size('fake-invalid-snapshot'))
+
     def test_volume_create_after_thin_creation(self):
         """Test self.vg.vg_thin_pool is set to pool_name
 
@@ -389,3 +405,160 @@ class BrickLvmTestCase(test.TestCase):
             self.vg.create_volume('test', '1G')
             self.assertRaises(exception.VolumeNotDeactivated,
                               self.vg.deactivate_lv, 'test')
+
+
+class BrickLvmCacheTestCase(test.TestCase):
+    def setUp(self):
+        super(BrickLvmCacheTestCase, self).setUp()
+        # name: (size, attr, origin)
+        self.lvs = {'fake-1': ('1.00', '-wi-a-----', ''),
+                    'fake-2': ('2.00', '-wi-ao----', '')}
+        self.commands = []
+
+        self.mock_object(processutils, 'execute', self.fake_execute)
+        self.vg = brick.LVM('fake-vg', 'sudo', executor=self.fake_execute,
+                            cache_ttl=60)
+        self.commands = []
+
+    def _lvs_output(self, names):
+        return ''.join('  fake-vg:%s:%s:%s:%s:\n' % ((name,) + self.lvs[name])
+                       for name in names if name in self.lvs)
+
+    def fake_execute(self, *cmd, **kwargs):
+        self.commands.append(cmd[2] if cmd[0] == 'env' else cmd[0])
+        if 'pvs' in cmd:
+            return "  fake-vg|/dev/sda|10.00|5.00\n", ""
+        if cmd[2:] == ('vgs', '--noheadings', '-o', 'name', 'fake-vg'):
+            return "  fake-vg\n", ""
+        if 'vgs' in cmd:
+            used = sum(float(lv[0]) for lv in self.lvs.values())
+            return ("  fake-vg:10.00:%.2f:%d:kVxztV-dKpG-Rz7E\n" %
+                    (10 - used, len(self.lvs)), "")
+        if 'lvs' in cmd:
+            if cmd[-1] == 'fake-vg':
+                return self._lvs_output(sorted(self.lvs)), ""
+            names = [arg.split('/')[1] for arg in cmd if
+                     arg.startswith('fake-vg/')]
+            if not any(name in self.lvs for name in names):
+                raise processutils.ProcessExecutionError(
+                    stderr='Failed to find logical volume')
+            return self._lvs_output(names), ""
+        if 'lvdisplay' in cmd:
+            return '  %s\n' % self.lvs[cmd[-1].split('/')[1]][1], ""
+        if 'lvcreate' in cmd:
+            if '--snapshot' in cmd:
+                origin = cmd[-3].split('/')[1]
+                size, _attr, _origin = self.lvs[origin]
+                self.lvs[cmd[4]] = (size, 'swi-a-s---', origin)
+                self.lvs[origin] = (size, 'owi-a-----', '')
+            else:
+                self.lvs[cmd[4]] = (cmd[-1][:-1] + '.00', '-wi-a-----', '')
+        elif 'lvremove' in cmd:
+            name = cmd[-1].split('/')[1]
+            origin = self.lvs.pop(name)[2]
+            if origin:
+                self.lvs[origin] = (self.lvs[origin][0], '-wi-a-----', '')
+        elif 'lvextend' in cmd:
+            name = cmd[-1].split('/')[1]
+            self.lvs[name] = (cmd[-2][:-1] + '.00',) + self.lvs[name][1:]
+        elif 'lvrename' in cmd:
+            self.lvs[cmd[3]] = self.lvs.pop(cmd[2])
+        else:
+            raise AssertionError('unexpected command called: %s' %
+                                 ', '.join(cmd))
+        return "", ""
+
+    def test_reads_use_cache(self):
+        self.assertEqual([{'vg': 'fake-vg', 'name': 'fake-1', 'size': '1.00'},
+                          {'vg': 'fake-vg', 'name': 'fake-2', 'size': '2.00'}],
+                         self.vg.get_volumes())
+        self.assertEqual(['lvs', 'vgs'], self.commands)
+
+        self.assertEqual('fake-2', self.vg.get_volume('fake-2')['name'])
+        self.assertFalse(self.vg.lv_has_snapshot('fake-1'))
+        self.assertFalse(self.vg.lv_is_snapshot('fake-1'))
+        self.assertIsNone(self.vg.lv_get_origin('fake-1'))
+        self.vg.update_volume_group_info()
+
+        self.assertEqual(['lvs', 'vgs'], self.commands)
+        self.assertEqual(7.0, self.vg.vg_free_space)
+        self.assertEqual(2, self.vg.vg_lv_count)
+
+    def test_lv_is_open_not_cached(self):
+        self.vg.get_volumes()
+        self.lvs['fake-1'] = ('1.00', '-wi-ao----', '')
+
+        # The LV opened since the cache was loaded is seen
+        self.assertTrue(self.vg.lv_is_open('fake-1'))
+        self.assertEqual(['lvs', 'vgs', 'lvdisplay'], self.commands)
+
+    def test_write_through(self):
+        self.vg.get_volumes()
+
+        self.vg.create_volume('fake-3', '3g')
+        self.vg.create_lv_snapshot('fake-snap', 'fake-1')
+        self.vg.extend_volume('fake-2', '4g')
+        self.vg.rename_volume('fake-3', 'fake-4')
+        self.commands = []
+
+        self.assertEqual('4.00', self.vg.get_volume('fake-2')['size'])
+        self.assertIsNone(self.vg.get_volume('fake-3'))
+        self.assertEqual('3.00', self.vg.get_volume('fake-4')['size'])
+        self.assertTrue(self.vg.lv_has_snapshot('fake-1'))
+        self.assertTrue(self.vg.lv_is_snapshot('fake-snap'))
+        self.assertEqual('fake-1', self.vg.lv_get_origin('fake-snap'))
+        self.vg.update_volume_group_info()
+        self.assertEqual(1.0, self.vg.vg_free_space)
+        self.assertEqual(4, self.vg.vg_lv_count)
+
+        self.vg.delete('fake-snap')
+        self.commands = []
+        self.assertFalse(self.vg.lv_has_snapshot('fake-1'))
+        self.assertIsNone(self.vg.get_volume('fake-snap'))
+        self.assertEqual(['fake-1', 'fake-2', 'fake-4'],
+                         [lv['name'] for lv in self.vg.get_volumes()])
+
+        # Only the lookup of the missing fake-snap ran a command
+        self.assertEqual(['lvs'], self.commands)
+
+    def test_cache_reloaded_when_expired(self):
+        with mock.patch('time.time', return_value=1000):
+            self.vg.get_volumes()
+            # Created outside of this object
+            self.lvs['fake-3'] = ('1.00', '-wi-a-----', '')
+            self.assertEqual(2, len(self.vg.get_volumes()))
+
+        with mock.patch('time.time', return_value=1060):
+            self.assertEqual(3, len(self.vg.get_volumes()))
+
+        self.assertEqual(['lvs', 'vgs', 'lvs', 'vgs'], self.commands)
+
+    def test_cache_miss_looks_up_lv(self):
+        self.vg.get_volumes()
+        self.lvs['fake-3'] = ('1.00', '-wi-a-----', '')
+
+        self.assertEqual('fake-3', self.vg.get_volume('fake-3')['name'])
+        self.assertEqual('fake-3', self.vg.get_volume('fake-3')['name'])
+
+        self.assertEqual(['lvs', 'vgs', 'lvs'], self.commands)
+
+    def test_scan_not_stored_over_change(self):
+        real_get_lvs = self.vg._get_lvs
+
+        def get_lvs(*lv_names):
+            lvs = real_get_lvs(*lv_names)
+            if not lv_names:
+                # A change completes while the scan runs
+                self.vg._update_cache(changed=['fake-1'])
+            return lvs
+
+        with mock.patch.object(self.vg, '_get_lvs', side_effect=get_lvs):
+            self.assertEqual(2, len(self.vg.get_volumes()))
+        self.assertIsNone(self.vg._lv_cache)
+
+    def test_invalidate_cache(self):
+        self.vg.get_volumes()
+        self.vg.invalidate_cache()
+        self.vg.get_volumes()
+
+        self.assertEqual(['lvs', 'vgs', 'lvs', 'vgs'], self.commands)
@@ -27,6 +27,9 @@ CONF.import_opt('backup_driver', 'cinder.backup.manager')
 CONF.import_opt('api_class', 'cinder.keymgr', group='key_manager')
 CONF.import_opt('fixed_key', 'cinder.keymgr.conf_key_mgr', group='key_manager')
 CONF.import_opt('scheduler_driver', 'cinder.scheduler.manager')
+CONF.import_opt('quota_resources_check_interval', 'cinder.quota')
+CONF.import_opt('volume_types_cache_ttl', 'cinder.volume.volume_types')
+CONF.import_opt('project_hierarchy_cache_ttl', 'cinder.quota_utils')
 
 def_vol_type = 'fake_vol_type'
 
@@ -48,6 +51,11 @@ def set_defaults(conf):
     conf.set_default('fixed_key', default='0' * 64, group='key_manager')
     conf.set_default('scheduler_driver',
                      'cinder.scheduler.filter_scheduler.FilterScheduler')
+    # Tests create volume types directly in the database.
+    conf.set_default('quota_resources_check_interval', 0)
+    conf.set_default('volume_types_cache_ttl', 0)
+    # Tests mock the Keystone projects.
+    conf.set_default('project_hierarchy_cache_ttl', 0)
     conf.set_default('state_path', os.path.abspath(
         os.path.join(os.path.dirname(__file__), '..', '..', '..')))
     conf.set_default('policy_dirs', [], group='oslo_policy')
@@ -0,0 +1,79 @@
+# Copyright (c) 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Benchmark of the volume, snapshot and backup queries and their indexes.
+
+The benchmark seeds and queries the database several times, it is only run
+when the CINDER_DB_BENCHMARK environment variable is set.  The default number
+of rows only checks that the queries return the same results with and
+without the indexes.  Set CINDER_DB_BENCHMARK_ROWS to seed a realistically
+sized database; the timings are attached to the test result as the
+'benchmark' detail.
+"""
+
+import os
+
+from testtools import content
+
+from cinder import context
+from cinder import db
+from cinder import test
+from cinder.tests import fixtures as cinder_fixtures
+
+
+class DatabaseIndexesBenchmarkTestCase(test.TestCase):
+
+    def setUp(self):
+        super(DatabaseIndexesBenchmarkTestCase, self).setUp()
+        if not os.environ.get('CINDER_DB_BENCHMARK'):
+            self.skipTest('Set CINDER_DB_BENCHMARK to run the benchmark')
+        self.context = context.get_admin_context()
+        rows = int(os.environ.get('CINDER_DB_BENCHMARK_ROWS', 200))
+        self.bench = self.useFixture(
+            cinder_fixtures.DatabaseBenchmark(rows, projects=10, hosts=4))
+
+    def _queries(self):
+        host = self.bench.host(1)
+        project_id = self.bench.project_id(1)
+        return [
+            ('volume_get_all_by_host',
+             lambda: len(db.volume_get_all_by_host(self.context, host))),
+            ('volume_data_get_for_host',
+             lambda: db.volume_data_get_for_host(self.context, host)),
+            ('volume_data_get_for_project',
+             lambda: db.volume_data_get_for_project(self.context,
+                                                    project_id)),
+            ('snapshot_get_by_host',
+             lambda: len(db.snapshot_get_by_host(self.context, host))),
+            ('volume_get_all_by_project',
+             lambda: [v.id for v in db.volume_get_all_by_project(
+                 self.context, project_id, None, 100)]),
+            ('volume_get_all',
+             lambda: [v.id for v in db.volume_get_all(
+                 self.context, None, 100, filters={'status': 'available'})]),
+            ('backup_get_all_by_host',
+             lambda: len(db.backup_get_all_by_host(self.context, host))),
+        ]
+
+    def test_indexes(self):
+        self.bench.drop_indexes()
+        before = self.bench.time_queries('no indexes', self._queries())
+        self.bench.create_indexes()
+        after = self.bench.time_queries('indexes', self._queries())
+
+        self.addDetail('benchmark', content.text_content(self.bench.report()))
+        self.assertEqual(before, after)
+        self.assertTrue(after['volume_get_all_by_host'])
+        self.assertTrue(after['volume_get_all_by_project'])
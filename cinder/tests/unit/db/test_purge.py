@@ -18,6 +18,7 @@
 import datetime
 import uuid
 
+import mock
 from oslo_db import exception as db_exc
 from oslo_utils import timeutils
 from sqlalchemy.dialects import sqlite
@@ -275,6 +276,55 @@ class PurgeDeletedTest(test.TestCase):
         self.assertEqual(4, vol_glance_meta_rows)
         self.assertEqual(4, qos_rows)
 
+    @mock.patch('time.sleep')
+    def test_purge_deleted_rows_in_batches(self, mock_sleep):
+        dialect = self.engine.url.get_dialect()
+        if dialect == sqlite.dialect:
+            self.conn.execute("PRAGMA foreign_keys = ON")
+        # Purge at 10 days old in batches of one row
+        rows = db.purge_deleted_rows(self.context, age_in_days=10,
+                                     batch_size=1, sleep_interval=0.1)
+
+        self.assertEqual(2, self.session.query(self.volumes).count())
+        self.assertEqual(2, self.session.query(self.vm).count())
+        self.assertEqual(2, self.session.query(self.snapshots).count())
+        self.assertEqual(4, self.session.query(self.vgm).count())
+        self.assertEqual(4, self.session.query(self.qos).count())
+        self.assertEqual(4, self.session.query(self.vol_types).count())
+        # 4 volumes, volume metadata, snapshots, snapshot metadata and
+        # volume type projects, 8 volume types, glance metadata and QoS
+        self.assertEqual(44, rows)
+        mock_sleep.assert_called_with(0.1)
+
+    @mock.patch('time.sleep', side_effect=KeyboardInterrupt)
+    def test_purge_deleted_rows_resume(self, mock_sleep):
+        # Interrupt the purge after the first batch
+        self.assertRaises(KeyboardInterrupt, db.purge_deleted_rows,
+                          self.context, age_in_days=10, batch_size=1,
+                          sleep_interval=1)
+
+        # Running it again purges the remaining rows
+        db.purge_deleted_rows(self.context, age_in_days=10)
+        self.assertEqual(2, self.session.query(self.volumes).count())
+        self.assertEqual(2, self.session.query(self.vm).count())
+        self.assertEqual(4, self.session.query(self.vgm).count())
+
+    def test_purge_deleted_rows_admin_context(self):
+        # The admin check applies to the context, not to the sessions
+        # used to purge each table
+        rows = db.purge_deleted_rows(context.get_admin_context(),
+                                     age_in_days=30)
+
+        self.assertEqual(22, rows)
+        self.assertEqual(4, self.session.query(self.volumes).count())
+
+    def test_purge_deleted_rows_not_admin(self):
+        ctxt = context.RequestContext('fake-user', 'fake-project')
+
+        self.assertRaises(exception.AdminRequired, db.purge_deleted_rows,
+                          ctxt, age_in_days=30)
+        self.assertEqual(6, self.session.query(self.volumes).count())
+
     def test_purge_deleted_rows_bad_args(self):
         # Test with no age argument
         self.assertRaises(TypeError, db.purge_deleted_rows, self.context)
@@ -282,6 +332,10 @@ class PurgeDeletedTest(test.TestCase):
         self.assertRaises(exception.InvalidParameterValue,
                           db.purge_deleted_rows, self.context,
                           age_in_days='ten')
+        # Test purge with an invalid batch size
+        self.assertRaises(exception.InvalidParameterValue,
+                          db.purge_deleted_rows, self.context,
+                          age_in_days=10, batch_size=0)
 
     def test_purge_deleted_rows_integrity_failure(self):
         dialect = self.engine.url.get_dialect()
@@ -0,0 +1,112 @@
+# Copyright (c) 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Benchmark of quota reservations in a single project.
+
+The benchmark is only run when the CINDER_DB_BENCHMARK environment variable
+is set.  The project is seeded with volumes, snapshots and backups so that
+the usage refresh has something to count, then
+CINDER_DB_BENCHMARK_RESERVATIONS reservations (20 by default) are made and
+committed one after the other, within and over the quota.  The unit tests
+use an in-memory SQLite database, which serializes the transactions, so the
+benchmark measures the cost of each reservation rather than the contention
+between them.  The timings are attached to the test result as the
+'benchmark' detail.
+"""
+
+import datetime
+import os
+
+from oslo_utils import timeutils
+from testtools import content
+
+from cinder import context
+from cinder import db
+from cinder import exception
+from cinder import quota
+from cinder import test
+from cinder.tests import fixtures as cinder_fixtures
+
+
+class QuotaReserveBenchmarkTestCase(test.TestCase):
+
+    def setUp(self):
+        super(QuotaReserveBenchmarkTestCase, self).setUp()
+        if not os.environ.get('CINDER_DB_BENCHMARK'):
+            self.skipTest('Set CINDER_DB_BENCHMARK to run the benchmark')
+        self.context = context.get_admin_context()
+        rows = int(os.environ.get('CINDER_DB_BENCHMARK_ROWS', 200))
+        self.reservations = int(
+            os.environ.get('CINDER_DB_BENCHMARK_RESERVATIONS', 20))
+        self.bench = self.useFixture(
+            cinder_fixtures.DatabaseBenchmark(rows, projects=1, hosts=4))
+        self.project_id = self.bench.project_id(0)
+        self.resources = {
+            'volumes': quota.ReservableResource('volumes', '_sync_volumes'),
+            'gigabytes': quota.ReservableResource('gigabytes',
+                                                  '_sync_gigabytes')}
+        self.expire = timeutils.utcnow() + datetime.timedelta(days=1)
+
+    def _reserve_and_commit(self, quotas):
+        try:
+            reservations = db.quota_reserve(
+                self.context, self.resources, quotas,
+                {'volumes': 1, 'gigabytes': 10}, self.expire, 0, 0,
+                project_id=self.project_id)
+        except exception.OverQuota:
+            return False
+        db.reservation_commit(self.context, reservations,
+                              project_id=self.project_id)
+        return True
+
+    def _reserve_all(self, quotas):
+        return [self._reserve_and_commit(quotas)
+                for _i in range(self.reservations)]
+
+    def _usage(self):
+        usage = db.quota_usage_get_all_by_project(self.context,
+                                                  self.project_id)
+        return usage['volumes'], usage['gigabytes']
+
+    def test_reservations(self):
+        # The first reservation creates and refreshes the usages
+        self.assertTrue(self._reserve_and_commit({'volumes': -1,
+                                                  'gigabytes': -1}))
+        volumes, gigabytes = self._usage()
+        self.assertGreater(volumes['in_use'], 1)
+
+        half = self.reservations // 2
+        results = self.bench.time_queries('reservations', [
+            ('reserve and commit within quota',
+             lambda: self._reserve_all({'volumes': -1, 'gigabytes': -1})),
+        ], repeat=1)
+        in_use = volumes['in_use'] + self.reservations
+        results.update(self.bench.time_queries('reservations', [
+            ('reserve and commit over quota',
+             lambda: self._reserve_all({'volumes': in_use + half,
+                                        'gigabytes': -1})),
+        ], repeat=1))
+
+        self.addDetail('benchmark', content.text_content(self.bench.report()))
+        self.assertEqual([True] * self.reservations,
+                         results['reserve and commit within quota'])
+        self.assertEqual(
+            [True] * half + [False] * (self.reservations - half),
+            results['reserve and commit over quota'])
+        self.assertEqual(({'in_use': in_use + half, 'reserved': 0},
+                          {'in_use': gigabytes['in_use'] +
+                           10 * (self.reservations + half),
+                           'reserved': 0}),
+                         self._usage())
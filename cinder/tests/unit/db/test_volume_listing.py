@@ -0,0 +1,84 @@
+# Copyright (c) 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Benchmark of the loading strategies used to list volumes.
+
+The benchmark is only run when the CINDER_DB_BENCHMARK environment variable
+is set.  1000 volumes with metadata are listed with every collection joined
+to the volumes, as volume_get_all used to do, and with the detail and summary
+queries.  Set CINDER_DB_BENCHMARK_ROWS to change the number of volumes; the
+timings are attached to the test result as the 'benchmark' detail.
+"""
+
+import os
+
+from testtools import content
+
+from cinder import context
+from cinder import db
+from cinder.db.sqlalchemy import api as sqlalchemy_api
+from cinder import test
+from cinder.tests import fixtures as cinder_fixtures
+
+
+class VolumeListingBenchmarkTestCase(test.TestCase):
+
+    def setUp(self):
+        super(VolumeListingBenchmarkTestCase, self).setUp()
+        if not os.environ.get('CINDER_DB_BENCHMARK'):
+            self.skipTest('Set CINDER_DB_BENCHMARK to run the benchmark')
+        self.context = context.get_admin_context()
+        self.rows = int(os.environ.get('CINDER_DB_BENCHMARK_ROWS', 1000))
+        self.bench = self.useFixture(
+            cinder_fixtures.DatabaseBenchmark(self.rows, projects=1, hosts=4,
+                                              metadata=5))
+
+    @staticmethod
+    def _summary(volumes):
+        return sorted(volume.id for volume in volumes)
+
+    @staticmethod
+    def _detail(volumes):
+        return sorted((volume.id,
+                       sorted((m.key, m.value)
+                              for m in volume.volume_metadata),
+                       sorted((m.key, m.value)
+                              for m in volume.volume_admin_metadata))
+                      for volume in volumes)
+
+    def _joined(self):
+        session = sqlalchemy_api.get_session()
+        with session.begin():
+            query = sqlalchemy_api._volume_get_query(self.context,
+                                                     session=session)
+            return self._detail(query.limit(self.rows).all())
+
+    def test_volume_listing(self):
+        results = self.bench.time_queries('list', [
+            ('joinedload detail', self._joined),
+            ('volume_get_all detail',
+             lambda: self._detail(db.volume_get_all(
+                 self.context, None, self.rows))),
+            ('volume_get_all summary',
+             lambda: self._summary(db.volume_get_all(
+                 self.context, None, self.rows, detail=False))),
+        ])
+
+        self.addDetail('benchmark', content.text_content(self.bench.report()))
+        self.assertEqual(results['joinedload detail'],
+                         results['volume_get_all detail'])
+        self.assertEqual([v[0] for v in results['joinedload detail']],
+                         results['volume_get_all summary'])
+        self.assertEqual(5, len(results['volume_get_all detail'][0][1]))
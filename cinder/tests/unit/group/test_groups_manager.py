@@ -13,6 +13,8 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import eventlet
+from eventlet import greenpool
 import mock
 
 from oslo_config import cfg
@@ -583,6 +585,81 @@ class GroupManagerTestCase(test.TestCase):
         self.assertTrue(mock_del_grpsnap.called)
         self.assertTrue(mock_del_grp.called)
 
+    def _limit_group_pool(self, workers):
+        """Returns the list of the number of driver calls running."""
+        self.volume._group_pool = greenpool.GreenPool(workers)
+        running = [0]
+        concurrency = []
+
+        def driver_call(*args):
+            running[0] += 1
+            concurrency.append(running[0])
+            eventlet.sleep(0)
+            running[0] -= 1
+            if args[-1].id in ('2', '3'):
+                raise (exception.SnapshotIsBusy(snapshot_name='snap')
+                       if args[-1].id == '3' else
+                       exception.VolumeBackendAPIException(data='error'))
+
+        return driver_call, concurrency
+
+    def test_create_group_snapshot_generic(self):
+        driver_call, concurrency = self._limit_group_pool(2)
+        snapshots = [mock.Mock(id=str(i)) for i in range(5)]
+
+        with mock.patch.object(self.volume.driver, 'create_snapshot',
+                               side_effect=driver_call):
+            model_update, snapshot_model_updates = (
+                self.volume._create_group_snapshot_generic(
+                    self.context, mock.Mock(), snapshots))
+
+        self.assertEqual({'status': 'error'}, model_update)
+        self.assertEqual([{'id': '0', 'status': 'available'},
+                          {'id': '1', 'status': 'available'},
+                          {'id': '2', 'status': 'error'},
+                          {'id': '3', 'status': 'error'},
+                          {'id': '4', 'status': 'available'}],
+                         snapshot_model_updates)
+        self.assertEqual(2, max(concurrency))
+
+    def test_delete_group_snapshot_generic(self):
+        driver_call, concurrency = self._limit_group_pool(3)
+        snapshots = [mock.Mock(id=str(i)) for i in range(5)]
+
+        with mock.patch.object(self.volume.driver, 'delete_snapshot',
+                               side_effect=driver_call):
+            model_update, snapshot_model_updates = (
+                self.volume._delete_group_snapshot_generic(
+                    self.context, mock.Mock(status='deleting'), snapshots))
+
+        self.assertEqual({'status': 'error'}, model_update)
+        self.assertEqual([{'id': '0', 'status': 'deleted'},
+                          {'id': '1', 'status': 'deleted'},
+                          {'id': '2', 'status': 'error'},
+                          {'id': '3', 'status': 'available'},
+                          {'id': '4', 'status': 'deleted'}],
+                         snapshot_model_updates)
+        self.assertEqual(3, max(concurrency))
+
+    def test_create_group_from_src_generic_error(self):
+        driver_call, concurrency = self._limit_group_pool(2)
+        snapshots = [mock.Mock(id=str(i)) for i in range(5)]
+        volumes = [mock.Mock(snapshot_id=str(i)) for i in range(5)]
+
+        with mock.patch.object(self.volume.driver,
+                               'create_volume_from_snapshot',
+                               side_effect=driver_call) as mock_create:
+            self.assertRaises(exception.VolumeBackendAPIException,
+                              self.volume._create_group_from_src_generic,
+                              self.context, mock.Mock(), volumes,
+                              snapshots=snapshots)
+
+        # The volumes after the one that failed are created too
+        self.assertEqual([mock.call(vol, snap)
+                          for vol, snap in zip(volumes, snapshots)],
+                         mock_create.call_args_list)
+        self.assertEqual(2, max(concurrency))
+
     @mock.patch('cinder.volume.driver.VolumeDriver.create_group',
                 return_value={'status': 'available'})
     @mock.patch('cinder.volume.driver.VolumeDriver.delete_group',
@@ -221,6 +221,18 @@ class TestBackupList(test_objects.BaseObjectsTestCase):
         self.assertEqual(1, len(backups))
         TestBackup._compare(self, fake_backup, backups[0])
 
+    @mock.patch('cinder.db.backup_get_all_active_by_window',
+                return_value=[fake_backup])
+    def test_get_all_active_by_window(self, get_all_active_by_window):
+        backups = objects.BackupList.get_all_active_by_window(
+            self.context, mock.sentinel.begin, mock.sentinel.end,
+            marker=mock.sentinel.marker, limit=10)
+        self.assertEqual(1, len(backups))
+        TestBackup._compare(self, fake_backup, backups[0])
+        get_all_active_by_window.assert_called_once_with(
+            self.context, mock.sentinel.begin, mock.sentinel.end,
+            marker=mock.sentinel.marker, limit=10, project_id_range=None)
+
     @mock.patch('cinder.db.backup_get_all', return_value=[fake_backup])
     def test_get_all_tenants(self, backup_get_all):
         search_opts = {'all_tenants': 1}
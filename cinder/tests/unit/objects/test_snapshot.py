@@ -278,6 +278,9 @@ class TestSnapshotList(test_objects.BaseObjectsTestCase):
             self.context, mock.sentinel.begin, mock.sentinel.end)
         self.assertEqual(1, len(snapshots))
         TestSnapshot._compare(self, fake_snapshot_obj, snapshots[0])
+        get_active_by_window.assert_called_once_with(
+            self.context, mock.sentinel.begin, mock.sentinel.end,
+            marker=None, limit=None, project_id_range=None)
 
     @mock.patch('cinder.objects.volume.Volume.get_by_id')
     @mock.patch('cinder.db.snapshot_get_all_for_cgsnapshot',
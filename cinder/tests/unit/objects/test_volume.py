@@ -426,6 +426,20 @@ class TestVolumeList(test_objects.BaseObjectsTestCase):
         self.assertEqual(1, len(volumes))
         TestVolume._compare(self, db_volume, volumes[0])
 
+    @mock.patch('cinder.db.volume_get_all')
+    def test_get_all_summary(self, volume_get_all):
+        db_volume = fake_volume.fake_db_volume()
+        volume_get_all.return_value = [db_volume]
+
+        volumes = objects.VolumeList.get_all(self.context, None, None,
+                                             detail=False)
+        self.assertEqual(1, len(volumes))
+        self.assertFalse(volumes[0].obj_attr_is_set('metadata'))
+        self.assertFalse(volumes[0].obj_attr_is_set('volume_type'))
+        volume_get_all.assert_called_once_with(
+            self.context, None, None, sort_keys=None, sort_dirs=None,
+            filters=None, offset=None, detail=False)
+
     @mock.patch('cinder.db.volume_get_all_by_host')
     def test_get_by_host(self, get_all_by_host):
         db_volume = fake_volume.fake_db_volume()
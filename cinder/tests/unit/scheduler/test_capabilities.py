@@ -0,0 +1,268 @@
+# Copyright (c) 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests For the delta encoding of capability reports
+"""
+
+import copy
+import os
+import time
+
+import mock
+from oslo_serialization import jsonutils
+from testtools import content
+
+from cinder import context
+from cinder import manager
+from cinder.scheduler import capabilities
+from cinder.scheduler import host_manager
+from cinder import test
+
+
+def _fake_capabilities(pools=2):
+    return {'volume_backend_name': 'backend',
+            'vendor_name': 'Open Source',
+            'driver_version': '3.0.0',
+            'storage_protocol': 'iSCSI',
+            'pools': [{'pool_name': 'pool%d' % i,
+                       'total_capacity_gb': 1024,
+                       'free_capacity_gb': 512,
+                       'provisioned_capacity_gb': 512,
+                       'allocated_capacity_gb': 512,
+                       'reserved_percentage': 0,
+                       'max_over_subscription_ratio': 20.0,
+                       'thin_provisioning_support': True,
+                       'thick_provisioning_support': False,
+                       'total_volumes': 10,
+                       'QoS_support': False,
+                       'multiattach': True} for i in range(pools)]}
+
+
+class CapabilitiesDeltaTestCase(test.TestCase):
+    """Test case for get_delta and apply_delta."""
+
+    def _assert_round_trip(self, old, new):
+        delta = capabilities.get_delta(old, new)
+        self.assertEqual(new, capabilities.apply_delta(old, delta))
+        return delta
+
+    def test_no_change(self):
+        caps = _fake_capabilities()
+        delta = self._assert_round_trip(caps, copy.deepcopy(caps))
+        self.assertEqual({'changed': {}, 'removed': [], 'pools': [],
+                          'removed_pools': []}, delta)
+
+    def test_changes(self):
+        old = _fake_capabilities()
+        new = copy.deepcopy(old)
+        new['driver_version'] = '3.0.1'
+        del new['vendor_name']
+        new['replication_enabled'] = False
+        new['pools'][1]['free_capacity_gb'] = 256
+        del new['pools'][1]['multiattach']
+
+        delta = self._assert_round_trip(old, new)
+
+        self.assertEqual({'driver_version': '3.0.1',
+                          'replication_enabled': False}, delta['changed'])
+        self.assertEqual(['vendor_name'], delta['removed'])
+        self.assertEqual([{'pool_name': 'pool1',
+                           'changed': {'free_capacity_gb': 256},
+                           'removed': ['multiattach']}], delta['pools'])
+        self.assertEqual([], delta['removed_pools'])
+
+    def test_pools_added_and_removed(self):
+        old = _fake_capabilities(pools=3)
+        new = copy.deepcopy(old)
+        del new['pools'][1]
+        new['pools'].append({'pool_name': 'pool3', 'free_capacity_gb': 1})
+
+        delta = self._assert_round_trip(old, new)
+
+        self.assertEqual([{'pool_name': 'pool3',
+                           'changed': {'pool_name': 'pool3',
+                                       'free_capacity_gb': 1},
+                           'removed': []}], delta['pools'])
+        self.assertEqual(['pool1'], delta['removed_pools'])
+
+    def test_apply_delta_shares_unchanged_pools(self):
+        old = _fake_capabilities()
+        new = copy.deepcopy(old)
+        new['pools'][0]['free_capacity_gb'] = 1
+
+        result = capabilities.apply_delta(
+            old, capabilities.get_delta(old, new))
+
+        self.assertEqual(512, old['pools'][0]['free_capacity_gb'])
+        self.assertIsNot(old['pools'][0], result['pools'][0])
+        self.assertIs(old['pools'][1], result['pools'][1])
+
+    def test_no_pools(self):
+        old = {'free_capacity_gb': 10, 'total_capacity_gb': 20}
+        delta = self._assert_round_trip(old, {'free_capacity_gb': 5,
+                                              'total_capacity_gb': 20})
+        self.assertEqual({'changed': {'free_capacity_gb': 5},
+                          'removed': []}, delta)
+
+    def test_pools_not_comparable(self):
+        old = _fake_capabilities()
+        self.assertIsNone(capabilities.get_delta(
+            old, {'pools': 'not a list of pools'}))
+        self.assertIsNone(capabilities.get_delta(
+            {'free_capacity_gb': 10}, old))
+
+
+class FakeSchedulerAPI(object):
+    """Delivers the capability reports to a HostManager."""
+
+    def __init__(self, host_manager, can_send_delta=True):
+        self.host_manager = host_manager
+        self.can_send_delta = can_send_delta
+        self.reports = []
+
+    def can_send_capabilities_delta(self):
+        return self.can_send_delta
+
+    def update_service_capabilities(self, ctxt, service_name, host,
+                                    capabilities, capabilities_version=None,
+                                    base_version=None):
+        # The capabilities go through the RPC serialization
+        capabilities = jsonutils.loads(jsonutils.dumps(capabilities))
+        self.reports.append((capabilities_version, base_version))
+        self.host_manager.update_service_capabilities(
+            service_name, host, capabilities,
+            capabilities_version=capabilities_version,
+            base_version=base_version)
+
+
+class CapabilitiesReportTestCase(test.TestCase):
+    """Test case for the capability reports of SchedulerDependentManager."""
+
+    def setUp(self):
+        super(CapabilitiesReportTestCase, self).setUp()
+        self.context = context.get_admin_context()
+        self.host_manager = host_manager.HostManager()
+        self.manager = manager.SchedulerDependentManager(
+            host='host1', service_name='volume')
+        self.scheduler_rpcapi = FakeSchedulerAPI(self.host_manager)
+        self.manager.scheduler_rpcapi = self.scheduler_rpcapi
+
+    def _publish(self, caps):
+        self.manager.update_service_capabilities(caps)
+        self.manager._publish_service_capabilities(self.context)
+        received = dict(self.host_manager.service_states['host1'])
+        del received['timestamp']
+        self.assertEqual(caps, received)
+
+    def test_publish_deltas(self):
+        self.override_config('capabilities_delta_reports', 2)
+        caps = _fake_capabilities()
+        for i in range(5):
+            # The driver updates its stats in place
+            caps['pools'][0]['free_capacity_gb'] = i
+            self._publish(caps)
+
+        versions = ['%s:%d' % (self.manager._capabilities_id, i)
+                    for i in range(1, 6)]
+        self.assertEqual([(versions[0], None),
+                          (versions[1], versions[0]),
+                          (versions[2], versions[1]),
+                          (versions[3], None),
+                          (versions[4], versions[3])],
+                         self.scheduler_rpcapi.reports)
+
+    def test_publish_full_after_reset(self):
+        caps = _fake_capabilities()
+        self._publish(caps)
+        self.manager._reset_reported_capabilities()
+        self._publish(caps)
+
+        self.assertEqual([None, None],
+                         [base for _v, base in self.scheduler_rpcapi.reports])
+
+    def test_publish_delta_not_supported(self):
+        self.scheduler_rpcapi.can_send_delta = False
+        caps = _fake_capabilities()
+        self._publish(caps)
+        self._publish(caps)
+
+        self.assertEqual([(None, None), (None, None)],
+                         self.scheduler_rpcapi.reports)
+
+
+class CapabilitiesReportBenchmarkTestCase(test.TestCase):
+    """Benchmark of full and delta capability reports.
+
+    CINDER_CAPABILITIES_BENCHMARK_BACKENDS backends (60 by default) with
+    CINDER_CAPABILITIES_BENCHMARK_POOLS pools each (50 by default) report
+    their capabilities to a HostManager, in full and then as deltas where
+    the free capacity of one pool changed.  The size of the reports
+    serialized for RPC and the time spent by the scheduler to apply them
+    are attached to the test result as the 'benchmark' detail.
+    """
+
+    def setUp(self):
+        super(CapabilitiesReportBenchmarkTestCase, self).setUp()
+        self.backends = int(
+            os.environ.get('CINDER_CAPABILITIES_BENCHMARK_BACKENDS', 60))
+        self.pools = int(
+            os.environ.get('CINDER_CAPABILITIES_BENCHMARK_POOLS', 50))
+        self.context = context.get_admin_context()
+        self.host_manager = host_manager.HostManager()
+        self.scheduler_rpcapi = FakeSchedulerAPI(self.host_manager)
+        self.caps = {}
+        self.managers = []
+        for i in range(self.backends):
+            mgr = manager.SchedulerDependentManager(host='host%d' % i,
+                                                    service_name='volume')
+            mgr.scheduler_rpcapi = mock.Mock()
+            self.managers.append(mgr)
+            self.caps[mgr.host] = _fake_capabilities(self.pools)
+
+    def _report(self, report):
+        size = 0
+        elapsed = 0
+        for mgr in self.managers:
+            caps = self.caps[mgr.host]
+            caps['pools'][report % self.pools]['free_capacity_gb'] = report
+            mgr.update_service_capabilities(caps)
+            mgr._publish_service_capabilities(self.context)
+            args, kwargs = mgr.scheduler_rpcapi.update_service_capabilities.\
+                call_args
+            payload = jsonutils.dumps(args[3])
+            size += len(payload)
+
+            start = time.time()
+            self.host_manager.update_service_capabilities(
+                'volume', mgr.host, jsonutils.loads(payload), **kwargs)
+            elapsed += time.time() - start
+        return size, elapsed
+
+    def test_capability_reports(self):
+        self.override_config('capabilities_delta_reports', 1)
+        full_size, full_time = self._report(1)
+        delta_size, delta_time = self._report(2)
+
+        self.addDetail('benchmark', content.text_content(
+            '%d backends with %d pools\n'
+            'full reports   %10d bytes %8.2f ms\n'
+            'delta reports  %10d bytes %8.2f ms\n' %
+            (self.backends, self.pools, full_size, full_time * 1000,
+             delta_size, delta_time * 1000)))
+        for mgr in self.managers:
+            received = dict(self.host_manager.service_states[mgr.host])
+            del received['timestamp']
+            self.assertEqual(self.caps[mgr.host], received)
+        self.assertLess(delta_size * 10, full_size)
@@ -117,6 +117,48 @@ class HostManagerTestCase(test.TestCase):
                     'host3': host3_volume_capabs}
         self.assertDictMatch(expected, service_states)
 
+    @mock.patch('oslo_utils.timeutils.utcnow')
+    def test_update_service_capabilities_delta(self, _mock_utcnow):
+        _mock_utcnow.side_effect = [31337, 31338, 31339]
+        capabs = dict(free_capacity_gb=4321, total_capacity_gb=5000,
+                      pools=[dict(pool_name='pool1', free_capacity_gb=21),
+                             dict(pool_name='pool2', free_capacity_gb=4300)])
+        delta = dict(changed=dict(free_capacity_gb=4311),
+                     removed=['total_capacity_gb'],
+                     pools=[dict(pool_name='pool1',
+                                 changed=dict(free_capacity_gb=11),
+                                 removed=[])],
+                     removed_pools=[])
+
+        self.host_manager.update_service_capabilities(
+            'volume', 'host1', capabs, capabilities_version='id:1')
+        self.host_manager.update_service_capabilities(
+            'volume', 'host1', delta, capabilities_version='id:2',
+            base_version='id:1')
+
+        expected = dict(free_capacity_gb=4311, timestamp=31338,
+                        pools=[dict(pool_name='pool1', free_capacity_gb=11),
+                               dict(pool_name='pool2',
+                                    free_capacity_gb=4300)])
+        self.assertEqual(expected, self.host_manager.service_states['host1'])
+        # The pool that did not change is not copied
+        self.assertIs(capabs['pools'][1],
+                      self.host_manager.service_states['host1']['pools'][1])
+        # The original dictionaries were not modified
+        self.assertEqual(4321, capabs['free_capacity_gb'])
+        self.assertEqual(21, capabs['pools'][0]['free_capacity_gb'])
+
+        # A delta from another version is ignored
+        self.host_manager.update_service_capabilities(
+            'volume', 'host1', dict(changed=dict(free_capacity_gb=1),
+                                    removed=[]),
+            capabilities_version='id:4', base_version='id:3')
+        self.assertEqual(expected, self.host_manager.service_states['host1'])
+        self.host_manager.update_service_capabilities(
+            'volume', 'host2', delta, capabilities_version='id:2',
+            base_version='id:1')
+        self.assertNotIn('host2', self.host_manager.service_states)
+
     @mock.patch('cinder.utils.service_is_up')
     @mock.patch('cinder.db.service_get_all')
     def test_has_all_capabilities(self, _mock_service_get_all,
@@ -89,6 +89,17 @@ class SchedulerRpcAPITestCase(test.TestCase):
                                  fanout=True,
                                  version='3.0')
 
+    def test_update_service_capabilities_delta(self):
+        self._test_scheduler_api('update_service_capabilities',
+                                 rpc_method='cast',
+                                 service_name='fake_name',
+                                 host='fake_host',
+                                 capabilities='fake_delta',
+                                 capabilities_version='fake_id:2',
+                                 base_version='fake_id:1',
+                                 fanout=True,
+                                 version='3.1')
+
     @mock.patch('oslo_messaging.RPCClient.can_send_version', return_value=True)
     def test_create_volume(self, can_send_version):
         self._test_scheduler_api('create_volume',
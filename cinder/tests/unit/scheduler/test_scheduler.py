@@ -103,7 +103,9 @@ class SchedulerManagerTestCase(test.TestCase):
         self.manager.update_service_capabilities(self.context,
                                                  service_name=service,
                                                  host=host)
-        _mock_update_cap.assert_called_once_with(service, host, {})
+        _mock_update_cap.assert_called_once_with(service, host, {},
+                                                 capabilities_version=None,
+                                                 base_version=None)
 
     @mock.patch('cinder.scheduler.driver.Scheduler.'
                 'update_service_capabilities')
@@ -117,7 +119,28 @@ class SchedulerManagerTestCase(test.TestCase):
                                                  service_name=service,
                                                  host=host,
                                                  capabilities=capabilities)
-        _mock_update_cap.assert_called_once_with(service, host, capabilities)
+        _mock_update_cap.assert_called_once_with(service, host, capabilities,
+                                                 capabilities_version=None,
+                                                 base_version=None)
+
+    @mock.patch('cinder.scheduler.driver.Scheduler.'
+                'update_service_capabilities')
+    def test_update_service_capabilities_delta(self, _mock_update_cap):
+        # Test capabilities versions are passed
+        service = 'fake_service'
+        host = 'fake_host'
+        delta = {'changed': {'fake_capability': 'fake_value'},
+                 'removed': []}
+
+        self.manager.update_service_capabilities(self.context,
+                                                 service_name=service,
+                                                 host=host,
+                                                 capabilities=delta,
+                                                 capabilities_version='id:2',
+                                                 base_version='id:1')
+        _mock_update_cap.assert_called_once_with(service, host, delta,
+                                                 capabilities_version='id:2',
+                                                 base_version='id:1')
 
     @mock.patch('cinder.scheduler.driver.Scheduler.schedule_create_volume')
     @mock.patch('cinder.message.api.API.create')
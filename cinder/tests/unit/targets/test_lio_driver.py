@@ -226,6 +226,19 @@ class TestLioAdmDriver(tf.TargetDriverFixture):
                                   self.fake_volumes_dir)
         self.assertFalse(mock_restore.called)
 
+    @mock.patch.object(lio.LioAdm, '_get_targets',
+                       side_effect=[None, 'target'])
+    @mock.patch.object(lio.LioAdm, '_restore_configuration')
+    def test_ensure_export_restores_once(self, mock_restore,
+                                         mock_get_targets):
+
+        ctxt = context.get_admin_context()
+        for i in range(2):
+            self.target.ensure_export(ctxt,
+                                      self.testvol,
+                                      self.fake_volumes_dir)
+        mock_restore.assert_called_once_with()
+
     @mock.patch.object(lio.LioAdm, '_execute', side_effect=lio.LioAdm._execute)
     @mock.patch.object(lio.LioAdm, '_persist_configuration')
     @mock.patch('cinder.utils.execute')
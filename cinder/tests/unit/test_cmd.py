@@ -412,6 +412,15 @@ class TestCinderManageCmd(test.TestCase):
         with mock.patch('sys.stdout', new=six.StringIO()):
             self.assertRaises(exception.InvalidInput, db_cmds.sync, 1)
 
+    @mock.patch('cinder.quota_utils.flush_cache')
+    @mock.patch('cinder.context.get_admin_context')
+    def test_quota_commands_flush_project_cache(self, get_admin_context,
+                                                flush_cache):
+        quota_cmds = cinder_manage.QuotaCommands()
+        with mock.patch('sys.stdout', new=six.StringIO()):
+            quota_cmds.flush_project_cache()
+        flush_cache.assert_called_once_with(get_admin_context.return_value)
+
     @mock.patch('cinder.version.version_string')
     def test_versions_commands_list(self, version_string):
         version_cmds = cinder_manage.VersionCommands()
@@ -447,14 +456,31 @@ class TestCinderManageCmd(test.TestCase):
                                       is_admin=True)
         get_admin_context.return_value = ctxt
 
-        purge_deleted_rows.return_value = None
+        purge_deleted_rows.return_value = 0
 
         db_cmds = cinder_manage.DbCommands()
         db_cmds.purge(age_in_days)
 
         get_admin_context.assert_called_once_with()
         purge_deleted_rows.assert_called_once_with(
-            ctxt, age_in_days=age_in_days)
+            ctxt, age_in_days=age_in_days, batch_size=1000, sleep_interval=0)
+
+    @mock.patch('cinder.db.sqlalchemy.api.purge_deleted_rows',
+                return_value=0)
+    @mock.patch('cinder.context.get_admin_context')
+    def test_purge_batch_size_and_sleep(self, get_admin_context,
+                                        purge_deleted_rows):
+        db_cmds = cinder_manage.DbCommands()
+        db_cmds.purge(10, batch_size=50, sleep=0.5)
+
+        purge_deleted_rows.assert_called_once_with(
+            get_admin_context.return_value, age_in_days=10, batch_size=50,
+            sleep_interval=0.5)
+
+    def test_purge_invalid_batch_size(self):
+        db_cmds = cinder_manage.DbCommands()
+        ex = self.assertRaises(SystemExit, db_cmds.purge, 10, batch_size=0)
+        self.assertEqual(1, ex.code)
 
     @mock.patch('cinder.db.service_get_all')
     @mock.patch('cinder.context.get_admin_context')
@@ -1700,6 +1726,8 @@ class TestCinderVolumeUsageAuditCmd(test.TestCase):
         rpc_init.assert_called_once_with(CONF)
         last_completed_audit_period.assert_called_once_with()
 
+    @mock.patch('cinder.objects.backup.BackupList.get_all_active_by_window',
+                return_value=[])
     @mock.patch('cinder.volume.utils.notify_about_volume_usage')
     @mock.patch('cinder.db.volume_get_active_by_window')
     @mock.patch('cinder.utils.last_completed_audit_period')
@@ -1713,7 +1741,8 @@ class TestCinderVolumeUsageAuditCmd(test.TestCase):
                                            rpc_init,
                                            last_completed_audit_period,
                                            volume_get_active_by_window,
-                                           notify_about_volume_usage):
+                                           notify_about_volume_usage,
+                                           backup_get_all_active_by_window):
         CONF.set_override('send_actions', True)
         CONF.set_override('start_time', '2014-01-01 01:00:00')
         CONF.set_override('end_time', '2014-02-02 02:00:00')
@@ -1754,7 +1783,9 @@ class TestCinderVolumeUsageAuditCmd(test.TestCase):
         get_logger.assert_called_once_with('cinder')
         rpc_init.assert_called_once_with(CONF)
         last_completed_audit_period.assert_called_once_with()
-        volume_get_active_by_window.assert_called_once_with(ctxt, begin, end)
+        volume_get_active_by_window.assert_called_once_with(
+            ctxt, begin, end, marker=None, limit=1000,
+            project_id_range=None)
         notify_about_volume_usage.assert_has_calls([
             mock.call(ctxt, volume1, 'exists', extra_usage_info=extra_info),
             mock.call(ctxt, volume1, 'create.start',
@@ -1763,6 +1794,8 @@ class TestCinderVolumeUsageAuditCmd(test.TestCase):
                       extra_usage_info=local_extra_info)
         ])
 
+    @mock.patch('cinder.objects.backup.BackupList.get_all_active_by_window',
+                return_value=[])
     @mock.patch('cinder.volume.utils.notify_about_volume_usage')
     @mock.patch('cinder.db.volume_get_active_by_window')
     @mock.patch('cinder.utils.last_completed_audit_period')
@@ -1776,7 +1809,8 @@ class TestCinderVolumeUsageAuditCmd(test.TestCase):
                                            rpc_init,
                                            last_completed_audit_period,
                                            volume_get_active_by_window,
-                                           notify_about_volume_usage):
+                                           notify_about_volume_usage,
+                                           backup_get_all_active_by_window):
         CONF.set_override('send_actions', True)
         CONF.set_override('start_time', '2014-01-01 01:00:00')
         CONF.set_override('end_time', '2014-02-02 02:00:00')
@@ -1821,7 +1855,9 @@ class TestCinderVolumeUsageAuditCmd(test.TestCase):
         get_logger.assert_called_once_with('cinder')
         rpc_init.assert_called_once_with(CONF)
         last_completed_audit_period.assert_called_once_with()
-        volume_get_active_by_window.assert_called_once_with(ctxt, begin, end)
+        volume_get_active_by_window.assert_called_once_with(
+            ctxt, begin, end, marker=None, limit=1000,
+            project_id_range=None)
         notify_about_volume_usage.assert_has_calls([
             mock.call(ctxt, volume1, 'exists', extra_usage_info=extra_info),
             mock.call(ctxt, volume1, 'create.start',
@@ -1834,6 +1870,8 @@ class TestCinderVolumeUsageAuditCmd(test.TestCase):
                       extra_usage_info=local_extra_info_delete)
         ])
 
+    @mock.patch('cinder.objects.backup.BackupList.get_all_active_by_window',
+                return_value=[])
     @mock.patch('cinder.volume.utils.notify_about_snapshot_usage')
     @mock.patch('cinder.objects.snapshot.SnapshotList.get_active_by_window')
     @mock.patch('cinder.volume.utils.notify_about_volume_usage')
@@ -1851,7 +1889,8 @@ class TestCinderVolumeUsageAuditCmd(test.TestCase):
                                       volume_get_active_by_window,
                                       notify_about_volume_usage,
                                       snapshot_get_active_by_window,
-                                      notify_about_snapshot_usage):
+                                      notify_about_snapshot_usage,
+                                      backup_get_all_active_by_window):
         CONF.set_override('send_actions', True)
         CONF.set_override('start_time', '2014-01-01 01:00:00')
         CONF.set_override('end_time', '2014-02-02 02:00:00')
@@ -1897,7 +1936,9 @@ class TestCinderVolumeUsageAuditCmd(test.TestCase):
         get_logger.assert_called_once_with('cinder')
         rpc_init.assert_called_once_with(CONF)
         last_completed_audit_period.assert_called_once_with()
-        volume_get_active_by_window.assert_called_once_with(ctxt, begin, end)
+        volume_get_active_by_window.assert_called_once_with(
+            ctxt, begin, end, marker=None, limit=1000,
+            project_id_range=None)
         self.assertFalse(notify_about_volume_usage.called)
         notify_about_snapshot_usage.assert_has_calls([
             mock.call(ctxt, snapshot1, 'exists', extra_info),
@@ -1907,6 +1948,8 @@ class TestCinderVolumeUsageAuditCmd(test.TestCase):
                       extra_usage_info=local_extra_info_delete)
         ])
 
+    @mock.patch('cinder.objects.backup.BackupList.get_all_active_by_window',
+                return_value=[])
     @mock.patch('cinder.volume.utils.notify_about_snapshot_usage')
     @mock.patch('cinder.objects.snapshot.SnapshotList.get_active_by_window')
     @mock.patch('cinder.volume.utils.notify_about_volume_usage')
@@ -1920,7 +1963,8 @@ class TestCinderVolumeUsageAuditCmd(test.TestCase):
     def test_main(self, get_admin_context, log_setup, get_logger,
                   version_string, rpc_init, last_completed_audit_period,
                   volume_get_active_by_window, notify_about_volume_usage,
-                  snapshot_get_active_by_window, notify_about_snapshot_usage):
+                  snapshot_get_active_by_window, notify_about_snapshot_usage,
+                  backup_get_all_active_by_window):
         CONF.set_override('send_actions', True)
         CONF.set_override('start_time', '2014-01-01 01:00:00')
         CONF.set_override('end_time', '2014-02-02 02:00:00')
@@ -1974,7 +2018,9 @@ class TestCinderVolumeUsageAuditCmd(test.TestCase):
         get_logger.assert_called_once_with('cinder')
         rpc_init.assert_called_once_with(CONF)
         last_completed_audit_period.assert_called_once_with()
-        volume_get_active_by_window.assert_called_once_with(ctxt, begin, end)
+        volume_get_active_by_window.assert_called_once_with(
+            ctxt, begin, end, marker=None, limit=1000,
+            project_id_range=None)
         notify_about_volume_usage.assert_has_calls([
             mock.call(ctxt, volume1, 'exists', extra_usage_info=extra_info),
             mock.call(ctxt, volume1, 'create.start',
@@ -1998,3 +2044,75 @@ class TestCinderVolumeUsageAuditCmd(test.TestCase):
             mock.call(ctxt, snapshot1, 'delete.end',
                       extra_usage_info=extra_info_snapshot_delete)
         ])
+
+    @mock.patch('cinder.volume.utils.notify_about_backup_usage')
+    @mock.patch('cinder.objects.backup.BackupList.get_all_active_by_window')
+    @mock.patch('cinder.volume.utils.notify_about_snapshot_usage')
+    @mock.patch('cinder.objects.snapshot.SnapshotList.get_active_by_window',
+                return_value=[])
+    @mock.patch('cinder.volume.utils.notify_about_volume_usage')
+    @mock.patch('cinder.db.volume_get_active_by_window')
+    @mock.patch('cinder.utils.last_completed_audit_period')
+    @mock.patch('cinder.rpc.init')
+    @mock.patch('oslo_log.log.getLogger')
+    @mock.patch('oslo_log.log.setup')
+    @mock.patch('cinder.context.get_admin_context')
+    def test_main_paginated_project_range(self, get_admin_context, log_setup,
+                                          get_logger, rpc_init,
+                                          last_completed_audit_period,
+                                          volume_get_active_by_window,
+                                          notify_about_volume_usage,
+                                          snapshot_get_active_by_window,
+                                          notify_about_snapshot_usage,
+                                          backup_get_all_active_by_window,
+                                          notify_about_backup_usage):
+        CONF.set_override('batch_size', 2)
+        CONF.set_override('notification_workers', 2)
+        CONF.set_override('project_id_start', fake.PROJECT2_ID)
+        CONF.set_override('project_id_end', fake.PROJECT_ID)
+        begin = datetime.datetime(2014, 1, 1, 1, 0)
+        end = datetime.datetime(2014, 2, 2, 2, 0)
+        ctxt = context.RequestContext(fake.USER_ID, fake.PROJECT_ID)
+        get_admin_context.return_value = ctxt
+        last_completed_audit_period.return_value = (begin, end)
+        volumes = [mock.MagicMock(id=volume_id, project_id=fake.PROJECT2_ID)
+                   for volume_id in (fake.VOLUME_ID, fake.VOLUME2_ID,
+                                     fake.VOLUME3_ID)]
+        volume_get_active_by_window.side_effect = [volumes[:2], volumes[2:]]
+        backup1 = mock.MagicMock(id=fake.BACKUP_ID,
+                                 project_id=fake.PROJECT2_ID)
+        backup2 = mock.MagicMock(id=fake.BACKUP2_ID,
+                                 project_id=fake.PROJECT2_ID)
+        backup_get_all_active_by_window.side_effect = [[backup1, backup2],
+                                                       []]
+        extra_info = {
+            'audit_period_beginning': str(begin),
+            'audit_period_ending': str(end),
+        }
+        project_id_range = (fake.PROJECT2_ID, fake.PROJECT_ID)
+
+        volume_usage_audit.main()
+
+        volume_get_active_by_window.assert_has_calls([
+            mock.call(ctxt, begin, end, marker=None, limit=2,
+                      project_id_range=project_id_range),
+            mock.call(ctxt, begin, end, marker=fake.VOLUME2_ID, limit=2,
+                      project_id_range=project_id_range)])
+        self.assertEqual(2, volume_get_active_by_window.call_count)
+        snapshot_get_active_by_window.assert_called_once_with(
+            ctxt, begin, end, marker=None, limit=2,
+            project_id_range=project_id_range)
+        backup_get_all_active_by_window.assert_has_calls([
+            mock.call(ctxt, begin, end, marker=None, limit=2,
+                      project_id_range=project_id_range),
+            mock.call(ctxt, begin, end, marker=fake.BACKUP2_ID, limit=2,
+                      project_id_range=project_id_range)])
+        notify_about_volume_usage.assert_has_calls(
+            [mock.call(ctxt, volume, 'exists', extra_usage_info=extra_info)
+             for volume in volumes], any_order=True)
+        self.assertEqual(3, notify_about_volume_usage.call_count)
+        self.assertFalse(notify_about_snapshot_usage.called)
+        notify_about_backup_usage.assert_has_calls(
+            [mock.call(ctxt, backup1, 'exists', extra_info),
+             mock.call(ctxt, backup2, 'exists', extra_info)], any_order=True)
+        self.assertEqual(2, notify_about_backup_usage.call_count)
@@ -22,6 +22,7 @@ import mock
 from oslo_config import cfg
 from oslo_utils import timeutils
 from oslo_utils import uuidutils
+import sqlalchemy
 
 from cinder.api import common
 from cinder import context
@@ -338,6 +339,27 @@ class DBAPIVolumeTestCase(BaseTest):
                              db.volume_data_get_for_host(
                                  self.ctxt, 'h%d@lvmdriver-1' % i))
 
+    def test_volume_data_get_by_project_for_host(self):
+        for i in range(THREE):
+            for j in range(i + 1):
+                db.volume_create(self.ctxt, {'project_id': 'p%d' % i,
+                                             'host': 'h1@backend#pool',
+                                             'size': ONE_HUNDREDS})
+        db.volume_create(self.ctxt, {'project_id': 'p0', 'host': 'h2',
+                                     'size': ONE_HUNDREDS})
+        volume = db.volume_create(self.ctxt, {'project_id': 'p0',
+                                              'host': 'h1@backend',
+                                              'size': ONE_HUNDREDS})
+        db.volume_destroy(self.ctxt, volume.id)
+
+        self.assertEqual({'p0': (1, ONE_HUNDREDS),
+                          'p1': (2, 2 * ONE_HUNDREDS),
+                          'p2': (THREE, THREE_HUNDREDS)},
+                         db.volume_data_get_by_project_for_host(
+                             self.ctxt, 'h1@backend'))
+        self.assertEqual({}, db.volume_data_get_by_project_for_host(
+            self.ctxt, 'h3'))
+
     def test_volume_data_get_for_project(self):
         for i in range(THREE):
             for j in range(THREE):
@@ -418,6 +440,32 @@ class DBAPIVolumeTestCase(BaseTest):
         self._assertEqualListsOfObjects(volumes[2:], db.volume_get_all(
                                         self.ctxt, 2, 2, ['id'], ['asc']))
 
+    def test_volume_get_all_detail(self):
+        db.volume_create(self.ctxt, {'id': fake.VOLUME_ID,
+                                     'metadata': {'key': 'value'},
+                                     'admin_metadata': {'readonly': 'True'}})
+        db.volume_attach(self.ctxt, {'volume_id': fake.VOLUME_ID,
+                                     'attach_status': 'attaching'})
+        volumes = db.volume_get_all(self.ctxt, None, None)
+
+        self.assertEqual(1, len(volumes))
+        self.assertEqual(set(), sqlalchemy.inspect(volumes[0]).unloaded &
+                         {'volume_metadata', 'volume_admin_metadata',
+                          'volume_attachment', 'volume_type'})
+        self.assertEqual('value', volumes[0].volume_metadata[0].value)
+        self.assertEqual(1, len(volumes[0].volume_attachment))
+
+    def test_volume_get_all_summary(self):
+        db.volume_create(self.ctxt, {'metadata': {'key': 'value'}})
+        volumes = db.volume_get_all(self.ctxt, None, None,
+                                    filters={'metadata': {'key': 'value'}},
+                                    detail=False)
+
+        self.assertEqual(1, len(volumes))
+        self.assertTrue({'volume_metadata', 'volume_admin_metadata',
+                         'volume_attachment', 'volume_type'}.issubset(
+                             sqlalchemy.inspect(volumes[0]).unloaded))
+
     def test_volume_get_all_by_host(self):
         volumes = []
         for i in range(3):
@@ -1293,6 +1341,26 @@ class DBAPISnapshotTestCase(BaseTest):
         actual = db.snapshot_data_get_for_project(self.ctxt, 'project1')
         self.assertEqual((1, 42), actual)
 
+    def test_snapshot_data_get_by_project_for_host(self):
+        db.volume_create(self.ctxt, {'id': 1, 'project_id': 'project1',
+                                     'host': 'host1#pool', 'size': 42})
+        db.volume_create(self.ctxt, {'id': 2, 'project_id': 'project1',
+                                     'host': 'host2#pool', 'size': 10})
+        db.volume_create(self.ctxt, {'id': 3, 'project_id': 'project2',
+                                     'host': 'host1#pool', 'size': 5})
+        for snap_id, volume_id, project_id, size in ((1, 1, 'project1', 42),
+                                                     (2, 1, 'project1', 42),
+                                                     (3, 2, 'project1', 10),
+                                                     (4, 3, 'project2', 5)):
+            db.snapshot_create(self.ctxt, {'id': snap_id,
+                                           'volume_id': volume_id,
+                                           'project_id': project_id,
+                                           'volume_size': size})
+
+        self.assertEqual({'project1': (2, 84), 'project2': (1, 5)},
+                         db.snapshot_data_get_by_project_for_host(
+                             self.ctxt, 'host1'))
+
     def test_snapshot_get_all_by_filter(self):
         db.volume_create(self.ctxt, {'id': 1})
         db.volume_create(self.ctxt, {'id': 2})
@@ -1428,6 +1496,29 @@ class DBAPISnapshotTestCase(BaseTest):
                                             'host1#pool0'),
                                         ignored_keys='volume')
 
+    def test_snapshots_update(self):
+        db.volume_create(self.ctxt, {'id': 1})
+        db.snapshot_create(self.ctxt, {'id': 1, 'volume_id': 1})
+        db.snapshot_create(self.ctxt, {'id': 2, 'volume_id': 1})
+        db.snapshot_create(self.ctxt, {'id': 3, 'volume_id': 1})
+
+        db.snapshots_update(self.ctxt, [{'id': 1, 'provider_id': 'p1'},
+                                        {'id': 3, 'provider_id': 'p3'}])
+
+        self.assertEqual(['p1', None, 'p3'],
+                         [db.snapshot_get(self.ctxt, i).provider_id
+                          for i in (1, 2, 3)])
+
+    def test_snapshots_update_not_found(self):
+        db.volume_create(self.ctxt, {'id': 1})
+        db.snapshot_create(self.ctxt, {'id': 1, 'volume_id': 1})
+
+        self.assertRaises(exception.SnapshotNotFound, db.snapshots_update,
+                          self.ctxt, [{'id': 1, 'provider_id': 'p1'},
+                                      {'id': 2, 'provider_id': 'p2'}])
+        # Nothing is updated if a snapshot is not found
+        self.assertIsNone(db.snapshot_get(self.ctxt, 1).provider_id)
+
     def test_snapshot_get_all_by_project(self):
         db.volume_create(self.ctxt, {'id': 1})
         db.volume_create(self.ctxt, {'id': 2})
@@ -1696,6 +1787,47 @@ class DBAPIVolumeTypeTestCase(BaseTest):
                           self.ctxt,
                           {'name': 'n2', 'id': vt['id']})
 
+    def test_volume_type_get_generation(self):
+        generations = [db.volume_type_get_generation(self.ctxt)]
+
+        def changed():
+            generations.append(db.volume_type_get_generation(self.ctxt))
+
+        vt = db.volume_type_create(self.ctxt, {'name': 'n1'})
+        changed()
+        # Changes made within the same second are counted too
+        for name in ('n2', 'n3'):
+            db.volume_type_update(self.ctxt, vt['id'],
+                                  {'name': name, 'description': None,
+                                   'is_public': None})
+            changed()
+        db.volume_type_extra_specs_update_or_create(self.ctxt, vt['id'],
+                                                    {'k1': 'v1'})
+        changed()
+        db.volume_type_extra_specs_delete(self.ctxt, vt['id'], 'k1')
+        changed()
+        db.volume_type_access_add(self.ctxt, vt['id'], 'fake_project')
+        changed()
+        qos = db.qos_specs_create(self.ctxt, {'name': 'qos1',
+                                              'consumer': 'back-end',
+                                              'specs': {'k1': 'v1'}})
+        changed()
+        db.qos_specs_associate(self.ctxt, qos['id'], vt['id'])
+        changed()
+        db.volume_type_destroy(self.ctxt, vt['id'])
+        changed()
+
+        self.assertEqual(len(generations), len(set(generations)))
+        self.assertEqual(generations[-1],
+                         db.volume_type_get_generation(self.ctxt))
+
+    def test_cache_generation(self):
+        self.assertEqual(0, db.cache_generation_get(self.ctxt, 'c1'))
+        self.assertEqual(1, db.cache_generation_bump(self.ctxt, 'c1'))
+        self.assertEqual(2, db.cache_generation_bump(self.ctxt, 'c1'))
+        self.assertEqual(1, db.cache_generation_bump(self.ctxt, 'c2'))
+        self.assertEqual(2, db.cache_generation_get(self.ctxt, 'c1'))
+
     def test_volume_type_access_remove(self):
         vt = db.volume_type_create(self.ctxt, {'name': 'n1'})
         db.volume_type_access_add(self.ctxt, vt['id'], 'fake_project')
@@ -1930,6 +2062,21 @@ class DBAPIReservationTestCase(BaseTest):
                              self.ctxt,
                              'project1'))
 
+    def test_reservation_rollback_other_project(self):
+        reservations = _quota_reserve(self.ctxt, 'project1')
+        _quota_reserve(self.ctxt, 'project2')
+        db.reservation_rollback(self.ctxt, reservations)
+        self.assertEqual({'project_id': 'project1',
+                          'volumes': {'reserved': 0, 'in_use': 0},
+                          'gigabytes': {'reserved': 0, 'in_use': 0}},
+                         db.quota_usage_get_all_by_project(self.ctxt,
+                                                           'project1'))
+        self.assertEqual({'project_id': 'project2',
+                          'volumes': {'reserved': 1, 'in_use': 0},
+                          'gigabytes': {'reserved': 2, 'in_use': 0}},
+                         db.quota_usage_get_all_by_project(self.ctxt,
+                                                           'project2'))
+
     def test_reservation_expire(self):
         self.values['expire'] = datetime.datetime.utcnow() + \
             datetime.timedelta(days=1)
@@ -1944,6 +2091,28 @@ class DBAPIReservationTestCase(BaseTest):
                              self.ctxt,
                              'project1'))
 
+    def test_reservation_expire_batches(self):
+        resources = {'volumes': quota.ReservableResource('volumes',
+                                                         '_sync_volumes')}
+        quotas = {'volumes': 10}
+        now = datetime.datetime.utcnow()
+        for expire in (now, now, now, now + datetime.timedelta(days=1)):
+            db.quota_reserve(self.ctxt, resources, quotas, {'volumes': 2},
+                             expire, 0, 0, 'project1')
+        db.quota_reserve(self.ctxt, resources, quotas, {'volumes': 1}, now,
+                         0, 0, 'project1', is_allocated_reserve=True)
+
+        self.assertEqual(4, db.reservation_expire(self.ctxt, batch_size=2))
+
+        expected = {'project_id': 'project1',
+                    'volumes': {'reserved': 2, 'in_use': 0}}
+        self.assertEqual(expected,
+                         db.quota_usage_get_all_by_project(self.ctxt,
+                                                           'project1'))
+        self.assertEqual(0, db.quota_allocated_get_all_by_project(
+            self.ctxt, 'project1')['volumes'])
+        self.assertEqual(0, db.reservation_expire(self.ctxt))
+
 
 class DBAPIQuotaClassTestCase(BaseTest):
 
@@ -2243,6 +2412,31 @@ class DBAPIBackupTestCase(BaseTest):
         filtered_backups = db.backup_get_all(self.ctxt, filters=filters)
         self._assertEqualListsOfObjects([], filtered_backups)
 
+    def test_backup_get_all_active_by_window(self):
+        db.backup_destroy(self.ctxt, self.created[0].id)
+        begin = timeutils.utcnow() - datetime.timedelta(days=1)
+        end = timeutils.utcnow() + datetime.timedelta(days=1)
+        ids = sorted(backup.id for backup in self.created)
+
+        backups = db.backup_get_all_active_by_window(self.ctxt, begin, end)
+        self.assertEqual(ids, sorted(backup.id for backup in backups))
+
+        first_page = db.backup_get_all_active_by_window(self.ctxt, begin, end,
+                                                        limit=2)
+        self.assertEqual(ids[:2], [backup.id for backup in first_page])
+        second_page = db.backup_get_all_active_by_window(
+            self.ctxt, begin, end, marker=first_page[-1].id, limit=2)
+        self.assertEqual(ids[2:], [backup.id for backup in second_page])
+
+        backups = db.backup_get_all_active_by_window(
+            self.ctxt, begin, end,
+            project_id_range=(fake.PROJECT_ID + '2', fake.PROJECT_ID + '3'))
+        self.assertEqual([self.created[1].id], [b.id for b in backups])
+
+        self.assertEqual([], db.backup_get_all_active_by_window(
+            self.ctxt, end, end + datetime.timedelta(days=1),
+            project_id_range=(fake.PROJECT_ID + '2', None)))
+
     def test_backup_get_all_by_host(self):
         byhost = db.backup_get_all_by_host(self.ctxt,
                                            self.created[1]['host'])
@@ -17,8 +17,8 @@
 
 import math
 
+import fixtures
 import mock
-from oslo_concurrency import processutils
 from oslo_utils import units
 
 from cinder import exception
@@ -83,6 +83,51 @@ class TestQemuImgInfo(test.TestCase):
                                           check_exit_code=False)
         self.assertEqual(expected_version, version)
 
+    @mock.patch('cinder.utils.execute')
+    def test_get_qemu_img_version_probed_once(self, mock_exec):
+        mock_exec.return_value = ("qemu-img version 2.0.0", "")
+
+        image_utils.get_qemu_img_version()
+        version = image_utils.get_qemu_img_version()
+
+        self.assertEqual([2, 0, 0], version)
+        self.assertEqual(1, mock_exec.call_count)
+
+    @mock.patch('cinder.utils.execute', side_effect=OSError)
+    def test_get_qemu_img_version_not_installed(self, mock_exec):
+        self.assertIsNone(image_utils.get_qemu_img_version())
+        self.assertFalse(image_utils.qemu_img_available())
+        self.assertEqual(1, mock_exec.call_count)
+
+    @mock.patch('oslo_utils.imageutils.QemuImgInfo')
+    @mock.patch('cinder.utils.execute')
+    def test_qemu_img_info_cached(self, mock_exec, mock_info):
+        mock_exec.return_value = (mock.sentinel.out, mock.sentinel.err)
+        test_path = self.useFixture(fixtures.TempDir()).path + '/image'
+        with open(test_path, 'wb') as f:
+            f.write(b'image')
+
+        image_utils.qemu_img_info(test_path)
+        output = image_utils.qemu_img_info(test_path)
+        self.assertEqual(mock_info.return_value, output)
+        self.assertEqual(1, mock_exec.call_count)
+
+        # The image changed, so it is inspected again
+        with open(test_path, 'ab') as f:
+            f.write(b'data')
+        image_utils.qemu_img_info(test_path)
+        self.assertEqual(2, mock_exec.call_count)
+
+    @mock.patch('oslo_utils.imageutils.QemuImgInfo')
+    @mock.patch('cinder.utils.execute')
+    def test_qemu_img_info_block_device_not_cached(self, mock_exec,
+                                                   mock_info):
+        mock_exec.return_value = (mock.sentinel.out, mock.sentinel.err)
+
+        image_utils.qemu_img_info('/dev/null')
+        image_utils.qemu_img_info('/dev/null')
+        self.assertEqual(2, mock_exec.call_count)
+
     @mock.patch.object(image_utils, 'get_qemu_img_version')
     def test_validate_qemu_img_version(self, mock_get_qemu_img_version):
         fake_current_version = [1, 8]
@@ -181,6 +226,23 @@ class TestConvertImage(test.TestCase):
                                               '-O', out_format, source, dest,
                                               run_as_root=True)
 
+    @mock.patch('cinder.image.image_utils.qemu_img_info')
+    @mock.patch('cinder.utils.execute')
+    @mock.patch('cinder.utils.is_blk_device', return_value=False)
+    def test_src_size_given(self, mock_isblk, mock_exec, mock_info):
+        source = mock.sentinel.source
+        dest = mock.sentinel.dest
+        out_format = mock.sentinel.out_format
+
+        output = image_utils.convert_image(source, dest, out_format,
+                                           src_size=units.Mi)
+
+        self.assertIsNone(output)
+        self.assertFalse(mock_info.called)
+        mock_exec.assert_called_once_with('qemu-img', 'convert', '-O',
+                                          out_format, source, dest,
+                                          run_as_root=True)
+
     @mock.patch('cinder.volume.utils.check_for_odirect_support',
                 return_value=True)
     @mock.patch('cinder.image.image_utils.qemu_img_info')
@@ -450,7 +512,8 @@ class TestUploadVolume(test.TestCase):
         mock_convert.assert_called_once_with(volume_path,
                                              temp_file,
                                              mock.sentinel.disk_format,
-                                             run_as_root=True)
+                                             run_as_root=True,
+                                             src_size=data.virtual_size)
         mock_info.assert_called_with(temp_file, run_as_root=True)
         self.assertEqual(2, mock_info.call_count)
         mock_open.assert_called_once_with(temp_file, 'rb')
@@ -540,7 +603,8 @@ class TestUploadVolume(test.TestCase):
         mock_convert.assert_called_once_with(volume_path,
                                              temp_file,
                                              mock.sentinel.disk_format,
-                                             run_as_root=True)
+                                             run_as_root=True,
+                                             src_size=data.virtual_size)
         mock_info.assert_called_with(temp_file, run_as_root=True)
         self.assertEqual(2, mock_info.call_count)
         self.assertFalse(image_service.update.called)
@@ -624,6 +688,11 @@ class TestFetchToRaw(test.TestCase):
 
 
 class TestFetchToVolumeFormat(test.TestCase):
+    def setUp(self):
+        super(TestFetchToVolumeFormat, self).setUp()
+        self.mock_object(image_utils, 'qemu_img_available',
+                         return_value=True)
+
     @mock.patch('cinder.image.image_utils.convert_image')
     @mock.patch('cinder.image.image_utils.volume_utils.copy_volume')
     @mock.patch(
@@ -658,7 +727,6 @@ class TestFetchToVolumeFormat(test.TestCase):
         image_service.show.assert_called_once_with(ctxt, image_id)
         mock_temp.assert_called_once_with()
         mock_info.assert_has_calls([
-            mock.call(tmp, run_as_root=True),
             mock.call(tmp, run_as_root=True),
             mock.call(dest, run_as_root=True)])
         mock_fetch.assert_called_once_with(ctxt, image_service, image_id,
@@ -666,7 +734,8 @@ class TestFetchToVolumeFormat(test.TestCase):
         self.assertFalse(mock_repl_xen.called)
         self.assertFalse(mock_copy.called)
         mock_convert.assert_called_once_with(tmp, dest, volume_format,
-                                             run_as_root=True)
+                                             run_as_root=True,
+                                             src_size=data.virtual_size)
 
     @mock.patch('cinder.image.image_utils.convert_image')
     @mock.patch('cinder.image.image_utils.volume_utils.copy_volume')
@@ -706,7 +775,6 @@ class TestFetchToVolumeFormat(test.TestCase):
         image_service.show.assert_called_once_with(ctxt, image_id)
         mock_temp.assert_called_once_with()
         mock_info.assert_has_calls([
-            mock.call(tmp, run_as_root=run_as_root),
             mock.call(tmp, run_as_root=run_as_root),
             mock.call(dest, run_as_root=run_as_root)])
         mock_fetch.assert_called_once_with(ctxt, image_service, image_id,
@@ -714,7 +782,8 @@ class TestFetchToVolumeFormat(test.TestCase):
         self.assertFalse(mock_repl_xen.called)
         self.assertFalse(mock_copy.called)
         mock_convert.assert_called_once_with(tmp, dest, volume_format,
-                                             run_as_root=run_as_root)
+                                             run_as_root=run_as_root,
+                                             src_size=data.virtual_size)
 
     @mock.patch('cinder.image.image_utils.convert_image')
     @mock.patch('cinder.image.image_utils.volume_utils.copy_volume')
@@ -758,7 +827,6 @@ class TestFetchToVolumeFormat(test.TestCase):
         self.assertEqual(2, mock_temp.call_count)
         mock_info.assert_has_calls([
             mock.call(tmp, run_as_root=True),
-            mock.call(dummy, run_as_root=True),
             mock.call(tmp, run_as_root=True),
             mock.call(dest, run_as_root=True)])
         mock_fetch.assert_called_once_with(ctxt, image_service, image_id,
@@ -766,7 +834,8 @@ class TestFetchToVolumeFormat(test.TestCase):
         self.assertFalse(mock_repl_xen.called)
         self.assertFalse(mock_copy.called)
         mock_convert.assert_called_once_with(tmp, dest, volume_format,
-                                             run_as_root=True)
+                                             run_as_root=True,
+                                             src_size=data.virtual_size)
 
     @mock.patch('cinder.image.image_utils.convert_image')
     @mock.patch('cinder.image.image_utils.volume_utils.copy_volume')
@@ -775,13 +844,13 @@ class TestFetchToVolumeFormat(test.TestCase):
     @mock.patch('cinder.image.image_utils.is_xenserver_image',
                 return_value=False)
     @mock.patch('cinder.image.image_utils.fetch')
-    @mock.patch('cinder.image.image_utils.qemu_img_info',
-                side_effect=processutils.ProcessExecutionError)
+    @mock.patch('cinder.image.image_utils.qemu_img_available',
+                return_value=False)
     @mock.patch('cinder.image.image_utils.temporary_file')
     @mock.patch('cinder.image.image_utils.CONF')
-    def test_no_qemu_img_and_is_raw(self, mock_conf, mock_temp, mock_info,
-                                    mock_fetch, mock_is_xen, mock_repl_xen,
-                                    mock_copy, mock_convert):
+    def test_no_qemu_img_and_is_raw(self, mock_conf, mock_temp,
+                                    mock_available, mock_fetch, mock_is_xen,
+                                    mock_repl_xen, mock_copy, mock_convert):
         ctxt = mock.sentinel.context
         image_service = mock.Mock(temp_images=None)
         image_id = mock.sentinel.image_id
@@ -806,7 +875,7 @@ class TestFetchToVolumeFormat(test.TestCase):
         self.assertIsNone(output)
         image_service.show.assert_called_once_with(ctxt, image_id)
         mock_temp.assert_called_once_with()
-        mock_info.assert_called_once_with(tmp, run_as_root=run_as_root)
+        mock_available.assert_called_once_with()
         mock_fetch.assert_called_once_with(ctxt, image_service, image_id,
                                            tmp, user_id, project_id)
         self.assertFalse(mock_repl_xen.called)
@@ -821,11 +890,11 @@ class TestFetchToVolumeFormat(test.TestCase):
     @mock.patch('cinder.image.image_utils.is_xenserver_image',
                 return_value=False)
     @mock.patch('cinder.image.image_utils.fetch')
-    @mock.patch('cinder.image.image_utils.qemu_img_info',
-                side_effect=processutils.ProcessExecutionError)
+    @mock.patch('cinder.image.image_utils.qemu_img_available',
+                return_value=False)
     @mock.patch('cinder.image.image_utils.temporary_file')
     @mock.patch('cinder.image.image_utils.CONF')
-    def test_no_qemu_img_not_raw(self, mock_conf, mock_temp, mock_info,
+    def test_no_qemu_img_not_raw(self, mock_conf, mock_temp, mock_available,
                                  mock_fetch, mock_is_xen, mock_repl_xen,
                                  mock_copy, mock_convert):
         ctxt = mock.sentinel.context
@@ -839,7 +908,6 @@ class TestFetchToVolumeFormat(test.TestCase):
         size = 4321
         run_as_root = mock.sentinel.run_as_root
 
-        tmp = mock_temp.return_value.__enter__.return_value
         image_service.show.return_value = {'disk_format': 'not_raw'}
 
         self.assertRaises(
@@ -851,7 +919,7 @@ class TestFetchToVolumeFormat(test.TestCase):
 
         image_service.show.assert_called_once_with(ctxt, image_id)
         mock_temp.assert_called_once_with()
-        mock_info.assert_called_once_with(tmp, run_as_root=run_as_root)
+        mock_available.assert_called_once_with()
         self.assertFalse(mock_fetch.called)
         self.assertFalse(mock_repl_xen.called)
         self.assertFalse(mock_copy.called)
@@ -864,13 +932,13 @@ class TestFetchToVolumeFormat(test.TestCase):
     @mock.patch('cinder.image.image_utils.is_xenserver_image',
                 return_value=False)
     @mock.patch('cinder.image.image_utils.fetch')
-    @mock.patch('cinder.image.image_utils.qemu_img_info',
-                side_effect=processutils.ProcessExecutionError)
+    @mock.patch('cinder.image.image_utils.qemu_img_available',
+                return_value=False)
     @mock.patch('cinder.image.image_utils.temporary_file')
     @mock.patch('cinder.image.image_utils.CONF')
-    def test_no_qemu_img_no_metadata(self, mock_conf, mock_temp, mock_info,
-                                     mock_fetch, mock_is_xen, mock_repl_xen,
-                                     mock_copy, mock_convert):
+    def test_no_qemu_img_no_metadata(self, mock_conf, mock_temp,
+                                     mock_available, mock_fetch, mock_is_xen,
+                                     mock_repl_xen, mock_copy, mock_convert):
         ctxt = mock.sentinel.context
         image_service = mock.Mock(temp_images=None)
         image_id = mock.sentinel.image_id
@@ -882,7 +950,6 @@ class TestFetchToVolumeFormat(test.TestCase):
         size = 4321
         run_as_root = mock.sentinel.run_as_root
 
-        tmp = mock_temp.return_value.__enter__.return_value
         image_service.show.return_value = None
 
         self.assertRaises(
@@ -894,7 +961,7 @@ class TestFetchToVolumeFormat(test.TestCase):
 
         image_service.show.assert_called_once_with(ctxt, image_id)
         mock_temp.assert_called_once_with()
-        mock_info.assert_called_once_with(tmp, run_as_root=run_as_root)
+        mock_available.assert_called_once_with()
         self.assertFalse(mock_fetch.called)
         self.assertFalse(mock_repl_xen.called)
         self.assertFalse(mock_copy.called)
@@ -938,9 +1005,7 @@ class TestFetchToVolumeFormat(test.TestCase):
 
         image_service.show.assert_called_once_with(ctxt, image_id)
         mock_temp.assert_called_once_with()
-        mock_info.assert_has_calls([
-            mock.call(tmp, run_as_root=run_as_root),
-            mock.call(tmp, run_as_root=run_as_root)])
+        mock_info.assert_called_once_with(tmp, run_as_root=run_as_root)
         mock_fetch.assert_called_once_with(ctxt, image_service, image_id,
                                            tmp, user_id, project_id)
         self.assertFalse(mock_repl_xen.called)
@@ -986,9 +1051,7 @@ class TestFetchToVolumeFormat(test.TestCase):
 
         image_service.show.assert_called_once_with(ctxt, image_id)
         mock_temp.assert_called_once_with()
-        mock_info.assert_has_calls([
-            mock.call(tmp, run_as_root=run_as_root),
-            mock.call(tmp, run_as_root=run_as_root)])
+        mock_info.assert_called_once_with(tmp, run_as_root=run_as_root)
         mock_fetch.assert_called_once_with(ctxt, image_service, image_id,
                                            tmp, user_id, project_id)
         self.assertFalse(mock_repl_xen.called)
@@ -1034,9 +1097,7 @@ class TestFetchToVolumeFormat(test.TestCase):
 
         image_service.show.assert_called_once_with(ctxt, image_id)
         mock_temp.assert_called_once_with()
-        mock_info.assert_has_calls([
-            mock.call(tmp, run_as_root=run_as_root),
-            mock.call(tmp, run_as_root=run_as_root)])
+        mock_info.assert_called_once_with(tmp, run_as_root=run_as_root)
         mock_fetch.assert_called_once_with(ctxt, image_service, image_id,
                                            tmp, user_id, project_id)
         self.assertFalse(mock_repl_xen.called)
@@ -1090,7 +1151,6 @@ class TestFetchToVolumeFormat(test.TestCase):
         image_service.show.assert_called_once_with(ctxt, image_id)
         mock_temp.assert_called_once_with()
         mock_info.assert_has_calls([
-            mock.call(tmp, run_as_root=run_as_root),
             mock.call(tmp, run_as_root=run_as_root),
             mock.call(dest, run_as_root=run_as_root)])
         mock_fetch.assert_called_once_with(ctxt, image_service, image_id,
@@ -1098,7 +1158,8 @@ class TestFetchToVolumeFormat(test.TestCase):
         self.assertFalse(mock_repl_xen.called)
         self.assertFalse(mock_copy.called)
         mock_convert.assert_called_once_with(tmp, dest, volume_format,
-                                             run_as_root=run_as_root)
+                                             run_as_root=run_as_root,
+                                             src_size=data.virtual_size)
 
     def test_format_mismatch(self):
         self._test_format_name_mismatch()
@@ -1147,7 +1208,6 @@ class TestFetchToVolumeFormat(test.TestCase):
         image_service.show.assert_called_once_with(ctxt, image_id)
         mock_temp.assert_called_once_with()
         mock_info.assert_has_calls([
-            mock.call(tmp, run_as_root=run_as_root),
             mock.call(tmp, run_as_root=run_as_root),
             mock.call(dest, run_as_root=run_as_root)])
         mock_fetch.assert_called_once_with(ctxt, image_service, image_id,
@@ -1155,7 +1215,8 @@ class TestFetchToVolumeFormat(test.TestCase):
         mock_repl_xen.assert_called_once_with(tmp)
         self.assertFalse(mock_copy.called)
         mock_convert.assert_called_once_with(tmp, dest, volume_format,
-                                             run_as_root=run_as_root)
+                                             run_as_root=run_as_root,
+                                             src_size=data.virtual_size)
 
 
 class TestXenserverUtils(test.TestCase):
@@ -1044,6 +1044,64 @@ class MigrationsMixin(test_migrations.WalkVersionsMixin):
         self.assertIsInstance(groups.c.source_group_id.type,
                               self.VARCHAR_TYPE)
 
+    def _check_085(self, engine, data):
+        """Test adding indexes for volume, snapshot and backup queries."""
+        expected = {
+            'volumes': {
+                'volumes_deleted_host_idx': ['deleted', 'host'],
+                'volumes_deleted_project_id_volume_type_id_idx':
+                    ['deleted', 'project_id', 'volume_type_id'],
+                'volumes_deleted_project_id_created_at_idx':
+                    ['deleted', 'project_id', 'created_at'],
+                'volumes_deleted_created_at_idx': ['deleted', 'created_at'],
+                'volumes_deleted_status_idx': ['deleted', 'status'],
+            },
+            'snapshots': {
+                'snapshots_volume_id_deleted_idx': ['volume_id', 'deleted'],
+                'snapshots_deleted_project_id_volume_type_id_idx':
+                    ['deleted', 'project_id', 'volume_type_id'],
+                'snapshots_deleted_project_id_created_at_idx':
+                    ['deleted', 'project_id', 'created_at'],
+            },
+            'backups': {
+                'backups_deleted_host_idx': ['deleted', 'host'],
+                'backups_volume_id_deleted_idx': ['volume_id', 'deleted'],
+                'backups_deleted_project_id_created_at_idx':
+                    ['deleted', 'project_id', 'created_at'],
+            },
+            'volume_attachment': {
+                'volume_attachment_volume_id_deleted_idx':
+                    ['volume_id', 'deleted'],
+                'volume_attachment_instance_uuid_deleted_idx':
+                    ['instance_uuid', 'deleted'],
+            },
+        }
+        for table_name, indexes in expected.items():
+            table = db_utils.get_table(engine, table_name)
+            index_columns = {idx.name: idx.columns.keys()
+                             for idx in table.indexes}
+            for index_name, columns in indexes.items():
+                self.assertEqual(columns, index_columns.get(index_name))
+
+    def _check_086(self, engine, data):
+        """Test adding cache_generations table."""
+        self.assertTrue(engine.dialect.has_table(engine.connect(),
+                                                 "cache_generations"))
+        cache_generations = db_utils.get_table(engine, 'cache_generations')
+
+        self.assertIsInstance(cache_generations.c.name.type,
+                              self.VARCHAR_TYPE)
+        self.assertIsInstance(cache_generations.c.generation.type,
+                              self.INTEGER_TYPE)
+        self.assertIsInstance(cache_generations.c.created_at.type,
+                              self.TIME_TYPE)
+        self.assertIsInstance(cache_generations.c.updated_at.type,
+                              self.TIME_TYPE)
+        self.assertIsInstance(cache_generations.c.deleted_at.type,
+                              self.TIME_TYPE)
+        self.assertIsInstance(cache_generations.c.deleted.type,
+                              self.BOOL_TYPE)
+
     def test_walk_versions(self):
         self.walk_versions(False, False)
 
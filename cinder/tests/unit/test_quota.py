@@ -882,6 +882,51 @@ class VolumeTypeQuotaEngineTestCase(test.TestCase):
         engine = quota.VolumeTypeQuotaEngine()
         engine.update_quota_resource(ctx, 'type1', 'type2')
 
+    @mock.patch.object(db, 'volume_type_get_generation', return_value=1)
+    @mock.patch.object(db, 'volume_type_get_all', return_value={})
+    def test_resources_cached(self, mock_get_all, mock_generation):
+        self.override_config('quota_resources_check_interval', 60)
+        engine = quota.VolumeTypeQuotaEngine()
+
+        resources = engine.resources
+        self.assertIs(resources, quota.VolumeTypeQuotaEngine().resources)
+        self.assertEqual(1, mock_get_all.call_count)
+        self.assertEqual(1, mock_generation.call_count)
+
+        # Changes in this process are seen immediately
+        engine.invalidate_resources()
+        self.assertIsNot(resources, engine.resources)
+        self.assertEqual(2, mock_get_all.call_count)
+
+    @mock.patch.object(db, 'volume_type_get_generation', return_value=1)
+    @mock.patch.object(db, 'volume_type_get_all', return_value={})
+    def test_resources_check_database(self, mock_get_all, mock_generation):
+        engine = quota.VolumeTypeQuotaEngine()
+
+        resources = engine.resources
+        self.assertIs(resources, engine.resources)
+        self.assertEqual(2, mock_generation.call_count)
+        self.assertEqual(1, mock_get_all.call_count)
+
+        mock_generation.return_value = 2
+        self.assertIsNot(resources, engine.resources)
+        self.assertEqual(2, mock_get_all.call_count)
+
+    def test_reserve_new_volume_type(self):
+        self.override_config('quota_resources_check_interval', 60)
+        ctx = context.RequestContext('admin', 'admin', is_admin=True)
+        engine = quota.VolumeTypeQuotaEngine()
+        self.assertNotIn('volumes_type1', engine.resource_names)
+
+        # Created by another process
+        db.volume_type_create(ctx, {'name': 'type1'})
+        reservations = engine.reserve(ctx, volumes_type1=1)
+
+        self.assertEqual(1, len(reservations))
+        self.assertIn('volumes_type1', engine.resource_names)
+        self.assertRaises(exception.QuotaResourceUnknown, engine.reserve,
+                          ctx, volumes_type2=1)
+
 
 class DbQuotaDriverBaseTestCase(test.TestCase):
     def setUp(self):
@@ -1647,25 +1692,6 @@ class NestedQuotaValidation(NestedDbQuotaDriverBaseTestCase):
         self.assertEqual(1, self.driver._allocated['B']['volumes'])
 
 
-class FakeSession(object):
-    def begin(self):
-        return self
-
-    def __enter__(self):
-        return self
-
-    def __exit__(self, exc_type, exc_value, exc_traceback):
-        return False
-
-    def query(self, *args, **kwargs):
-        pass
-
-
-class FakeUsage(sqa_models.QuotaUsage):
-    def save(self, *args, **kwargs):
-        pass
-
-
 class QuotaReserveSqlAlchemyTestCase(test.TestCase):
     # cinder.db.sqlalchemy.api.quota_reserve is so complex it needs its
     # own test case, and since it's a quota manipulator, this is the
@@ -1681,10 +1707,10 @@ class QuotaReserveSqlAlchemyTestCase(test.TestCase):
                           volume_type_name=None, session=None):
                 self.sync_called.add(res_name)
                 if res_name in self.usages:
-                    if self.usages[res_name].in_use < 0:
+                    if self.usages[res_name]['in_use'] < 0:
                         return {res_name: 2}
                     else:
-                        return {res_name: self.usages[res_name].in_use - 1}
+                        return {res_name: self.usages[res_name]['in_use'] - 1}
                 return {res_name: 0}
             return fake_sync
 
@@ -1697,38 +1723,9 @@ class QuotaReserveSqlAlchemyTestCase(test.TestCase):
 
         self.mock_object(sqa_api, 'QUOTA_SYNC_FUNCTIONS', QUOTA_SYNC_FUNCTIONS)
         self.expire = timeutils.utcnow() + datetime.timedelta(seconds=3600)
+        self.context = context.RequestContext('fake_user', 'test_project')
 
         self.usages = {}
-        self.usages_created = {}
-        self.reservations_created = {}
-
-        def fake_get_session():
-            return FakeSession()
-
-        def fake_get_quota_usages(context, session, project_id):
-            return self.usages.copy()
-
-        def fake_quota_usage_create(context, project_id, resource, in_use,
-                                    reserved, until_refresh, session=None,
-                                    save=True):
-            quota_usage_ref = self._make_quota_usage(
-                project_id, resource, in_use, reserved, until_refresh,
-                timeutils.utcnow(), timeutils.utcnow())
-
-            self.usages_created[resource] = quota_usage_ref
-
-            return quota_usage_ref
-
-        def fake_reservation_create(context, uuid, usage_id, project_id,
-                                    resource, delta, expire, session=None,
-                                    allocated_id=None):
-            reservation_ref = self._make_reservation(
-                uuid, usage_id, project_id, resource, delta, expire,
-                timeutils.utcnow(), timeutils.utcnow(), allocated_id)
-
-            self.reservations_created[resource] = reservation_ref
-
-            return reservation_ref
 
         def fake_qagabp(context, project_id):
             self.assertEqual('test_project', project_id)
@@ -1736,48 +1733,29 @@ class QuotaReserveSqlAlchemyTestCase(test.TestCase):
 
         self.mock_object(sqa_api, 'quota_allocated_get_all_by_project',
                          fake_qagabp)
-        self.mock_object(sqa_api, 'get_session',
-                         fake_get_session)
-        self.mock_object(sqa_api, '_get_quota_usages',
-                         fake_get_quota_usages)
-        self.mock_object(sqa_api, '_quota_usage_create',
-                         fake_quota_usage_create)
-        self.mock_object(sqa_api, '_reservation_create',
-                         fake_reservation_create)
-
-        patcher = mock.patch.object(timeutils, 'utcnow')
-        self.addCleanup(patcher.stop)
-        self.mock_utcnow = patcher.start()
-        self.mock_utcnow.return_value = datetime.datetime.utcnow()
-
-    def _make_quota_usage(self, project_id, resource, in_use, reserved,
-                          until_refresh, created_at, updated_at):
-        quota_usage_ref = FakeUsage()
-        quota_usage_ref.id = len(self.usages) + len(self.usages_created)
-        quota_usage_ref.project_id = project_id
-        quota_usage_ref.resource = resource
-        quota_usage_ref.in_use = in_use
-        quota_usage_ref.reserved = reserved
-        quota_usage_ref.until_refresh = until_refresh
-        quota_usage_ref.created_at = created_at
-        quota_usage_ref.updated_at = updated_at
-        quota_usage_ref.deleted_at = None
-        quota_usage_ref.deleted = False
-
-        return quota_usage_ref
 
     def init_usage(self, project_id, resource, in_use, reserved,
                    until_refresh=None, created_at=None, updated_at=None):
-        if created_at is None:
-            created_at = timeutils.utcnow()
-        if updated_at is None:
-            updated_at = timeutils.utcnow()
-
-        quota_usage_ref = self._make_quota_usage(project_id, resource, in_use,
-                                                 reserved, until_refresh,
-                                                 created_at, updated_at)
-
-        self.usages[resource] = quota_usage_ref
+        session = sqa_api.get_session()
+        with session.begin():
+            usage = sqa_api._quota_usage_create(self.context.elevated(),
+                                                project_id, resource, in_use,
+                                                reserved, until_refresh,
+                                                session=session)
+        if created_at is not None:
+            sqa_api.model_query(self.context, sqa_models.QuotaUsage,
+                                read_deleted='no').\
+                filter_by(id=usage.id).\
+                update({'created_at': created_at,
+                        'updated_at': updated_at})
+        self.usages[resource] = {'id': usage.id, 'in_use': in_use}
+
+    def get_usages(self):
+        rows = sqa_api.model_query(self.context, sqa_models.QuotaUsage,
+                                   read_deleted='no').\
+            filter_by(project_id='test_project').\
+            all()
+        return {row.resource: row for row in rows}
 
     def compare_usage(self, usage_dict, expected):
         for usage in expected:
@@ -1788,41 +1766,23 @@ class QuotaReserveSqlAlchemyTestCase(test.TestCase):
                                  "%s != %s on usage for resource %s" %
                                  (actual, value, resource))
 
-    def _make_reservation(self, uuid, usage_id, project_id, resource,
-                          delta, expire, created_at, updated_at, alloc_id):
-        reservation_ref = sqa_models.Reservation()
-        reservation_ref.id = len(self.reservations_created)
-        reservation_ref.uuid = uuid
-        reservation_ref.usage_id = usage_id
-        reservation_ref.project_id = project_id
-        reservation_ref.resource = resource
-        reservation_ref.delta = delta
-        reservation_ref.expire = expire
-        reservation_ref.created_at = created_at
-        reservation_ref.updated_at = updated_at
-        reservation_ref.deleted_at = None
-        reservation_ref.deleted = False
-        reservation_ref.allocated_id = alloc_id
-
-        return reservation_ref
-
     def compare_reservation(self, reservations, expected):
-        reservations = set(reservations)
+        rows = sqa_api.model_query(self.context, sqa_models.Reservation,
+                                   read_deleted='no').\
+            filter(sqa_models.Reservation.uuid.in_(reservations)).\
+            all()
+        self.assertEqual(len(reservations), len(rows))
+        rows = {row.resource: row for row in rows}
+        self.assertEqual(len(expected), len(rows))
+
         for resv in expected:
             resource = resv['resource']
-            resv_obj = self.reservations_created[resource]
-
-            self.assertIn(resv_obj.uuid, reservations)
-            reservations.discard(resv_obj.uuid)
-
             for key, value in resv.items():
-                actual = getattr(resv_obj, key)
+                actual = getattr(rows[resource], key)
                 self.assertEqual(value, actual,
                                  "%s != %s on reservation for resource %s" %
                                  (actual, value, resource))
 
-        self.assertEqual(0, len(reservations))
-
     def _mock_allocated_get_all_by_project(self, allocated_quota=False):
         def fake_qagabp(context, project_id):
             self.assertEqual('test_project', project_id)
@@ -1835,7 +1795,6 @@ class QuotaReserveSqlAlchemyTestCase(test.TestCase):
                          fake_qagabp)
 
     def test_quota_reserve_with_allocated(self):
-        context = FakeContext('test_project', 'test_class')
         # Allocated quota for volume will be updated for 3
         self._mock_allocated_get_all_by_project(allocated_quota=True)
         # Quota limited for volume updated for 10
@@ -1844,17 +1803,18 @@ class QuotaReserveSqlAlchemyTestCase(test.TestCase):
         # Try reserve 7 volumes
         deltas = dict(volumes=7,
                       gigabytes=2 * 1024, )
-        result = sqa_api.quota_reserve(context, self.resources, quotas,
+        result = sqa_api.quota_reserve(self.context, self.resources, quotas,
                                        deltas, self.expire, 5, 0)
         # The reservation works
+        usages = self.get_usages()
         self.compare_reservation(
             result,
             [dict(resource='volumes',
-                  usage_id=self.usages_created['volumes'],
+                  usage_id=usages['volumes'].id,
                   project_id='test_project',
                   delta=7),
              dict(resource='gigabytes',
-                  usage_id=self.usages_created['gigabytes'],
+                  usage_id=usages['gigabytes'].id,
                   delta=2 * 1024), ])
         # But if we try reserve 8 volumes(more free quota that we have)
         deltas = dict(volumes=8,
@@ -1862,21 +1822,21 @@ class QuotaReserveSqlAlchemyTestCase(test.TestCase):
 
         self.assertRaises(exception.OverQuota,
                           sqa_api.quota_reserve,
-                          context, self.resources, quotas,
+                          self.context, self.resources, quotas,
                           deltas, self.expire, 0, 0)
 
     def test_quota_reserve_create_usages(self):
-        context = FakeContext('test_project', 'test_class')
         quotas = dict(volumes=5,
                       gigabytes=10 * 1024, )
         deltas = dict(volumes=2,
                       gigabytes=2 * 1024, )
         self._mock_allocated_get_all_by_project()
-        result = sqa_api.quota_reserve(context, self.resources, quotas,
+        result = sqa_api.quota_reserve(self.context, self.resources, quotas,
                                        deltas, self.expire, 0, 0)
 
         self.assertEqual(set(['volumes', 'gigabytes']), self.sync_called)
-        self.compare_usage(self.usages_created,
+        usages = self.get_usages()
+        self.compare_usage(usages,
                            [dict(resource='volumes',
                                  project_id='test_project',
                                  in_use=0,
@@ -1890,77 +1850,97 @@ class QuotaReserveSqlAlchemyTestCase(test.TestCase):
         self.compare_reservation(
             result,
             [dict(resource='volumes',
-                  usage_id=self.usages_created['volumes'],
+                  usage_id=usages['volumes'].id,
                   project_id='test_project',
                   delta=2),
              dict(resource='gigabytes',
-                  usage_id=self.usages_created['gigabytes'],
+                  usage_id=usages['gigabytes'].id,
                   delta=2 * 1024), ])
 
     def test_quota_reserve_negative_in_use(self):
         self.init_usage('test_project', 'volumes', -1, 0, until_refresh=1)
         self.init_usage('test_project', 'gigabytes', -1, 0, until_refresh=1)
-        context = FakeContext('test_project', 'test_class')
         quotas = dict(volumes=5,
                       gigabytes=10 * 1024, )
         deltas = dict(volumes=2,
                       gigabytes=2 * 1024, )
         self._mock_allocated_get_all_by_project()
-        result = sqa_api.quota_reserve(context, self.resources, quotas,
+        result = sqa_api.quota_reserve(self.context, self.resources, quotas,
                                        deltas, self.expire, 5, 0)
 
         self.assertEqual(set(['volumes', 'gigabytes']), self.sync_called)
-        self.compare_usage(self.usages, [dict(resource='volumes',
-                                              project_id='test_project',
-                                              in_use=2,
-                                              reserved=2,
-                                              until_refresh=5),
-                                         dict(resource='gigabytes',
-                                              project_id='test_project',
-                                              in_use=2,
-                                              reserved=2 * 1024,
-                                              until_refresh=5), ])
-        self.assertEqual({}, self.usages_created)
+        usages = self.get_usages()
+        self.compare_usage(usages, [dict(resource='volumes',
+                                         project_id='test_project',
+                                         in_use=2,
+                                         reserved=2,
+                                         until_refresh=5),
+                                    dict(resource='gigabytes',
+                                         project_id='test_project',
+                                         in_use=2,
+                                         reserved=2 * 1024,
+                                         until_refresh=5), ])
+        self.assertEqual(2, len(usages))
         self.compare_reservation(result,
                                  [dict(resource='volumes',
-                                       usage_id=self.usages['volumes'],
+                                       usage_id=self.usages['volumes']['id'],
                                        project_id='test_project',
                                        delta=2),
                                   dict(resource='gigabytes',
-                                       usage_id=self.usages['gigabytes'],
+                                       usage_id=self.usages['gigabytes']['id'],
                                        delta=2 * 1024), ])
 
     def test_quota_reserve_until_refresh(self):
         self.init_usage('test_project', 'volumes', 3, 0, until_refresh=1)
         self.init_usage('test_project', 'gigabytes', 3, 0, until_refresh=1)
-        context = FakeContext('test_project', 'test_class')
         quotas = dict(volumes=5, gigabytes=10 * 1024, )
         deltas = dict(volumes=2, gigabytes=2 * 1024, )
         self._mock_allocated_get_all_by_project()
-        result = sqa_api.quota_reserve(context, self.resources, quotas,
+        result = sqa_api.quota_reserve(self.context, self.resources, quotas,
                                        deltas, self.expire, 5, 0)
 
         self.assertEqual(set(['volumes', 'gigabytes']), self.sync_called)
-        self.compare_usage(self.usages, [dict(resource='volumes',
-                                              project_id='test_project',
-                                              in_use=2,
-                                              reserved=2,
-                                              until_refresh=5),
-                                         dict(resource='gigabytes',
-                                              project_id='test_project',
-                                              in_use=2,
-                                              reserved=2 * 1024,
-                                              until_refresh=5), ])
-        self.assertEqual({}, self.usages_created)
+        usages = self.get_usages()
+        self.compare_usage(usages, [dict(resource='volumes',
+                                         project_id='test_project',
+                                         in_use=2,
+                                         reserved=2,
+                                         until_refresh=5),
+                                    dict(resource='gigabytes',
+                                         project_id='test_project',
+                                         in_use=2,
+                                         reserved=2 * 1024,
+                                         until_refresh=5), ])
+        self.assertEqual(2, len(usages))
         self.compare_reservation(result,
                                  [dict(resource='volumes',
-                                       usage_id=self.usages['volumes'],
+                                       usage_id=self.usages['volumes']['id'],
                                        project_id='test_project',
                                        delta=2),
                                   dict(resource='gigabytes',
-                                       usage_id=self.usages['gigabytes'],
+                                       usage_id=self.usages['gigabytes']['id'],
                                        delta=2 * 1024), ])
 
+    def test_quota_reserve_until_refresh_decrement(self):
+        self.init_usage('test_project', 'volumes', 3, 0, until_refresh=3)
+        self.init_usage('test_project', 'gigabytes', 3, 0, until_refresh=3)
+        quotas = dict(volumes=5, gigabytes=10 * 1024, )
+        deltas = dict(volumes=2, gigabytes=2 * 1024, )
+        self._mock_allocated_get_all_by_project()
+        sqa_api.quota_reserve(self.context, self.resources, quotas,
+                              deltas, self.expire, 5, 0)
+
+        self.assertEqual(set(), self.sync_called)
+        self.compare_usage(self.get_usages(),
+                           [dict(resource='volumes',
+                                 in_use=3,
+                                 reserved=2,
+                                 until_refresh=2),
+                            dict(resource='gigabytes',
+                                 in_use=3,
+                                 reserved=2 * 1024,
+                                 until_refresh=2), ])
+
     def test_quota_reserve_max_age(self):
         max_age = 3600
         record_created = (timeutils.utcnow() -
@@ -1969,151 +1949,177 @@ class QuotaReserveSqlAlchemyTestCase(test.TestCase):
                         created_at=record_created, updated_at=record_created)
         self.init_usage('test_project', 'gigabytes', 3, 0,
                         created_at=record_created, updated_at=record_created)
-        context = FakeContext('test_project', 'test_class')
         quotas = dict(volumes=5, gigabytes=10 * 1024, )
         deltas = dict(volumes=2, gigabytes=2 * 1024, )
         self._mock_allocated_get_all_by_project()
-        result = sqa_api.quota_reserve(context, self.resources, quotas,
+        result = sqa_api.quota_reserve(self.context, self.resources, quotas,
                                        deltas, self.expire, 0, max_age)
 
         self.assertEqual(set(['volumes', 'gigabytes']), self.sync_called)
-        self.compare_usage(self.usages, [dict(resource='volumes',
-                                              project_id='test_project',
-                                              in_use=2,
-                                              reserved=2,
-                                              until_refresh=None),
-                                         dict(resource='gigabytes',
-                                              project_id='test_project',
-                                              in_use=2,
-                                              reserved=2 * 1024,
-                                              until_refresh=None), ])
-        self.assertEqual({}, self.usages_created)
+        usages = self.get_usages()
+        self.compare_usage(usages, [dict(resource='volumes',
+                                         project_id='test_project',
+                                         in_use=2,
+                                         reserved=2,
+                                         until_refresh=None),
+                                    dict(resource='gigabytes',
+                                         project_id='test_project',
+                                         in_use=2,
+                                         reserved=2 * 1024,
+                                         until_refresh=None), ])
+        self.assertEqual(2, len(usages))
         self.compare_reservation(result,
                                  [dict(resource='volumes',
-                                       usage_id=self.usages['volumes'],
+                                       usage_id=self.usages['volumes']['id'],
                                        project_id='test_project',
                                        delta=2),
                                   dict(resource='gigabytes',
-                                       usage_id=self.usages['gigabytes'],
+                                       usage_id=self.usages['gigabytes']['id'],
                                        delta=2 * 1024), ])
 
     def test_quota_reserve_no_refresh(self):
         self.init_usage('test_project', 'volumes', 3, 0)
         self.init_usage('test_project', 'gigabytes', 3, 0)
-        context = FakeContext('test_project', 'test_class')
         quotas = dict(volumes=5, gigabytes=10 * 1024, )
         deltas = dict(volumes=2, gigabytes=2 * 1024, )
         self._mock_allocated_get_all_by_project()
-        result = sqa_api.quota_reserve(context, self.resources, quotas,
+        result = sqa_api.quota_reserve(self.context, self.resources, quotas,
                                        deltas, self.expire, 0, 0)
 
         self.assertEqual(set([]), self.sync_called)
-        self.compare_usage(self.usages, [dict(resource='volumes',
-                                              project_id='test_project',
-                                              in_use=3,
-                                              reserved=2,
-                                              until_refresh=None),
-                                         dict(resource='gigabytes',
-                                              project_id='test_project',
-                                              in_use=3,
-                                              reserved=2 * 1024,
-                                              until_refresh=None), ])
-        self.assertEqual({}, self.usages_created)
+        usages = self.get_usages()
+        self.compare_usage(usages, [dict(resource='volumes',
+                                         project_id='test_project',
+                                         in_use=3,
+                                         reserved=2,
+                                         until_refresh=None),
+                                    dict(resource='gigabytes',
+                                         project_id='test_project',
+                                         in_use=3,
+                                         reserved=2 * 1024,
+                                         until_refresh=None), ])
+        self.assertEqual(2, len(usages))
         self.compare_reservation(result,
                                  [dict(resource='volumes',
-                                       usage_id=self.usages['volumes'],
+                                       usage_id=self.usages['volumes']['id'],
                                        project_id='test_project',
                                        delta=2),
                                   dict(resource='gigabytes',
-                                       usage_id=self.usages['gigabytes'],
+                                       usage_id=self.usages['gigabytes']['id'],
                                        delta=2 * 1024), ])
 
     def test_quota_reserve_unders(self):
         self.init_usage('test_project', 'volumes', 1, 0)
         self.init_usage('test_project', 'gigabytes', 1 * 1024, 0)
-        context = FakeContext('test_project', 'test_class')
         quotas = dict(volumes=5, gigabytes=10 * 1024, )
         deltas = dict(volumes=-2, gigabytes=-2 * 1024, )
         self._mock_allocated_get_all_by_project()
-        result = sqa_api.quota_reserve(context, self.resources, quotas,
+        result = sqa_api.quota_reserve(self.context, self.resources, quotas,
                                        deltas, self.expire, 0, 0)
 
         self.assertEqual(set([]), self.sync_called)
-        self.compare_usage(self.usages, [dict(resource='volumes',
-                                              project_id='test_project',
-                                              in_use=1,
-                                              reserved=0,
-                                              until_refresh=None),
-                                         dict(resource='gigabytes',
-                                              project_id='test_project',
-                                              in_use=1 * 1024,
-                                              reserved=0,
-                                              until_refresh=None), ])
-        self.assertEqual({}, self.usages_created)
+        usages = self.get_usages()
+        self.compare_usage(usages, [dict(resource='volumes',
+                                         project_id='test_project',
+                                         in_use=1,
+                                         reserved=0,
+                                         until_refresh=None),
+                                    dict(resource='gigabytes',
+                                         project_id='test_project',
+                                         in_use=1 * 1024,
+                                         reserved=0,
+                                         until_refresh=None), ])
+        self.assertEqual(2, len(usages))
         self.compare_reservation(result,
                                  [dict(resource='volumes',
-                                       usage_id=self.usages['volumes'],
+                                       usage_id=self.usages['volumes']['id'],
                                        project_id='test_project',
                                        delta=-2),
                                   dict(resource='gigabytes',
-                                       usage_id=self.usages['gigabytes'],
+                                       usage_id=self.usages['gigabytes']['id'],
                                        delta=-2 * 1024), ])
 
     def test_quota_reserve_overs(self):
         self.init_usage('test_project', 'volumes', 4, 0)
         self.init_usage('test_project', 'gigabytes', 10 * 1024, 0)
-        context = FakeContext('test_project', 'test_class')
         quotas = dict(volumes=5, gigabytes=10 * 1024, )
         deltas = dict(volumes=2, gigabytes=2 * 1024, )
         self._mock_allocated_get_all_by_project()
         self.assertRaises(exception.OverQuota,
                           sqa_api.quota_reserve,
-                          context, self.resources, quotas,
+                          self.context, self.resources, quotas,
                           deltas, self.expire, 0, 0)
 
         self.assertEqual(set([]), self.sync_called)
-        self.compare_usage(self.usages, [dict(resource='volumes',
-                                              project_id='test_project',
-                                              in_use=4,
-                                              reserved=0,
-                                              until_refresh=None),
-                                         dict(resource='gigabytes',
-                                              project_id='test_project',
-                                              in_use=10 * 1024,
-                                              reserved=0,
-                                              until_refresh=None), ])
-        self.assertEqual({}, self.usages_created)
-        self.assertEqual({}, self.reservations_created)
+        usages = self.get_usages()
+        self.compare_usage(usages, [dict(resource='volumes',
+                                         project_id='test_project',
+                                         in_use=4,
+                                         reserved=0,
+                                         until_refresh=None),
+                                    dict(resource='gigabytes',
+                                         project_id='test_project',
+                                         in_use=10 * 1024,
+                                         reserved=0,
+                                         until_refresh=None), ])
+        self.assertEqual(2, len(usages))
+        self.assertEqual([], sqa_api.model_query(
+            self.context, sqa_models.Reservation, read_deleted='no').all())
+
+    def test_quota_reserve_overs_keeps_refresh(self):
+        self.init_usage('test_project', 'volumes', -1, 0, until_refresh=1)
+        self.init_usage('test_project', 'gigabytes', 3, 0)
+        quotas = dict(volumes=3, gigabytes=10 * 1024, )
+        deltas = dict(volumes=2, gigabytes=2 * 1024, )
+        self._mock_allocated_get_all_by_project()
+        exc = self.assertRaises(exception.OverQuota,
+                                sqa_api.quota_reserve,
+                                self.context, self.resources, quotas,
+                                deltas, self.expire, 5, 0)
+
+        self.assertEqual(['volumes'], exc.kwargs['overs'])
+        self.assertEqual(set(['volumes']), self.sync_called)
+        # The refresh is kept, but not the reservation of gigabytes
+        self.compare_usage(self.get_usages(),
+                           [dict(resource='volumes',
+                                 in_use=2,
+                                 reserved=0,
+                                 until_refresh=5),
+                            dict(resource='gigabytes',
+                                 in_use=3,
+                                 reserved=0), ])
+        self.assertEqual([], sqa_api.model_query(
+            self.context, sqa_models.Reservation, read_deleted='no').all())
 
     def test_quota_reserve_reduction(self):
         self.init_usage('test_project', 'volumes', 10, 0)
         self.init_usage('test_project', 'gigabytes', 20 * 1024, 0)
-        context = FakeContext('test_project', 'test_class')
         quotas = dict(volumes=5, gigabytes=10 * 1024, )
         deltas = dict(volumes=-2, gigabytes=-2 * 1024, )
         self._mock_allocated_get_all_by_project()
-        result = sqa_api.quota_reserve(context, self.resources, quotas,
+        result = sqa_api.quota_reserve(self.context, self.resources, quotas,
                                        deltas, self.expire, 0, 0)
 
         self.assertEqual(set([]), self.sync_called)
-        self.compare_usage(self.usages, [dict(resource='volumes',
-                                              project_id='test_project',
-                                              in_use=10,
-                                              reserved=0,
-                                              until_refresh=None),
-                                         dict(resource='gigabytes',
-                                              project_id='test_project',
-                                              in_use=20 * 1024,
-                                              reserved=0,
-                                              until_refresh=None), ])
-        self.assertEqual({}, self.usages_created)
+        usages = self.get_usages()
+        self.compare_usage(usages, [dict(resource='volumes',
+                                         project_id='test_project',
+                                         in_use=10,
+                                         reserved=0,
+                                         until_refresh=None),
+                                    dict(resource='gigabytes',
+                                         project_id='test_project',
+                                         in_use=20 * 1024,
+                                         reserved=0,
+                                         until_refresh=None), ])
+        self.assertEqual(2, len(usages))
         self.compare_reservation(result,
                                  [dict(resource='volumes',
-                                       usage_id=self.usages['volumes'],
+                                       usage_id=self.usages['volumes']['id'],
                                        project_id='test_project',
                                        delta=-2),
                                   dict(resource='gigabytes',
-                                       usage_id=self.usages['gigabytes'],
+                                       usage_id=self.usages['gigabytes']['id'],
                                        project_id='test_project',
                                        delta=-2 * 1024), ])
 
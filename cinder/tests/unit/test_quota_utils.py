@@ -16,9 +16,11 @@
 import mock
 
 from cinder import context
+from cinder import db
 from cinder import exception
 from cinder import quota_utils
 from cinder import test
+from cinder import utils
 
 from keystoneclient import exceptions
 
@@ -54,6 +56,17 @@ class QuotaUtilsTest(test.TestCase):
                                                session=ksclient_session(),
                                                version=(3, 0))
 
+    @mock.patch('keystoneclient.client.Client')
+    @mock.patch('keystoneclient.session.Session')
+    def test_keystone_client_shares_http_session(self, ksclient_session,
+                                                 ksclient_class):
+        quota_utils._keystone_client(self.context)
+        quota_utils._keystone_client(self.context)
+        sessions = [call[1]['session']
+                    for call in ksclient_session.call_args_list]
+        self.assertEqual(2, len(sessions))
+        self.assertIs(sessions[0], sessions[1])
+
     @mock.patch('keystoneclient.client.Client')
     def test_get_project_keystoneclient_v2(self, ksclient_class):
         keystoneclient = ksclient_class.return_value
@@ -241,3 +254,101 @@ class QuotaUtilsTest(test.TestCase):
             overs, usages, quotas,
             exception.UnexpectedOverQuota,
             resource='snapshots')
+
+
+class ProjectHierarchyCacheTestCase(test.TestCase):
+
+    def setUp(self):
+        super(ProjectHierarchyCacheTestCase, self).setUp()
+        self.context = context.RequestContext('fake_user', 'fake_proj_id')
+        self.override_config('project_hierarchy_cache_ttl', 300)
+        self.override_config('project_hierarchy_cache_check_interval', 10)
+        self.now = 1000.0
+        self.mock_object(utils.time, 'time', lambda: self.now)
+
+        patcher = mock.patch('keystoneclient.client.Client')
+        self.ksclient = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        self.ksclient.version = 'v3'
+        self.ksclient.projects.get.side_effect = self._get_project
+
+    @staticmethod
+    def _get_project(project_id, subtree_as_ids=False, parents_as_ids=False):
+        project = QuotaUtilsTest.FakeProject(project_id, 'bar')
+        project.parents = {'bar': {'default': None}}
+        return project
+
+    def _get(self, project_id='foo', is_admin_project=False):
+        return quota_utils.get_project_hierarchy(
+            self.context, project_id, parents_as_ids=True,
+            is_admin_project=is_admin_project)
+
+    def test_cached(self):
+        project = self._get()
+        project.parents['baz'] = None
+        admin_project = self._get(is_admin_project=True)
+
+        self.assertEqual(1, self.ksclient.projects.get.call_count)
+        self.assertEqual({'bar': None}, admin_project.parents)
+        self.assertFalse(project.is_admin_project)
+        self.assertTrue(admin_project.is_admin_project)
+        self.assertEqual({'hits': 1, 'misses': 1, 'invalidations': 0,
+                          'size': 1}, quota_utils.get_cache_stats())
+
+    def test_not_shared_between_users(self):
+        self._get()
+        self.context = context.RequestContext('other_user', 'fake_proj_id')
+        self._get()
+        self.assertEqual(2, self.ksclient.projects.get.call_count)
+
+    def test_not_shared_between_roles(self):
+        self._get()
+        self.context = context.RequestContext('fake_user', 'fake_proj_id',
+                                              roles=['admin'])
+        self._get()
+        self._get()
+        self.assertEqual(2, self.ksclient.projects.get.call_count)
+
+    def test_expired(self):
+        self._get()
+        self.now += 301
+        self._get()
+        self.assertEqual(2, self.ksclient.projects.get.call_count)
+
+    def test_disabled(self):
+        self.override_config('project_hierarchy_cache_ttl', 0)
+        self._get()
+        self._get()
+        self.assertEqual(2, self.ksclient.projects.get.call_count)
+
+    def test_least_recently_used_dropped(self):
+        self.override_config('project_hierarchy_cache_size', 2)
+        self._get('p1')
+        self._get('p2')
+        self._get('p1')
+        self._get('p3')
+        self.assertEqual(3, self.ksclient.projects.get.call_count)
+
+        self._get('p1')
+        self.assertEqual(3, self.ksclient.projects.get.call_count)
+        self._get('p2')
+        self.assertEqual(4, self.ksclient.projects.get.call_count)
+
+    def test_flushed_by_other_process(self):
+        self._get()
+        # As done by cinder-manage in another process
+        db.cache_generation_bump(context.get_admin_context(),
+                                 quota_utils.PROJECT_HIERARCHY_CACHE)
+        self._get()
+        self.assertEqual(1, self.ksclient.projects.get.call_count)
+
+        self.now += 10
+        self._get()
+        self.assertEqual(2, self.ksclient.projects.get.call_count)
+
+    def test_flush_cache(self):
+        self._get()
+        self.assertEqual(1, quota_utils.flush_cache(
+            context.get_admin_context()))
+        self._get()
+        self.assertEqual(2, self.ksclient.projects.get.call_count)
@@ -0,0 +1,116 @@
+# Copyright (c) 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Benchmark of the commands run as root with and without rootwrap daemon.
+
+The benchmark starts many processes, it is only run when the
+CINDER_ROOTWRAP_BENCHMARK environment variable is set.
+CINDER_ROOTWRAP_BENCHMARK_COMMANDS commands (20 by default) are run through
+utils.execute with a cinder-rootwrap process per command, then through the
+rootwrap daemon.  Both use the same filters and run as the current user
+instead of through sudo; the benchmark is skipped when run as root because
+processutils then runs the commands directly.  The commands per second are
+attached to the test result as the 'benchmark' detail.
+"""
+
+import os
+import sys
+import time
+
+import fixtures
+import mock
+from testtools import content
+
+from cinder import test
+from cinder import utils
+
+
+ROOTWRAP_CONF = """[DEFAULT]
+filters_path=%(filters_path)s
+exec_dirs=/sbin,/usr/sbin,/bin,/usr/bin
+use_syslog=False
+"""
+
+ROOTWRAP_FILTERS = """[Filters]
+echo: CommandFilter, echo, root
+"""
+
+
+class RootwrapDaemonBenchmarkTestCase(test.TestCase):
+
+    def setUp(self):
+        super(RootwrapDaemonBenchmarkTestCase, self).setUp()
+        if not os.environ.get('CINDER_ROOTWRAP_BENCHMARK'):
+            self.skipTest('Set CINDER_ROOTWRAP_BENCHMARK to run the '
+                          'benchmark')
+        if os.geteuid() == 0:
+            # processutils does not use the root helper when run as root
+            self.skipTest('The benchmark must not be run as root')
+        self.commands = int(
+            os.environ.get('CINDER_ROOTWRAP_BENCHMARK_COMMANDS', 20))
+
+        tempdir = self.useFixture(fixtures.TempDir()).path
+        filters_path = os.path.join(tempdir, 'rootwrap.d')
+        os.mkdir(filters_path)
+        with open(os.path.join(filters_path, 'benchmark.filters'), 'w') as f:
+            f.write(ROOTWRAP_FILTERS)
+        rootwrap_config = os.path.join(tempdir, 'rootwrap.conf')
+        with open(rootwrap_config, 'w') as f:
+            f.write(ROOTWRAP_CONF % {'filters_path': filters_path})
+
+        root_helper = '%s -c "from oslo_rootwrap import cmd; cmd.main()" %s'
+        self.mock_object(utils, 'get_root_helper',
+                         return_value=root_helper % (sys.executable,
+                                                     rootwrap_config))
+        self.mock_object(
+            utils, 'get_rootwrap_daemon_command',
+            return_value=[sys.executable, '-c',
+                          'from oslo_rootwrap import cmd; cmd.daemon()',
+                          rootwrap_config])
+        self.addCleanup(self._stop_daemons)
+
+    @staticmethod
+    def _stop_daemons():
+        for client in utils._rootwrap_daemon_clients.values():
+            # Set once the daemon is started, stops it
+            if client._finalize is not None:
+                client._finalize()
+        utils._rootwrap_daemon_clients.clear()
+
+    def _run_commands(self):
+        start = time.time()
+        outputs = [utils.execute('echo', i, run_as_root=True)[0]
+                   for i in range(self.commands)]
+        return outputs, self.commands / (time.time() - start)
+
+    def test_rootwrap_daemon(self):
+        self.override_config('use_rootwrap_daemon', False)
+        with mock.patch.object(utils, '_rootwrap_daemon_execute') as daemon:
+            expected, rootwrap_rate = self._run_commands()
+        self.assertFalse(daemon.called)
+
+        self.override_config('use_rootwrap_daemon', True)
+        # The first command starts the daemon
+        utils.execute('echo', run_as_root=True)
+        outputs, daemon_rate = self._run_commands()
+
+        self.addDetail('benchmark', content.text_content(
+            '%d commands\n'
+            'cinder-rootwrap  %8.1f commands/s\n'
+            'rootwrap daemon  %8.1f commands/s\n' %
+            (self.commands, rootwrap_rate, daemon_rate)))
+        self.assertEqual(['%d\n' % i for i in range(self.commands)],
+                         expected)
+        self.assertEqual(expected, outputs)
@@ -62,6 +62,63 @@ class ExecuteTestCase(test.TestCase):
                                                 run_as_root=True,
                                                 root_helper=mock_helper)
 
+    @mock.patch('cinder.utils._get_rootwrap_daemon_client')
+    @mock.patch('cinder.utils.processutils.execute')
+    def test_execute_rootwrap_daemon(self, mock_putils_exe, mock_client):
+        self.override_config('use_rootwrap_daemon', True)
+        mock_execute = mock_client.return_value.execute
+        mock_execute.return_value = (0, 'out', 'err')
+
+        output = utils.execute('a', 1, process_input='in', run_as_root=True)
+
+        self.assertEqual(('out', 'err'), output)
+        mock_execute.assert_called_once_with(['a', '1'], 'in')
+        self.assertFalse(mock_putils_exe.called)
+
+    @mock.patch('cinder.utils._get_rootwrap_daemon_client')
+    @mock.patch('cinder.utils.processutils.execute')
+    def test_execute_rootwrap_daemon_not_used(self, mock_putils_exe,
+                                              mock_client):
+        self.override_config('use_rootwrap_daemon', True)
+
+        utils.execute('a', 1)
+        utils.execute('a', 1, run_as_root=True, root_helper='sudo')
+        utils.execute('a', 1, run_as_root=True, env_variables={'A': 'b'})
+
+        self.assertEqual(3, mock_putils_exe.call_count)
+        self.assertFalse(mock_client.called)
+
+    @mock.patch('cinder.utils._get_rootwrap_daemon_client')
+    def test_execute_rootwrap_daemon_exit_code(self, mock_client):
+        self.override_config('use_rootwrap_daemon', True)
+        mock_execute = mock_client.return_value.execute
+        mock_execute.return_value = (2, 'out', 'err')
+
+        self.assertEqual(('out', 'err'),
+                         utils.execute('a', run_as_root=True,
+                                       check_exit_code=False))
+        self.assertEqual(('out', 'err'),
+                         utils.execute('a', run_as_root=True,
+                                       check_exit_code=[0, 2]))
+        exc = self.assertRaises(putils.ProcessExecutionError,
+                                utils.execute, 'a', run_as_root=True)
+        self.assertEqual(2, exc.exit_code)
+        self.assertEqual('out', exc.stdout)
+        self.assertEqual('err', exc.stderr)
+
+    @mock.patch('cinder.utils.time.sleep')
+    @mock.patch('cinder.utils._get_rootwrap_daemon_client')
+    def test_execute_rootwrap_daemon_attempts(self, mock_client, mock_sleep):
+        self.override_config('use_rootwrap_daemon', True)
+        mock_execute = mock_client.return_value.execute
+        mock_execute.side_effect = [(1, '', 'err'), (0, 'out', '')]
+
+        output = utils.execute('a', run_as_root=True, attempts=2)
+
+        self.assertEqual(('out', ''), output)
+        self.assertEqual(2, mock_execute.call_count)
+        self.assertEqual(1, mock_sleep.call_count)
+
 
 class GenericUtilsTestCase(test.TestCase):
     def test_as_int(self):
@@ -1433,6 +1490,76 @@ class TestComparableMixin(test.TestCase):
                          self.one._compare(1, self.one._cmpkey))
 
 
+@mock.patch('time.time', return_value=1000)
+class GenerationCacheTestCase(test.TestCase):
+
+    def setUp(self):
+        super(GenerationCacheTestCase, self).setUp()
+        self.generation = mock.Mock(return_value=1)
+        self.ttl = 300
+        self.size = None
+        self.cache = utils.GenerationCache(
+            'Test cache', self.generation, ttl=lambda: self.ttl,
+            check_interval=lambda: 10, size=lambda: self.size)
+
+    def test_get(self, mock_time):
+        value = {'key': 'value'}
+        self.assertEqual(value, self.cache.get('key', lambda: value))
+        cached = self.cache.get('key', mock.Mock())
+
+        # Callers get copies of the cached value
+        self.assertEqual(value, cached)
+        self.assertIsNot(value, cached)
+        self.assertEqual({'hits': 1, 'misses': 1, 'invalidations': 0,
+                          'size': 1}, self.cache.get_stats())
+
+    def test_disabled(self, mock_time):
+        self.ttl = 0
+        load = mock.Mock(return_value='value')
+        self.cache.get('key', load)
+        self.cache.get('key', load)
+
+        self.assertEqual(2, load.call_count)
+        self.assertFalse(self.generation.called)
+
+    def test_expired(self, mock_time):
+        load = mock.Mock(side_effect=['first', 'second'])
+        self.assertEqual('first', self.cache.get('key', load))
+        mock_time.return_value = 1299
+        self.assertEqual('first', self.cache.get('key', load))
+        mock_time.return_value = 1300
+        self.assertEqual('second', self.cache.get('key', load))
+
+    def test_least_recently_used_dropped(self, mock_time):
+        self.size = 2
+        self.cache.get('k1', lambda: 1)
+        self.cache.get('k2', lambda: 2)
+        self.cache.get('k1', mock.Mock())
+        self.cache.get('k3', lambda: 3)
+
+        self.assertEqual(['k1', 'k3'], list(self.cache._entries))
+
+    def test_generation_changed(self, mock_time):
+        load = mock.Mock(side_effect=['first', 'second'])
+        self.cache.get('key', load)
+        self.generation.return_value = 2
+
+        # The generation is checked every 10 seconds
+        self.assertEqual('first', self.cache.get('key', load))
+        mock_time.return_value = 1010
+        self.assertEqual('second', self.cache.get('key', load))
+        self.assertEqual(2, self.generation.call_count)
+        self.assertEqual(1, self.cache.invalidations)
+
+    def test_invalidated_while_loading(self, mock_time):
+        def load():
+            self.cache.invalidate()
+            return 'value'
+
+        self.assertEqual('value', self.cache.get('key', load))
+        self.assertEqual(0, self.cache.get_stats()['size'])
+
+
 class TestValidateInteger(test.TestCase):
 
     def test_validate_integer_greater_than_max_int_limit(self):
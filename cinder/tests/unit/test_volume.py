@@ -69,6 +69,7 @@ from cinder import utils
 import cinder.volume
 from cinder.volume import api as volume_api
 from cinder.volume import configuration as conf
+from cinder.volume import copy_scheduler
 from cinder.volume import driver
 from cinder.volume import manager as vol_manager
 from cinder.volume import rpcapi as volume_rpcapi
@@ -372,6 +373,77 @@ class VolumeTestCase(BaseVolumeTestCase):
         self.assertRaises(exception.VolumeNotFound, db.volume_get,
                           context.get_admin_context(), volume_id)
 
+    def test_init_host_reexports_in_use_volumes(self):
+        vol0 = tests_utils.create_volume(self.context, status='in-use',
+                                         size=0, host=CONF.host)
+        vol1 = tests_utils.create_volume(self.context, status='in-use',
+                                         size=0, host=CONF.host)
+
+        def ensure_export(ctxt, volume):
+            if volume.id == vol1.id:
+                raise exception.CinderException()
+
+        with mock.patch.object(self.volume.driver, 'ensure_export',
+                               side_effect=ensure_export) as mock_export:
+            self.volume.init_host()
+
+        self.assertEqual(2, mock_export.call_count)
+        vol0.refresh()
+        vol1.refresh()
+        self.assertEqual('in-use', vol0.status)
+        self.assertEqual('error', vol1.status)
+
+    def test_init_host_reexports_without_bulk_hook(self):
+        vol0 = tests_utils.create_volume(self.context, status='in-use',
+                                         size=0, host=CONF.host)
+        vol1 = tests_utils.create_volume(self.context, status='in-use',
+                                         size=0, host=CONF.host)
+
+        def ensure_export(ctxt, volume):
+            if volume.id == vol1.id:
+                raise exception.CinderException()
+
+        with mock.patch.object(self.volume.driver, 'ensure_exports',
+                               side_effect=NotImplementedError), \
+                mock.patch.object(self.volume.driver, 'ensure_export',
+                                  side_effect=ensure_export) as mock_export:
+            self.volume.init_host()
+
+        self.assertEqual(2, mock_export.call_count)
+        vol0.refresh()
+        vol1.refresh()
+        self.assertEqual('in-use', vol0.status)
+        self.assertEqual('error', vol1.status)
+
+    def test_init_host_bulk_ensure_exports(self):
+        vol0 = tests_utils.create_volume(self.context, status='in-use',
+                                         size=0, host=CONF.host)
+        vol1 = tests_utils.create_volume(self.context, status='in-use',
+                                         size=0, host=CONF.host)
+        vol2 = tests_utils.create_volume(self.context, status='creating',
+                                         size=0, host=CONF.host)
+
+        with mock.patch.object(self.volume.driver, 'ensure_exports',
+                               return_value=[vol1.id]) as mock_exports, \
+                mock.patch.object(self.volume.driver,
+                                  'ensure_export') as mock_export, \
+                mock.patch.object(self.volume.db, 'volumes_update',
+                                  wraps=self.volume.db.volumes_update) as \
+                mock_update:
+            self.volume.init_host()
+
+        self.assertEqual({vol0.id, vol1.id},
+                         {v.id for v in mock_exports.call_args[0][1]})
+        self.assertFalse(mock_export.called)
+        # The status of both volumes is fixed in a single update
+        self.assertEqual(1, mock_update.call_count)
+        vol0.refresh()
+        vol1.refresh()
+        vol2.refresh()
+        self.assertEqual('in-use', vol0.status)
+        self.assertEqual('error', vol1.status)
+        self.assertEqual('error', vol2.status)
+
     def test_init_host_count_allocated_capacity(self):
         vol0 = tests_utils.create_volume(
             self.context, size=100, host=CONF.host)
@@ -447,6 +519,35 @@ class VolumeTestCase(BaseVolumeTestCase):
         self.volume.delete_volume(self.context, vol0.id)
         self.volume.delete_volume(self.context, vol1.id)
 
+    @mock.patch.object(driver.BaseVD, "update_provider_info")
+    def test_init_host_sync_provider_info_other_host(self, mock_update):
+        vol0 = tests_utils.create_volume(
+            self.context, size=1, host=CONF.host)
+        vol1 = tests_utils.create_volume(
+            self.context, size=1, host='other_host')
+        snap0 = tests_utils.create_snapshot(self.context, vol0.id)
+        snap1 = tests_utils.create_snapshot(self.context, vol1.id)
+        # The driver returns updates for resources of another host
+        mock_update.return_value = (
+            [{'id': vol0.id, 'provider_id': '1 2 xxxx'},
+             {'id': vol1.id, 'provider_id': '3 4 yyyy'}],
+            [{'id': snap0.id, 'provider_id': '5 6 xxxx'},
+             {'id': snap1.id, 'provider_id': '7 8 yyyy'}])
+
+        with mock.patch.object(self.volume.db, 'snapshot_get_all') as \
+                mock_get_all:
+            self.volume.init_host()
+
+        self.assertFalse(mock_get_all.called)
+        vol0.refresh()
+        vol1.refresh()
+        snap0.refresh()
+        snap1.refresh()
+        self.assertEqual('1 2 xxxx', vol0.provider_id)
+        self.assertIsNone(vol1.provider_id)
+        self.assertEqual('5 6 xxxx', snap0.provider_id)
+        self.assertIsNone(snap1.provider_id)
+
     @mock.patch.object(driver.BaseVD, "update_provider_info")
     def test_init_host_sync_provider_info_no_update(self, mock_update):
         vol0 = tests_utils.create_volume(
@@ -540,8 +641,70 @@ class VolumeTestCase(BaseVolumeTestCase):
                     m_get_goodness.return_value = mygoodnessfunction
                     manager._report_driver_status(1)
                     self.assertTrue(m_get_stats.called)
+                    expected.update(copy_scheduler.CopyScheduler.
+                                    get_default().get_stats())
                     mock_update.assert_called_once_with(expected)
 
+    @mock.patch.object(vol_manager.VolumeManager,
+                       'update_service_capabilities')
+    @mock.patch('oslo_service.loopingcall.FixedIntervalLoopingCall')
+    def test_report_driver_status_background_collection(self, mock_loop,
+                                                        mock_update):
+        self.override_config('driver_stats_collection_interval', 60)
+        manager = vol_manager.VolumeManager()
+        manager.driver.set_initialized()
+        start = timeutils.utcnow()
+        with mock.patch.object(manager.driver, 'get_volume_stats',
+                               return_value={'name': 'cinder-volumes'}) as \
+                m_get_stats, \
+                mock.patch('oslo_utils.timeutils.utcnow') as mock_utcnow:
+            mock_utcnow.return_value = start
+            manager._start_driver_stats_collector()
+            mock_loop.assert_called_once_with(
+                manager._collect_driver_stats)
+            mock_loop.return_value.start.assert_called_once_with(
+                interval=60, initial_delay=60)
+            self.assertEqual(1, m_get_stats.call_count)
+
+            # The report publishes the stats collected without the driver
+            mock_utcnow.return_value = start + datetime.timedelta(seconds=30)
+            manager._report_driver_status(1)
+            self.assertEqual(1, m_get_stats.call_count)
+            stats = mock_update.call_args[0][0]
+            self.assertEqual('cinder-volumes', stats['name'])
+            self.assertEqual(30, stats['driver_stats_age'])
+            self.assertEqual(0, stats['driver_stats_collection_time'])
+            self.assertEqual(0, stats['driver_stats_failures'])
+
+            # Failed collections keep the last stats collected
+            m_get_stats.side_effect = exception.VolumeBackendAPIException(
+                data='timeout')
+            manager._collect_driver_stats()
+            manager._collect_driver_stats()
+            mock_utcnow.return_value = start + datetime.timedelta(seconds=400)
+            with mock.patch.object(vol_manager.LOG, 'warning') as mock_warn:
+                manager._report_driver_status(1)
+            self.assertTrue(mock_warn.called)
+            stats = mock_update.call_args[0][0]
+            self.assertEqual('cinder-volumes', stats['name'])
+            self.assertEqual(400, stats['driver_stats_age'])
+            self.assertEqual(2, stats['driver_stats_failures'])
+
+    @mock.patch.object(vol_manager.VolumeManager,
+                       'update_service_capabilities')
+    @mock.patch('oslo_service.loopingcall.FixedIntervalLoopingCall')
+    def test_report_driver_status_no_stats_collected(self, mock_loop,
+                                                     mock_update):
+        manager = vol_manager.VolumeManager()
+        manager.driver.set_initialized()
+        with mock.patch.object(
+                manager.driver, 'get_volume_stats',
+                side_effect=exception.VolumeBackendAPIException(
+                    data='timeout')):
+            manager._start_driver_stats_collector()
+            manager._report_driver_status(1)
+        self.assertFalse(mock_update.called)
+
     def test_is_working(self):
         # By default we have driver mocked to be initialized...
         self.assertTrue(self.volume.is_working())
@@ -5165,8 +5328,9 @@ class VolumeMigrationTestCase(BaseVolumeTestCase):
             volume = db.volume_get(context.get_admin_context(), volume['id'])
             self.assertEqual('error', volume['migration_status'])
             self.assertEqual('available', volume['status'])
-            mock_copy.assert_called_once_with('foo', 'bar', 0, '1M',
-                                              sparse=True)
+            mock_copy.assert_called_once_with(
+                'foo', 'bar', 0, '1M', sparse=True,
+                priority=copy_scheduler.PRIORITY_NORMAL)
 
     def fake_attach_volume(self, ctxt, volume, instance_uuid, host_name,
                            mountpoint, mode):
@@ -6026,6 +6190,32 @@ class GetActiveByWindowTestCase(BaseVolumeTestCase):
         self.assertEqual(fake.VOLUME3_ID, volumes[1].id)
         self.assertEqual(fake.VOLUME4_ID, volumes[2].id)
 
+    def test_volume_get_active_by_window_paginated(self):
+        self.db_vol_attrs[3]['project_id'] = fake.PROJECT2_ID
+        for attrs in self.db_vol_attrs:
+            db.volume_create(self.ctx, attrs)
+        begin = datetime.datetime(1, 3, 1, 1, 1, 1)
+        end = datetime.datetime(1, 4, 1, 1, 1, 1)
+        ids = sorted([fake.VOLUME2_ID, fake.VOLUME3_ID, fake.VOLUME4_ID])
+
+        first_page = db.volume_get_active_by_window(self.context, begin, end,
+                                                    limit=2)
+        self.assertEqual(ids[:2], [volume.id for volume in first_page])
+        second_page = db.volume_get_active_by_window(
+            self.context, begin, end, marker=first_page[-1].id, limit=2)
+        self.assertEqual(ids[2:], [volume.id for volume in second_page])
+
+        # fake.PROJECT2_ID < fake.PROJECT_ID
+        volumes = db.volume_get_active_by_window(
+            self.context, begin, end,
+            project_id_range=(None, fake.PROJECT_ID))
+        self.assertEqual([fake.VOLUME4_ID], [volume.id for volume in volumes])
+        volumes = db.volume_get_active_by_window(
+            self.context, begin, end,
+            project_id_range=(fake.PROJECT_ID, None))
+        self.assertEqual(sorted([fake.VOLUME2_ID, fake.VOLUME3_ID]),
+                         sorted(volume.id for volume in volumes))
+
     def test_snapshot_get_active_by_window(self):
         # Find all all snapshots valid within a timeframe window.
         db.volume_create(self.context, {'id': fake.VOLUME_ID})
@@ -6356,7 +6546,8 @@ class GenericVolumeDriverTestCase(DriverTestCase):
                                       dest_vol)
 
         self.assertEqual(attach_expected, mock_attach.mock_calls)
-        mock_copy.assert_called_with('foo', 'bar', 1024, '1M', sparse=False)
+        mock_copy.assert_called_with('foo', 'bar', 1024, '1M', sparse=False,
+                                     priority=copy_scheduler.PRIORITY_NORMAL)
         self.assertEqual(detach_expected, mock_detach.mock_calls)
 
         #  Test case for sparse_copy_volume = True
@@ -6369,7 +6560,8 @@ class GenericVolumeDriverTestCase(DriverTestCase):
                                       dest_vol)
 
         self.assertEqual(attach_expected, mock_attach.mock_calls)
-        mock_copy.assert_called_with('foo', 'bar', 1024, '1M', sparse=True)
+        mock_copy.assert_called_with('foo', 'bar', 1024, '1M', sparse=True,
+                                     priority=copy_scheduler.PRIORITY_NORMAL)
         self.assertEqual(detach_expected, mock_detach.mock_calls)
 
         # cleanup resource
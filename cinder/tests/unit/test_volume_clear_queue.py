@@ -0,0 +1,72 @@
+# Copyright (c) 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for the background volume clear queue."""
+
+import eventlet
+from eventlet import event
+import mock
+
+from cinder import test
+from cinder.volume import clear_queue
+
+
+class ClearQueueTestCase(test.TestCase):
+
+    def test_submit_runs_jobs(self):
+        queue = clear_queue.ClearQueue(2)
+        job1 = mock.Mock()
+        job2 = mock.Mock(side_effect=Exception)
+
+        self.assertTrue(queue.submit('vol1', 1024, job1))
+        self.assertTrue(queue.submit('vol2', 2048, job2))
+        self.assertFalse(queue.submit('vol1', 1024, job1))
+        self.assertTrue(queue.is_pending('vol1'))
+
+        stats = queue.get_stats()
+        self.assertEqual(2, stats['clear_queue_depth'])
+        self.assertEqual(0, stats['clear_running'])
+        self.assertEqual(3072, stats['clear_pending_mb'])
+
+        eventlet.sleep(0)
+
+        job1.assert_called_once_with()
+        job2.assert_called_once_with()
+        self.assertFalse(queue.is_pending('vol1'))
+        self.assertFalse(queue.is_pending('vol2'))
+        self.assertEqual(0, queue.get_stats()['clear_pending_mb'])
+
+    def test_workers_bounded(self):
+        queue = clear_queue.ClearQueue(1)
+        running = []
+        release = event.Event()
+
+        def job():
+            running.append(1)
+            release.wait()
+
+        queue.submit('vol1', 1, job)
+        queue.submit('vol2', 1, job)
+        eventlet.sleep(0)
+
+        self.assertEqual(1, len(running))
+        stats = queue.get_stats()
+        self.assertEqual(1, stats['clear_running'])
+        self.assertEqual(1, stats['clear_queue_depth'])
+
+        release.send()
+        eventlet.sleep(0)
+        eventlet.sleep(0)
+        self.assertEqual(2, len(running))
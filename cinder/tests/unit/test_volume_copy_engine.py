@@ -0,0 +1,146 @@
+# Copyright (c) 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for the in-process volume copy engine."""
+
+import errno
+import os
+import stat
+
+import fixtures
+import mock
+from oslo_utils import units
+
+from cinder import exception
+from cinder import test
+from cinder.volume import copy_engine
+
+
+class CopyEngineTestCase(test.TestCase):
+
+    def setUp(self):
+        super(CopyEngineTestCase, self).setUp()
+        self.tempdir = self.useFixture(fixtures.TempDir()).path
+        self.chunk = 64 * units.Ki
+        self.src = self._make_file('src', [b'\1', b'\0', b'\2', b'\0'])
+        self.dest = self._make_file('dest', [b'\7'] * 4)
+
+    def _make_file(self, name, chunks):
+        path = os.path.join(self.tempdir, name)
+        with open(path, 'wb') as f:
+            for c in chunks:
+                f.write(c * self.chunk)
+        return path
+
+    def _read(self, path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def test_copy_detects_zero_chunks(self):
+        progress = mock.Mock()
+        engine = copy_engine.CopyEngine(self.src, self.dest, 4 * self.chunk,
+                                        chunk_size=self.chunk, io_depth=2,
+                                        progress_callback=progress)
+        engine.run()
+
+        self.assertEqual(self._read(self.src), self._read(self.dest))
+        self.assertEqual(4 * self.chunk, engine.bytes_done)
+        self.assertEqual(2 * self.chunk, engine.bytes_zero)
+        self.assertEqual(copy_engine.ZERO_PUNCH_HOLE, engine._zero_mode)
+        progress.assert_called_with(4 * self.chunk, 4 * self.chunk)
+
+    def test_copy_sparse_skips_zero_chunks(self):
+        engine = copy_engine.CopyEngine(self.src, self.dest, 4 * self.chunk,
+                                        chunk_size=self.chunk, sparse=True)
+        engine.run()
+
+        data = self._read(self.dest)
+        self.assertEqual(b'\1' * self.chunk, data[:self.chunk])
+        # Zero chunks were not written, the old content is still there
+        self.assertEqual(b'\7' * self.chunk, data[self.chunk:2 * self.chunk])
+        self.assertEqual(2 * self.chunk, engine.bytes_written)
+
+    def test_copy_dest_offset(self):
+        engine = copy_engine.CopyEngine(copy_engine.ZERO_SOURCE, self.dest,
+                                        2 * self.chunk,
+                                        chunk_size=self.chunk,
+                                        dest_offset=self.chunk)
+        engine.run()
+
+        self.assertEqual(b'\7' * self.chunk + b'\0' * 2 * self.chunk,
+                         self._read(self.dest)[:3 * self.chunk])
+        self.assertEqual(3 * self.chunk, os.path.getsize(self.dest))
+
+    @mock.patch('cinder.volume.copy_engine.punch_hole',
+                side_effect=OSError(errno.EOPNOTSUPP, 'not supported'))
+    def test_clear_falls_back_to_write(self, mock_punch):
+        engine = copy_engine.CopyEngine(copy_engine.ZERO_SOURCE, self.dest,
+                                        4 * self.chunk,
+                                        chunk_size=self.chunk, io_depth=1)
+        engine.run()
+
+        self.assertEqual(b'\0' * 4 * self.chunk, self._read(self.dest))
+        self.assertEqual(copy_engine.ZERO_WRITE, engine._zero_mode)
+        self.assertEqual(4 * self.chunk, engine.bytes_written)
+        self.assertEqual(1, mock_punch.call_count)
+
+    @mock.patch('cinder.volume.copy_engine.punch_hole',
+                side_effect=OSError(errno.EIO, 'I/O error'))
+    def test_clear_error_is_raised(self, mock_punch):
+        engine = copy_engine.CopyEngine(copy_engine.ZERO_SOURCE, self.dest,
+                                        4 * self.chunk,
+                                        chunk_size=self.chunk)
+        self.assertRaises(OSError, engine.run)
+
+    def test_missing_destination(self):
+        engine = copy_engine.CopyEngine(self.src, '/nonexistent/dest',
+                                        self.chunk)
+        self.assertRaises(exception.DeviceUnavailable, engine.run)
+
+    @mock.patch('cinder.volume.copy_engine.discard_zeroes_data')
+    @mock.patch('os.stat')
+    def test_select_zero_mode_block_device(self, mock_stat, mock_dzd):
+        mock_stat.return_value = mock.Mock(st_mode=stat.S_IFBLK)
+        engine = copy_engine.CopyEngine(self.src, '/dev/fake', self.chunk)
+
+        mock_dzd.return_value = True
+        self.assertEqual(copy_engine.ZERO_DISCARD,
+                         engine._select_zero_mode())
+        mock_dzd.return_value = False
+        self.assertEqual(copy_engine.ZERO_ZEROOUT,
+                         engine._select_zero_mode())
+        engine.sparse = True
+        self.assertEqual(copy_engine.ZERO_SKIP, engine._select_zero_mode())
+
+    @mock.patch('cinder.volume.copy_engine.tpool.execute')
+    def test_finish_syncs_block_device(self, mock_execute):
+        engine = copy_engine.CopyEngine(self.src, self.dest, self.chunk)
+        engine._finish()
+        self.assertFalse(mock_execute.called)
+
+        engine.sync = True
+        engine._finish()
+        mock_execute.assert_called_once_with(os.fsync, mock.ANY)
+
+        mock_execute.reset_mock()
+        engine.sync = False
+        engine._dest_is_blk = True
+        engine._finish()
+        mock_execute.assert_called_once_with(os.fsync, mock.ANY)
+
+    def test_chunk_size_aligned(self):
+        engine = copy_engine.CopyEngine(self.src, self.dest, self.chunk,
+                                        chunk_size=units.Ki + 1)
+        self.assertEqual(copy_engine.ALIGNMENT, engine.chunk_size)
@@ -0,0 +1,108 @@
+# Copyright (c) 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for volume copy concurrency limits."""
+
+import eventlet
+from eventlet import event
+
+from cinder import test
+from cinder.volume import copy_scheduler
+
+
+class CopySchedulerTestCase(test.TestCase):
+
+    def _run_copies(self, scheduler, priorities):
+        started = []
+        release = event.Event()
+
+        def copy(name, priority):
+            with scheduler.slot(priority, name=name):
+                started.append(name)
+                release.wait()
+
+        blocker = eventlet.spawn(copy, 'running',
+                                 copy_scheduler.PRIORITY_NORMAL)
+        eventlet.sleep(0)
+        threads = [eventlet.spawn(copy, name, priority)
+                   for name, priority in priorities]
+        eventlet.sleep(0)
+
+        stats = scheduler.get_stats()
+        release.send()
+        blocker.wait()
+        for thread in threads:
+            thread.wait()
+        return started, stats
+
+    def test_unlimited(self):
+        scheduler = copy_scheduler.CopyScheduler()
+        started, stats = self._run_copies(
+            scheduler, [('a', copy_scheduler.PRIORITY_LOW),
+                        ('b', copy_scheduler.PRIORITY_HIGH)])
+
+        self.assertEqual(['running', 'a', 'b'], started)
+        self.assertEqual(3, stats['copy_active'])
+        self.assertEqual(0, stats['copy_queue_depth'])
+        self.assertEqual(0, scheduler.get_stats()['copy_active'])
+
+    def test_priority(self):
+        scheduler = copy_scheduler.CopyScheduler(1)
+        started, stats = self._run_copies(
+            scheduler, [('clear', copy_scheduler.PRIORITY_LOW),
+                        ('migrate', copy_scheduler.PRIORITY_NORMAL),
+                        ('create', copy_scheduler.PRIORITY_HIGH)])
+
+        self.assertEqual(['running', 'create', 'migrate', 'clear'], started)
+        self.assertEqual(1, stats['copy_active'])
+        self.assertEqual(3, stats['copy_queue_depth'])
+        self.assertEqual(1, stats['copy_queue_depth_high'])
+        self.assertEqual(1, stats['copy_queue_depth_normal'])
+        self.assertEqual(1, stats['copy_queue_depth_low'])
+
+        stats = scheduler.get_stats()
+        self.assertEqual(0, stats['copy_active'])
+        self.assertEqual(4, stats['copy_started'])
+        self.assertEqual(3, stats['copy_queued'])
+
+    def test_fifo(self):
+        scheduler = copy_scheduler.CopyScheduler(1, policy='fifo')
+        started, stats = self._run_copies(
+            scheduler, [('clear', copy_scheduler.PRIORITY_LOW),
+                        ('create', copy_scheduler.PRIORITY_HIGH)])
+
+        self.assertEqual(['running', 'clear', 'create'], started)
+        self.assertEqual(1, stats['copy_queue_depth_low'])
+        self.assertEqual(1, stats['copy_queue_depth_high'])
+
+    def test_waiter_killed(self):
+        scheduler = copy_scheduler.CopyScheduler(1)
+        release = event.Event()
+
+        def copy():
+            with scheduler.slot():
+                release.wait()
+
+        blocker = eventlet.spawn(copy)
+        eventlet.sleep(0)
+        waiter = eventlet.spawn(copy)
+        eventlet.sleep(0)
+        self.assertEqual(1, scheduler.get_stats()['copy_queue_depth'])
+
+        waiter.kill()
+        self.assertEqual(0, scheduler.get_stats()['copy_queue_depth'])
+        release.send()
+        blocker.wait()
+        self.assertEqual(0, scheduler.get_stats()['copy_active'])
@@ -15,6 +15,10 @@
 
 """Tests for volume copy throttling helpers."""
 
+import errno
+import os
+
+import fixtures
 import mock
 
 from cinder import test
@@ -72,3 +76,98 @@ class ThrottleTestCase(test.TestCase):
                 with throttle.subcommand('src_volume2', 'dst_volume2') as cmd:
                     self.assertEqual(['cgexec', '-g', 'blkio:fake_group'],
                                      cmd['prefix'])
+
+
+class IoMaxCgroupTestCase(test.TestCase):
+
+    def setUp(self):
+        super(IoMaxCgroupTestCase, self).setUp()
+        self.root = self.useFixture(fixtures.TempDir()).path
+        self.mock_object(throttling.IoMaxCgroup, 'CGROUP_ROOT', self.root)
+        self.mock_object(os, 'getpid', return_value=42)
+        self.writes = []
+
+        def fake_write(throttle, name, value, child=None):
+            self.writes.append((os.path.basename(child or throttle.path),
+                                name, value))
+
+        self.mock_object(throttling.IoMaxCgroup, '_write', fake_write)
+
+    def test_is_supported(self):
+        self.assertFalse(throttling.IoMaxCgroup.is_supported())
+        with open(os.path.join(self.root, 'cgroup.controllers'), 'w') as f:
+            f.write('cpuset cpu io memory pids\n')
+        self.assertTrue(throttling.IoMaxCgroup.is_supported())
+
+    @mock.patch.object(os, 'kill')
+    def test_init_removes_stale_children(self, mock_kill):
+        def fake_kill(pid, sig):
+            if pid == 1:
+                raise OSError(errno.ESRCH, 'No such process')
+            if pid == 3:
+                raise OSError(errno.EPERM, 'Operation not permitted')
+
+        mock_kill.side_effect = fake_kill
+        group = os.path.join(self.root, 'fake_group')
+        for name in ('copy-1-0', 'copy-1-1', 'copy-2-0', 'copy-3-0',
+                     'other'):
+            os.makedirs(os.path.join(group, name))
+
+        throttling.IoMaxCgroup(1024, 0, 'fake_group')
+
+        # Only the children of the processes that are gone are removed
+        self.assertEqual(['copy-2-0', 'copy-3-0', 'other'],
+                         sorted(os.listdir(group)))
+        self.assertEqual([('fake_group', 'cgroup.subtree_control', '+io')],
+                         self.writes)
+
+    @mock.patch.object(os, 'kill',
+                       side_effect=OSError(errno.ESRCH, 'No such process'))
+    def test_init_skips_busy_children(self, mock_kill):
+        group = os.path.join(self.root, 'fake_group')
+        os.makedirs(os.path.join(group, 'copy-1-0'))
+
+        with mock.patch.object(os, 'rmdir',
+                               side_effect=OSError(errno.EBUSY,
+                                                   'Device or resource busy')):
+            throttling.IoMaxCgroup(1024, 0, 'fake_group')
+
+        self.assertEqual(['copy-1-0'], os.listdir(group))
+        self.assertEqual([('fake_group', 'cgroup.subtree_control', '+io')],
+                         self.writes)
+
+    @mock.patch.object(utils, 'get_blkdev_major_minor')
+    def test_IoMaxCgroup(self, mock_major_minor):
+        mock_major_minor.side_effect = lambda path: {
+            'src_volume1': '253:0', 'dst_volume1': '253:1',
+            'src_volume2': '253:0', 'dst_volume2': '253:3'}[path]
+
+        throttle = throttling.IoMaxCgroup(1024, 100, 'fake_group')
+        group = os.path.join(self.root, 'fake_group')
+        del self.writes[:]
+
+        with throttle.subcommand('src_volume1', 'dst_volume1') as cmd:
+            self.assertEqual(['cgexec', '-g', 'io:fake_group/copy-42-0'],
+                             cmd['prefix'])
+            self.assertEqual(['copy-42-0'], os.listdir(group))
+
+            # a nested job reading from the same device halves its limits
+            with throttle.subcommand('src_volume2', 'dst_volume2'):
+                self.assertEqual(2, len(os.listdir(group)))
+
+        self.assertEqual([], os.listdir(group))
+        self.assertEqual(
+            [('copy-42-0', 'io.max', '253:0 rbps=1024 riops=100'),
+             ('copy-42-0', 'io.max', '253:1 wbps=1024 wiops=100'),
+             ('copy-42-0', 'io.max', '253:0 rbps=512 riops=50'),
+             ('copy-42-1', 'io.max', '253:0 rbps=512 riops=50'),
+             ('copy-42-1', 'io.max', '253:3 wbps=1024 wiops=100'),
+             # the nested job ends; limits are resumed
+             ('copy-42-0', 'io.max', '253:0 rbps=1024 riops=100')],
+            self.writes)
+
+    @mock.patch.object(utils, 'get_blkdev_major_minor', return_value=None)
+    def test_IoMaxCgroup_no_device(self, mock_major_minor):
+        throttle = throttling.IoMaxCgroup(1024, 0, 'fake_group')
+        with throttle.subcommand('volume1', 'volume2') as cmd:
+            self.assertEqual({'prefix': []}, cmd)
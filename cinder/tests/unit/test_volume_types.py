@@ -554,3 +554,88 @@ class VolumeTypeTestCase(test.TestCase):
                 'cipher': 'fake1',
                 'created_at': 'time1', }
         self._exec_volume_types_encryption_changed(enc1, None, True)
+
+
+class VolumeTypesCacheTestCase(test.TestCase):
+    """Test cases for the volume types cache."""
+    def setUp(self):
+        super(VolumeTypesCacheTestCase, self).setUp()
+        self.override_config('volume_types_cache_ttl', 300)
+        self.override_config('volume_types_cache_check_interval', 60)
+        self.ctxt = context.get_admin_context()
+        self.vol_type = volume_types.create(self.ctxt, 'type1',
+                                            {'key1': 'value1'})
+
+    @mock.patch.object(db, 'volume_type_get', wraps=db.volume_type_get)
+    def test_get_volume_type_cached(self, mock_get):
+        vol_type = volume_types.get_volume_type(self.ctxt,
+                                                self.vol_type['id'])
+        vol_type['extra_specs']['key1'] = 'changed'
+        extra_specs = volume_types.get_volume_type_extra_specs(
+            self.vol_type['id'])
+
+        # Callers get copies of the cached volume type
+        self.assertEqual({'key1': 'value1'}, extra_specs)
+        self.assertEqual(1, mock_get.call_count)
+        stats = volume_types.get_cache_stats()
+        self.assertEqual((1, 1, 1),
+                         (stats['hits'], stats['misses'], stats['size']))
+
+    @mock.patch.object(db, 'volume_type_get', wraps=db.volume_type_get)
+    def test_get_volume_type_not_cached_for_users(self, mock_get):
+        ctxt = context.RequestContext(fake.USER_ID, fake.PROJECT_ID)
+        volume_types.get_volume_type(ctxt, self.vol_type['id'])
+        volume_types.get_volume_type(ctxt, self.vol_type['id'])
+
+        self.assertEqual(2, mock_get.call_count)
+        self.assertEqual(0, volume_types.get_cache_stats()['misses'])
+
+    def test_cache_disabled(self):
+        self.override_config('volume_types_cache_ttl', 0)
+        with mock.patch.object(db, 'volume_type_get_generation') as mock_gen:
+            volume_types.get_volume_type(self.ctxt, self.vol_type['id'])
+            self.assertFalse(mock_gen.called)
+        self.assertEqual(0, volume_types.get_cache_stats()['size'])
+
+    def test_invalidated_by_changes_in_process(self):
+        volume_types.get_volume_type_qos_specs(self.vol_type['id'])
+        qos = qos_specs.create(self.ctxt, 'qos1', {'consumer': 'back-end',
+                                                   'total_iops_sec': '100'})
+        qos_specs.associate_qos_with_type(self.ctxt, qos.id,
+                                          self.vol_type['id'])
+
+        res = volume_types.get_volume_type_qos_specs(self.vol_type['id'])
+        self.assertEqual(qos.id, res['qos_specs']['id'])
+
+        volume_types.update(self.ctxt, self.vol_type['id'], 'type2', None)
+        self.assertEqual('type2', volume_types.get_volume_type(
+            self.ctxt, self.vol_type['id'])['name'])
+        self.assertLessEqual(3, volume_types.get_cache_stats()[
+            'invalidations'])
+
+    def test_invalidated_by_changes_in_database(self):
+        volume_types.get_volume_type_extra_specs(self.vol_type['id'])
+        # Changed by another service
+        db.volume_type_extra_specs_update_or_create(
+            self.ctxt, self.vol_type['id'], {'key1': 'value2'})
+
+        extra_specs = volume_types.get_volume_type_extra_specs(
+            self.vol_type['id'])
+        self.assertEqual({'key1': 'value1'}, extra_specs)
+
+        self.override_config('volume_types_cache_check_interval', 0)
+        extra_specs = volume_types.get_volume_type_extra_specs(
+            self.vol_type['id'])
+        self.assertEqual({'key1': 'value2'}, extra_specs)
+
+    @mock.patch('time.time')
+    def test_entries_expire(self, mock_time):
+        mock_time.return_value = 1000
+        get = mock.Mock(side_effect=['first', 'second'])
+        cache = volume_types._create_cache()
+
+        self.assertEqual('first', cache.get('key', get))
+        mock_time.return_value = 1299
+        self.assertEqual('first', cache.get('key', get))
+        mock_time.return_value = 1300
+        self.assertEqual('second', cache.get('key', get))
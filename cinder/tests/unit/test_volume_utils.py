@@ -37,6 +37,7 @@ from cinder.tests.unit import fake_constants as fake
 from cinder.tests.unit import fake_snapshot
 from cinder.tests.unit import fake_volume
 from cinder import utils
+from cinder.volume import copy_scheduler
 from cinder.volume import throttling
 from cinder.volume import utils as volume_utils
 from cinder.volume import volume_types
@@ -416,7 +417,9 @@ class ClearVolumeTestCase(test.TestCase):
         mock_copy.assert_called_once_with('/dev/zero', 'volume_path', 1024,
                                           '1M', sync=True,
                                           execute=utils.execute, ionice='-c3',
-                                          throttle=None, sparse=False)
+                                          throttle=None, sparse=False,
+                                          priority=copy_scheduler.PRIORITY_LOW,
+                                          dest_offset_in_m=0)
 
     @mock.patch('cinder.volume.utils.copy_volume', return_value=None)
     @mock.patch('cinder.volume.utils.CONF')
@@ -431,7 +434,9 @@ class ClearVolumeTestCase(test.TestCase):
         mock_copy.assert_called_once_with('/dev/zero', 'volume_path', 1,
                                           '1M', sync=True,
                                           execute=utils.execute, ionice='-c0',
-                                          throttle=None, sparse=False)
+                                          throttle=None, sparse=False,
+                                          priority=copy_scheduler.PRIORITY_LOW,
+                                          dest_offset_in_m=0)
 
     @mock.patch('cinder.utils.execute')
     @mock.patch('cinder.volume.utils.CONF')
@@ -464,6 +469,86 @@ class ClearVolumeTestCase(test.TestCase):
             'dd', 'if=/dev/zero', 'of=volume_path', 'count=1048576', 'bs=1M',
             'iflag=count_bytes', 'oflag=direct', run_as_root=True)
 
+    @mock.patch('cinder.volume.copy_engine.discard_zeroes_data',
+                return_value=False)
+    @mock.patch('cinder.volume.utils.copy_volume')
+    @mock.patch('cinder.utils.execute')
+    def test_clear_volume_discard(self, mock_exec, mock_copy, mock_dzd):
+        output = volume_utils.clear_volume(1024, 'volume_path',
+                                           volume_clear='discard',
+                                           volume_clear_size=0)
+        self.assertIsNone(output)
+        mock_exec.assert_called_once_with('blkdiscard', '-z', 'volume_path',
+                                          run_as_root=True)
+        self.assertFalse(mock_copy.called)
+
+    @mock.patch('cinder.volume.copy_engine.discard_zeroes_data',
+                return_value=True)
+    @mock.patch('cinder.volume.utils.copy_volume')
+    @mock.patch('cinder.utils.execute')
+    def test_clear_volume_discard_zeroes_data(self, mock_exec, mock_copy,
+                                              mock_dzd):
+        output = volume_utils.clear_volume(1024, 'volume_path',
+                                           volume_clear='discard',
+                                           volume_clear_size=1)
+        self.assertIsNone(output)
+        mock_exec.assert_called_once_with('blkdiscard', '-l',
+                                          '%d' % units.Mi, 'volume_path',
+                                          run_as_root=True)
+        self.assertFalse(mock_copy.called)
+
+    @mock.patch('cinder.volume.copy_engine.discard_zeroes_data',
+                return_value=True)
+    @mock.patch('cinder.volume.utils.copy_volume')
+    @mock.patch('cinder.utils.execute')
+    def test_clear_volume_discard_offset(self, mock_exec, mock_copy,
+                                         mock_dzd):
+        volume_utils.clear_volume(1024, 'volume_path',
+                                  volume_clear='discard',
+                                  volume_clear_size=0,
+                                  volume_clear_offset=1000)
+        mock_exec.assert_called_once_with('blkdiscard',
+                                          '-o', '%d' % (1000 * units.Mi),
+                                          '-l', '%d' % (24 * units.Mi),
+                                          'volume_path', run_as_root=True)
+        self.assertFalse(mock_copy.called)
+
+    @mock.patch('cinder.volume.utils.copy_volume', return_value=None)
+    @mock.patch('cinder.volume.utils.CONF')
+    def test_clear_volume_offset(self, mock_conf, mock_copy):
+        mock_conf.volume_dd_blocksize = '1M'
+        volume_utils.clear_volume(1024, 'volume_path', volume_clear='zero',
+                                  volume_clear_size=10,
+                                  volume_clear_ionice='-c3',
+                                  volume_clear_offset=100)
+        mock_copy.assert_called_once_with('/dev/zero', 'volume_path', 10,
+                                          '1M', sync=True,
+                                          execute=utils.execute, ionice='-c3',
+                                          throttle=None, sparse=False,
+                                          priority=copy_scheduler.PRIORITY_LOW,
+                                          dest_offset_in_m=100)
+
+    @mock.patch('cinder.volume.copy_engine.discard_zeroes_data',
+                return_value=False)
+    @mock.patch('cinder.volume.utils.copy_volume')
+    @mock.patch('cinder.utils.execute',
+                side_effect=processutils.ProcessExecutionError)
+    @mock.patch('cinder.volume.utils.CONF')
+    def test_clear_volume_discard_fallback(self, mock_conf, mock_exec,
+                                           mock_copy, mock_dzd):
+        mock_conf.volume_dd_blocksize = '1M'
+        output = volume_utils.clear_volume(1024, 'volume_path',
+                                           volume_clear='discard',
+                                           volume_clear_size=0,
+                                           volume_clear_ionice='-c3')
+        self.assertIsNone(output)
+        mock_copy.assert_called_once_with('/dev/zero', 'volume_path', 1024,
+                                          '1M', sync=True,
+                                          execute=utils.execute, ionice='-c3',
+                                          throttle=None, sparse=False,
+                                          priority=copy_scheduler.PRIORITY_LOW,
+                                          dest_offset_in_m=0)
+
     @mock.patch('cinder.volume.utils.CONF')
     def test_clear_volume_invalid_opt(self, mock_conf):
         mock_conf.volume_clear = 'non_existent_volume_clearer'
@@ -591,6 +676,79 @@ class CopyVolumeTestCase(test.TestCase):
                                           'oflag=direct', 'conv=sparse',
                                           run_as_root=True)
 
+    @mock.patch('cinder.volume.utils.check_for_odirect_support',
+                return_value=True)
+    @mock.patch('cinder.utils.execute')
+    def test_copy_volume_dd_with_dest_offset(self, mock_exec, mock_support):
+        output = volume_utils.copy_volume('/dev/zero', '/dev/null', 1024, '3M',
+                                          sync=True, execute=utils.execute,
+                                          dest_offset_in_m=2)
+        self.assertIsNone(output)
+        mock_exec.assert_called_once_with('dd', 'if=/dev/zero', 'of=/dev/null',
+                                          'count=%s' % units.Gi, 'bs=3M',
+                                          'seek=%s' % (2 * units.Mi),
+                                          'iflag=count_bytes,direct',
+                                          'oflag=seek_bytes,direct',
+                                          run_as_root=True)
+
+    def test_copy_volume_handles_dest_offset(self):
+        self.assertRaises(exception.InvalidInput, volume_utils.copy_volume,
+                          io.RawIOBase(), io.RawIOBase(), 1024, 1,
+                          dest_offset_in_m=2)
+
+    @mock.patch('cinder.volume.utils.check_for_odirect_support',
+                return_value=False)
+    @mock.patch('cinder.volume.copy_engine.CopyEngine')
+    @mock.patch('cinder.utils.execute')
+    def test_copy_volume_native_with_throttle(self, mock_exec, mock_engine,
+                                              mock_support):
+        self.override_config('volume_copy_method', 'native')
+        fake_throttle = throttling.Throttle(['cgexec', '-g', 'io:group'])
+        output = volume_utils.copy_volume('/dev/zero', '/dev/null', 1024, '3M',
+                                          throttle=fake_throttle)
+        self.assertIsNone(output)
+        self.assertFalse(mock_engine.called)
+        mock_exec.assert_called_once_with('cgexec', '-g', 'io:group', 'dd',
+                                          'if=/dev/zero', 'of=/dev/null',
+                                          'count=%s' % units.Gi, 'bs=3M',
+                                          'iflag=count_bytes',
+                                          run_as_root=True)
+
+    @mock.patch('cinder.volume.copy_engine.CopyEngine')
+    @mock.patch('cinder.utils.temporary_chown')
+    @mock.patch('cinder.utils.execute')
+    def test_copy_volume_native(self, mock_exec, mock_chown, mock_engine):
+        self.override_config('volume_copy_method', 'native')
+        self.override_config('volume_copy_io_depth', 8)
+        output = volume_utils.copy_volume('/dev/zero', '/dev/null', 1024, '3M',
+                                          sync=True, sparse=True)
+        self.assertIsNone(output)
+        mock_engine.assert_called_once_with('/dev/zero', '/dev/null',
+                                            units.Gi, chunk_size=3 * units.Mi,
+                                            io_depth=8, sparse=True,
+                                            sync=True, dest_offset=0)
+        mock_engine.return_value.run.assert_called_once_with()
+        # /dev/zero is never chowned
+        mock_chown.assert_called_once_with('/dev/null')
+        mock_exec.assert_not_called()
+
+    @mock.patch('cinder.volume.utils.check_for_odirect_support',
+                return_value=False)
+    @mock.patch('cinder.volume.copy_engine.CopyEngine')
+    @mock.patch('cinder.utils.execute')
+    def test_copy_volume_native_with_ionice(self, mock_exec, mock_engine,
+                                            mock_support):
+        self.override_config('volume_copy_method', 'native')
+        output = volume_utils.copy_volume('/dev/zero', '/dev/null', 1024, '3M',
+                                          sync=True, ionice='-c3')
+        self.assertIsNone(output)
+        self.assertFalse(mock_engine.called)
+        mock_exec.assert_called_once_with('ionice', '-c3', 'dd',
+                                          'if=/dev/zero', 'of=/dev/null',
+                                          'count=%s' % units.Gi, 'bs=3M',
+                                          'iflag=count_bytes',
+                                          'conv=fdatasync', run_as_root=True)
+
     @mock.patch('cinder.volume.utils._copy_volume_with_file')
     def test_copy_volume_handles(self, mock_copy):
         handle1 = io.RawIOBase()
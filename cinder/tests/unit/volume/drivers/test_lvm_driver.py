@@ -95,6 +95,245 @@ class LVMVolumeDriverTestCase(test_volume.DriverTestCase):
                          'size': 123}
         lvm_driver._delete_volume(fake_snapshot, is_snapshot=True)
 
+    @mock.patch.object(volutils, 'clear_volume')
+    @mock.patch.object(os.path, 'exists', return_value=True)
+    def test_delete_snapshot_clears_allocated_cow(self, mock_exists,
+                                                  mock_clear):
+        vg_obj = fake_lvm.FakeBrickLVM('cinder-volumes',
+                                       False,
+                                       None,
+                                       'default')
+        self.configuration.volume_clear = 'zero'
+        self.configuration.volume_clear_size = 0
+        self.configuration.lvm_type = 'default'
+        lvm_driver = lvm.LVMVolumeDriver(configuration=self.configuration,
+                                         vg_obj=vg_obj, db=db)
+        snapshot = {'name': 'snapshot-1', 'id': '1', 'volume_size': 1024}
+        cow_path = lvm_driver.local_path(snapshot) + '-cow'
+
+        # The origin is written to during the first pass
+        with mock.patch.object(vg_obj, 'get_snapshot_allocated_size',
+                               side_effect=[20971.52, 21000.2, 21000.2]), \
+                mock.patch.object(vg_obj, 'delete') as mock_delete:
+            lvm_driver._delete_volume(snapshot, is_snapshot=True)
+
+        # Only the chunks allocated since the first pass are cleared again
+        self.assertEqual([mock.call(1048576, cow_path, volume_clear='zero',
+                                    volume_clear_size=20972,
+                                    volume_clear_offset=0),
+                          mock.call(1048576, cow_path, volume_clear='zero',
+                                    volume_clear_size=29,
+                                    volume_clear_offset=20972)],
+                         mock_clear.call_args_list)
+        mock_delete.assert_called_once_with('_snapshot-1')
+
+    @mock.patch.object(volutils, 'clear_volume')
+    @mock.patch.object(os.path, 'exists', return_value=True)
+    def test_delete_snapshot_allocated_cow_unknown(self, mock_exists,
+                                                   mock_clear):
+        vg_obj = fake_lvm.FakeBrickLVM('cinder-volumes',
+                                       False,
+                                       None,
+                                       'default')
+        self.configuration.volume_clear = 'zero'
+        self.configuration.volume_clear_size = 100
+        self.configuration.lvm_type = 'default'
+        lvm_driver = lvm.LVMVolumeDriver(configuration=self.configuration,
+                                         vg_obj=vg_obj, db=db)
+        snapshot = {'name': 'snapshot-1', 'id': '1', 'volume_size': 1}
+
+        lvm_driver._delete_volume(snapshot, is_snapshot=True)
+
+        mock_clear.assert_called_once_with(
+            1024, lvm_driver.local_path(snapshot) + '-cow',
+            volume_clear='zero', volume_clear_size=100,
+            volume_clear_offset=0)
+
+    @mock.patch.object(volutils, 'clear_volume')
+    @mock.patch.object(os.path, 'exists', return_value=True)
+    def test_delete_volume_background_clear(self, mock_exists, mock_clear):
+        vg_obj = fake_lvm.FakeBrickLVM('cinder-volumes',
+                                       False,
+                                       None,
+                                       'default')
+        self.configuration.volume_clear = 'zero'
+        self.configuration.volume_clear_size = 0
+        self.configuration.volume_clear_workers = 2
+        self.configuration.lvm_type = 'default'
+        lvm_driver = lvm.LVMVolumeDriver(configuration=self.configuration,
+                                         vg_obj=vg_obj, db=db)
+        volume = dict(self.FAKE_VOLUME, size=1)
+
+        with mock.patch.object(lvm_driver._clear_queue,
+                               'submit') as mock_submit, \
+                mock.patch.object(vg_obj, 'rename_volume') as mock_rename, \
+                mock.patch.object(vg_obj, 'delete') as mock_delete:
+            lvm_driver._delete_volume(volume)
+
+            mock_rename.assert_called_once_with('test1', 'reclaim-test1')
+            mock_submit.assert_called_once_with('reclaim-test1', 1024,
+                                                mock.ANY)
+            self.assertFalse(mock_clear.called)
+            self.assertFalse(mock_delete.called)
+
+            # Run the queued job
+            mock_submit.call_args[0][2]()
+            mock_clear.assert_called_once_with(
+                1024, lvm_driver.local_path({'name': 'reclaim-test1'}),
+                volume_clear='zero', volume_clear_size=0)
+            mock_delete.assert_called_once_with('reclaim-test1')
+
+    @mock.patch.object(volutils, 'get_all_volume_groups',
+                       return_value=[{'name': 'cinder-volumes'}])
+    def test_check_for_setup_error_reclaims_pending_volumes(self, vgs):
+        vg_obj = mock.Mock(spec=brick_lvm.LVM)
+        vg_obj.vg_name = 'cinder-volumes'
+        vg_obj.get_volumes.return_value = [
+            {'name': 'volume-1', 'size': '1.00'},
+            {'name': 'reclaim-volume-2', 'size': '2.00'}]
+        self.configuration.volume_clear = 'zero'
+        self.configuration.volume_clear_workers = 2
+        self.configuration.lvm_type = 'default'
+        lvm_driver = lvm.LVMVolumeDriver(configuration=self.configuration,
+                                         vg_obj=vg_obj, db=db)
+
+        with mock.patch.object(lvm_driver._clear_queue,
+                               'submit') as mock_submit:
+            lvm_driver.check_for_setup_error()
+
+        mock_submit.assert_called_once_with('reclaim-volume-2', 2048,
+                                            mock.ANY)
+
+        # Without clearing, the LVs left behind are deleted
+        self.configuration.volume_clear = 'none'
+        lvm_driver = lvm.LVMVolumeDriver(configuration=self.configuration,
+                                         vg_obj=vg_obj, db=db)
+        lvm_driver.check_for_setup_error()
+        vg_obj.delete.assert_called_once_with('reclaim-volume-2')
+
+    @mock.patch.object(volutils, 'get_all_volume_groups',
+                       return_value=[{'name': 'cinder-volumes'}])
+    @mock.patch.object(volutils, 'clear_volume')
+    @mock.patch.object(os.path, 'exists', return_value=True)
+    def test_check_for_setup_error_clears_pending_volumes(self, mock_exists,
+                                                          mock_clear, vgs):
+        vg_obj = mock.Mock(spec=brick_lvm.LVM)
+        vg_obj.vg_name = 'cinder-volumes'
+        vg_obj.get_volumes.return_value = [
+            {'name': 'volume-1', 'size': '1.00'},
+            {'name': 'reclaim-volume-2', 'size': '2.00'}]
+        self.configuration.volume_clear = 'zero'
+        self.configuration.volume_clear_size = 0
+        self.configuration.volume_clear_workers = 0
+        self.configuration.lvm_type = 'default'
+        lvm_driver = lvm.LVMVolumeDriver(configuration=self.configuration,
+                                         vg_obj=vg_obj, db=db)
+
+        with mock.patch.object(lvm.clear_queue, 'ClearQueue') as mock_queue:
+            lvm_driver.check_for_setup_error()
+
+        # Background clearing was disabled, the LV is still cleared in the
+        # background instead of delaying the startup
+        self.assertIsNone(lvm_driver._clear_queue)
+        mock_queue.assert_called_once_with(1, name='LVM-reclaim')
+        mock_submit = mock_queue.return_value.submit
+        mock_submit.assert_called_once_with('reclaim-volume-2', 2048,
+                                            mock.ANY)
+        self.assertFalse(mock_clear.called)
+
+        mock_submit.call_args[0][2]()
+        mock_clear.assert_called_once_with(
+            2048, lvm_driver.local_path({'name': 'reclaim-volume-2'}),
+            volume_clear='zero', volume_clear_size=0)
+        vg_obj.delete.assert_called_once_with('reclaim-volume-2')
+
+    @mock.patch.object(volutils, 'get_all_volume_groups',
+                       return_value=[{'name': 'cinder-volumes'}])
+    def test_check_for_setup_error_reclaim_failure(self, vgs):
+        vg_obj = mock.Mock(spec=brick_lvm.LVM)
+        vg_obj.vg_name = 'cinder-volumes'
+        vg_obj.get_volumes.return_value = [
+            {'name': 'reclaim-volume-1', 'size': '1.00'},
+            {'name': 'reclaim-volume-2', 'size': '2.00'}]
+        vg_obj.delete.side_effect = [
+            processutils.ProcessExecutionError(), None]
+        self.configuration.volume_clear = 'none'
+        self.configuration.lvm_type = 'default'
+        lvm_driver = lvm.LVMVolumeDriver(configuration=self.configuration,
+                                         vg_obj=vg_obj, db=db)
+
+        lvm_driver.check_for_setup_error()
+
+        # The failure is logged and the other LVs are still reclaimed
+        self.assertEqual([mock.call('reclaim-volume-1'),
+                          mock.call('reclaim-volume-2')],
+                         vg_obj.delete.call_args_list)
+
+    def test_ensure_exports(self):
+        vg_obj = mock.Mock(spec=brick_lvm.LVM)
+        self.configuration.lvm_type = 'default'
+        lvm_driver = lvm.LVMVolumeDriver(configuration=self.configuration,
+                                         vg_obj=vg_obj, db=db)
+        volumes = [{'id': 'vol1'}, {'id': 'vol2'}, {'id': 'vol3'}]
+
+        def ensure_export(context, volume):
+            if volume['id'] == 'vol2':
+                raise exception.CinderException()
+
+        with mock.patch.object(lvm_driver, 'ensure_export',
+                               side_effect=ensure_export) as mock_export:
+            failed = lvm_driver.ensure_exports(self.context, volumes)
+
+        self.assertEqual(['vol2'], failed)
+        self.assertEqual([mock.call(self.context, volume)
+                          for volume in volumes],
+                         mock_export.call_args_list)
+
+    def test_update_volume_stats_reclaim_pending(self):
+        vg_obj = mock.Mock(spec=brick_lvm.LVM)
+        vg_obj.vg_name = 'cinder-volumes'
+        vg_obj.vg_size = 10.0
+        vg_obj.vg_free_space = 4.0
+        vg_obj.get_volumes.return_value = [
+            {'name': 'volume-1', 'size': '1.00'},
+            {'name': 'reclaim-volume-2', 'size': '2.00'},
+            {'name': 'volume-3', 'size': '3.00'}]
+        self.configuration.lvm_type = 'default'
+        lvm_driver = lvm.LVMVolumeDriver(configuration=self.configuration,
+                                         vg_obj=vg_obj, db=db)
+
+        lvm_driver._update_volume_stats()
+
+        pool = lvm_driver._stats['pools'][0]
+        self.assertEqual(4.0, pool['free_capacity_gb'])
+        self.assertEqual(4.0, pool['provisioned_capacity_gb'])
+        self.assertEqual(2.0, pool['reclaim_pending_gb'])
+        self.assertEqual(2, pool['total_volumes'])
+
+    @mock.patch.object(volutils, 'clear_volume')
+    @mock.patch.object(os.path, 'exists', return_value=True)
+    def test_delete_snapshot_not_background_cleared(self, mock_exists,
+                                                    mock_clear):
+        vg_obj = fake_lvm.FakeBrickLVM('cinder-volumes',
+                                       False,
+                                       None,
+                                       'default')
+        self.configuration.volume_clear = 'zero'
+        self.configuration.volume_clear_size = 0
+        self.configuration.volume_clear_workers = 2
+        self.configuration.lvm_type = 'default'
+        lvm_driver = lvm.LVMVolumeDriver(configuration=self.configuration,
+                                         vg_obj=vg_obj, db=db)
+        snapshot = {'name': 'snapshot-test1', 'id': 'test1',
+                    'volume_size': 1}
+
+        with mock.patch.object(lvm_driver._clear_queue,
+                               'submit') as mock_submit:
+            lvm_driver._delete_volume(snapshot, is_snapshot=True)
+
+        self.assertFalse(mock_submit.called)
+        self.assertTrue(mock_clear.called)
+
     @mock.patch.object(volutils, 'get_all_volume_groups',
                        return_value=[{'name': 'cinder-volumes'}])
     def test_check_for_setup_error(self, vgs):
@@ -362,6 +601,8 @@ class LVMVolumeDriverTestCase(test_volume.DriverTestCase):
 
     @mock.patch.object(cinder.volume.utils, 'get_all_volume_groups',
                        return_value=[{'name': 'cinder-volumes'}])
+    @mock.patch.object(cinder.brick.local_dev.lvm.LVM, 'get_volumes',
+                       return_value=[])
     @mock.patch('cinder.brick.local_dev.lvm.LVM.update_volume_group_info')
     @mock.patch('cinder.brick.local_dev.lvm.LVM.get_all_physical_volumes')
     @mock.patch('cinder.brick.local_dev.lvm.LVM.supports_thin_provisioning',
@@ -378,6 +619,8 @@ class LVMVolumeDriverTestCase(test_volume.DriverTestCase):
 
     @mock.patch.object(cinder.volume.utils, 'get_all_volume_groups',
                        return_value=[{'name': 'cinder-volumes'}])
+    @mock.patch.object(cinder.brick.local_dev.lvm.LVM, 'get_volumes',
+                       return_value=[])
     @mock.patch('cinder.brick.local_dev.lvm.LVM.update_volume_group_info')
     @mock.patch('cinder.brick.local_dev.lvm.LVM.get_all_physical_volumes')
     @mock.patch('cinder.brick.local_dev.lvm.LVM.get_volume')
@@ -494,7 +737,7 @@ class LVMVolumeDriverTestCase(test_volume.DriverTestCase):
         self.assertRaises(processutils.ProcessExecutionError,
                           self.volume.driver.migrate_volume, self.context,
                           vol, host)
-        mock_delete.assert_called_once_with(vol)
+        mock_delete.assert_called_once_with(vol['name'])
 
     @mock.patch.object(volutils, 'get_all_volume_groups',
                        return_value=[{'name': 'cinder-volumes-2'}])
@@ -867,6 +1110,117 @@ class LVMVolumeDriverTestCase(test_volume.DriverTestCase):
                 'extra_info': None}]
         self.assertEqual(exp, res)
 
+    def _create_multi_pool_driver(self):
+        self.configuration.lvm_volume_groups = ['vg1', 'vg2']
+        self.configuration.volume_clear = 'none'
+        vgs = {}
+        for vg_name in self.configuration.lvm_volume_groups:
+            vg = mock.Mock(spec=brick_lvm.LVM)
+            vg.vg_name = vg_name
+            vg.vg_size = 5.0
+            vg.vg_free_space = 3.0
+            vg.get_volumes.return_value = [{'name': 'lv-%s' % vg_name}]
+            vg.get_volume.return_value = None
+            vg.lv_has_snapshot.return_value = False
+            vgs[vg_name] = vg
+
+        lvm_driver = lvm.LVMVolumeDriver(configuration=self.configuration,
+                                         db=db)
+        with mock.patch.object(lvm_driver, '_init_vg',
+                               side_effect=vgs.get), \
+                mock.patch.object(volutils, 'get_all_volume_groups',
+                                  side_effect=lambda vg_name: [
+                                      {'name': vg_name}]):
+            lvm_driver.check_for_setup_error()
+        return lvm_driver, vgs
+
+    def test_multi_pool_stats(self):
+        lvm_driver, vgs = self._create_multi_pool_driver()
+
+        lvm_driver._update_volume_stats()
+
+        self.assertIs(vgs['vg1'], lvm_driver.vg)
+        pools = lvm_driver._stats['pools']
+        self.assertEqual(['vg1', 'vg2'], [p['pool_name'] for p in pools])
+        for pool in pools:
+            self.assertEqual(5.0, pool['total_capacity_gb'])
+            self.assertEqual(3.0, pool['free_capacity_gb'])
+            self.assertEqual(2.0, pool['provisioned_capacity_gb'])
+            self.assertEqual(1, pool['total_volumes'])
+            self.assertEqual('LVMVolumeDriver:%s:%s:default:0' %
+                             (lvm_driver.hostname, pool['pool_name']),
+                             pool['location_info'])
+        for vg in vgs.values():
+            vg.update_volume_group_info.assert_called_once_with()
+
+    @mock.patch.object(volutils, 'copy_volume')
+    def test_multi_pool_volume_operations(self, mock_copy):
+        lvm_driver, vgs = self._create_multi_pool_driver()
+        volume = {'name': 'volume-1', 'id': '1', 'size': 1,
+                  'host': 'host@lvm#vg2'}
+
+        lvm_driver.create_volume(volume)
+        vgs['vg2'].create_volume.assert_called_once_with(
+            'volume-1', '1g', 'default', 0)
+        self.assertFalse(vgs['vg1'].create_volume.called)
+        self.assertEqual('/dev/mapper/vg2-volume--1',
+                         lvm_driver.local_path(volume))
+        self.assertEqual('vg2', lvm_driver.get_pool(volume))
+
+        lvm_driver.extend_volume(volume, 2)
+        vgs['vg2'].extend_volume.assert_called_once_with('volume-1', '2g')
+
+        # Volumes without a pool of this back end are looked up by name
+        vgs['vg2'].get_volume.side_effect = (
+            lambda name: {'name': name} if name in ('volume-1', '_snapshot-2')
+            else None)
+        volume['host'] = 'host@lvm#LVM'
+        self.assertEqual('vg2', lvm_driver.get_pool(volume))
+
+        lvm_driver.delete_volume(volume)
+        vgs['vg2'].delete.assert_called_once_with('volume-1')
+        self.assertFalse(vgs['vg1'].delete.called)
+
+        # Snapshots and clones are made in the volume group of the volume
+        snapshot = {'name': 'snapshot-2', 'id': '2', 'volume_size': 1,
+                    'volume_name': 'volume-1', 'volume': volume}
+        lvm_driver.create_snapshot(snapshot)
+        vgs['vg2'].create_lv_snapshot.assert_called_once_with(
+            '_snapshot-2', 'volume-1', 'default')
+
+        clone = {'name': 'volume-3', 'id': '3', 'size': 1,
+                 'host': 'host@lvm#vg1'}
+        lvm_driver.create_volume_from_snapshot(clone, snapshot)
+        vgs['vg1'].create_volume.assert_called_once_with(
+            'volume-3', '1g', 'default', 0)
+        vgs['vg2'].activate_lv.assert_called_once_with('snapshot-2',
+                                                       is_snapshot=True)
+        mock_copy.assert_called_once_with(
+            '/dev/mapper/vg2-_snapshot--2', '/dev/mapper/vg1-volume--3', 1024,
+            '1M', execute=lvm_driver._execute, sparse=False)
+
+    @mock.patch.object(volutils, 'copy_volume')
+    def test_multi_pool_migrate_volume_between_pools(self, mock_copy):
+        lvm_driver, vgs = self._create_multi_pool_driver()
+        capabilities = {'location_info': 'LVMVolumeDriver:%s:'
+                        'vg2:default:0' % lvm_driver.hostname}
+        volume = {'name': 'volume-1', 'id': '1', 'size': 1,
+                  'status': 'available', 'host': 'host@lvm#vg1'}
+
+        with mock.patch.object(volutils, 'get_all_volume_groups',
+                               return_value=[{'name': 'vg1'},
+                                             {'name': 'vg2'}]):
+            moved, model_update = lvm_driver.migrate_volume(
+                self.context, volume, {'capabilities': capabilities})
+
+        self.assertTrue(moved)
+        vgs['vg2'].create_volume.assert_called_once_with(
+            'volume-1', '1g', 'default', 0)
+        mock_copy.assert_called_once_with(
+            '/dev/mapper/vg1-volume--1', '/dev/mapper/vg2-volume--1', 1024,
+            '1M', execute=lvm_driver._execute, sparse=False)
+        vgs['vg1'].delete.assert_called_once_with('volume-1')
+
     # Global setting, LVM setting, expected outcome
     @ddt.data((10.0, 2.0, 2.0))
     @ddt.data((10.0, None, 10.0))
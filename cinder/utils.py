@@ -19,7 +19,9 @@
 
 
 import abc
+import collections
 import contextlib
+import copy
 import datetime
 import functools
 import inspect
@@ -43,6 +45,7 @@ from oslo_concurrency import lockutils
 from oslo_concurrency import processutils
 from oslo_config import cfg
 from oslo_log import log as logging
+from oslo_rootwrap import client as rootwrap_client
 from oslo_utils import encodeutils
 from oslo_utils import excutils
 from oslo_utils import importutils
@@ -116,13 +119,89 @@ def check_exclusive_options(**kwargs):
         raise exception.InvalidInput(reason=msg)
 
 
+# Arguments of processutils.execute supported by the rootwrap daemon
+_ROOTWRAP_DAEMON_KWARGS = frozenset(['process_input', 'check_exit_code',
+                                     'delay_on_retry', 'attempts',
+                                     'run_as_root', 'root_helper',
+                                     'loglevel', 'log_errors'])
+_rootwrap_daemon_clients = {}
+
+
 def execute(*cmd, **kwargs):
     """Convenience wrapper around oslo's execute() method."""
     if 'run_as_root' in kwargs and 'root_helper' not in kwargs:
         kwargs['root_helper'] = get_root_helper()
+    if (CONF.use_rootwrap_daemon and kwargs.get('run_as_root') and
+            kwargs['root_helper'] == get_root_helper() and
+            _ROOTWRAP_DAEMON_KWARGS.issuperset(kwargs)):
+        return _rootwrap_daemon_execute(*cmd, **kwargs)
     return processutils.execute(*cmd, **kwargs)
 
 
+def get_rootwrap_daemon_command():
+    return ['sudo', 'cinder-rootwrap-daemon', CONF.rootwrap_config]
+
+
+@synchronized('rootwrap-daemon-client')
+def _get_rootwrap_daemon_client():
+    """Return the rootwrap daemon client, the daemon starts on first use."""
+    command = get_rootwrap_daemon_command()
+    key = tuple(command)
+    if key not in _rootwrap_daemon_clients:
+        _rootwrap_daemon_clients[key] = rootwrap_client.Client(command)
+    return _rootwrap_daemon_clients[key]
+
+
+def _rootwrap_daemon_execute(*cmd, **kwargs):
+    """Run a command as root through the rootwrap daemon.
+
+    Behaves like processutils.execute for the arguments listed in
+    _ROOTWRAP_DAEMON_KWARGS.
+    """
+    cmd = [six.text_type(c) for c in cmd]
+    process_input = kwargs.get('process_input')
+    attempts = kwargs.get('attempts', 1)
+    delay_on_retry = kwargs.get('delay_on_retry', True)
+    loglevel = kwargs.get('loglevel', py_logging.DEBUG)
+    log_errors = kwargs.get('log_errors')
+    check_exit_code = kwargs.get('check_exit_code', [0])
+    ignore_exit_code = False
+    if isinstance(check_exit_code, bool):
+        ignore_exit_code = not check_exit_code
+        check_exit_code = [0]
+    elif isinstance(check_exit_code, int):
+        check_exit_code = [check_exit_code]
+
+    sanitized_cmd = strutils.mask_password(' '.join(cmd))
+    client = _get_rootwrap_daemon_client()
+    while attempts > 0:
+        attempts -= 1
+        LOG.log(loglevel, 'Running cmd (rootwrap daemon): %s', sanitized_cmd)
+        start_time = time.time()
+        returncode, out, err = client.execute(cmd, process_input)
+        LOG.log(loglevel, 'CMD "%(cmd)s" returned: %(code)s in %(time)0.3fs',
+                {'cmd': sanitized_cmd, 'code': returncode,
+                 'time': time.time() - start_time})
+        if ignore_exit_code or returncode in check_exit_code:
+            return out, err
+
+        error = processutils.ProcessExecutionError(
+            exit_code=returncode,
+            stdout=strutils.mask_password(out),
+            stderr=strutils.mask_password(err),
+            cmd=sanitized_cmd)
+        if (log_errors == processutils.LOG_ALL_ERRORS or
+                (log_errors == processutils.LOG_FINAL_ERROR and
+                 not attempts)):
+            LOG.log(loglevel, '%s', error)
+        if not attempts:
+            LOG.log(loglevel, '%r failed. Not Retrying.', sanitized_cmd)
+            raise error
+        LOG.log(loglevel, '%r failed. Retrying.', sanitized_cmd)
+        if delay_on_retry:
+            time.sleep(random.randint(20, 200) / 100.0)
+
+
 def check_ssh_injection(cmd_list):
     ssh_injection_pattern = ['`', '$', '|', '||', ';', '&', '&&', '>', '>>',
                              '<']
@@ -770,6 +849,88 @@ class ComparableMixin(object):
         return self._compare(other, lambda s, o: s != o)
 
 
+class GenerationCache(object):
+    """Process-local read-through cache invalidated through a generation.
+
+    Entries expire after ttl() seconds, and when size is given at most
+    size() of them are kept, the least recently used ones being dropped
+    first.  All the entries are dropped on invalidate(), and when the value
+    returned by get_generation() changes, which is checked at most every
+    check_interval() seconds so that the changes made by other processes
+    are seen too.  The settings are callables so that they can be read from
+    the configuration on every use.  Callers get copies of the cached
+    values.
+    """
+
+    def __init__(self, name, get_generation, ttl, check_interval,
+                 size=None):
+        self.name = name
+        self._get_generation = get_generation
+        self._ttl = ttl
+        self._check_interval = check_interval
+        self._size = size
+        self._entries = collections.OrderedDict()
+        self._generation = None
+        self._checked_at = 0
+        # Bumped on every invalidation, so that values loaded before an
+        # invalidation are not stored after it.
+        self._epoch = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def invalidate(self):
+        self._entries.clear()
+        self._generation = None
+        self._epoch += 1
+        self.invalidations += 1
+
+    def _check_generation(self, now):
+        if (self._generation is not None and
+                now - self._checked_at < self._check_interval()):
+            return
+        generation = self._get_generation()
+        if generation != self._generation:
+            if self._generation is not None:
+                LOG.debug("%(name)s changed, dropping %(count)d cached "
+                          "entries.", {'name': self.name,
+                                       'count': len(self._entries)})
+                self.invalidate()
+            self._generation = generation
+        self._checked_at = now
+
+    def get(self, key, load):
+        """Return the cached value of key, calling load() on a miss."""
+        ttl = self._ttl()
+        if not ttl:
+            return load()
+
+        now = time.time()
+        self._check_generation(now)
+        entry = self._entries.pop(key, None)
+        if entry is not None and now - entry[0] < ttl:
+            # Move it to the most recently used end
+            self._entries[key] = entry
+            self.hits += 1
+            return copy.deepcopy(entry[1])
+
+        self.misses += 1
+        epoch = self._epoch
+        value = load()
+        if epoch == self._epoch:
+            self._entries[key] = (now, value)
+            if self._size is not None:
+                while len(self._entries) > self._size():
+                    self._entries.popitem(last=False)
+        return copy.deepcopy(value)
+
+    def get_stats(self):
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'size': len(self._entries)}
+
+
 def retry(exceptions, interval=1, retries=3, backoff_rate=2,
           wait_random=False):
 
@@ -506,7 +506,7 @@ class API(base.Base):
 
     def get_all(self, context, marker=None, limit=None, sort_keys=None,
                 sort_dirs=None, filters=None, viewable_admin_meta=False,
-                offset=None):
+                offset=None, detail=True):
         check_policy(context, 'get_all')
 
         if filters is None:
@@ -541,14 +541,15 @@ class API(base.Base):
                                                  sort_keys=sort_keys,
                                                  sort_dirs=sort_dirs,
                                                  filters=filters,
-                                                 offset=offset)
+                                                 offset=offset,
+                                                 detail=detail)
         else:
-            if viewable_admin_meta:
+            if viewable_admin_meta and detail:
                 context = context.elevated()
             volumes = objects.VolumeList.get_all_by_project(
                 context, context.project_id, marker, limit,
                 sort_keys=sort_keys, sort_dirs=sort_dirs, filters=filters,
-                offset=offset)
+                offset=offset, detail=detail)
 
         LOG.info(_LI("Get all volumes completed successfully."))
         return volumes
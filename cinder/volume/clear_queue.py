@@ -0,0 +1,105 @@
+# Copyright (c) 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Background queue for wiping deleted volumes."""
+
+
+import collections
+
+import eventlet
+from eventlet import queue
+from oslo_log import log as logging
+from oslo_utils import timeutils
+from six.moves import range
+
+from cinder.i18n import _LE, _LI
+
+
+LOG = logging.getLogger(__name__)
+
+
+class ClearQueue(object):
+    """Wipe deleted volumes with a bounded number of workers.
+
+    Jobs are run in submission order by at most max_workers greenthreads.
+    Pending and running jobs are tracked by key so that callers can tell
+    whether a device is still being wiped, and get_stats() reports the
+    queue to operators through the driver capabilities.
+    """
+
+    def __init__(self, max_workers, name='clear'):
+        self.max_workers = max_workers
+        self.name = name
+        self._queue = queue.LightQueue()
+        self._jobs = collections.OrderedDict()
+        self._workers = []
+
+    def _start_workers(self):
+        if self._workers:
+            return
+        self._workers = [eventlet.spawn(self._worker)
+                         for _i in range(self.max_workers)]
+
+    def _worker(self):
+        while True:
+            key = self._queue.get()
+            job = self._jobs[key]
+            job['started_at'] = timeutils.utcnow()
+            try:
+                job['func']()
+                LOG.info(_LI('Cleared %(key)s after %(wait).1f seconds in '
+                             'the %(name)s queue.'),
+                         {'key': key, 'name': self.name,
+                          'wait': timeutils.delta_seconds(
+                              job['queued_at'], job['started_at'])})
+            except Exception:
+                LOG.exception(_LE('Failed to clear %s in the background.'),
+                              key)
+            finally:
+                del self._jobs[key]
+
+    def submit(self, key, size_in_m, func):
+        """Queue func to clear the device identified by key.
+
+        :returns: False if the key is already queued or being cleared
+        """
+        if key in self._jobs:
+            return False
+        self._jobs[key] = {'func': func,
+                           'size_in_m': size_in_m,
+                           'queued_at': timeutils.utcnow(),
+                           'started_at': None}
+        self._start_workers()
+        self._queue.put(key)
+        LOG.info(_LI('Queued %(key)s for clearing, %(depth)d job(s) in the '
+                     '%(name)s queue.'),
+                 {'key': key, 'depth': len(self._jobs), 'name': self.name})
+        return True
+
+    def is_pending(self, key):
+        return key in self._jobs
+
+    def get_stats(self):
+        """Return queue depth and pending size for capability reports."""
+        now = timeutils.utcnow()
+        running = [job for job in self._jobs.values() if job['started_at']]
+        oldest = min([job['queued_at'] for job in self._jobs.values()] or
+                     [now])
+        return {'clear_queue_depth': len(self._jobs) - len(running),
+                'clear_running': len(running),
+                'clear_pending_mb': sum(job['size_in_m']
+                                        for job in self._jobs.values()),
+                'clear_oldest_wait_seconds': int(
+                    timeutils.delta_seconds(oldest, now))}
@@ -0,0 +1,340 @@
+# Copyright (c) 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""In-process volume data copy engine.
+
+The engine copies data between block devices or files without spawning
+'dd'.  The source is read in large block-aligned chunks by several native
+threads at once, and chunks that only contain zeros are never written.
+Depending on the destination they are either skipped (when it is known to
+read back as zeros already), discarded, zeroed out by the kernel or punched
+out of the file.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import fcntl
+import os
+import stat
+import struct
+
+import eventlet
+from eventlet import tpool
+from oslo_log import log as logging
+from oslo_utils import excutils
+from oslo_utils import timeutils
+from oslo_utils import units
+from six.moves import range
+
+from cinder import exception
+from cinder.i18n import _, _LI, _LW
+
+
+LOG = logging.getLogger(__name__)
+
+# ioctl request numbers from linux/fs.h
+BLKDISCARD = 0x1277
+BLKZEROOUT = 0x127f
+
+# fallocate(2) modes from linux/falloc.h
+FALLOC_FL_KEEP_SIZE = 0x01
+FALLOC_FL_PUNCH_HOLE = 0x02
+
+# Every chunk boundary is kept on this alignment so that ranges handed to
+# discard and zeroout requests are valid for any logical block size.
+ALIGNMENT = 4 * units.Ki
+
+ZERO_SOURCE = '/dev/zero'
+
+# Zero handling modes, in order of preference.
+ZERO_SKIP = 'skip'
+ZERO_DISCARD = 'discard'
+ZERO_ZEROOUT = 'zeroout'
+ZERO_PUNCH_HOLE = 'punch_hole'
+ZERO_WRITE = 'write'
+
+_UNSUPPORTED_ERRNOS = (errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL,
+                       errno.ENOSYS)
+
+_libc = None
+
+
+def _fallocate(fd, mode, offset, length):
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+    ret = _libc.fallocate(fd, mode, ctypes.c_int64(offset),
+                          ctypes.c_int64(length))
+    if ret != 0:
+        err = ctypes.get_errno()
+        raise OSError(err, os.strerror(err))
+
+
+def discard_zeroes_data(path):
+    """Return True if discarded blocks of a device are read back as zeros.
+
+    Only trusts the kernel's 'discard_zeroes_data' queue attribute, which
+    newer kernels always report as 0.  Callers that need zeros must use
+    BLKZEROOUT when this returns False.
+    """
+    try:
+        st = os.stat(path)
+        if not stat.S_ISBLK(st.st_mode):
+            return False
+        sysfs = ('/sys/dev/block/%d:%d/queue/discard_zeroes_data' %
+                 (os.major(st.st_rdev), os.minor(st.st_rdev)))
+        if not os.path.exists(sysfs):
+            # Partitions keep their queue attributes on the parent device
+            sysfs = ('/sys/dev/block/%d:%d/../queue/discard_zeroes_data' %
+                     (os.major(st.st_rdev), os.minor(st.st_rdev)))
+        with open(sysfs) as f:
+            return f.read().strip() == '1'
+    except (IOError, OSError):
+        return False
+
+
+def discard(fd, offset, length):
+    """Issue BLKDISCARD on a range of an open block device."""
+    fcntl.ioctl(fd, BLKDISCARD, struct.pack('QQ', offset, length))
+
+
+def zeroout(fd, offset, length):
+    """Issue BLKZEROOUT on a range of an open block device."""
+    fcntl.ioctl(fd, BLKZEROOUT, struct.pack('QQ', offset, length))
+
+
+def punch_hole(fd, offset, length):
+    """Deallocate a range of an open regular file."""
+    _fallocate(fd, FALLOC_FL_PUNCH_HOLE | FALLOC_FL_KEEP_SIZE,
+               offset, length)
+
+
+class CopyEngine(object):
+    """Copy a byte range from one path to another in-process.
+
+    :param src: source path, or '/dev/zero' to zero the destination
+    :param dest: destination path
+    :param length: number of bytes to copy
+    :param chunk_size: size of each I/O, rounded up to ALIGNMENT
+    :param io_depth: number of I/Os kept in flight
+    :param sparse: the destination already reads back as zeros, so zero
+                   chunks are skipped rather than cleared
+    :param sync: flush the destination to stable storage before returning,
+                 block device destinations are always flushed
+    :param progress_callback: called with (bytes_done, length) after each
+                              chunk completes
+    :param dest_offset: where the data is written in the destination, a
+                        multiple of ALIGNMENT
+    """
+
+    def __init__(self, src, dest, length, chunk_size=4 * units.Mi,
+                 io_depth=4, sparse=False, sync=False,
+                 progress_callback=None, dest_offset=0):
+        self.src = src
+        self.dest = dest
+        self.length = length
+        self.dest_offset = dest_offset
+        self.chunk_size = max(ALIGNMENT, (chunk_size + ALIGNMENT - 1) //
+                              ALIGNMENT * ALIGNMENT)
+        self.io_depth = max(1, io_depth)
+        self.sparse = sparse
+        self.sync = sync
+        self.progress_callback = progress_callback
+
+        self.bytes_done = 0
+        self.bytes_written = 0
+        self.bytes_zero = 0
+        self._last_reported = 0
+        self._zero_chunk = b'\0' * self.chunk_size
+        self._zero_mode = None
+        self._dest_is_blk = False
+        self._aborted = False
+
+    def _select_zero_mode(self):
+        st = os.stat(self.dest)
+        self._dest_is_blk = stat.S_ISBLK(st.st_mode)
+        if self.sparse:
+            return ZERO_SKIP
+        if self._dest_is_blk:
+            if discard_zeroes_data(self.dest):
+                return ZERO_DISCARD
+            return ZERO_ZEROOUT
+        if stat.S_ISREG(st.st_mode):
+            return ZERO_PUNCH_HOLE
+        return ZERO_WRITE
+
+    def _open_dest(self):
+        return os.open(self.dest, os.O_WRONLY | os.O_CREAT, 0o600)
+
+    def _open_src(self):
+        if self.src == ZERO_SOURCE:
+            return None
+        return os.open(self.src, os.O_RDONLY)
+
+    def _read_chunk(self, fd, offset, length):
+        if fd is None:
+            return None
+        os.lseek(fd, offset, os.SEEK_SET)
+        parts = []
+        remaining = length
+        while remaining:
+            data = os.read(fd, remaining)
+            if not data:
+                break
+            parts.append(data)
+            remaining -= len(data)
+        return b''.join(parts)
+
+    def _write_data(self, fd, offset, data):
+        os.lseek(fd, offset, os.SEEK_SET)
+        view = memoryview(data)
+        while view:
+            written = os.write(fd, view)
+            view = view[written:]
+
+    def _clear_range(self, fd, offset, length):
+        mode = self._zero_mode
+        if mode == ZERO_SKIP:
+            return False
+        # The tail of a volume may not be aligned; zeros are written there.
+        if mode != ZERO_WRITE and length % ALIGNMENT == 0:
+            try:
+                if mode == ZERO_DISCARD:
+                    discard(fd, offset, length)
+                elif mode == ZERO_ZEROOUT:
+                    zeroout(fd, offset, length)
+                else:
+                    punch_hole(fd, offset, length)
+                return False
+            except (IOError, OSError) as e:
+                if e.errno not in _UNSUPPORTED_ERRNOS:
+                    raise
+                LOG.warning(_LW("Zero range request %(mode)s is not "
+                                "supported by %(dest)s, writing zeros "
+                                "instead."),
+                            {'mode': mode, 'dest': self.dest})
+                self._zero_mode = ZERO_WRITE
+        self._write_data(fd, offset, self._zero_chunk[:length])
+        return True
+
+    def _copy_chunk(self, src_fd, dest_fd, offset, length):
+        """Copy one chunk; runs in a native thread.
+
+        Returns a tuple of (bytes transferred, bytes written, zero bytes).
+        """
+        data = self._read_chunk(src_fd, offset, length)
+        if data is None:
+            data_len = length
+            is_zero = True
+        else:
+            data_len = len(data)
+            if data_len == self.chunk_size:
+                is_zero = data == self._zero_chunk
+            else:
+                is_zero = data == self._zero_chunk[:data_len]
+
+        if not data_len:
+            return 0, 0, 0
+
+        dest_offset = self.dest_offset + offset
+        if is_zero:
+            written = self._clear_range(dest_fd, dest_offset, data_len)
+            return data_len, data_len if written else 0, data_len
+
+        self._write_data(dest_fd, dest_offset, data)
+        return data_len, data_len, 0
+
+    def _report_progress(self):
+        if self.progress_callback:
+            self.progress_callback(self.bytes_done, self.length)
+        if self.bytes_done - self._last_reported >= self.length // 10:
+            self._last_reported = self.bytes_done
+            LOG.debug("Copied %(done)d of %(total)d bytes from %(src)s to "
+                      "%(dest)s.",
+                      {'done': self.bytes_done, 'total': self.length,
+                       'src': self.src, 'dest': self.dest})
+
+    def _worker(self, offsets):
+        src_fd = self._open_src()
+        try:
+            dest_fd = self._open_dest()
+            try:
+                for offset in offsets:
+                    if self._aborted:
+                        return
+                    length = min(self.chunk_size, self.length - offset)
+                    done, written, zero = tpool.execute(
+                        self._copy_chunk, src_fd, dest_fd, offset, length)
+                    self.bytes_done += done
+                    self.bytes_written += written
+                    self.bytes_zero += zero
+                    self._report_progress()
+                    if done < length:
+                        # End of the source reached
+                        return
+            finally:
+                os.close(dest_fd)
+        finally:
+            if src_fd is not None:
+                os.close(src_fd)
+
+    def _finish(self):
+        fd = self._open_dest()
+        try:
+            if not self._dest_is_blk and stat.S_ISREG(os.fstat(fd).st_mode):
+                # Zero chunks skipped at the end must still count towards
+                # the size of a file destination, as they do with dd.
+                os.ftruncate(fd, self.dest_offset + self.length)
+            # dd writes to block devices with O_DIRECT, flush them so that
+            # a completed copy is on stable storage as it is with dd.
+            if self.sync or self._dest_is_blk:
+                tpool.execute(os.fsync, fd)
+        finally:
+            os.close(fd)
+
+    def run(self):
+        """Perform the copy, blocking the calling greenthread until done."""
+        if not os.path.exists(self.dest):
+            raise exception.DeviceUnavailable(
+                path=self.dest, reason=_("Destination does not exist."))
+        self._zero_mode = self._select_zero_mode()
+
+        start_time = timeutils.utcnow()
+
+        # Offsets are shared by all workers, each worker takes the next
+        # chunk when its previous I/O completes.
+        offsets = iter(range(0, self.length, self.chunk_size))
+        pool = eventlet.GreenPool(self.io_depth)
+        workers = [pool.spawn(self._worker, offsets)
+                   for _i in range(self.io_depth)]
+        try:
+            for worker in workers:
+                worker.wait()
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                self._aborted = True
+                pool.waitall()
+
+        self._finish()
+
+        duration = max(1, timeutils.delta_seconds(start_time,
+                                                  timeutils.utcnow()))
+        LOG.info(_LI("Volume copy %(size).2f MB at %(mbps).2f MB/s, "
+                     "%(zero).2f MB were zero (%(mode)s)."),
+                 {'size': float(self.bytes_done) / units.Mi,
+                  'mbps': float(self.bytes_done) / units.Mi / duration,
+                  'zero': float(self.bytes_zero) / units.Mi,
+                  'mode': self._zero_mode})
@@ -0,0 +1,137 @@
+# Copyright (c) 2016 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Concurrency limits for volume data copies."""
+
+
+import contextlib
+import heapq
+import itertools
+import time
+
+from eventlet import event
+from oslo_log import log as logging
+
+
+LOG = logging.getLogger(__name__)
+
+# Copies for user-facing requests, such as creating a volume from an image,
+# a snapshot or another volume.
+PRIORITY_HIGH = 0
+# Copies done on behalf of the service, such as migrations.
+PRIORITY_NORMAL = 1
+# Clearing deleted volumes.
+PRIORITY_LOW = 2
+
+
+class CopyScheduler(object):
+    """Limit the number of data copies running at the same time.
+
+    Copies beyond max_concurrency wait in a queue, and are started in
+    priority order or in arrival order depending on the policy.  A
+    max_concurrency of 0 does not limit copies, but they are still counted.
+    """
+
+    DEFAULT = None
+
+    @staticmethod
+    def set_default(scheduler):
+        CopyScheduler.DEFAULT = scheduler
+
+    @staticmethod
+    def get_default():
+        if CopyScheduler.DEFAULT is None:
+            CopyScheduler.DEFAULT = CopyScheduler()
+        return CopyScheduler.DEFAULT
+
+    def __init__(self, max_concurrency=0, policy='priority'):
+        self.max_concurrency = max_concurrency
+        self.policy = policy
+        self._active = 0
+        self._waiters = []
+        self._seq = itertools.count()
+
+        self._started = 0
+        self._queued = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+
+    def _acquire(self, priority):
+        if (not self.max_concurrency or
+                (self._active < self.max_concurrency and not self._waiters)):
+            self._active += 1
+            return 0.0
+
+        # Waiters are ordered by (sort key, arrival), the last field is only
+        # kept for the queue depth metrics.
+        sort_key = priority if self.policy == 'priority' else 0
+        waiter = (sort_key, next(self._seq), event.Event(), priority)
+        heapq.heappush(self._waiters, waiter)
+        self._queued += 1
+        start = time.time()
+        try:
+            waiter[2].wait()
+        except BaseException:
+            if waiter[2].ready():
+                # The slot was already handed over to us
+                self._release()
+            else:
+                self._waiters.remove(waiter)
+                heapq.heapify(self._waiters)
+            raise
+        return time.time() - start
+
+    def _release(self):
+        if self._waiters:
+            # Hand the slot over to the next copy without freeing it
+            waiter = heapq.heappop(self._waiters)
+            waiter[2].send()
+        else:
+            self._active -= 1
+
+    @contextlib.contextmanager
+    def slot(self, priority=PRIORITY_NORMAL, name=None):
+        """Run the enclosed copy once a slot is available."""
+        wait_time = self._acquire(priority)
+        self._started += 1
+        self._wait_time_total += wait_time
+        self._wait_time_max = max(self._wait_time_max, wait_time)
+        if wait_time:
+            LOG.debug("Copy %(name)s waited %(wait).2f sec for a slot.",
+                      {'name': name, 'wait': wait_time})
+        try:
+            yield
+        finally:
+            self._release()
+
+    def get_stats(self):
+        """Return copy concurrency metrics for capability reports."""
+        depth = {PRIORITY_HIGH: 0, PRIORITY_NORMAL: 0, PRIORITY_LOW: 0}
+        for waiter in self._waiters:
+            depth[waiter[3]] = depth.get(waiter[3], 0) + 1
+        return {
+            'copy_max_concurrency': self.max_concurrency,
+            'copy_active': self._active,
+            'copy_queue_depth': len(self._waiters),
+            'copy_queue_depth_high': depth[PRIORITY_HIGH],
+            'copy_queue_depth_normal': depth[PRIORITY_NORMAL],
+            'copy_queue_depth_low': depth[PRIORITY_LOW],
+            'copy_started': self._started,
+            'copy_queued': self._queued,
+            'copy_wait_seconds_avg': round(
+                self._wait_time_total / self._started, 3)
+            if self._started else 0.0,
+            'copy_wait_seconds_max': round(self._wait_time_max, 3),
+        }
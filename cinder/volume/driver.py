@@ -31,6 +31,7 @@ from cinder.image import image_utils
 from cinder import objects
 from cinder.objects import fields
 from cinder import utils
+from cinder.volume import copy_scheduler
 from cinder.volume import driver_utils
 from cinder.volume import rpcapi as volume_rpcapi
 from cinder.volume import throttling
@@ -79,8 +80,19 @@ volume_opts = [
                      'running. Otherwise, it will fallback to single path.'),
     cfg.StrOpt('volume_clear',
                default='zero',
-               choices=['none', 'zero', 'shred'],
-               help='Method used to wipe old volumes'),
+               choices=['none', 'zero', 'shred', 'discard'],
+               help='Method used to wipe old volumes. "discard" clears '
+                    'block devices with blkdiscard, zeroing them out in '
+                    'the kernel when discarded blocks are not guaranteed '
+                    'to read back as zeros, and falls back to "zero" when '
+                    'the device does not support it.'),
+    cfg.IntOpt('volume_clear_workers',
+               default=0,
+               min=0,
+               help='Number of volumes that may be wiped at the same time '
+                    'in the background after they are deleted. 0 => wipe '
+                    'synchronously as part of the delete request. Only '
+                    'used by drivers that support background clearing.'),
     cfg.IntOpt('volume_clear_size',
                default=0,
                max=1024,
@@ -128,6 +140,50 @@ volume_opts = [
                default=0,
                help='The upper limit of bandwidth of volume copy. '
                     '0 => unlimited'),
+    cfg.IntOpt('volume_copy_iops_limit',
+               default=0,
+               help='The upper limit of IOPS of volume copy. Only enforced '
+                    'on hosts using cgroup v2. 0 => unlimited'),
+    cfg.StrOpt('volume_copy_cgroup_version',
+               default='auto',
+               choices=['auto', '1', '2'],
+               help='cgroup version used to throttle volume copy. "1" uses '
+                    'the blkio controller through libcgroup tools, "2" '
+                    'creates a child of volume_copy_blkio_cgroup_name, '
+                    'relative to the cgroup2 mount, for every copy and sets '
+                    'its io.max limits, and starts the copy in it with '
+                    'cgexec (libcgroup 2.0 or later) as root. That cgroup '
+                    'must be delegated to the service user. "auto" uses '
+                    'cgroup v2 when the io controller is available on the '
+                    'unified hierarchy.'),
+    cfg.StrOpt('volume_copy_method',
+               default='dd',
+               choices=['dd', 'native'],
+               help='Method used to copy and clear volume data on the '
+                    'host. "dd" runs dd through the root helper, "native" '
+                    'copies in-process with several outstanding I/Os and '
+                    'does not write zero blocks, discarding or punching '
+                    'them out of the destination instead. Copies that '
+                    'require ionice or a throttling cgroup always use dd.'),
+    cfg.IntOpt('volume_copy_io_depth',
+               default=4,
+               min=1,
+               help='Number of I/Os kept in flight by the native volume '
+                    'copy method'),
+    cfg.IntOpt('volume_copy_max_concurrency',
+               default=0,
+               min=0,
+               help='Maximum number of volume data copies, clears and '
+                    'image conversions run at the same time by the volume '
+                    'service. Additional copies wait in a queue. '
+                    '0 => unlimited'),
+    cfg.StrOpt('volume_copy_queue_policy',
+               default='priority',
+               choices=['priority', 'fifo'],
+               help='Order in which queued volume data copies are started. '
+                    '"priority" starts copies for user requests first, then '
+                    'migrations, then clears of deleted volumes, "fifo" '
+                    'starts them in arrival order.'),
     cfg.StrOpt('iscsi_write_cache',
                default='on',
                choices=['on', 'off'],
@@ -506,8 +562,30 @@ class BaseVD(object):
                         self.configuration.safe_get(
                             'volume_copy_blkio_cgroup_name')) or
                        CONF.volume_copy_blkio_cgroup_name)
+        iops_limit = ((self.configuration and
+                       self.configuration.safe_get(
+                           'volume_copy_iops_limit')) or
+                      CONF.volume_copy_iops_limit)
+        cgroup_version = ((self.configuration and
+                           self.configuration.safe_get(
+                               'volume_copy_cgroup_version')) or
+                          CONF.volume_copy_cgroup_version)
+        if cgroup_version == 'auto':
+            cgroup_version = ('2' if throttling.IoMaxCgroup.is_supported()
+                              else '1')
         self._throttle = None
-        if bps_limit:
+        if cgroup_version == '2' and (bps_limit or iops_limit):
+            try:
+                self._throttle = throttling.IoMaxCgroup(int(bps_limit),
+                                                        int(iops_limit),
+                                                        cgroup_name)
+            except EnvironmentError as err:
+                LOG.warning(_LW('Failed to activate volume copy throttling: '
+                                '%(err)s'), {'err': err})
+        elif bps_limit:
+            if iops_limit:
+                LOG.warning(_LW('volume_copy_iops_limit is ignored with '
+                                'cgroup v1 throttling.'))
             try:
                 self._throttle = throttling.BlkioCgroup(int(bps_limit),
                                                         cgroup_name)
@@ -516,6 +594,17 @@ class BaseVD(object):
                                 '%(err)s'), {'err': err})
         throttling.Throttle.set_default(self._throttle)
 
+    def set_copy_scheduler(self):
+        max_concurrency = ((self.configuration and
+                            self.configuration.safe_get(
+                                'volume_copy_max_concurrency')) or
+                           CONF.volume_copy_max_concurrency)
+        policy = ((self.configuration and
+                   self.configuration.safe_get('volume_copy_queue_policy')) or
+                  CONF.volume_copy_queue_policy)
+        copy_scheduler.CopyScheduler.set_default(
+            copy_scheduler.CopyScheduler(int(max_concurrency), policy))
+
     def get_version(self):
         """Get the current version of this driver."""
         return self.VERSION
@@ -1527,6 +1616,21 @@ class BaseVD(object):
         """Synchronously recreates an export for a volume."""
         return
 
+    def ensure_exports(self, context, volumes):
+        """Synchronously recreates the exports of several volumes.
+
+        This is called on startup with all the in-use volumes of the host.
+        Drivers that can recreate all their exports at once, e.g. with a
+        single update of the target configuration, can implement it instead
+        of having ensure_export called for each volume.
+
+        :param context: the context of the caller
+        :param volumes: list of the volumes to re-export
+        :returns: list of the ids of the volumes whose export could not be
+                  recreated
+        """
+        raise NotImplementedError()
+
     @abc.abstractmethod
     def create_export(self, context, volume, connector):
         """Exports the volume.
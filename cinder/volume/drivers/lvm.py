@@ -15,6 +15,8 @@ Driver for Linux servers running LVM.
 
 """
 
+import collections
+import functools
 import math
 import os
 import socket
@@ -34,6 +36,7 @@ from cinder.image import image_utils
 from cinder import interface
 from cinder import objects
 from cinder import utils
+from cinder.volume import clear_queue
 from cinder.volume import driver
 from cinder.volume import utils as volutils
 
@@ -69,12 +72,31 @@ volume_opts = [
                  help='max_over_subscription_ratio setting for the LVM '
                       'driver.  If set, this takes precedence over the '
                       'general max_over_subscription_ratio option.  If '
-                      'None, the general option is used.')
+                      'None, the general option is used.'),
+    cfg.IntOpt('lvm_cache_ttl',
+               default=60,
+               min=0,
+               help='Number of seconds the logical volume and volume group '
+                    'information of the volume group is cached for. The '
+                    'cache is updated by the changes made by the driver and '
+                    'reloaded when it expires, so that it also sees the '
+                    'changes made outside of Cinder. 0 disables the cache.'),
+    cfg.ListOpt('lvm_volume_groups',
+                default=[],
+                help='Volume groups managed by the back end. Each volume '
+                     'group is reported to the scheduler as a separate pool '
+                     'named after the volume group, and the lvm_type and '
+                     'lvm_mirrors options apply to all of them. If empty, '
+                     'the back end manages the volume_group volume group as '
+                     'a single pool named after the back end.'),
 ]
 
 CONF = cfg.CONF
 CONF.register_opts(volume_opts)
 
+# Deleted volumes are renamed with this prefix until they are cleared
+RECLAIM_PREFIX = 'reclaim-'
+
 
 @interface.volumedriver
 class LVMVolumeDriver(driver.VolumeDriver):
@@ -92,6 +114,9 @@ class LVMVolumeDriver(driver.VolumeDriver):
         self.configuration.append_config_values(volume_opts)
         self.hostname = socket.gethostname()
         self.vg = vg_obj
+        # Volume groups by pool name when lvm_volume_groups is set,
+        # self.vg is then the first one.
+        self._pools = collections.OrderedDict()
         self.backend_name =\
             self.configuration.safe_get('volume_backend_name') or 'LVM'
 
@@ -113,6 +138,12 @@ class LVMVolumeDriver(driver.VolumeDriver):
             executor=self._execute)
         self.protocol = self.target_driver.protocol
         self._sparse_copy_volume = False
+        self._clear_queue = None
+        if (self.configuration.safe_get('volume_clear_workers') and
+                self.configuration.volume_clear != 'none'):
+            self._clear_queue = clear_queue.ClearQueue(
+                self.configuration.volume_clear_workers,
+                name=self.backend_name)
 
         if self.configuration.lvm_max_over_subscription_ratio is not None:
             self.configuration.max_over_subscription_ratio = \
@@ -121,23 +152,115 @@ class LVMVolumeDriver(driver.VolumeDriver):
     def _sizestr(self, size_in_g):
         return '%sg' % size_in_g
 
-    def _volume_not_present(self, volume_name):
-        return self.vg.get_volume(volume_name) is None
+    def _volume_not_present(self, volume_name, vg=None):
+        if vg is None:
+            vg = self.vg
+        return vg.get_volume(volume_name) is None
 
-    def _delete_volume(self, volume, is_snapshot=False):
-        """Deletes a logical volume."""
-        if self.configuration.volume_clear != 'none' and \
-                self.configuration.lvm_type != 'thin':
-            self._clear_volume(volume, is_snapshot)
+    def _get_vg(self, volume):
+        """Return the volume group of a volume.
 
+        The volume group is the pool of the volume host.  When the host has
+        no pool of this back end, the volume group is looked up by the name
+        of the logical volume.
+        """
+        if not self._pools:
+            return self.vg
+        pool = None
+        if 'host' in volume and volume['host']:
+            pool = volutils.extract_host(volume['host'], 'pool')
+        if pool in self._pools:
+            return self._pools[pool]
+        return self._find_vg(self._escape_snapshot(volume['name']))
+
+    def _get_snapshot_vg(self, snapshot):
+        """Return the volume group of a snapshot, which is its volume's."""
+        if not self._pools:
+            return self.vg
+        volume = snapshot.get('volume')
+        if volume:
+            return self._get_vg(volume)
+        return self._find_vg(snapshot['volume_name'])
+
+    def _find_vg(self, lv_name):
+        for vg in self._pools.values():
+            if vg.get_volume(lv_name) is not None:
+                return vg
+        return self.vg
+
+    def _get_vg_name(self, volume):
+        if not self._pools:
+            return self.configuration.volume_group
+        return self._get_vg(volume).vg_name
+
+    def _delete_volume(self, volume, is_snapshot=False, vg=None):
+        """Deletes a logical volume."""
         name = volume['name']
         if is_snapshot:
             name = self._escape_snapshot(volume['name'])
-        self.vg.delete(name)
+        if vg is None:
+            vg = self._get_vg(volume)
 
-    def _clear_volume(self, volume, is_snapshot=False):
+        if self.configuration.volume_clear != 'none' and \
+                self.configuration.lvm_type != 'thin':
+            # Snapshots are cleared synchronously, their origin can not be
+            # deleted until they are gone.
+            if self._clear_queue and not is_snapshot:
+                # The volume is renamed out of the way so that the delete
+                # completes now, and the reclaim LV left in the volume
+                # group is found again if the service restarts before it
+                # is cleared.
+                reclaim_name = RECLAIM_PREFIX + name
+                vg.rename_volume(name, reclaim_name)
+                self._reclaim_volume(vg, reclaim_name, volume['size'])
+                return
+            self._clear_volume(volume, is_snapshot, vg=vg)
+
+        vg.delete(name)
+
+    def _reclaim_volume(self, vg, name, size_in_g, queue=None):
+        """Clear and delete the LV of a deleted volume in the background."""
+        volume_ref = {'id': name, 'name': name, 'size': size_in_g}
+        (queue or self._clear_queue).submit(
+            name, size_in_g * units.Ki,
+            functools.partial(self._clear_and_delete_volume,
+                              volume_ref, name, vg))
+
+    def _clear_and_delete_volume(self, volume, name, vg):
+        self._clear_volume(volume)
+        vg.delete(name)
+
+    def _reclaim_pending_volumes(self, vg):
+        """Reclaim the LVs of the volumes deleted before the service restart.
+
+        They are always cleared in the background so that the service
+        starts without waiting for them, and a failure to reclaim one of
+        them does not prevent the others from being reclaimed.
+        """
+        queue = self._clear_queue
+        if queue is None and self.configuration.volume_clear != 'none':
+            # volume_clear_workers was changed to 0, the LVs left over are
+            # cleared one at a time.
+            queue = clear_queue.ClearQueue(
+                1, name='%s-reclaim' % self.backend_name)
+
+        for lv in vg.get_volumes():
+            if not lv['name'].startswith(RECLAIM_PREFIX):
+                continue
+            try:
+                if queue:
+                    size_in_g = int(math.ceil(float(lv['size'])))
+                    self._reclaim_volume(vg, lv['name'], size_in_g,
+                                         queue=queue)
+                else:
+                    # volume_clear was changed to none
+                    vg.delete(lv['name'])
+            except Exception:
+                LOG.exception(_LE('Failed to reclaim logical volume %s.'),
+                              lv['name'])
+
+    def _clear_volume(self, volume, is_snapshot=False, vg=None):
         # zero out old volumes to prevent data leaking between users
-        # TODO(ja): reclaiming space should be done lazy and low priority
         if is_snapshot:
             # if the volume to be cleared is a snapshot of another volume
             # we need to clear out the volume using the -cow instead of the
@@ -148,9 +271,6 @@ class LVMVolumeDriver(driver.VolumeDriver):
         else:
             dev_path = self.local_path(volume)
 
-        # TODO(jdg): Maybe we could optimize this for snaps by looking at
-        # the cow table and only overwriting what's necessary?
-        # for now we're still skipping on snaps due to hang issue
         if not os.path.exists(dev_path):
             msg = (_('Volume device file path %s does not exist.')
                    % dev_path)
@@ -169,11 +289,48 @@ class LVMVolumeDriver(driver.VolumeDriver):
         # be sure to convert before passing in
         vol_sz_in_meg = size_in_g * units.Ki
 
+        if is_snapshot:
+            self._clear_snapshot(
+                volume, dev_path, vol_sz_in_meg,
+                vg if vg is not None else self._get_snapshot_vg(volume))
+            return
+
         volutils.clear_volume(
             vol_sz_in_meg, dev_path,
             volume_clear=self.configuration.volume_clear,
             volume_clear_size=self.configuration.volume_clear_size)
 
+    def _clear_snapshot(self, snapshot, dev_path, size_in_m, vg):
+        """Clear the allocated part of the COW store of a snapshot.
+
+        Writes to the origin while the snapshot is cleared allocate more
+        chunks after the ones already allocated, so the allocated size is
+        checked again after each pass and the chunks allocated since are
+        cleared, until it no longer grows.  The whole store is cleared if
+        its allocated size is unknown.
+        """
+        name = self._escape_snapshot(snapshot['name'])
+        clear_size = min(self.configuration.volume_clear_size or size_in_m,
+                         size_in_m)
+        cleared = 0
+        while cleared < clear_size:
+            allocated = vg.get_snapshot_allocated_size(name)
+            if allocated is None:
+                allocated = clear_size
+            allocated = min(int(math.ceil(allocated)), clear_size)
+            if allocated <= cleared:
+                break
+            LOG.debug('Clearing %(cleared)s to %(allocated)s of %(size)s '
+                      'MiB of the COW store of snapshot %(name)s.',
+                      {'cleared': cleared, 'allocated': allocated,
+                       'size': size_in_m, 'name': name})
+            volutils.clear_volume(
+                size_in_m, dev_path,
+                volume_clear=self.configuration.volume_clear,
+                volume_clear_size=allocated - cleared,
+                volume_clear_offset=cleared)
+            cleared = allocated
+
     def _escape_snapshot(self, snapshot_name):
         # Linux LVM reserves name that starts with snapshot, so that
         # such volume name can't be created. Mangle it.
@@ -194,53 +351,40 @@ class LVMVolumeDriver(driver.VolumeDriver):
 
         vg_ref.create_volume(name, size, lvm_type, mirror_count)
 
-    def _update_volume_stats(self):
-        """Retrieve stats info from volume group."""
-
-        LOG.debug("Updating volume stats")
-        if self.vg is None:
-            LOG.warning(_LW('Unable to update stats on non-initialized '
-                            'Volume Group: %s'),
-                        self.configuration.volume_group)
-            return
-
-        self.vg.update_volume_group_info()
-        data = {}
-
-        # Note(zhiteng): These information are driver/backend specific,
-        # each driver may define these values in its own config options
-        # or fetch from driver specific configuration file.
-        data["volume_backend_name"] = self.backend_name
-        data["vendor_name"] = 'Open Source'
-        data["driver_version"] = self.VERSION
-        data["storage_protocol"] = self.protocol
-        data["pools"] = []
-
-        total_capacity = 0
-        free_capacity = 0
+    def _get_pool_stats(self, vg, pool_name):
+        """Return the capabilities of the pool of a volume group."""
+        lvs = vg.get_volumes()
+        # The LVs of deleted volumes waiting to be cleared take space that
+        # is neither free nor provisioned.
+        reclaim_lvs = [lv for lv in lvs
+                       if lv['name'].startswith(RECLAIM_PREFIX)]
+        reclaim_capacity = round(sum(float(lv['size'])
+                                     for lv in reclaim_lvs), 2)
 
         if self.configuration.lvm_mirrors > 0:
             total_capacity =\
-                self.vg.vg_mirror_size(self.configuration.lvm_mirrors)
+                vg.vg_mirror_size(self.configuration.lvm_mirrors)
             free_capacity =\
-                self.vg.vg_mirror_free_space(self.configuration.lvm_mirrors)
+                vg.vg_mirror_free_space(self.configuration.lvm_mirrors)
             provisioned_capacity = round(
-                float(total_capacity) - float(free_capacity), 2)
+                float(total_capacity) - float(free_capacity) -
+                reclaim_capacity, 2)
         elif self.configuration.lvm_type == 'thin':
-            total_capacity = self.vg.vg_thin_pool_size
-            free_capacity = self.vg.vg_thin_pool_free_space
-            provisioned_capacity = self.vg.vg_provisioned_capacity
+            total_capacity = vg.vg_thin_pool_size
+            free_capacity = vg.vg_thin_pool_free_space
+            provisioned_capacity = vg.vg_provisioned_capacity
         else:
-            total_capacity = self.vg.vg_size
-            free_capacity = self.vg.vg_free_space
+            total_capacity = vg.vg_size
+            free_capacity = vg.vg_free_space
             provisioned_capacity = round(
-                float(total_capacity) - float(free_capacity), 2)
+                float(total_capacity) - float(free_capacity) -
+                reclaim_capacity, 2)
 
         location_info = \
             ('LVMVolumeDriver:%(hostname)s:%(vg)s'
              ':%(lvm_type)s:%(lvm_mirrors)s' %
              {'hostname': self.hostname,
-              'vg': self.configuration.volume_group,
+              'vg': vg.vg_name,
               'lvm_type': self.configuration.lvm_type,
               'lvm_mirrors': self.configuration.lvm_mirrors})
 
@@ -248,13 +392,10 @@ class LVMVolumeDriver(driver.VolumeDriver):
 
         # Calculate the total volumes used by the VG group.
         # This includes volumes and snapshots.
-        total_volumes = len(self.vg.get_volumes())
+        total_volumes = len(lvs) - len(reclaim_lvs)
 
-        # Skip enabled_pools setting, treat the whole backend as one pool
-        # XXX FIXME if multipool support is added to LVM driver.
-        single_pool = {}
-        single_pool.update(dict(
-            pool_name=data["volume_backend_name"],
+        pool = dict(
+            pool_name=pool_name,
             total_capacity_gb=total_capacity,
             free_capacity_gb=free_capacity,
             reserved_percentage=self.configuration.reserved_percentage,
@@ -268,61 +409,109 @@ class LVMVolumeDriver(driver.VolumeDriver):
             total_volumes=total_volumes,
             filter_function=self.get_filter_function(),
             goodness_function=self.get_goodness_function(),
-            multiattach=True
-        ))
-        data["pools"].append(single_pool)
+            multiattach=True,
+            reclaim_pending_gb=reclaim_capacity,
+        )
+
+        if self._clear_queue:
+            pool.update(self._clear_queue.get_stats())
+        return pool
+
+    def _update_volume_stats(self):
+        """Retrieve stats info from the volume groups."""
+
+        LOG.debug("Updating volume stats")
+        if self.vg is None:
+            LOG.warning(_LW('Unable to update stats on non-initialized '
+                            'Volume Group: %s'),
+                        self.configuration.volume_group)
+            return
+
+        data = {}
+
+        # Note(zhiteng): These information are driver/backend specific,
+        # each driver may define these values in its own config options
+        # or fetch from driver specific configuration file.
+        data["volume_backend_name"] = self.backend_name
+        data["vendor_name"] = 'Open Source'
+        data["driver_version"] = self.VERSION
+        data["storage_protocol"] = self.protocol
+        data["pools"] = []
+
+        if self._pools:
+            # One pool per volume group, named after the volume group
+            for pool_name, vg in self._pools.items():
+                vg.update_volume_group_info()
+                data["pools"].append(self._get_pool_stats(vg, pool_name))
+        else:
+            # A single volume group, the whole backend is one pool
+            self.vg.update_volume_group_info()
+            data["pools"].append(
+                self._get_pool_stats(self.vg, data["volume_backend_name"]))
 
         # Check availability of sparse volume copy.
         data['sparse_copy_volume'] = self._sparse_copy_volume
 
         self._stats = data
 
-    def check_for_setup_error(self):
-        """Verify that requirements are in place to use LVM driver."""
-        if self.vg is None:
-            root_helper = utils.get_root_helper()
+    def _init_vg(self, vg_name):
+        root_helper = utils.get_root_helper()
 
-            lvm_conf_file = self.configuration.lvm_conf_file
-            if lvm_conf_file.lower() == 'none':
-                lvm_conf_file = None
+        lvm_conf_file = self.configuration.lvm_conf_file
+        if lvm_conf_file.lower() == 'none':
+            lvm_conf_file = None
 
-            try:
-                self.vg = lvm.LVM(self.configuration.volume_group,
-                                  root_helper,
-                                  lvm_type=self.configuration.lvm_type,
-                                  executor=self._execute,
-                                  lvm_conf=lvm_conf_file)
+        try:
+            return lvm.LVM(vg_name,
+                           root_helper,
+                           lvm_type=self.configuration.lvm_type,
+                           executor=self._execute,
+                           lvm_conf=lvm_conf_file,
+                           cache_ttl=self.configuration.lvm_cache_ttl)
+
+        except exception.VolumeGroupNotFound:
+            message = (_("Volume Group %s does not exist") % vg_name)
+            raise exception.VolumeBackendAPIException(data=message)
 
-            except exception.VolumeGroupNotFound:
+    def check_for_setup_error(self):
+        """Verify that requirements are in place to use LVM driver."""
+        if self.configuration.lvm_volume_groups:
+            for vg_name in self.configuration.lvm_volume_groups:
+                if vg_name not in self._pools:
+                    self._pools[vg_name] = self._init_vg(vg_name)
+            self.vg = self._pools[self.configuration.lvm_volume_groups[0]]
+        elif self.vg is None:
+            self.vg = self._init_vg(self.configuration.volume_group)
+
+        vgs = list(self._pools.values()) or [self.vg]
+        for vg in vgs:
+            vg_list = volutils.get_all_volume_groups(vg.vg_name)
+            vg_dict = \
+                next(vg_ref for vg_ref in vg_list
+                     if vg_ref['name'] == vg.vg_name)
+            if vg_dict is None:
                 message = (_("Volume Group %s does not exist") %
-                           self.configuration.volume_group)
+                           vg.vg_name)
                 raise exception.VolumeBackendAPIException(data=message)
 
-        vg_list = volutils.get_all_volume_groups(
-            self.configuration.volume_group)
-        vg_dict = \
-            next(vg for vg in vg_list if vg['name'] == self.vg.vg_name)
-        if vg_dict is None:
-            message = (_("Volume Group %s does not exist") %
-                       self.configuration.volume_group)
-            raise exception.VolumeBackendAPIException(data=message)
-
-        pool_name = "%s-pool" % self.configuration.volume_group
-
         if self.configuration.lvm_type == 'auto':
             # Default to thin provisioning if it is supported and
-            # the volume group is empty, or contains a thin pool
+            # the volume groups are empty, or contain a thin pool
             # for us to use.
-            self.vg.update_volume_group_info()
+            for vg in vgs:
+                vg.update_volume_group_info()
 
             self.configuration.lvm_type = 'default'
 
             if volutils.supports_thin_provisioning():
-                if self.vg.get_volume(pool_name) is not None:
+                has_pool = [vg.get_volume(self._thin_pool_name(vg))
+                            is not None for vg in vgs]
+                if all(has_pool):
                     LOG.info(_LI('Enabling LVM thin provisioning by default '
                                  'because a thin pool exists.'))
                     self.configuration.lvm_type = 'thin'
-                elif len(self.vg.get_volumes()) == 0:
+                elif all(pool or len(vg.get_volumes()) == 0
+                         for pool, vg in zip(has_pool, vgs)):
                     LOG.info(_LI('Enabling LVM thin provisioning by default '
                                  'because no LVs exist.'))
                     self.configuration.lvm_type = 'thin'
@@ -334,19 +523,30 @@ class LVMVolumeDriver(driver.VolumeDriver):
                             "on this version of LVM.")
                 raise exception.VolumeBackendAPIException(data=message)
 
-            if self.vg.get_volume(pool_name) is None:
-                try:
-                    self.vg.create_thin_pool(pool_name)
-                except processutils.ProcessExecutionError as exc:
-                    exception_message = (_("Failed to create thin pool, "
-                                           "error message was: %s")
-                                         % six.text_type(exc.stderr))
-                    raise exception.VolumeBackendAPIException(
-                        data=exception_message)
+            for vg in vgs:
+                pool_name = self._thin_pool_name(vg)
+                if vg.get_volume(pool_name) is None:
+                    try:
+                        vg.create_thin_pool(pool_name)
+                    except processutils.ProcessExecutionError as exc:
+                        exception_message = (_("Failed to create thin pool, "
+                                               "error message was: %s")
+                                             % six.text_type(exc.stderr))
+                        raise exception.VolumeBackendAPIException(
+                            data=exception_message)
 
             # Enable sparse copy since lvm_type is 'thin'
             self._sparse_copy_volume = True
 
+        # The volumes deleted with background clearing are reclaimed even
+        # when it has been disabled since
+        for vg in vgs:
+            self._reclaim_pending_volumes(vg)
+
+    @staticmethod
+    def _thin_pool_name(vg):
+        return "%s-pool" % vg.vg_name
+
     def create_volume(self, volume):
         """Creates a logical volume."""
         mirror_count = 0
@@ -356,7 +556,8 @@ class LVMVolumeDriver(driver.VolumeDriver):
         self._create_volume(volume['name'],
                             self._sizestr(volume['size']),
                             self.configuration.lvm_type,
-                            mirror_count)
+                            mirror_count,
+                            self._get_vg(volume))
 
     def update_migrated_volume(self, ctxt, volume, new_volume,
                                original_volume_status):
@@ -378,7 +579,8 @@ class LVMVolumeDriver(driver.VolumeDriver):
             current_name = CONF.volume_name_template % new_volume['id']
             original_volume_name = CONF.volume_name_template % volume['id']
             try:
-                self.vg.rename_volume(current_name, original_volume_name)
+                self._get_vg(new_volume).rename_volume(
+                    current_name, original_volume_name)
             except processutils.ProcessExecutionError:
                 LOG.error(_LE('Unable to rename the logical volume '
                               'for volume: %s'), volume['id'])
@@ -398,11 +600,13 @@ class LVMVolumeDriver(driver.VolumeDriver):
         self._create_volume(volume['name'],
                             self._sizestr(volume['size']),
                             self.configuration.lvm_type,
-                            self.configuration.lvm_mirrors)
+                            self.configuration.lvm_mirrors,
+                            self._get_vg(volume))
 
         # Some configurations of LVM do not automatically activate
         # ThinLVM snapshot LVs.
-        self.vg.activate_lv(snapshot['name'], is_snapshot=True)
+        self._get_snapshot_vg(snapshot).activate_lv(snapshot['name'],
+                                                    is_snapshot=True)
 
         # copy_volume expects sizes in MiB, we store integer GiB
         # be sure to convert before passing in
@@ -420,28 +624,32 @@ class LVMVolumeDriver(driver.VolumeDriver):
         # remove export here because we already did it
         # in the manager before we got here.
 
-        if self._volume_not_present(volume['name']):
+        vg = self._get_vg(volume)
+        if self._volume_not_present(volume['name'], vg):
             # If the volume isn't present, then don't attempt to delete
             return True
 
-        if self.vg.lv_has_snapshot(volume['name']):
+        if vg.lv_has_snapshot(volume['name']):
             LOG.error(_LE('Unable to delete due to existing snapshot '
                           'for volume: %s'), volume['name'])
             raise exception.VolumeIsBusy(volume_name=volume['name'])
 
-        self._delete_volume(volume)
+        self._delete_volume(volume, vg=vg)
         LOG.info(_LI('Successfully deleted volume: %s'), volume['id'])
 
     def create_snapshot(self, snapshot):
         """Creates a snapshot."""
 
-        self.vg.create_lv_snapshot(self._escape_snapshot(snapshot['name']),
-                                   snapshot['volume_name'],
-                                   self.configuration.lvm_type)
+        vg = self._get_snapshot_vg(snapshot)
+        vg.create_lv_snapshot(self._escape_snapshot(snapshot['name']),
+                              snapshot['volume_name'],
+                              self.configuration.lvm_type)
 
     def delete_snapshot(self, snapshot):
         """Deletes a snapshot."""
-        if self._volume_not_present(self._escape_snapshot(snapshot['name'])):
+        vg = self._get_snapshot_vg(snapshot)
+        if self._volume_not_present(self._escape_snapshot(snapshot['name']),
+                                    vg):
             # If the snapshot isn't present, then don't attempt to delete
             LOG.warning(_LW("snapshot: %s not found, "
                             "skipping delete operations"), snapshot['name'])
@@ -450,11 +658,11 @@ class LVMVolumeDriver(driver.VolumeDriver):
 
         # TODO(yamahata): zeroing out the whole snapshot triggers COW.
         # it's quite slow.
-        self._delete_volume(snapshot, is_snapshot=True)
+        self._delete_volume(snapshot, is_snapshot=True, vg=vg)
 
     def local_path(self, volume, vg=None):
         if vg is None:
-            vg = self.configuration.volume_group
+            vg = self._get_vg_name(volume)
         # NOTE(vish): stops deprecation warning
         escaped_group = vg.replace('-', '--')
         escaped_name = self._escape_snapshot(volume['name']).replace('-', '--')
@@ -478,15 +686,19 @@ class LVMVolumeDriver(driver.VolumeDriver):
 
     def create_cloned_volume(self, volume, src_vref):
         """Creates a clone of the specified volume."""
-        if self.configuration.lvm_type == 'thin':
-            self.vg.create_lv_snapshot(volume['name'],
-                                       src_vref['name'],
-                                       self.configuration.lvm_type)
+        vg = self._get_vg(volume)
+        # Thin snapshots can not be made in another volume group, the
+        # volume is copied instead.
+        if (self.configuration.lvm_type == 'thin' and
+                vg is self._get_vg(src_vref)):
+            vg.create_lv_snapshot(volume['name'],
+                                  src_vref['name'],
+                                  self.configuration.lvm_type)
             if volume['size'] > src_vref['size']:
                 LOG.debug("Resize the new volume to %s.", volume['size'])
                 self.extend_volume(volume, volume['size'])
-            self.vg.activate_lv(volume['name'], is_snapshot=True,
-                                permanent=True)
+            vg.activate_lv(volume['name'], is_snapshot=True,
+                           permanent=True)
             return
 
         mirror_count = 0
@@ -509,9 +721,11 @@ class LVMVolumeDriver(driver.VolumeDriver):
             self._create_volume(volume['name'],
                                 self._sizestr(volume['size']),
                                 self.configuration.lvm_type,
-                                mirror_count)
+                                mirror_count,
+                                vg)
 
-            self.vg.activate_lv(temp_snapshot['name'], is_snapshot=True)
+            self._get_snapshot_vg(temp_snapshot).activate_lv(
+                temp_snapshot['name'], is_snapshot=True)
             volutils.copy_volume(
                 self.local_path(temp_snapshot),
                 self.local_path(volume),
@@ -583,8 +797,8 @@ class LVMVolumeDriver(driver.VolumeDriver):
 
     def extend_volume(self, volume, new_size):
         """Extend an existing volume's size."""
-        self.vg.extend_volume(volume['name'],
-                              self._sizestr(new_size))
+        self._get_vg(volume).extend_volume(volume['name'],
+                                           self._sizestr(new_size))
 
     def manage_existing(self, volume, existing_ref):
         """Manages an existing LV.
@@ -592,8 +806,12 @@ class LVMVolumeDriver(driver.VolumeDriver):
         Renames the LV to match the expected name for the volume.
         Error checking done by manage_existing_get_size is not repeated.
         """
+        self._manage_existing(self._get_vg(volume), volume['name'],
+                              existing_ref)
+
+    def _manage_existing(self, vg, name, existing_ref):
         lv_name = existing_ref['source-name']
-        self.vg.get_volume(lv_name)
+        vg.get_volume(lv_name)
 
         vol_id = volutils.extract_id_from_volume_name(lv_name)
         if volutils.check_already_managed_volume(vol_id):
@@ -601,7 +819,7 @@ class LVMVolumeDriver(driver.VolumeDriver):
 
         # Attempt to rename the LV to match the OpenStack internal name.
         try:
-            self.vg.rename_volume(lv_name, volume['name'])
+            vg.rename_volume(lv_name, name)
         except processutils.ProcessExecutionError as exc:
             exception_message = (_("Failed to rename logical volume %(name)s, "
                                    "error message was: %(err_msg)s")
@@ -624,7 +842,11 @@ class LVMVolumeDriver(driver.VolumeDriver):
             raise exception.ManageExistingInvalidReference(
                 existing_ref=existing_ref, reason=reason)
         lv_name = existing_ref['source-name']
-        lv = self.vg.get_volume(lv_name)
+        if object_type == 'snapshot':
+            vg = self._get_snapshot_vg(existing_object)
+        else:
+            vg = self._get_vg(existing_object)
+        lv = vg.get_volume(lv_name)
 
         # Raise an exception if we didn't find a suitable LV.
         if not lv:
@@ -659,50 +881,54 @@ class LVMVolumeDriver(driver.VolumeDriver):
 
     def manage_existing_snapshot(self, snapshot, existing_ref):
         dest_name = self._escape_snapshot(snapshot['name'])
-        snapshot_temp = {"name": dest_name}
         if not isinstance(existing_ref, dict):
             existing_ref = {"source-name": existing_ref}
-        return self.manage_existing(snapshot_temp, existing_ref)
+        self._manage_existing(self._get_snapshot_vg(snapshot), dest_name,
+                              existing_ref)
 
     def _get_manageable_resource_info(self, cinder_resources, resource_type,
                                       marker, limit, offset, sort_keys,
                                       sort_dirs):
         entries = []
-        lvs = self.vg.get_volumes()
         cinder_ids = [resource['id'] for resource in cinder_resources]
 
-        for lv in lvs:
-            is_snap = self.vg.lv_is_snapshot(lv['name'])
-            if ((resource_type == 'volume' and is_snap) or
-                    (resource_type == 'snapshot' and not is_snap)):
-                continue
-
-            if resource_type == 'volume':
-                potential_id = volutils.extract_id_from_volume_name(lv['name'])
-            else:
-                unescape = self._unescape_snapshot(lv['name'])
-                potential_id = volutils.extract_id_from_snapshot_name(unescape)
-            lv_info = {'reference': {'source-name': lv['name']},
-                       'size': int(math.ceil(float(lv['size']))),
-                       'cinder_id': None,
-                       'extra_info': None}
-
-            if potential_id in cinder_ids:
-                lv_info['safe_to_manage'] = False
-                lv_info['reason_not_safe'] = 'already managed'
-                lv_info['cinder_id'] = potential_id
-            elif self.vg.lv_is_open(lv['name']):
-                lv_info['safe_to_manage'] = False
-                lv_info['reason_not_safe'] = '%s in use' % resource_type
-            else:
-                lv_info['safe_to_manage'] = True
-                lv_info['reason_not_safe'] = None
-
-            if resource_type == 'snapshot':
-                origin = self.vg.lv_get_origin(lv['name'])
-                lv_info['source_reference'] = {'source-name': origin}
-
-            entries.append(lv_info)
+        for vg in list(self._pools.values()) or [self.vg]:
+            for lv in vg.get_volumes():
+                if lv['name'].startswith(RECLAIM_PREFIX):
+                    continue
+                is_snap = vg.lv_is_snapshot(lv['name'])
+                if ((resource_type == 'volume' and is_snap) or
+                        (resource_type == 'snapshot' and not is_snap)):
+                    continue
+
+                if resource_type == 'volume':
+                    potential_id = volutils.extract_id_from_volume_name(
+                        lv['name'])
+                else:
+                    unescape = self._unescape_snapshot(lv['name'])
+                    potential_id = volutils.extract_id_from_snapshot_name(
+                        unescape)
+                lv_info = {'reference': {'source-name': lv['name']},
+                           'size': int(math.ceil(float(lv['size']))),
+                           'cinder_id': None,
+                           'extra_info': None}
+
+                if potential_id in cinder_ids:
+                    lv_info['safe_to_manage'] = False
+                    lv_info['reason_not_safe'] = 'already managed'
+                    lv_info['cinder_id'] = potential_id
+                elif vg.lv_is_open(lv['name']):
+                    lv_info['safe_to_manage'] = False
+                    lv_info['reason_not_safe'] = '%s in use' % resource_type
+                else:
+                    lv_info['safe_to_manage'] = True
+                    lv_info['reason_not_safe'] = None
+
+                if resource_type == 'snapshot':
+                    origin = vg.lv_get_origin(lv['name'])
+                    lv_info['source_reference'] = {'source-name': origin}
+
+                entries.append(lv_info)
 
         return volutils.paginate_entries_list(entries, marker, limit, offset,
                                               sort_keys, sort_dirs)
@@ -750,11 +976,12 @@ class LVMVolumeDriver(driver.VolumeDriver):
         if (dest_type != 'LVMVolumeDriver' or dest_hostname != self.hostname):
             return false_ret
 
-        if dest_vg == self.vg.vg_name:
+        src_vg = self._get_vg(volume)
+        if dest_vg == src_vg.vg_name:
             message = (_("Refusing to migrate volume ID: %(id)s. Please "
                          "check your configuration because source and "
                          "destination are the same Volume Group: %(name)s.") %
-                       {'id': volume['id'], 'name': self.vg.vg_name})
+                       {'id': volume['id'], 'name': src_vg.vg_name})
             LOG.error(message)
             raise exception.VolumeBackendAPIException(data=message)
 
@@ -766,16 +993,20 @@ class LVMVolumeDriver(driver.VolumeDriver):
                       dest_vg)
             return false_ret
 
-        helper = utils.get_root_helper()
+        if dest_vg in self._pools:
+            # Another pool of this back end
+            dest_vg_ref = self._pools[dest_vg]
+        else:
+            helper = utils.get_root_helper()
 
-        lvm_conf_file = self.configuration.lvm_conf_file
-        if lvm_conf_file.lower() == 'none':
-            lvm_conf_file = None
+            lvm_conf_file = self.configuration.lvm_conf_file
+            if lvm_conf_file.lower() == 'none':
+                lvm_conf_file = None
 
-        dest_vg_ref = lvm.LVM(dest_vg, helper,
-                              lvm_type=lvm_type,
-                              executor=self._execute,
-                              lvm_conf=lvm_conf_file)
+            dest_vg_ref = lvm.LVM(dest_vg, helper,
+                                  lvm_type=lvm_type,
+                                  executor=self._execute,
+                                  lvm_conf=lvm_conf_file)
 
         self._create_volume(volume['name'],
                             self._sizestr(volume['size']),
@@ -797,26 +1028,44 @@ class LVMVolumeDriver(driver.VolumeDriver):
                 LOG.error(_LE("Volume migration failed due to "
                               "exception: %(reason)s."),
                           {'reason': six.text_type(e)}, resource=volume)
-                dest_vg_ref.delete(volume)
-        self._delete_volume(volume)
+                dest_vg_ref.delete(volume['name'])
+        self._delete_volume(volume, vg=src_vg)
         return (True, None)
 
     def get_pool(self, volume):
-        return self.backend_name
+        if not self._pools:
+            return self.backend_name
+        return self._get_vg(volume).vg_name
 
     # #######  Interface methods for DataPath (Target Driver) ########
 
     def ensure_export(self, context, volume):
-        volume_path = "/dev/%s/%s" % (self.configuration.volume_group,
+        volume_path = "/dev/%s/%s" % (self._get_vg_name(volume),
                                       volume['name'])
 
         model_update = \
             self.target_driver.ensure_export(context, volume, volume_path)
         return model_update
 
+    def ensure_exports(self, context, volumes):
+        """Recreates the exports of the volumes one after the other.
+
+        The target helpers update the target configuration shared by all
+        the volumes of the host, which is not safe to do concurrently.
+        """
+        failed = []
+        for volume in volumes:
+            try:
+                self.ensure_export(context, volume)
+            except Exception:
+                LOG.exception(_LE('Failed to re-export volume %s.'),
+                              volume['id'])
+                failed.append(volume['id'])
+        return failed
+
     def create_export(self, context, volume, connector, vg=None):
         if vg is None:
-            vg = self.configuration.volume_group
+            vg = self._get_vg_name(volume)
 
         volume_path = "/dev/%s/%s" % (vg, volume['name'])
 
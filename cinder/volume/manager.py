@@ -36,13 +36,17 @@ intact.
 """
 
 
+import copy
 import requests
+import sys
 import time
 
+from eventlet import greenpool
 from oslo_config import cfg
 from oslo_log import log as logging
 import oslo_messaging as messaging
 from oslo_serialization import jsonutils
+from oslo_service import loopingcall
 from oslo_service import periodic_task
 from oslo_utils import excutils
 from oslo_utils import importutils
@@ -73,6 +77,7 @@ from cinder import quota
 from cinder import utils
 from cinder import volume as cinder_volume
 from cinder.volume import configuration as config
+from cinder.volume import copy_scheduler
 from cinder.volume.flows.manager import create_volume
 from cinder.volume.flows.manager import manage_existing
 from cinder.volume.flows.manager import manage_existing_snapshot
@@ -118,6 +123,33 @@ volume_manager_opts = [
                 default=False,
                 help='Offload pending volume delete during '
                      'volume service startup'),
+    cfg.IntOpt('volume_service_inithost_export_workers',
+               default=8,
+               min=1,
+               help='Number of volume exports recreated concurrently '
+                    'during volume service startup, when the driver does '
+                    'not recreate them all at once'),
+    cfg.IntOpt('group_volume_operation_workers',
+               default=8,
+               min=1,
+               help='Number of driver calls on the volumes or snapshots of '
+                    'generic groups run concurrently by the backend, for '
+                    'all its group snapshot and group from source '
+                    'operations'),
+    cfg.IntOpt('driver_stats_collection_interval',
+               default=0,
+               min=0,
+               help='Interval, in seconds, at which the driver stats are '
+                    'collected in a background thread. The periodic status '
+                    'report then publishes the latest stats collected '
+                    'instead of waiting for the driver. 0 collects them in '
+                    'the periodic status report.'),
+    cfg.IntOpt('driver_stats_max_age',
+               default=300,
+               min=0,
+               help='Age, in seconds, above which the driver stats '
+                    'collected in the background are reported as stale. '
+                    '0 disables the check.'),
     cfg.StrOpt('zoning_mode',
                help='FC Zoning mode configured'),
     cfg.StrOpt('extra_capabilities',
@@ -194,6 +226,13 @@ class VolumeManager(manager.SchedulerDependentManager):
         self.configuration = config.Configuration(volume_manager_opts,
                                                   config_group=service_name)
         self.stats = {}
+        self._stats_collector = None
+        self._driver_stats = None
+        self._driver_stats_time = None
+        self._driver_stats_duration = None
+        self._driver_stats_failures = 0
+        self._group_pool = greenpool.GreenPool(
+            self.configuration.group_volume_operation_workers)
 
         if not volume_driver:
             # Get from configuration, which will get the default
@@ -342,34 +381,85 @@ class VolumeManager(manager.SchedulerDependentManager):
             volumes, snapshots)
 
         if updates:
+            updates = {update['id']: update for update in updates}
+            volume_updates = []
             for volume in volumes:
                 # NOTE(JDG): Make sure returned item is in this hosts volumes
-                update = (
-                    [updt for updt in updates if updt['id'] ==
-                        volume['id']][0])
-                if update:
-                    self.db.volume_update(
-                        ctxt,
-                        update['id'],
-                        {'provider_id': update['provider_id']})
-
-        # NOTE(jdg): snapshots are slighty harder, because
-        # we do not have a host column and of course no get
-        # all by host, so we use a get_all and bounce our
-        # response off of it
+                update = updates.get(volume['id'])
+                if update and (update['provider_id'] !=
+                               volume['provider_id']):
+                    volume_updates.append(
+                        {'id': volume['id'],
+                         'provider_id': update['provider_id']})
+            if volume_updates:
+                self.db.volumes_update(ctxt, volume_updates)
+
         if snapshot_updates:
-            cinder_snaps = self.db.snapshot_get_all(ctxt)
-            for snap in cinder_snaps:
+            snapshot_updates = {update['id']: update
+                                for update in snapshot_updates}
+            provider_updates = []
+            for snap in snapshots:
                 # NOTE(jdg): For now we only update those that have no entry
                 if not snap.get('provider_id', None):
-                    update = (
-                        [updt for updt in snapshot_updates if updt['id'] ==
-                            snap['id']][0])
+                    update = snapshot_updates.get(snap['id'])
                     if update:
-                        self.db.snapshot_update(
-                            ctxt,
-                            update['id'],
-                            {'provider_id': update['provider_id']})
+                        provider_updates.append(
+                            {'id': snap['id'],
+                             'provider_id': update['provider_id']})
+            if provider_updates:
+                self.db.snapshots_update(ctxt, provider_updates)
+
+    def _ensure_exports(self, ctxt, volumes):
+        """Recreate the exports of the in-use volumes of the host.
+
+        The driver is asked to recreate them all at once first, and
+        ensure_export is called for each volume in a pool of
+        volume_service_inithost_export_workers if it can not.
+
+        :returns: the volumes whose export could not be recreated
+        """
+        if not volumes:
+            return []
+
+        try:
+            failed = self.driver.ensure_exports(ctxt, volumes)
+        except NotImplementedError:
+            pass
+        except Exception:
+            LOG.exception(_LE("Failed to re-export volumes, re-exporting "
+                              "them one by one."),
+                          resource={'type': 'driver',
+                                    'id': self.driver.__class__.__name__})
+        else:
+            failed = set(failed or ())
+            for volume in volumes:
+                if volume.id in failed:
+                    LOG.error(_LE("Failed to re-export volume, setting to "
+                                  "ERROR."), resource=volume)
+            return [volume for volume in volumes if volume.id in failed]
+
+        def ensure_export(volume):
+            try:
+                self.driver.ensure_export(ctxt, volume)
+            except Exception:
+                LOG.exception(_LE("Failed to re-export volume, "
+                                  "setting to ERROR."),
+                              resource=volume)
+                return volume
+
+        pool = greenpool.GreenPool(CONF.volume_service_inithost_export_workers)
+        return [volume for volume in pool.imap(ensure_export, volumes)
+                if volume is not None]
+
+    def _set_volumes_error(self, ctxt, volumes):
+        """Set the status of volumes to error in a single DB transaction."""
+        if not volumes:
+            return
+        self.db.volumes_update(ctxt, [{'id': volume.id, 'status': 'error'}
+                                      for volume in volumes])
+        for volume in volumes:
+            volume.status = 'error'
+            volume.obj_reset_changes(['status'])
 
     def _include_resources_in_cluster(self, ctxt):
 
@@ -431,21 +521,16 @@ class VolumeManager(manager.SchedulerDependentManager):
         try:
             self.stats['pools'] = {}
             self.stats.update({'allocated_capacity_gb': 0})
+            to_export = []
+            to_error = []
             for volume in volumes:
                 # available volume should also be counted into allocated
                 if volume['status'] in ['in-use', 'available']:
                     # calculate allocated capacity for driver
                     self._count_allocated_capacity(ctxt, volume)
 
-                    try:
-                        if volume['status'] in ['in-use']:
-                            self.driver.ensure_export(ctxt, volume)
-                    except Exception:
-                        LOG.exception(_LE("Failed to re-export volume, "
-                                          "setting to ERROR."),
-                                      resource=volume)
-                        volume.status = 'error'
-                        volume.save()
+                    if volume['status'] in ['in-use']:
+                        to_export.append(volume)
                 elif volume['status'] in ('downloading', 'creating'):
                     LOG.warning(_LW("Detected volume stuck "
                                     "in %(curr_status)s "
@@ -455,14 +540,15 @@ class VolumeManager(manager.SchedulerDependentManager):
 
                     if volume['status'] == 'downloading':
                         self.driver.clear_download(ctxt, volume)
-                    volume.status = 'error'
-                    volume.save()
+                    to_error.append(volume)
                 elif volume.status == 'uploading':
                     # Set volume status to available or in-use.
                     self.db.volume_update_status_based_on_attachment(
                         ctxt, volume.id)
                 else:
                     pass
+            to_error.extend(self._ensure_exports(ctxt, to_export))
+            self._set_volumes_error(ctxt, to_error)
             snapshots = objects.SnapshotList.get_by_host(
                 ctxt, self.host, {'status': fields.SnapshotStatus.CREATING})
             for snapshot in snapshots:
@@ -476,12 +562,16 @@ class VolumeManager(manager.SchedulerDependentManager):
             return
 
         self.driver.set_throttle()
+        self.driver.set_copy_scheduler()
 
         # at this point the driver is considered initialized.
         # NOTE(jdg): Careful though because that doesn't mean
         # that an entry exists in the service table
         self.driver.set_initialized()
 
+        if self.configuration.driver_stats_collection_interval:
+            self._start_driver_stats_collector()
+
         for volume in volumes:
             if volume['status'] == 'deleting':
                 if CONF.volume_service_inithost_offload:
@@ -1689,7 +1779,8 @@ class VolumeManager(manager.SchedulerDependentManager):
                                   dest_attach_info['device']['path'],
                                   size_in_mb,
                                   self.configuration.volume_dd_blocksize,
-                                  sparse=sparse_copy_volume)
+                                  sparse=sparse_copy_volume,
+                                  priority=copy_scheduler.PRIORITY_NORMAL)
             copy_error = False
         except Exception:
             with excutils.save_and_reraise_exception():
@@ -2006,10 +2097,14 @@ class VolumeManager(manager.SchedulerDependentManager):
                         resource={'type': 'driver',
                                   'id': self.driver.__class__.__name__})
         else:
-            volume_stats = self.driver.get_volume_stats(refresh=True)
-            if self.extra_capabilities:
+            volume_stats = self._get_driver_stats()
+            if self.extra_capabilities and volume_stats is not None:
                 volume_stats.update(self.extra_capabilities)
             if volume_stats:
+                # Append the copy queue metrics of this backend
+                volume_stats.update(
+                    copy_scheduler.CopyScheduler.get_default().get_stats())
+
                 # Append volume stats with 'allocated_capacity_gb'
                 self._append_volume_stats(volume_stats)
 
@@ -2020,6 +2115,79 @@ class VolumeManager(manager.SchedulerDependentManager):
                 # queue it to be sent to the Schedulers.
                 self.update_service_capabilities(volume_stats)
 
+    def _start_driver_stats_collector(self):
+        """Collect the driver stats in a background thread.
+
+        The stats are collected once before the thread is started so that
+        they are available to the first status report.
+        """
+        interval = self.configuration.driver_stats_collection_interval
+        self._collect_driver_stats()
+        self._stats_collector = loopingcall.FixedIntervalLoopingCall(
+            self._collect_driver_stats)
+        self._stats_collector.start(interval=interval,
+                                    initial_delay=interval)
+
+    def _collect_driver_stats(self):
+        start = timeutils.utcnow()
+        try:
+            stats = self.driver.get_volume_stats(refresh=True)
+        except Exception:
+            self._driver_stats_failures += 1
+            LOG.exception(_LE("Failed to collect driver stats."),
+                          resource={'type': 'driver',
+                                    'id': self.driver.__class__.__name__})
+            return
+        finally:
+            self._driver_stats_duration = timeutils.delta_seconds(
+                start, timeutils.utcnow())
+
+        self._driver_stats = stats
+        self._driver_stats_time = timeutils.utcnow()
+        self._driver_stats_failures = 0
+
+    def _get_driver_stats(self):
+        """Returns the driver stats to report.
+
+        Without a background collector the driver is asked for them.
+        Otherwise a copy of the latest stats collected is returned with
+        their age, the duration of the last collection and the number of
+        collections that failed since, or None if none was collected yet.
+        """
+        if self._stats_collector is None:
+            return self.driver.get_volume_stats(refresh=True)
+
+        if self._driver_stats is None:
+            LOG.warning(_LW("No driver stats collected yet, the last "
+                            "%(failures)d collections failed."),
+                        {'failures': self._driver_stats_failures},
+                        resource={'type': 'driver',
+                                  'id': self.driver.__class__.__name__})
+            return None
+
+        age = timeutils.delta_seconds(self._driver_stats_time,
+                                      timeutils.utcnow())
+        max_age = self.configuration.driver_stats_max_age
+        if max_age and age > max_age:
+            LOG.warning(_LW("Reporting driver stats collected %(age)d "
+                            "seconds ago, the last %(failures)d collections "
+                            "failed and the last one took %(duration)d "
+                            "seconds."),
+                        {'age': age,
+                         'failures': self._driver_stats_failures,
+                         'duration': self._driver_stats_duration},
+                        resource={'type': 'driver',
+                                  'id': self.driver.__class__.__name__})
+
+        volume_stats = copy.deepcopy(self._driver_stats)
+        if volume_stats:
+            volume_stats.update(
+                driver_stats_age=round(age, 1),
+                driver_stats_collection_time=round(
+                    self._driver_stats_duration, 1),
+                driver_stats_failures=self._driver_stats_failures)
+        return volume_stats
+
     def _append_volume_stats(self, vol_stats):
         pools = vol_stats.get('pools', None)
         if pools and isinstance(pools, list):
@@ -2049,8 +2217,13 @@ class VolumeManager(manager.SchedulerDependentManager):
         return volume_stats
 
     def publish_service_capabilities(self, context):
-        """Collect driver status and then publish."""
+        """Collect driver status and then publish.
+
+        The capabilities are published in full, as they are requested by
+        schedulers that do not know them.
+        """
         self._report_driver_status(context)
+        self._reset_reported_capabilities()
         self._publish_service_capabilities(context)
 
     def _notify_about_volume_usage(self,
@@ -2889,25 +3062,48 @@ class VolumeManager(manager.SchedulerDependentManager):
         :param source_vols: a list of volume objects in the source_group.
         :returns: model_update, volumes_model_update
         """
-        for vol in volumes:
-            try:
-                if snapshots:
-                    for snapshot in snapshots:
-                        if vol.snapshot_id == snapshot.id:
-                            self.driver.create_volume_from_snapshot(
-                                vol, snapshot)
-                            break
-            except Exception:
-                raise
+        def create_volume(vol):
+            if snapshots:
+                for snapshot in snapshots:
+                    if vol.snapshot_id == snapshot.id:
+                        self.driver.create_volume_from_snapshot(
+                            vol, snapshot)
+                        break
+            if source_vols:
+                for source_vol in source_vols:
+                    if vol.source_volid == source_vol.id:
+                        self.driver.create_cloned_volume(vol, source_vol)
+                        break
+
+        self._run_in_group_pool(create_volume, volumes)
+        return None, None
+
+    def _run_in_group_pool(self, func, items):
+        """Calls func for each item of a group operation.
+
+        The calls run concurrently, with at most
+        group_volume_operation_workers of them at once across all the group
+        operations of the backend. If a call raises, the exception of the
+        first such item is raised once all the calls have returned.
+
+        :returns: the results of the calls, in the order of the items
+        """
+        def call(item):
             try:
-                if source_vols:
-                    for source_vol in source_vols:
-                        if vol.source_volid == source_vol.id:
-                            self.driver.create_cloned_volume(vol, source_vol)
-                            break
+                return func(item), None
             except Exception:
-                raise
-        return None, None
+                return None, sys.exc_info()
+
+        # NOTE: GreenPool.imap would run the calls in a pool of its own,
+        # a pile spawns them in the pool shared by the group operations.
+        pile = greenpool.GreenPile(self._group_pool)
+        for item in items:
+            pile.spawn(call, item)
+        results = list(pile)
+        for _result, exc_info in results:
+            if exc_info:
+                six.reraise(*exc_info)
+        return [result for result, _exc_info in results]
 
     def _sort_snapshots(self, volumes, snapshots):
         # Sort source snapshots so that they are in the same order as their
@@ -3818,26 +4014,28 @@ class VolumeManager(manager.SchedulerDependentManager):
     def _create_group_snapshot_generic(self, context, group_snapshot,
                                        snapshots):
         """Creates a group_snapshot."""
-        model_update = {'status': 'available'}
-        snapshot_model_updates = []
-        for snapshot in snapshots:
+        def create_snapshot(snapshot):
             snapshot_model_update = {'id': snapshot.id}
             try:
                 self.driver.create_snapshot(snapshot)
                 snapshot_model_update['status'] = 'available'
             except Exception:
                 snapshot_model_update['status'] = 'error'
-                model_update['status'] = 'error'
-            snapshot_model_updates.append(snapshot_model_update)
+            return snapshot_model_update
+
+        snapshot_model_updates = self._run_in_group_pool(create_snapshot,
+                                                         snapshots)
+        model_update = {'status': 'available'}
+        if any(update['status'] == 'error'
+               for update in snapshot_model_updates):
+            model_update['status'] = 'error'
 
         return model_update, snapshot_model_updates
 
     def _delete_group_snapshot_generic(self, context, group_snapshot,
                                        snapshots):
         """Deletes a group_snapshot."""
-        model_update = {'status': group_snapshot.status}
-        snapshot_model_updates = []
-        for snapshot in snapshots:
+        def delete_snapshot(snapshot):
             snapshot_model_update = {'id': snapshot.id}
             try:
                 self.driver.delete_snapshot(snapshot)
@@ -3846,8 +4044,14 @@ class VolumeManager(manager.SchedulerDependentManager):
                 snapshot_model_update['status'] = 'available'
             except Exception:
                 snapshot_model_update['status'] = 'error'
-                model_update['status'] = 'error'
-            snapshot_model_updates.append(snapshot_model_update)
+            return snapshot_model_update
+
+        snapshot_model_updates = self._run_in_group_pool(delete_snapshot,
+                                                         snapshots)
+        model_update = {'status': group_snapshot.status}
+        if any(update['status'] == 'error'
+               for update in snapshot_model_updates):
+            model_update['status'] = 'error'
 
         return model_update, snapshot_model_updates
 
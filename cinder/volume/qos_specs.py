@@ -52,6 +52,7 @@ def create(context, name, specs=None):
     LOG.debug("Dict for qos_specs: %s", values)
     qos_spec = objects.QualityOfServiceSpecs(context, **values)
     qos_spec.create()
+    volume_types.invalidate_cache()
     return qos_spec
 
 
@@ -86,6 +87,7 @@ def update(context, qos_specs_id, specs):
         raise exception.QoSSpecsUpdateFailed(specs_id=qos_specs_id,
                                              qos_specs=specs)
 
+    volume_types.invalidate_cache()
     return qos_spec
 
 
@@ -107,6 +109,7 @@ def delete(context, qos_specs_id, force=False):
         context, qos_specs_id)
 
     qos_spec.destroy(force)
+    volume_types.invalidate_cache()
 
 
 def delete_keys(context, qos_specs_id, keys):
@@ -130,6 +133,7 @@ def delete_keys(context, qos_specs_id, keys):
                     specs_key=key, specs_id=qos_specs_id)
     finally:
         qos_spec.save()
+        volume_types.invalidate_cache()
 
 
 def get_associations(context, qos_specs_id):
@@ -180,6 +184,7 @@ def associate_qos_with_type(context, specs_id, type_id):
                 raise exception.InvalidVolumeType(reason=msg)
         else:
             db.qos_specs_associate(context, specs_id, type_id)
+            volume_types.invalidate_cache()
     except db_exc.DBError:
         LOG.exception(_LE('DB error:'))
         LOG.warning(_LW('Failed to associate qos specs '
@@ -194,6 +199,7 @@ def disassociate_qos_specs(context, specs_id, type_id):
     try:
         get_qos_specs(context, specs_id)
         db.qos_specs_disassociate(context, specs_id, type_id)
+        volume_types.invalidate_cache()
     except db_exc.DBError:
         LOG.exception(_LE('DB error:'))
         LOG.warning(_LW('Failed to disassociate qos specs '
@@ -208,6 +214,7 @@ def disassociate_all(context, specs_id):
     try:
         get_qos_specs(context, specs_id)
         db.qos_specs_disassociate_all(context, specs_id)
+        volume_types.invalidate_cache()
     except db_exc.DBError:
         LOG.exception(_LE('DB error:'))
         LOG.warning(_LW('Failed to disassociate qos specs %s.'), specs_id)
@@ -204,10 +204,13 @@ class LioAdm(iscsi.ISCSITarget):
         # We make changes persistent
         self._persist_configuration(volume['id'])
 
+    @utils.synchronized('lioadm_ensure_export', external=True)
     def ensure_export(self, context, volume, volume_path):
         """Recreate exports for logical volumes."""
 
-        # Restore saved configuration file if no target exists.
+        # Restore saved configuration file if no target exists.  The lock
+        # makes sure that it is restored once, the other calls find the
+        # restored targets.
         if not self._get_targets():
             LOG.info(_LI('Restoring iSCSI target from configuration file'))
             self._restore_configuration()
@@ -17,12 +17,15 @@
 
 
 import contextlib
+import errno
+import itertools
+import os
 
 from oslo_concurrency import processutils
 from oslo_log import log as logging
 
 from cinder import exception
-from cinder.i18n import _LW, _LE
+from cinder.i18n import _LI, _LW, _LE
 from cinder import utils
 
 
@@ -45,6 +48,13 @@ class Throttle(object):
     def __init__(self, prefix=None):
         self.prefix = prefix or []
 
+    def _get_device_number(self, path):
+        try:
+            return utils.get_blkdev_major_minor(path)
+        except exception.Error as e:
+            LOG.error(_LE('Failed to get device number for throttling: '
+                          '%(error)s'), {'error': e})
+
     @contextlib.contextmanager
     def subcommand(self, srcpath, dstpath):
         """Sub-command that reads from srcpath and writes to dstpath.
@@ -73,13 +83,6 @@ class BlkioCgroup(Throttle):
                       {'name': cgroup_name})
             raise
 
-    def _get_device_number(self, path):
-        try:
-            return utils.get_blkdev_major_minor(path)
-        except exception.Error as e:
-            LOG.error(_LE('Failed to get device number for throttling: '
-                          '%(error)s'), {'error': e})
-
     def _limit_bps(self, rw, dev, bps):
         try:
             utils.execute('cgset', '-r', 'blkio.throttle.%s_bps_device=%s %d'
@@ -129,3 +132,152 @@ class BlkioCgroup(Throttle):
             yield {'prefix': ['cgexec', '-g', 'blkio:%s' % self.cgroup]}
         finally:
             self._dec_device(srcdev, dstdev)
+
+
+class IoMaxCgroup(Throttle):
+    """Throttle disk I/O bandwidth and IOPS using cgroup v2 io.max.
+
+    Every throttled sub-command is started by cgexec in its own child of
+    the given cgroup, which must be writable by the service.  The limits are
+    shared evenly between the sub-commands using the same device, and are
+    updated through the cgroup filesystem whenever a sub-command starts or
+    ends.  Moving a process into a cgroup requires write access to the
+    cgroups it moves between, so the sub-commands must be run as root.
+    """
+
+    CGROUP_ROOT = '/sys/fs/cgroup'
+    CHILD_PREFIX = 'copy-'
+
+    @classmethod
+    def is_supported(cls):
+        try:
+            with open(os.path.join(cls.CGROUP_ROOT,
+                                   'cgroup.controllers')) as f:
+                return 'io' in f.read().split()
+        except (IOError, OSError):
+            return False
+
+    def __init__(self, bps_limit, iops_limit, cgroup_name):
+        self.bps_limit = bps_limit
+        self.iops_limit = iops_limit
+        self.cgroup = cgroup_name.strip('/')
+        self.path = os.path.join(self.CGROUP_ROOT, self.cgroup)
+        self.srcdevs = {}
+        self.dstdevs = {}
+        self._child_ids = itertools.count()
+
+        try:
+            if not os.path.isdir(self.path):
+                os.makedirs(self.path)
+            self._remove_stale_children()
+            self._write('cgroup.subtree_control', '+io')
+        except EnvironmentError:
+            LOG.error(_LE('Failed to set up io cgroup \'%(path)s\'.'),
+                      {'path': self.path})
+            raise
+
+    def _write(self, name, value, child=None):
+        path = os.path.join(child or self.path, name)
+        with open(path, 'w') as f:
+            f.write(value)
+
+    @staticmethod
+    def _is_alive(pid):
+        try:
+            os.kill(pid, 0)
+        except OSError as e:
+            return e.errno != errno.ESRCH
+        return True
+
+    def _remove_stale_children(self):
+        # The cgroup is shared by the backends of the host, only the
+        # children of the processes that are gone are stale.
+        for name in os.listdir(self.path):
+            child = os.path.join(self.path, name)
+            if (not name.startswith(self.CHILD_PREFIX) or
+                    not os.path.isdir(child)):
+                continue
+            try:
+                pid = int(name[len(self.CHILD_PREFIX):].split('-')[0])
+            except ValueError:
+                continue
+            if self._is_alive(pid):
+                continue
+            LOG.info(_LI('Removing stale io cgroup %s.'), child)
+            try:
+                os.rmdir(child)
+            except EnvironmentError as e:
+                if e.errno != errno.EBUSY:
+                    raise
+                LOG.info(_LI('Io cgroup %s is still in use.'), child)
+
+    def _create_child(self):
+        child = os.path.join(self.path, '%s%d-%d' % (self.CHILD_PREFIX,
+                                                     os.getpid(),
+                                                     next(self._child_ids)))
+        os.mkdir(child)
+        return child
+
+    def _remove_child(self, child):
+        try:
+            os.rmdir(child)
+        except EnvironmentError as e:
+            LOG.warning(_LW('Failed to remove io cgroup %(child)s: '
+                            '%(error)s'), {'child': child, 'error': e})
+
+    def _limit_device(self, child, rw, dev, share):
+        limits = []
+        if self.bps_limit:
+            limits.append('%sbps=%d' % (rw, max(1, self.bps_limit // share)))
+        if self.iops_limit:
+            limits.append('%siops=%d' % (rw, max(1, self.iops_limit // share)))
+        try:
+            self._write('io.max', '%s %s' % (dev, ' '.join(limits)), child)
+        except EnvironmentError:
+            LOG.warning(_LW('Failed to set up io cgroup to throttle the '
+                            'device \'%(device)s\'.'), {'device': dev})
+
+    def _set_limits(self, rw, devs, dev):
+        children = devs.get(dev, [])
+        for child in children:
+            self._limit_device(child, rw, dev, len(children))
+
+    @utils.synchronized('IoMaxCgroup')
+    def _inc_device(self, child, srcdev, dstdev):
+        if srcdev:
+            self.srcdevs.setdefault(srcdev, []).append(child)
+            self._set_limits('r', self.srcdevs, srcdev)
+        if dstdev:
+            self.dstdevs.setdefault(dstdev, []).append(child)
+            self._set_limits('w', self.dstdevs, dstdev)
+
+    @utils.synchronized('IoMaxCgroup')
+    def _dec_device(self, child, srcdev, dstdev):
+        if srcdev:
+            self.srcdevs[srcdev].remove(child)
+            if not self.srcdevs[srcdev]:
+                del self.srcdevs[srcdev]
+            self._set_limits('r', self.srcdevs, srcdev)
+        if dstdev:
+            self.dstdevs[dstdev].remove(child)
+            if not self.dstdevs[dstdev]:
+                del self.dstdevs[dstdev]
+            self._set_limits('w', self.dstdevs, dstdev)
+
+    @contextlib.contextmanager
+    def subcommand(self, srcpath, dstpath):
+        srcdev = self._get_device_number(srcpath)
+        dstdev = self._get_device_number(dstpath)
+
+        if srcdev is None and dstdev is None:
+            yield {'prefix': []}
+            return
+
+        child = self._create_child()
+        self._inc_device(child, srcdev, dstdev)
+        try:
+            yield {'prefix': ['cgexec', '-g', 'io:%s/%s' %
+                              (self.cgroup, os.path.basename(child))]}
+        finally:
+            self._dec_device(child, srcdev, dstdev)
+            self._remove_child(child)
@@ -43,6 +43,8 @@ from cinder.i18n import _, _LI, _LW, _LE
 from cinder import objects
 from cinder import rpc
 from cinder import utils
+from cinder.volume import copy_engine
+from cinder.volume import copy_scheduler
 from cinder.volume import throttling
 from cinder.volume import volume_types
 
@@ -381,7 +383,7 @@ def check_for_odirect_support(src, dest, flag='oflag=direct'):
 
 def _copy_volume_with_path(prefix, srcstr, deststr, size_in_m, blocksize,
                            sync=False, execute=utils.execute, ionice=None,
-                           sparse=False):
+                           sparse=False, dest_offset_in_m=0):
     cmd = prefix[:]
 
     if ionice:
@@ -392,6 +394,10 @@ def _copy_volume_with_path(prefix, srcstr, deststr, size_in_m, blocksize,
 
     cmd.extend(('dd', 'if=%s' % srcstr, 'of=%s' % deststr,
                 'count=%d' % size_in_bytes, 'bs=%s' % blocksize))
+    oflags = []
+    if dest_offset_in_m:
+        cmd.append('seek=%d' % (dest_offset_in_m * units.Mi))
+        oflags.append('seek_bytes')
 
     # Use O_DIRECT to avoid thrashing the system buffer cache
     odirect = check_for_odirect_support(srcstr, deststr, 'iflag=direct')
@@ -399,8 +405,10 @@ def _copy_volume_with_path(prefix, srcstr, deststr, size_in_m, blocksize,
     cmd.append('iflag=count_bytes,direct' if odirect else 'iflag=count_bytes')
 
     if check_for_odirect_support(srcstr, deststr, 'oflag=direct'):
-        cmd.append('oflag=direct')
+        oflags.append('direct')
         odirect = True
+    if oflags:
+        cmd.append('oflag=' + ','.join(oflags))
 
     # If the volume is being unprovisioned then
     # request the data is persisted before returning,
@@ -508,9 +516,27 @@ def _copy_volume_with_file(src, dest, size_in_m):
              {'size_in_m': size_in_m, 'mbps': mbps})
 
 
+def _copy_volume_native(srcstr, deststr, size_in_m, blocksize, sync=False,
+                        sparse=False, dest_offset_in_m=0):
+    blocksize = _check_blocksize(blocksize)
+    engine = copy_engine.CopyEngine(
+        srcstr, deststr, size_in_m * units.Mi,
+        chunk_size=strutils.string_to_bytes('%sB' % blocksize),
+        io_depth=CONF.volume_copy_io_depth, sparse=sparse, sync=sync,
+        dest_offset=dest_offset_in_m * units.Mi)
+
+    with utils.temporary_chown(deststr):
+        if srcstr == copy_engine.ZERO_SOURCE:
+            engine.run()
+        else:
+            with utils.temporary_chown(srcstr):
+                engine.run()
+
+
 def copy_volume(src, dest, size_in_m, blocksize, sync=False,
                 execute=utils.execute, ionice=None, throttle=None,
-                sparse=False):
+                sparse=False, priority=copy_scheduler.PRIORITY_HIGH,
+                dest_offset_in_m=0):
     """Copy data from the source volume to the destination volume.
 
     The parameters 'src' and 'dest' are both typically of type str, which
@@ -522,25 +548,88 @@ def copy_volume(src, dest, size_in_m, blocksize, sync=False,
     of type RawIOBase or any derivative that supports file operations such as
     read and write.  In this case, the handles are treated as file handles
     instead of file paths and, at present moment, throttling is unavailable.
+
+    Path to path copies are done in-process by the copy engine when
+    'volume_copy_method' is set to 'native' and neither ionice nor
+    throttling is in effect, otherwise 'dd' is used.
+
+    The copy waits for a slot of the default copy scheduler, in the order
+    given by 'priority', before it is started.
+
+    Path to path copies write the data 'dest_offset_in_m' MiB into the
+    destination.
     """
+    if dest_offset_in_m and not (isinstance(src, six.string_types) and
+                                 isinstance(dest, six.string_types)):
+        raise exception.InvalidInput(
+            reason=_("A destination offset is only supported for copies "
+                     "between paths."))
+
+    scheduler = copy_scheduler.CopyScheduler.get_default()
+    with scheduler.slot(priority, name=dest):
+        if (isinstance(src, six.string_types) and
+                isinstance(dest, six.string_types)):
+            if not throttle:
+                throttle = throttling.Throttle.get_default()
+            with throttle.subcommand(src, dest) as throttle_cmd:
+                if (CONF.volume_copy_method == 'native' and not ionice and
+                        not throttle_cmd['prefix']):
+                    _copy_volume_native(src, dest, size_in_m, blocksize,
+                                        sync=sync, sparse=sparse,
+                                        dest_offset_in_m=dest_offset_in_m)
+                    return
+                _copy_volume_with_path(throttle_cmd['prefix'], src, dest,
+                                       size_in_m, blocksize, sync=sync,
+                                       execute=execute, ionice=ionice,
+                                       sparse=sparse,
+                                       dest_offset_in_m=dest_offset_in_m)
+        else:
+            _copy_volume_with_file(src, dest, size_in_m)
 
-    if (isinstance(src, six.string_types) and
-            isinstance(dest, six.string_types)):
-        if not throttle:
-            throttle = throttling.Throttle.get_default()
-        with throttle.subcommand(src, dest) as throttle_cmd:
-            _copy_volume_with_path(throttle_cmd['prefix'], src, dest,
-                                   size_in_m, blocksize, sync=sync,
-                                   execute=execute, ionice=ionice,
-                                   sparse=sparse)
-    else:
-        _copy_volume_with_file(src, dest, size_in_m)
+
+def _clear_volume_discard(volume_size, volume_path, volume_clear_size,
+                          volume_clear_offset=0, execute=utils.execute):
+    """Clear a block device with a discard or zero-out request.
+
+    A plain discard is only used when the device reports that discarded
+    blocks read back as zeros, otherwise the kernel is asked to zero the
+    range with BLKZEROOUT, which unmaps the blocks on devices that support
+    it.
+
+    :returns: True if the device was cleared, False if zero-fill is needed
+    """
+    cmd = ['blkdiscard']
+    if not copy_engine.discard_zeroes_data(volume_path):
+        cmd.append('-z')
+    if volume_clear_offset:
+        cmd.extend(('-o', '%d' % (volume_clear_offset * units.Mi)))
+    if volume_clear_offset or volume_clear_size != volume_size:
+        cmd.extend(('-l', '%d' % (volume_clear_size * units.Mi)))
+    cmd.append(volume_path)
+
+    start_time = timeutils.utcnow()
+    try:
+        execute(*cmd, run_as_root=True)
+    except processutils.ProcessExecutionError as e:
+        LOG.warning(_LW("Unable to discard volume %(path)s, falling back "
+                        "to zero-fill: %(err)s"),
+                    {'path': volume_path, 'err': e.stderr})
+        return False
+
+    duration = timeutils.delta_seconds(start_time, timeutils.utcnow())
+    LOG.info(_LI("Volume %(path)s cleared by discard in %(duration).2f sec"),
+             {'path': volume_path, 'duration': duration})
+    return True
 
 
 def clear_volume(volume_size, volume_path, volume_clear=None,
                  volume_clear_size=None, volume_clear_ionice=None,
-                 throttle=None):
-    """Unprovision old volumes to prevent data leaking between users."""
+                 throttle=None, volume_clear_offset=0):
+    """Unprovision old volumes to prevent data leaking between users.
+
+    volume_clear_size MiB are cleared from volume_clear_offset MiB into the
+    volume, a volume_clear_size of 0 clears up to the end of the volume.
+    """
     if volume_clear is None:
         volume_clear = CONF.volume_clear
 
@@ -548,7 +637,7 @@ def clear_volume(volume_size, volume_path, volume_clear=None,
         volume_clear_size = CONF.volume_clear_size
 
     if volume_clear_size == 0:
-        volume_clear_size = volume_size
+        volume_clear_size = volume_size - volume_clear_offset
 
     if volume_clear_ionice is None:
         volume_clear_ionice = CONF.volume_clear_ionice
@@ -560,6 +649,12 @@ def clear_volume(volume_size, volume_path, volume_clear=None,
                         "be removed in the next release. Clearing with dd."))
         volume_clear = 'zero'
 
+    if volume_clear == 'discard':
+        if _clear_volume_discard(volume_size, volume_path,
+                                 volume_clear_size, volume_clear_offset):
+            return
+        volume_clear = 'zero'
+
     # We pass sparse=False explicitly here so that zero blocks are not
     # skipped in order to clear the volume.
     if volume_clear == 'zero':
@@ -567,7 +662,9 @@ def clear_volume(volume_size, volume_path, volume_clear=None,
                            CONF.volume_dd_blocksize,
                            sync=True, execute=utils.execute,
                            ionice=volume_clear_ionice,
-                           throttle=throttle, sparse=False)
+                           throttle=throttle, sparse=False,
+                           priority=copy_scheduler.PRIORITY_LOW,
+                           dest_offset_in_m=volume_clear_offset)
     else:
         raise exception.InvalidConfigurationValue(
             option='volume_clear',
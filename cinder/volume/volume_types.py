@@ -30,14 +30,68 @@ from cinder import db
 from cinder import exception
 from cinder.i18n import _, _LE
 from cinder import quota
+from cinder import utils
+
+volume_types_cache_opts = [
+    cfg.IntOpt('volume_types_cache_ttl',
+               default=300,
+               help='Number of seconds volume types, their extra specs and '
+                    'QoS specs are cached by each process.  0 disables the '
+                    'cache.'),
+    cfg.IntOpt('volume_types_cache_check_interval',
+               default=10,
+               help='Number of seconds between checks for volume type, '
+                    'extra specs and QoS specs changes made by other '
+                    'processes, which drop the cached volume types.'), ]
 
 CONF = cfg.CONF
+CONF.register_opts(volume_types_cache_opts)
 LOG = logging.getLogger(__name__)
 QUOTAS = quota.QUOTAS
 ENCRYPTION_IGNORED_FIELDS = ['volume_type_id', 'created_at', 'updated_at',
                              'deleted_at']
 
 
+def _get_cache_generation():
+    return db.volume_type_get_generation(context.get_admin_context())
+
+
+def _create_cache():
+    """Create the cache of the volume types and of their specs.
+
+    It is invalidated when this process changes volume types, extra specs
+    or QoS specs, and when their generation in the database changes.
+    """
+    return utils.GenerationCache(
+        'Volume types', _get_cache_generation,
+        ttl=lambda: CONF.volume_types_cache_ttl,
+        check_interval=lambda: CONF.volume_types_cache_check_interval)
+
+
+CACHE = _create_cache()
+
+
+def invalidate_cache():
+    """Drop the cached volume types after changing them in this process."""
+    CACHE.invalidate()
+
+
+def reset_cache():
+    global CACHE
+    CACHE = _create_cache()
+
+
+def get_cache_stats():
+    """Return the hit and miss counters of the volume types cache."""
+    return CACHE.get_stats()
+
+
+def _cacheable(ctxt):
+    # Non admin users only see the public types and the types they were
+    # given access to, without their extra specs.
+    return ctxt.is_admin
+
+
 def create(context,
            name,
            extra_specs=None,
@@ -59,6 +113,8 @@ def create(context,
         LOG.exception(_LE('DB error:'))
         raise exception.VolumeTypeCreateFailed(name=name,
                                                extra_specs=extra_specs)
+    invalidate_cache()
+    QUOTAS.invalidate_resources()
     return type_ref
 
 
@@ -75,6 +131,7 @@ def update(context, id, name, description, is_public=None):
                                              dict(name=name,
                                                   description=description,
                                                   is_public=is_public))
+        invalidate_cache()
         # Rename resource in quota if volume type name is changed.
         if name:
             old_type_name = old_volume_type.get('name')
@@ -94,7 +151,10 @@ def destroy(context, id):
         msg = _("id cannot be None")
         raise exception.InvalidVolumeType(reason=msg)
     elevated = context if context.is_admin else context.elevated()
-    return db.volume_type_destroy(elevated, id)
+    result = db.volume_type_destroy(elevated, id)
+    invalidate_cache()
+    QUOTAS.invalidate_resources()
+    return result
 
 
 def get_all_types(context, inactive=0, filters=None, marker=None,
@@ -128,7 +188,11 @@ def get_volume_type(ctxt, id, expected_fields=None):
     if ctxt is None:
         ctxt = context.get_admin_context()
 
-    return db.volume_type_get(ctxt, id, expected_fields=expected_fields)
+    if not _cacheable(ctxt):
+        return db.volume_type_get(ctxt, id, expected_fields=expected_fields)
+    key = ('type', id, ctxt.read_deleted, tuple(expected_fields or ()))
+    return CACHE.get(key, lambda: db.volume_type_get(
+        ctxt, id, expected_fields=expected_fields))
 
 
 def get_by_name_or_id(context, identity):
@@ -144,7 +208,10 @@ def get_volume_type_by_name(context, name):
         msg = _("name cannot be None")
         raise exception.InvalidVolumeType(reason=msg)
 
-    return db.volume_type_get_by_name(context, name)
+    if not _cacheable(context):
+        return db.volume_type_get_by_name(context, name)
+    key = ('type_by_name', name, context.read_deleted)
+    return CACHE.get(key, lambda: db.volume_type_get_by_name(context, name))
 
 
 def get_default_volume_type():
@@ -195,7 +262,9 @@ def add_volume_type_access(context, volume_type_id, project_id):
         msg = _("Type access modification is not applicable to public volume "
                 "type.")
         raise exception.InvalidVolumeType(reason=msg)
-    return db.volume_type_access_add(elevated, volume_type_id, project_id)
+    result = db.volume_type_access_add(elevated, volume_type_id, project_id)
+    invalidate_cache()
+    return result
 
 
 def remove_volume_type_access(context, volume_type_id, project_id):
@@ -208,7 +277,9 @@ def remove_volume_type_access(context, volume_type_id, project_id):
         msg = _("Type access modification is not applicable to public volume "
                 "type.")
         raise exception.InvalidVolumeType(reason=msg)
-    return db.volume_type_access_remove(elevated, volume_type_id, project_id)
+    result = db.volume_type_access_remove(elevated, volume_type_id, project_id)
+    invalidate_cache()
+    return result
 
 
 def is_encrypted(context, volume_type_id):
@@ -226,9 +297,9 @@ def get_volume_type_encryption(context, volume_type_id):
 def get_volume_type_qos_specs(volume_type_id):
     """Get all qos specs for given volume type."""
     ctxt = context.get_admin_context()
-    res = db.volume_type_qos_specs_get(ctxt,
-                                       volume_type_id)
-    return res
+    return CACHE.get(('qos_specs', volume_type_id),
+                     lambda: db.volume_type_qos_specs_get(ctxt,
+                                                          volume_type_id))
 
 
 def volume_types_diff(context, vol_type_id1, vol_type_id2):